@@ -0,0 +1,37 @@
+"""add_open_credit_sales_partial_index
+
+Revision ID: 5c1e7a9d2b40
+Revises: 1323a07c90a4
+Create Date: 2026-10-19 09:12:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d2b40'
+down_revision: Union[str, Sequence[str], None] = '1323a07c90a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    indexes = [i['name'] for i in inspector.get_indexes('sales')]
+    if 'ix_sales_open_credit_customer_date' not in indexes:
+        op.create_index(
+            'ix_sales_open_credit_customer_date', 'sales', ['customer_id', 'date'], unique=False,
+            postgresql_where=sa.text("is_credit = true AND paid = false"),
+            sqlite_where=sa.text("is_credit = 1 AND paid = 0")
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sales_open_credit_customer_date', table_name='sales')
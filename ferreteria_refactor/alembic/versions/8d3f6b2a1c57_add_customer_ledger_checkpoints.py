@@ -0,0 +1,58 @@
+"""add_customer_ledger_checkpoints
+
+Revision ID: 8d3f6b2a1c57
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-19 10:31:07.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6b2a1c57'
+down_revision: Union[str, Sequence[str], None] = '5c1e7a9d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'customer_ledger_checkpoints' not in inspector.get_table_names():
+        op.create_table(
+            'customer_ledger_checkpoints',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('customer_id', sa.Integer(), nullable=False),
+            sa.Column('entry_date', sa.DateTime(), nullable=False),
+            sa.Column('sale_id', sa.Integer(), nullable=False),
+            sa.Column('entry_kind', sa.Integer(), nullable=False),
+            sa.Column('entry_id', sa.Integer(), nullable=False),
+            sa.Column('balance', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('entry_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_customer_ledger_checkpoints_id'), 'customer_ledger_checkpoints', ['id'], unique=False)
+        op.create_index(
+            'ix_ledger_checkpoints_customer_key', 'customer_ledger_checkpoints',
+            ['customer_id', 'entry_date', 'sale_id', 'entry_kind', 'entry_id'], unique=False
+        )
+
+    # Pagos por factura: el estado de cuenta los une a sales por sale_id
+    indexes = [i['name'] for i in inspector.get_indexes('sale_payments')]
+    if 'ix_sale_payments_sale_id' not in indexes:
+        op.create_index('ix_sale_payments_sale_id', 'sale_payments', ['sale_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sale_payments_sale_id', table_name='sale_payments')
+    op.drop_index('ix_ledger_checkpoints_customer_key', table_name='customer_ledger_checkpoints')
+    op.drop_index(op.f('ix_customer_ledger_checkpoints_id'), table_name='customer_ledger_checkpoints')
+    op.drop_table('customer_ledger_checkpoints')
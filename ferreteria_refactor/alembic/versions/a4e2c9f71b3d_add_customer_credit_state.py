@@ -0,0 +1,65 @@
+"""add_customer_credit_state
+
+Revision ID: a4e2c9f71b3d
+Revises: 8d3f6b2a1c57
+Create Date: 2026-10-19 11:48:22.904415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e2c9f71b3d'
+down_revision: Union[str, Sequence[str], None] = '8d3f6b2a1c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'customer_credit_state' in inspector.get_table_names():
+        return
+
+    state = op.create_table(
+        'customer_credit_state',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('outstanding_balance', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('open_invoices', sa.Integer(), nullable=False),
+        sa.Column('oldest_due_date', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.PrimaryKeyConstraint('customer_id')
+    )
+
+    # Backfill desde las facturas a crédito abiertas
+    sales = sa.table(
+        'sales',
+        sa.column('customer_id', sa.Integer), sa.column('id', sa.Integer),
+        sa.column('balance_pending', sa.Numeric), sa.column('due_date', sa.DateTime),
+        sa.column('is_credit', sa.Boolean), sa.column('paid', sa.Boolean)
+    )
+    op.execute(state.insert().from_select(
+        ['customer_id', 'outstanding_balance', 'open_invoices', 'oldest_due_date', 'updated_at'],
+        sa.select(
+            sales.c.customer_id,
+            sa.func.coalesce(sa.func.sum(sales.c.balance_pending), 0),
+            sa.func.count(sales.c.id),
+            sa.func.min(sales.c.due_date),
+            sa.func.current_timestamp()
+        ).where(
+            sales.c.is_credit == sa.true(),
+            sales.c.paid == sa.false(),
+            sales.c.customer_id.isnot(None)
+        ).group_by(sales.c.customer_id)
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('customer_credit_state')
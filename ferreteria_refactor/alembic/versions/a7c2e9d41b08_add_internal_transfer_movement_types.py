@@ -0,0 +1,34 @@
+"""add internal transfer movement types
+
+Revision ID: a7c2e9d41b08
+Revises: d9b4e7f2a310
+Create Date: 2026-10-19 18:12:40.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c2e9d41b08'
+down_revision: Union[str, Sequence[str], None] = 'd9b4e7f2a310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Kardex de transferencias entre almacenes propios (SQLite guarda el enum como texto)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE movementtype ADD VALUE IF NOT EXISTS 'TRANSFER_IN'")
+        op.execute("ALTER TYPE movementtype ADD VALUE IF NOT EXISTS 'TRANSFER_OUT'")
+
+
+def downgrade() -> None:
+    # Removing enum values is not directly supported in Postgres without recreating the type
+    pass
@@ -0,0 +1,122 @@
+"""kardex stock ledger: indexes, per-warehouse balance, snapshots, monthly partitions
+
+Revision ID: b3d8f1a6c927
+Revises: a7c2e9d41b08
+Create Date: 2026-10-19 19:05:12.402117
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d8f1a6c927'
+down_revision: Union[str, Sequence[str], None] = 'a7c2e9d41b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KARDEX_INDEXES = {
+    'ix_kardex_product_date': ['product_id', 'date'],
+    'ix_kardex_warehouse_product_date': ['warehouse_id', 'product_id', 'date'],
+    'ix_kardex_date': ['date'],
+}
+MONTHS_AHEAD = 3
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _partition_kardex(conn):
+    """Postgres: kardex pasa a ser una tabla particionada por mes (RANGE sobre date)."""
+    kind = conn.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'kardex'")).scalar()
+    if kind == 'p':
+        return
+
+    op.execute("UPDATE kardex SET date = now() WHERE date IS NULL")
+    op.execute("ALTER TABLE kardex RENAME TO kardex_legacy")
+    # La secuencia del id pasa a la tabla nueva
+    op.execute("ALTER SEQUENCE kardex_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE kardex (LIKE kardex_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (date)")
+    op.execute("ALTER TABLE kardex ALTER COLUMN date SET NOT NULL")
+    # La clave primaria de una tabla particionada debe incluir la columna de partición
+    op.execute("ALTER TABLE kardex ADD PRIMARY KEY (id, date)")
+    op.execute("ALTER TABLE kardex ADD FOREIGN KEY (product_id) REFERENCES products (id)")
+    op.execute("ALTER TABLE kardex ADD FOREIGN KEY (warehouse_id) REFERENCES warehouses (id)")
+    op.execute("ALTER SEQUENCE kardex_id_seq OWNED BY kardex.id")
+
+    first = conn.execute(sa.text("SELECT min(date) FROM kardex_legacy")).scalar()
+    start = (first.date() if first else date.today()).replace(day=1)
+    last = _next_month(date.today().replace(day=1))
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while start < last:
+        end = _next_month(start)
+        op.execute(
+            f"CREATE TABLE kardex_y{start.year}m{start.month:02d} PARTITION OF kardex "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+    # Movimientos con fecha fuera de los meses creados
+    op.execute("CREATE TABLE kardex_default PARTITION OF kardex DEFAULT")
+
+    op.execute("INSERT INTO kardex SELECT * FROM kardex_legacy")
+    op.execute("DROP TABLE kardex_legacy")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    columns = [c['name'] for c in inspector.get_columns('kardex')]
+    if 'warehouse_balance' not in columns:
+        op.add_column('kardex', sa.Column('warehouse_balance', sa.Numeric(12, 3), nullable=True))
+
+    if conn.dialect.name == 'postgresql':
+        _partition_kardex(conn)
+
+    existing = {ix['name'] for ix in sa.inspect(conn).get_indexes('kardex')}
+    for name, index_columns in KARDEX_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'kardex', index_columns)
+    # Último saldo de cada (producto, almacén)
+    if 'ix_kardex_product_warehouse_id' not in existing:
+        op.create_index('ix_kardex_product_warehouse_id', 'kardex', ['product_id', 'warehouse_id', 'id'])
+
+    if 'stock_snapshots' not in inspector.get_table_names():
+        op.create_table(
+            'stock_snapshots',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('snapshot_date', sa.Date(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('warehouse_id', sa.Integer(), nullable=True),
+            sa.Column('quantity', sa.Numeric(12, 3), nullable=False),
+            sa.Column('is_opening', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+            sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_stock_snapshots_id', 'stock_snapshots', ['id'])
+        op.create_index(
+            'ix_stock_snapshots_date_warehouse_product', 'stock_snapshots',
+            ['snapshot_date', 'warehouse_id', 'product_id']
+        )
+    # La apertura del libro, los saldos corridos y las fotos de cierre se calculan al iniciar
+    # la aplicación (StockLedgerService.run_maintenance)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # La tabla particionada de Postgres se conserva (mismas columnas)
+    op.drop_index('ix_stock_snapshots_date_warehouse_product', table_name='stock_snapshots')
+    op.drop_index('ix_stock_snapshots_id', table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
+    op.drop_index('ix_kardex_product_warehouse_id', table_name='kardex')
+    for name in KARDEX_INDEXES:
+        op.drop_index(name, table_name='kardex')
+    op.drop_column('kardex', 'warehouse_balance')
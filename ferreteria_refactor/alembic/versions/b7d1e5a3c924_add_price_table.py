@@ -0,0 +1,70 @@
+"""add_price_table
+
+Revision ID: b7d1e5a3c924
+Revises: a4e2c9f71b3d
+Create Date: 2026-10-19 13:05:49.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1e5a3c924'
+down_revision: Union[str, Sequence[str], None] = 'a4e2c9f71b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'price_table_versions' not in tables:
+        op.create_table(
+            'price_table_versions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('exchange_rate_id', sa.Integer(), nullable=True),
+            sa.Column('rate', sa.Numeric(precision=14, scale=4), nullable=True),
+            sa.Column('is_full', sa.Boolean(), nullable=True),
+            sa.Column('rows_changed', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['exchange_rate_id'], ['exchange_rates.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_price_table_versions_id'), 'price_table_versions', ['id'], unique=False)
+
+    if 'product_price_table' not in tables:
+        op.create_table(
+            'product_price_table',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('unit_id', sa.Integer(), nullable=False),
+            sa.Column('price_list_id', sa.Integer(), nullable=False),
+            sa.Column('exchange_rate_id', sa.Integer(), nullable=True),
+            sa.Column('price_usd', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('rate', sa.Numeric(precision=14, scale=4), nullable=False),
+            sa.Column('price_local', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('product_id', 'unit_id', 'price_list_id', name='uix_product_price_table_key')
+        )
+        op.create_index(op.f('ix_product_price_table_id'), 'product_price_table', ['id'], unique=False)
+        op.create_index(op.f('ix_product_price_table_version'), 'product_price_table', ['version'], unique=False)
+        op.create_index('ix_product_price_table_rate', 'product_price_table', ['exchange_rate_id'], unique=False)
+    # La tabla se llena al arrancar la API (PriceTableService.ensure_built)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_price_table_rate', table_name='product_price_table')
+    op.drop_index(op.f('ix_product_price_table_version'), table_name='product_price_table')
+    op.drop_index(op.f('ix_product_price_table_id'), table_name='product_price_table')
+    op.drop_table('product_price_table')
+    op.drop_index(op.f('ix_price_table_versions_id'), table_name='price_table_versions')
+    op.drop_table('price_table_versions')
@@ -0,0 +1,57 @@
+"""add_effective_prices
+
+Revision ID: c3f8a1d6e205
+Revises: b7d1e5a3c924
+Create Date: 2026-10-19 15:22:07.431862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a1d6e205'
+down_revision: Union[str, Sequence[str], None] = 'b7d1e5a3c924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'effective_prices' not in inspector.get_table_names():
+        op.create_table(
+            'effective_prices',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('unit_id', sa.Integer(), nullable=False),
+            sa.Column('price_list_id', sa.Integer(), nullable=False),
+            sa.Column('min_quantity', sa.Numeric(precision=12, scale=3), nullable=False),
+            sa.Column('conversion_factor', sa.Numeric(precision=14, scale=4), nullable=False),
+            sa.Column('price', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('discount_percentage', sa.Numeric(precision=5, scale=2), nullable=False),
+            sa.Column('final_price', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('tax_rate', sa.Numeric(precision=5, scale=2), nullable=False),
+            sa.Column('tax_amount', sa.Numeric(precision=18, scale=4), nullable=False),
+            sa.Column('price_mayor_1', sa.Numeric(precision=18, scale=4), nullable=True),
+            sa.Column('price_mayor_2', sa.Numeric(precision=18, scale=4), nullable=True),
+            sa.Column('requires_auth', sa.Boolean(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('product_id', 'unit_id', 'price_list_id', 'min_quantity', name='uix_effective_prices_key')
+        )
+        op.create_index(op.f('ix_effective_prices_id'), 'effective_prices', ['id'], unique=False)
+        op.create_index(op.f('ix_effective_prices_version'), 'effective_prices', ['version'], unique=False)
+    # La tabla se llena al arrancar la API (EffectivePriceService.ensure_built)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_effective_prices_version'), table_name='effective_prices')
+    op.drop_index(op.f('ix_effective_prices_id'), table_name='effective_prices')
+    op.drop_table('effective_prices')
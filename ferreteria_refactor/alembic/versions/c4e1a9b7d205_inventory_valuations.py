@@ -0,0 +1,44 @@
+"""inventory valuations: permanent cache of month-end valuations
+
+Revision ID: c4e1a9b7d205
+Revises: b3d8f1a6c927
+Create Date: 2026-10-19 21:40:37.118520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a9b7d205'
+down_revision: Union[str, Sequence[str], None] = 'b3d8f1a6c927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'inventory_valuations' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'inventory_valuations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('valuation_date', sa.Date(), nullable=False),
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_inventory_valuations_id', 'inventory_valuations', ['id'])
+    op.create_index('ix_inventory_valuations_date_scope', 'inventory_valuations', ['valuation_date', 'scope'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_valuations_date_scope', table_name='inventory_valuations')
+    op.drop_index('ix_inventory_valuations_id', table_name='inventory_valuations')
+    op.drop_table('inventory_valuations')
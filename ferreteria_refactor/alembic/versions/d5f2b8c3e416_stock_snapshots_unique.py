@@ -0,0 +1,52 @@
+"""stock snapshots: unique (snapshot_date, product_id, warehouse_id)
+
+Revision ID: d5f2b8c3e416
+Revises: c4e1a9b7d205
+Create Date: 2026-10-20 10:12:48.905311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f2b8c3e416'
+down_revision: Union[str, Sequence[str], None] = 'c4e1a9b7d205'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    constraints = {c['name'] for c in inspector.get_unique_constraints('stock_snapshots')}
+    indexes = {ix['name'] for ix in inspector.get_indexes('stock_snapshots')}
+
+    # Fotos duplicadas por el mantenimiento concurrente de varios workers: se conserva una
+    op.execute(
+        "DELETE FROM stock_snapshots WHERE id NOT IN ("
+        "SELECT min(id) FROM stock_snapshots GROUP BY snapshot_date, product_id, warehouse_id)"
+    )
+    # Las valuaciones guardadas pudieron calcularse con fotos duplicadas
+    op.execute("DELETE FROM inventory_valuations")
+
+    if 'uix_stock_snapshots_key' not in constraints:
+        with op.batch_alter_table('stock_snapshots') as batch_op:
+            batch_op.create_unique_constraint(
+                'uix_stock_snapshots_key', ['snapshot_date', 'product_id', 'warehouse_id']
+            )
+    if 'uix_stock_snapshots_unassigned' not in indexes:
+        op.create_index(
+            'uix_stock_snapshots_unassigned', 'stock_snapshots', ['snapshot_date', 'product_id'], unique=True,
+            postgresql_where=sa.text('warehouse_id IS NULL'), sqlite_where=sa.text('warehouse_id IS NULL')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uix_stock_snapshots_unassigned', table_name='stock_snapshots')
+    with op.batch_alter_table('stock_snapshots') as batch_op:
+        batch_op.drop_constraint('uix_stock_snapshots_key', type_='unique')
@@ -0,0 +1,39 @@
+"""add_order_item_created_at
+
+Revision ID: d9b4e7f2a310
+Revises: c3f8a1d6e205
+Create Date: 2026-10-19 16:48:31.905214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b4e7f2a310'
+down_revision: Union[str, Sequence[str], None] = 'c3f8a1d6e205'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'restaurant_order_items' in inspector.get_table_names():
+        columns = [c['name'] for c in inspector.get_columns('restaurant_order_items')]
+        if 'created_at' not in columns:
+            op.add_column('restaurant_order_items', sa.Column('created_at', sa.DateTime(), nullable=True))
+            # Items existentes: hora de apertura de su orden
+            op.execute(
+                "UPDATE restaurant_order_items SET created_at = restaurant_orders.created_at "
+                "FROM restaurant_orders WHERE restaurant_orders.id = restaurant_order_items.order_id"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('restaurant_order_items', 'created_at')
@@ -0,0 +1,51 @@
+"""import jobs: background price-list import progress shared by all workers
+
+Revision ID: e6a3c9d4f527
+Revises: d5f2b8c3e416
+Create Date: 2026-10-20 11:03:27.550918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a3c9d4f527'
+down_revision: Union[str, Sequence[str], None] = 'd5f2b8c3e416'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'import_jobs' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('update_stock', sa.Boolean(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('processed_rows', sa.Integer(), nullable=True),
+        sa.Column('created', sa.Integer(), nullable=True),
+        sa.Column('updated', sa.Integer(), nullable=True),
+        sa.Column('unchanged', sa.Integer(), nullable=True),
+        sa.Column('error_count', sa.Integer(), nullable=True),
+        sa.Column('errors', sa.JSON(), nullable=True),
+        sa.Column('detail', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_import_jobs_started_at', 'import_jobs', ['started_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_import_jobs_started_at', table_name='import_jobs')
+    op.drop_table('import_jobs')
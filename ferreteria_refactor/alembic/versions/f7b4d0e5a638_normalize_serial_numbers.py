@@ -0,0 +1,49 @@
+"""product instances: store serial numbers normalized (trimmed, upper case)
+
+Revision ID: f7b4d0e5a638
+Revises: e6a3c9d4f527
+Create Date: 2026-10-20 11:48:12.304117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b4d0e5a638'
+down_revision: Union[str, Sequence[str], None] = 'e6a3c9d4f527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Otra instancia con el mismo serial normalizado (p. ej. 'abc' y 'ABC')
+_COLLIDES = (
+    "EXISTS (SELECT 1 FROM product_instances o WHERE o.id <> product_instances.id "
+    "AND UPPER(TRIM(o.serial_number)) = UPPER(TRIM(product_instances.serial_number)))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ventas, garantías y RMA buscan el serial normalizado (serial_intake_service.normalize_serial);
+    # los seriales cargados antes en minúsculas o con espacios quedaban inalcanzables
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "UPDATE product_instances SET serial_number = UPPER(TRIM(serial_number)) "
+        f"WHERE serial_number <> UPPER(TRIM(serial_number)) AND NOT {_COLLIDES}"
+    ))
+
+    # Los que chocarían con otro serial (índice único) se dejan como están para revisión manual
+    conflicts = conn.execute(sa.text(
+        "SELECT id, serial_number FROM product_instances "
+        f"WHERE serial_number <> UPPER(TRIM(serial_number)) AND {_COLLIDES} ORDER BY id"
+    )).fetchall()
+    for row in conflicts:
+        print(f"[MIGRATION] Serial duplicado al normalizar, sin cambios: id={row.id} '{row.serial_number}'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # El valor original no se conserva
+    pass
@@ -22,6 +22,13 @@ else:
 class Settings:
     # Support both naming conventions
     DATABASE_URL: str = os.getenv("DB_URL", os.getenv("DATABASE_URL", "sqlite:///./ferreteria.db"))
+
+    # Read Path (reportes/exportaciones). Sin READ_DATABASE_URL se usa un pool
+    # separado y más pequeño contra el mismo servidor, con statement_timeout.
+    READ_DATABASE_URL: str = os.getenv("READ_DATABASE_URL", "")
+    READ_POOL_SIZE: int = int(os.getenv("READ_POOL_SIZE", "5"))
+    READ_POOL_MAX_OVERFLOW: int = int(os.getenv("READ_POOL_MAX_OVERFLOW", "5"))
+    READ_STATEMENT_TIMEOUT_MS: int = int(os.getenv("READ_STATEMENT_TIMEOUT_MS", "60000"))
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY")
@@ -31,6 +38,36 @@ class Settings:
         print("WARNING: SECRET_KEY not set in .env. Using stable dev key.")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+    # Auth Cache (principal por 'sub' del token; 0 = desactivado)
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+
+    # Password Hashing (bcrypt). Cambiar BCRYPT_ROUNDS re-hashea al próximo login.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    AUTH_HASH_WORKERS: int = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+
+    # PIN de supervisor: intentos fallidos antes de bloquear y duración del bloqueo
+    PIN_MAX_ATTEMPTS: int = int(os.getenv("PIN_MAX_ATTEMPTS", "5"))
+    PIN_LOCKOUT_SECONDS: int = int(os.getenv("PIN_LOCKOUT_SECONDS", "300"))
+
+    # Estado de cuenta: cada cuántos movimientos se guarda un saldo acumulado (checkpoint)
+    LEDGER_CHECKPOINT_INTERVAL: int = int(os.getenv("LEDGER_CHECKPOINT_INTERVAL", "500"))
+    
+    # Pantalla de cocina: eventos por estación que se guardan para reconexiones
+    KITCHEN_FEED_BUFFER: int = int(os.getenv("KITCHEN_FEED_BUFFER", "500"))
+    
+    # Menú del restaurante: segundos que otro worker puede servir un menú ya cambiado
+    MENU_CACHE_TTL_SECONDS: int = int(os.getenv("MENU_CACHE_TTL_SECONDS", "30"))
+    
+    # Mapa de mesas: recarga completa del estado en memoria (cambios de otros workers)
+    FLOOR_SNAPSHOT_TTL_SECONDS: int = int(os.getenv("FLOOR_SNAPSHOT_TTL_SECONDS", "15"))
+    
+    # Imágenes de productos: hilos para decodificar/redimensionar/codificar (fuera del event loop)
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    
+    # Exportación PDF del catálogo: procesos para catálogos grandes (0 = en el mismo proceso)
+    EXPORT_WORKER_PROCESSES: int = int(os.getenv("EXPORT_WORKER_PROCESSES", "1"))
     
     # Modules
     MODULE_RESTAURANT_ENABLED: bool = os.getenv("MODULE_RESTAURANT_ENABLED", "false").lower() == "true"
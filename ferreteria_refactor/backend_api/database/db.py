@@ -52,6 +52,7 @@ if DB_TYPE == "sqlite" or "sqlite" in str(DATABASE_URL):
         
     connect_args = {"check_same_thread": False, "timeout": 30}
     pool_config = {} # SQLite doesn't use the same pool config as Postgres
+    IS_SQLITE = True
 else:
     # VPS/Docker Mode (Postgres)
     connect_args = {}
@@ -62,6 +63,7 @@ else:
         "pool_recycle": 1800,   # Reciclar conexiones cada 30 min
         "pool_pre_ping": True   # Verificar conexión antes de usarla
     }
+    IS_SQLITE = False
 
 engine = create_engine(
     DATABASE_URL,
@@ -71,11 +73,73 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Perfil de escritorio SQLite: PRAGMAs (WAL, mmap, cache...), cola de un escritor
+# y pool de conexiones de solo lectura. El mantenimiento en reposo se inicia en main.py.
+sqlite_write_gate = None
+read_engine = engine
+if IS_SQLITE and ":memory:" not in str(DATABASE_URL):
+    from .sqlite_profile import apply_pragmas, SQLiteWriteGate, create_read_engine
+    apply_pragmas(engine)
+    sqlite_write_gate = SQLiteWriteGate()
+    sqlite_write_gate.install(SessionLocal)
+    read_engine = create_read_engine(str(DATABASE_URL))
+elif not IS_SQLITE:
+    # Read Path (Postgres): réplica si está configurada; si no, pool aparte en el
+    # mismo servidor. Un reporte pesado no puede agotar las conexiones de las cajas.
+    read_engine = create_engine(
+        settings.READ_DATABASE_URL or DATABASE_URL,
+        connect_args={
+            "options": f"-c statement_timeout={settings.READ_STATEMENT_TIMEOUT_MS} "
+                       f"-c default_transaction_read_only=on"
+        },
+        pool_size=settings.READ_POOL_SIZE,
+        max_overflow=settings.READ_POOL_MAX_OVERFLOW,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True
+    )
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
-def get_db():
+def get_write_db():
+    """Sesión del pool principal (transacciones de venta, caja, inventario)."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Sesión del pool de lectura (reportes y exportaciones)."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Alias histórico: la mayoría de routers usan get_db para escrituras
+get_db = get_write_db
+
+def get_pool_stats():
+    """Uso de cada pool de conexiones (para monitorear saturación)."""
+    stats = {}
+    for name, eng in (("write", engine), ("read", read_engine)):
+        if name == "read" and eng is engine:
+            continue
+        pool = eng.pool
+        size = pool.size() if hasattr(pool, "size") else None
+        checked_out = pool.checkedout() if hasattr(pool, "checkedout") else None
+        overflow = pool.overflow() if hasattr(pool, "overflow") else None
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        capacity = (size or 0) + max(max_overflow, 0)
+        stats[name] = {
+            "pool": type(pool).__name__,
+            "size": size,
+            "checked_out": checked_out,
+            "overflow": overflow,
+            "capacity": capacity or None,
+            "saturation": round(checked_out / capacity, 3) if capacity and checked_out is not None else None
+        }
+    return stats
@@ -0,0 +1,154 @@
+"""
+Perfil de rendimiento SQLite (Modo Escritorio / Congelado)
+
+- PRAGMAs al conectar: WAL, synchronous=NORMAL, mmap, cache, temp_store, busy_timeout
+- Cola de un solo escritor: las transacciones de escritura se serializan en Python
+  en vez de competir por el lock del archivo ("database is locked")
+- Engine de solo lectura (mode=ro) con su propio pool para lecturas concurrentes
+- Mantenimiento en reposo: wal_checkpoint(TRUNCATE) + PRAGMA optimize
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+# Configurable por variables de entorno (valores pensados para un PC de caja)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))        # 64 MB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # 256 MB
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+SQLITE_MAINTENANCE_INTERVAL = int(os.getenv("SQLITE_MAINTENANCE_INTERVAL", "300"))
+SQLITE_IDLE_SECONDS = int(os.getenv("SQLITE_IDLE_SECONDS", "30"))
+
+
+def apply_pragmas(engine, read_only: bool = False):
+    """Registra los PRAGMAs de escritorio en cada conexión nueva del engine."""
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not read_only:
+                # journal_mode es persistente en el archivo; solo el escritor lo fija
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+
+class SQLiteWriteGate:
+    """
+    Cola de un solo escritor para transacciones de escritura.
+
+    Se engancha a un sessionmaker: la sesión toma el turno en su primer flush y lo
+    libera al terminar la transacción raíz (commit, rollback o close).
+    - No se aplica en el hilo del event loop (endpoints async): esperar ahí bloquearía
+      al escritor que tiene el turno. Esos casos quedan cubiertos por busy_timeout.
+    - Si la espera supera busy_timeout se continúa sin turno (mismo comportamiento
+      que sin la cola), evitando bloqueos por sesiones anidadas en el mismo hilo.
+    """
+
+    def __init__(self, timeout: float = SQLITE_BUSY_TIMEOUT_MS / 1000):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.last_write_at = time.monotonic()
+
+    def install(self, session_factory):
+        event.listen(session_factory, "before_flush", self._before_flush)
+        event.listen(session_factory, "after_transaction_end", self._after_transaction_end)
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def _before_flush(self, session, flush_context, instances):
+        if session.info.get("sqlite_write_turn") is not None or self._in_event_loop():
+            return
+        self.waiting += 1
+        try:
+            acquired = self._lock.acquire(timeout=self.timeout)
+        finally:
+            self.waiting -= 1
+        if not acquired:
+            print("[DB] WARN: Cola de escritura agotó la espera; continuando con busy_timeout")
+        session.info["sqlite_write_turn"] = acquired
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is not None:
+            return  # SAVEPOINT / subtransacción
+        acquired = session.info.pop("sqlite_write_turn", None)
+        if acquired is not None:
+            self.last_write_at = time.monotonic()
+        if acquired:
+            self._lock.release()
+
+    def is_idle(self, idle_seconds: float = SQLITE_IDLE_SECONDS) -> bool:
+        return (
+            not self._lock.locked()
+            and self.waiting == 0
+            and time.monotonic() - self.last_write_at >= idle_seconds
+        )
+
+
+def create_read_engine(database_url: str):
+    """
+    Engine de solo lectura (URI mode=ro) con pool propio.
+    En WAL los lectores no bloquean al escritor ni entre sí.
+    """
+    db_path = quote(database_url.replace("sqlite:///", "", 1).replace("\\", "/"), safe="/:.")
+    read_engine = create_engine(
+        f"sqlite:///file:{db_path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=QueuePool,
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=SQLITE_READ_POOL_SIZE,
+    )
+    apply_pragmas(read_engine, read_only=True)
+    return read_engine
+
+
+def run_maintenance(engine):
+    """Checkpoint del WAL (truncando el archivo -wal) y actualización de estadísticas."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
+_maintenance_thread = None
+
+
+def start_maintenance(engine, write_gate: SQLiteWriteGate, interval: int = SQLITE_MAINTENANCE_INTERVAL):
+    """
+    Hilo daemon que ejecuta run_maintenance cuando no hay escrituras recientes.
+    Idempotente: retorna el hilo ya iniciado si existe.
+    """
+    global _maintenance_thread
+    if _maintenance_thread is not None and _maintenance_thread.is_alive():
+        return _maintenance_thread
+
+    def _loop():
+        while True:
+            time.sleep(interval)
+            if not write_gate.is_idle():
+                continue
+            try:
+                run_maintenance(engine)
+            except Exception as e:
+                print(f"[DB] WARN: Mantenimiento SQLite falló: {e}")
+
+    _maintenance_thread = threading.Thread(target=_loop, name="sqlite-maintenance", daemon=True)
+    _maintenance_thread.start()
+    return _maintenance_thread
@@ -2,43 +2,115 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from typing import List, Annotated
+from typing import List, Annotated, Optional
+import time
 
-from .database.db import get_db
 from .database.db import get_db
 from .config import settings, Settings
 from .models.models import User, UserRole
+from .utils.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# ========================================
+# Auth Cache
+# ========================================
+# Evita decodificar el JWT y consultar `users` en cada petición.
+# - _token_cache: payload verificado por token, vive hasta su 'exp'
+# - _principal_cache: datos mínimos del usuario por 'sub' (TTL corto)
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+_principal_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+
+class CurrentUser:
+    """
+    Principal autenticado, desacoplado de la sesión de BD.
+    Expone los campos que usan los routers (id, username, role, full_name, is_active).
+    Para modificar el usuario, cargar el modelo con db.query(User).get(current_user.id).
+    """
+    __slots__ = ("id", "username", "role", "full_name", "is_active")
+
+    def __init__(self, id: int, username: str, role: UserRole, full_name: Optional[str], is_active: bool):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.full_name = full_name
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=user.role,
+            full_name=user.full_name,
+            is_active=user.is_active,
+        )
+
+    def __repr__(self):
+        return f"<CurrentUser(username='{self.username}', role='{self.role}')>"
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verifica el JWT y memoriza el payload durante la vida restante del token.
+    Raises:
+        JWTError: Si la firma o la expiración no son válidas
+    """
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    exp = payload.get("exp")
+    if exp:
+        _token_cache.set(token, payload, ttl=exp - time.time())
+    return payload
+
+
+def invalidate_user_cache(username: Optional[str] = None):
+    """
+    Invalida el principal cacheado de un usuario (o todos si username es None).
+    Llamar al actualizar rol, desactivar o emitir USER_UPDATED / USER_ROLE_CHANGED.
+    """
+    if username is None:
+        _principal_cache.clear()
+        _token_cache.clear()
+    else:
+        _principal_cache.pop(username)
+
+
 def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
-    print(f"🕵️ SERVER PROBE: Checking Token: {token[:15]}...")
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             print("⛔ Auth Failed: Token payload missing 'sub'")
             raise credentials_exception
     except JWTError as e:
         print(f"⛔ JWT Validation Error: {e}")
-        print(f"   - Expected Key: {settings.SECRET_KEY[:5]}...")
         print(f"   - Algorithm: {settings.ALGORITHM}")
         raise credentials_exception
-        
+
+    principal = _principal_cache.get(username)
+    if principal is not None:
+        return principal
+
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         print(f"⛔ Auth Failed: User '{username}' not found in DB.")
         raise credentials_exception
-    
-    print(f"✅ Auth Success: User '{username}' authenticated.")
-    return user
 
-def get_current_active_user(current_user: Annotated[User, Depends(get_current_user)]):
+    principal = CurrentUser.from_user(user)
+    _principal_cache.set(username, principal)
+    return principal
+
+def get_current_active_user(current_user: Annotated[CurrentUser, Depends(get_current_user)]):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -47,8 +119,7 @@ class RoleChecker:
     def __init__(self, allowed_roles: List[UserRole]):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, user: Annotated[User, Depends(get_current_active_user)]):
-        print(f"🕵️ RoleChecker: User '{user.username}' (Role: {user.role}) vs Allowed: {self.allowed_roles}")
+    def __call__(self, user: Annotated[CurrentUser, Depends(get_current_active_user)]):
         if user.role not in self.allowed_roles:
             print(f"⛔ RoleChecker: Access DENIED. User role {user.role} not in {self.allowed_roles}")
             raise HTTPException(
@@ -126,6 +126,12 @@ def health_check():
     """Simple health check endpoint for connectivity testing"""
     return {"status": "ok", "service": "ferreteria-api"}
 
+@app.get("/api/v1/health/db-pools")
+def db_pools_health():
+    """Uso de los pools de escritura y lectura (saturación = checked_out / capacidad)"""
+    from .database.db import get_pool_stats
+    return get_pool_stats()
+
 # --- LOGICA DE INICIALIZACION ---
 def run_migrations():
     """
@@ -187,20 +193,8 @@ def run_migrations():
 
 @app.on_event("startup")
 def startup_event():
-    # Create images directory - environment aware
-    IS_DOCKER = os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true'
-    
-    if getattr(sys, 'frozen', False):
-        # FROZEN (PyInstaller): Use executable directory for data persistence
-        base_dir = os.path.dirname(sys.executable)
-        images_dir = os.path.join(base_dir, "data", "images", "products")
-    elif IS_DOCKER:
-        images_dir = "/app/data/images/products"
-    else:
-        # Local development
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        images_dir = os.path.join(base_dir, "data", "images", "products")
-    
+    # Create images directory - environment aware (same path the uploads use)
+    from .services.image_service import IMAGES_DIR as images_dir
     os.makedirs(images_dir, exist_ok=True)
     print(f"[INFO] Directorio de imagenes creado: {images_dir}")
     
@@ -230,6 +224,17 @@ def startup_event():
 
 
 
+    # SQLite (Escritorio): checkpoint del WAL + optimize cuando no hay escrituras
+    from .database.db import sqlite_write_gate
+    if sqlite_write_gate is not None:
+        from .database.sqlite_profile import start_maintenance
+        start_maintenance(engine, sqlite_write_gate)
+        print("[INFO] Mantenimiento SQLite en reposo ACTIVADO")
+
+    # Kardex: particiones de los próximos meses (Postgres) y fotos de cierre de mes
+    from .services.stock_ledger_service import StockLedgerService
+    StockLedgerService.start_scheduler()
+
     # Seed Data
     from .database.db import SessionLocal
     from .routers.auth import init_admin_user
@@ -239,6 +244,12 @@ def startup_event():
         init_admin_user(db)
         init_exchange_rates(db)
 
+        # Tabla de precios en moneda local (primera ejecución / después de migrar)
+        from .services.price_table_service import PriceTableService
+        PriceTableService.ensure_built(db)
+        from .services.effective_price_service import EffectivePriceService
+        EffectivePriceService.ensure_built(db)
+
         # Initialize Payment Methods
         # Initialize Payment Methods with Better Names
         print("[DEBUG] Verificando metodos de pago...", flush=True)
@@ -291,26 +302,12 @@ def startup_event():
 # ============================================
 
 # 1. FIRST: Mount product images (must be before frontend catch-all)
-# 1. FIRST: Mount product images (must be before frontend catch-all)
-IS_DOCKER = os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true'
-
-if getattr(sys, 'frozen', False):
-    # FROZEN (PyInstaller): Use executable directory
-    base_dir = os.path.dirname(sys.executable)
-    images_dir = os.path.join(base_dir, "data", "images", "products")
-elif IS_DOCKER:
-    images_dir = "/app/data/images/products"
-else:
-    # Local development
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    images_dir = os.path.join(base_dir, "data", "images", "products")
+from .services.image_service import IMAGES_DIR as images_dir, ProductImageFiles
 
-# Create directory if it doesn't exist
-os.makedirs(images_dir, exist_ok=True)
 print(f"[INFO] Directorio de imagenes: {images_dir}")
 
-# Mount the directory
-app.mount("/images/products", StaticFiles(directory=images_dir), name="product_images")
+# Mount the directory (content-hashed files are served as immutable)
+app.mount("/images/products", ProductImageFiles(directory=images_dir), name="product_images")
 print("[INFO] Imagenes montadas como archivos estaticos")
 
 # 2. THEN: Mount frontend static files
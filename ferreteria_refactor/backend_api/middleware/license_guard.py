@@ -2,13 +2,18 @@
 License Guard Middleware
 Valida la licencia JWT en cada petición al backend.
 Bloquea todas las peticiones si la licencia es inválida o ha expirado.
+
+La validación (lectura de license.key + verificación RS256) se cachea en memoria
+y se revalida en segundo plano, así que el costo por petición es una lectura de estado.
 """
 
-from fastapi import Request, HTTPException
+from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from jose import jwt, JWTError
 from pathlib import Path
+import asyncio
+import threading
+import time
 import uuid
 import os
 from datetime import datetime
@@ -29,19 +34,28 @@ a+7jA9G9XHVSgCgwpuMqHPT43cT42IAZm6Q5xr6fku0EmWplOGb+8Dj3jpzvsgQ5
 # license_guard.py -> middleware -> backend_api -> ferreteria_refactor -> ferreteria -> license.key
 LICENSE_FILE = Path(__file__).parent.parent.parent.parent / "license.key"
 
-# Rutas que NO requieren licencia válida
+# La licencia protege la API. Fuera de este prefijo solo se sirve el frontend (SPA de React
+# Router: index.html, /assets, favicon, manifest...) y las imágenes de productos
+PROTECTED_PREFIX = "/api/"
+
+# Rutas de la API que NO requieren licencia válida (por prefijo)
 WHITELIST_PATHS = [
-    "/docs",
-    "/openapi.json",
-    "/redoc",
     "/api/v1/license/activate",
     "/api/v1/license/status",
     "/api/v1/license/machine-id",
-    "/assets",
-    "/",
     "/api/v1/ws",
+    "/api/v1/health",
 ]
 
+# Revalidación completa periódica aunque el archivo no cambie (segundos)
+LICENSE_REVALIDATE_SECONDS = int(os.getenv("LICENSE_REVALIDATE_SECONDS", "300"))
+# Frecuencia con la que el hilo de fondo revisa mtime/variables de entorno (segundos)
+LICENSE_CHECK_SECONDS = int(os.getenv("LICENSE_CHECK_SECONDS", "5"))
+# Revalidar antes de 'exp' para no servir una licencia a punto de vencer (segundos)
+LICENSE_EXPIRY_MARGIN_SECONDS = 60
+# Reintento cuando la licencia es inválida (evita RS256 en cada petición rechazada)
+LICENSE_ERROR_RETRY_SECONDS = 10
+
 
 def get_machine_id():
     """Obtiene el ID de hardware de la máquina actual."""
@@ -185,28 +199,120 @@ def validate_license():
     return payload
 
 
-class LicenseGuardMiddleware(BaseHTTPMiddleware):
+class LicenseCache:
     """
-    Middleware que valida la licencia en cada petición.
+    Resultado de validate_license() cacheado en memoria.
+
+    Se revalida cuando:
+    - Cambia el mtime de license.key o las variables LICENSE_* (detectado por revalidate_loop)
+    - Se acerca el 'exp' de la licencia
+    - Pasan LICENSE_REVALIDATE_SECONDS desde la última validación
+    Los errores también se cachean (LICENSE_ERROR_RETRY_SECONDS) para no repetir
+    la verificación RS256 en cada petición rechazada.
     """
-    
-    async def dispatch(self, request: Request, call_next):
-        # Verificar si la ruta está en la whitelist
-        path = request.url.path
-        
-        # Permitir rutas whitelisted
-        if any(path.startswith(whitelist_path) for whitelist_path in WHITELIST_PATHS):
-            return await call_next(request)
-        
-        # Validar licencia para todas las demás rutas
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payload = None
+        self._error = None
+        self._source = None
+        self._valid_until = 0.0
+
+    def _source_key(self):
         try:
-            validate_license()
+            mtime = LICENSE_FILE.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        return (
+            os.getenv("LICENSE_MODE", "OFFLINE").upper(),
+            os.getenv("LICENSE_KEY"),
+            os.getenv("CLOUD_LICENSE_KEY"),
+            mtime,
+        )
+
+    def get(self) -> dict:
+        """
+        Retorna el payload de la licencia vigente.
+
+        Raises:
+            HTTPException: Si la licencia es inválida (error cacheado)
+        """
+        if self._source is None or time.time() >= self._valid_until:
+            self.refresh()
+        if self._error is not None:
+            raise self._error
+        return self._payload
+
+    def refresh(self, force: bool = False):
+        """Revalida solo si la fuente cambió o el resultado cacheado venció."""
+        source = self._source_key()
+        with self._lock:
+            now = time.time()
+            if not force and source == self._source and now < self._valid_until:
+                return
+
+            try:
+                payload = validate_license()
+                valid_until = now + LICENSE_REVALIDATE_SECONDS
+                exp = payload.get("exp")
+                if exp:
+                    recheck_at = max(exp - LICENSE_EXPIRY_MARGIN_SECONDS, now + LICENSE_ERROR_RETRY_SECONDS)
+                    valid_until = min(valid_until, recheck_at)
+                self._payload, self._error = payload, None
+            except HTTPException as e:
+                valid_until = now + LICENSE_ERROR_RETRY_SECONDS
+                self._payload, self._error = None, e
+
+            self._source = source
+            self._valid_until = valid_until
+
+    def invalidate(self):
+        """Fuerza revalidación en la próxima petición (ej. tras activar una licencia)."""
+        with self._lock:
+            self._source = None
+
+    async def revalidate_loop(self):
+        """Revisa la fuente periódicamente fuera del event loop."""
+        while True:
+            await asyncio.sleep(LICENSE_CHECK_SECONDS)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"[LICENSE] Error revalidando licencia: {e}")
+
+
+# Global instance
+license_cache = LicenseCache()
+
+
+def is_whitelisted(path: str) -> bool:
+    return not path.startswith(PROTECTED_PREFIX) or any(path.startswith(p) for p in WHITELIST_PATHS)
+
+
+class LicenseGuardMiddleware:
+    """
+    Middleware ASGI puro que valida la licencia en cada petición HTTP.
+    Usa license_cache, así que el costo por petición es leer el estado cacheado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._revalidate_task = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or is_whitelisted(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        # Arrancar la revalidación en segundo plano con el primer request
+        if self._revalidate_task is None:
+            self._revalidate_task = asyncio.create_task(license_cache.revalidate_loop())
+
+        try:
+            license_cache.get()
         except HTTPException as e:
-            return JSONResponse(
-                status_code=e.status_code,
-                content=e.detail
-            )
-        
-        # Si la licencia es válida, continuar con la petición
-        response = await call_next(request)
-        return response
+            response = JSONResponse(status_code=e.status_code, content=e.detail)
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Numeric, Text, DateTime, Enum, JSON, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Numeric, Text, Date, DateTime, Enum, JSON, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 import datetime
@@ -14,6 +14,8 @@ class MovementType(enum.Enum):
     ADJUSTMENT_OUT = "ADJUSTMENT_OUT"
     EXTERNAL_TRANSFER_IN = "EXTERNAL_TRANSFER_IN"
     EXTERNAL_TRANSFER_OUT = "EXTERNAL_TRANSFER_OUT"
+    TRANSFER_IN = "TRANSFER_IN"  # Entre almacenes propios
+    TRANSFER_OUT = "TRANSFER_OUT"
 
 class ProductInstanceStatus(enum.Enum):
     AVAILABLE = "AVAILABLE"
@@ -96,6 +98,72 @@ class ExchangeRate(Base):
     def __repr__(self):
         return f"<ExchangeRate(name='{self.name}', code='{self.currency_code}', rate={self.rate})>"
 
+class PriceTableVersion(Base):
+    """
+    Versión de la tabla de precios en moneda local (product_price_table).
+    Se crea una por cada recálculo; is_full indica que se reconstruyó toda la tabla
+    (los clientes con una versión anterior deben descargarla completa).
+    """
+    __tablename__ = "price_table_versions"
+
+    id = Column(Integer, primary_key=True, index=True)  # = versión
+    exchange_rate_id = Column(Integer, ForeignKey("exchange_rates.id", ondelete="SET NULL"), nullable=True)
+    rate = Column(Numeric(14, 4), nullable=True)
+    is_full = Column(Boolean, default=False)
+    rows_changed = Column(Integer, default=0)
+    created_at = Column(DateTime, default=get_venezuela_now)
+
+class ProductPriceTable(Base):
+    """
+    Precio por producto / presentación / lista de precios en USD y en moneda local.
+    unit_id = 0 es la unidad base; price_list_id = 0 es el precio general.
+    version = versión en la que cambió la fila (para descargas incrementales).
+    """
+    __tablename__ = "product_price_table"
+    __table_args__ = (
+        UniqueConstraint("product_id", "unit_id", "price_list_id", name="uix_product_price_table_key"),
+        Index("ix_product_price_table_rate", "exchange_rate_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    unit_id = Column(Integer, nullable=False, default=0)
+    price_list_id = Column(Integer, nullable=False, default=0)
+    exchange_rate_id = Column(Integer, nullable=True)
+    price_usd = Column(Numeric(18, 4), nullable=False)
+    rate = Column(Numeric(14, 4), nullable=False)
+    price_local = Column(Numeric(18, 4), nullable=False)
+    version = Column(Integer, nullable=False, index=True)
+
+class EffectivePrice(Base):
+    """
+    Precio de venta efectivo (USD) por producto / presentación / lista de precios / escalón.
+    unit_id = 0 es la unidad base; price_list_id = 0 es el precio general;
+    min_quantity = 0 es el precio sin escalón (PriceRule.min_quantity en otro caso).
+    price es el precio de lista, final_price aplica el descuento activo (impuesto incluido).
+    Se mantiene desde EffectivePriceService al confirmar cambios de catálogo.
+    """
+    __tablename__ = "effective_prices"
+    __table_args__ = (
+        UniqueConstraint("product_id", "unit_id", "price_list_id", "min_quantity", name="uix_effective_prices_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    unit_id = Column(Integer, nullable=False, default=0)
+    price_list_id = Column(Integer, nullable=False, default=0)
+    min_quantity = Column(Numeric(12, 3), nullable=False, default=0)
+    conversion_factor = Column(Numeric(14, 4), nullable=False, default=1)
+    price = Column(Numeric(18, 4), nullable=False)
+    discount_percentage = Column(Numeric(5, 2), nullable=False, default=0)
+    final_price = Column(Numeric(18, 4), nullable=False)
+    tax_rate = Column(Numeric(5, 2), nullable=False, default=0)
+    tax_amount = Column(Numeric(18, 4), nullable=False, default=0)
+    price_mayor_1 = Column(Numeric(18, 4), nullable=True)
+    price_mayor_2 = Column(Numeric(18, 4), nullable=True)
+    requires_auth = Column(Boolean, nullable=False, default=False)
+    version = Column(Integer, nullable=False, index=True)
+
 class PriceList(Base):
     __tablename__ = "price_lists"
 
@@ -212,6 +280,12 @@ class Product(Base):
     # NEW: Multiple Price Lists Support
     prices = relationship("ProductPrice", back_populates="product", cascade="all, delete-orphan")
 
+    @property
+    def thumbnail_url(self):
+        """Miniatura precalculada para la grilla del POS (None en imágenes anteriores sin hash)."""
+        from ..services.image_service import ImageService
+        return ImageService.url_for(self.image_url, "thumb")
+
     def __repr__(self):
         return f"<Product(name='{self.name}', is_box={self.is_box}, is_combo={self.is_combo}, factor={self.conversion_factor})>"
 
@@ -270,7 +344,17 @@ class ComboItem(Base):
         return f"<ComboItem(parent={self.parent_product_id}, child={self.child_product_id}, qty={self.quantity})>"
 
 class Kardex(Base):
+    """
+    Libro de movimientos de stock (solo se agregan filas).
+    En Postgres la tabla está particionada por mes sobre `date` (ver StockLedgerService).
+    """
     __tablename__ = "kardex"
+    __table_args__ = (
+        Index("ix_kardex_product_date", "product_id", "date"),
+        Index("ix_kardex_warehouse_product_date", "warehouse_id", "product_id", "date"),
+        Index("ix_kardex_date", "date"),
+        Index("ix_kardex_product_warehouse_id", "product_id", "warehouse_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -280,14 +364,89 @@ class Kardex(Base):
     balance_after = Column(Numeric(12, 3), nullable=False)
     description = Column(Text, nullable=True)
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True) # NEW: Warehouse link
+    # Saldo corrido del producto en este almacén (o sin almacén) después del movimiento
+    warehouse_balance = Column(Numeric(12, 3), nullable=True)
 
     product = relationship("Product")
 
     def __repr__(self):
         return f"<Kardex(product='{self.product_id}', type='{self.movement_type}', qty={self.quantity})>"
 
+class StockSnapshot(Base):
+    """
+    Existencia de un producto en un almacén al cierre de `snapshot_date` según el kardex
+    (movimientos con fecha anterior al día siguiente). warehouse_id NULL = movimientos sin almacén.
+    La primera foto es la apertura del libro; luego una por cierre de mes.
+    Se invalida si se registran movimientos con fecha anterior.
+    """
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        Index("ix_stock_snapshots_date_warehouse_product", "snapshot_date", "warehouse_id", "product_id"),
+        UniqueConstraint("snapshot_date", "product_id", "warehouse_id", name="uix_stock_snapshots_key"),
+        # NULL no se compara en la restricción única: una fila sin almacén por producto y fecha
+        Index(
+            "uix_stock_snapshots_unassigned", "snapshot_date", "product_id", unique=True,
+            postgresql_where=text("warehouse_id IS NULL"), sqlite_where=text("warehouse_id IS NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_date = Column(Date, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
+    quantity = Column(Numeric(12, 3), nullable=False)
+    is_opening = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=get_venezuela_now)
+
+class InventoryValuation(Base):
+    """
+    Valuación de inventario al cierre de un mes ya cerrado (caché permanente).
+    scope = "<total|warehouse|category>:<warehouse_id|*>". Se elimina junto con las fotos de
+    stock si se registra un movimiento con fecha anterior.
+    """
+    __tablename__ = "inventory_valuations"
+    __table_args__ = (
+        Index("ix_inventory_valuations_date_scope", "valuation_date", "scope"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    valuation_date = Column(Date, nullable=False)
+    scope = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=get_venezuela_now)
+
+class ImportJob(Base):
+    """
+    Trabajo de importación de lista de precios en segundo plano. Se guarda en la BD para que
+    cualquier worker pueda informar el avance, no solo el que ejecuta la importación.
+    """
+    __tablename__ = "import_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    filename = Column(String, nullable=True)
+    update_stock = Column(Boolean, default=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, default=0)
+    created = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(JSON, nullable=True)  # Primeros MAX_JOB_ERRORS mensajes
+    detail = Column(Text, nullable=True)
+    started_at = Column(DateTime, default=get_venezuela_now, index=True)
+    finished_at = Column(DateTime, nullable=True)
+
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Índice parcial: solo facturas a crédito abiertas (reporte de antigüedad, estado de cuenta)
+        Index(
+            "ix_sales_open_credit_customer_date", "customer_id", "date",
+            postgresql_where=text("is_credit = true AND paid = false"),
+            sqlite_where=text("is_credit = 1 AND paid = 0")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, default=get_venezuela_now, index=True)
@@ -339,7 +498,7 @@ class SalePayment(Base):
     __tablename__ = "sale_payments"
 
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False, index=True)
     amount = Column(Numeric(18, 4), nullable=False)
     currency = Column(String, default="USD") # USD or Bs
     payment_method = Column(String, default="Efectivo") # Efectivo, Tarjeta, etc.
@@ -347,6 +506,27 @@ class SalePayment(Base):
 
     sale = relationship("Sale", back_populates="payments")
 
+class CustomerLedgerCheckpoint(Base):
+    """
+    Saldo acumulado del estado de cuenta de un cliente hasta un movimiento dado.
+    La clave (entry_date, sale_id, entry_kind, entry_id) es el orden del estado de cuenta.
+    Se recalcula en segundo plano y se invalida si se registran movimientos anteriores.
+    """
+    __tablename__ = "customer_ledger_checkpoints"
+    __table_args__ = (
+        Index("ix_ledger_checkpoints_customer_key", "customer_id", "entry_date", "sale_id", "entry_kind", "entry_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    entry_date = Column(DateTime, nullable=False)
+    sale_id = Column(Integer, nullable=False)
+    entry_kind = Column(Integer, nullable=False)  # 0 = VENTA, 1 = ABONO
+    entry_id = Column(Integer, nullable=False)
+    balance = Column(Numeric(18, 4), nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=get_venezuela_now)
+
 class SaleDetail(Base):
     __tablename__ = "sale_details"
 
@@ -575,6 +755,20 @@ class Customer(Base):
     def __repr__(self):
         return f"<Customer(name='{self.name}')>"
 
+class CustomerCreditState(Base):
+    """
+    Exposición de crédito materializada por cliente (facturas a crédito abiertas).
+    Se mantiene en la misma transacción que las ventas, abonos y devoluciones
+    (ver services/credit_state_service.py).
+    """
+    __tablename__ = "customer_credit_state"
+
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    outstanding_balance = Column(Numeric(18, 4), nullable=False, default=0)  # SUM(balance_pending)
+    open_invoices = Column(Integer, nullable=False, default=0)
+    oldest_due_date = Column(DateTime, nullable=True)  # MIN(due_date) de las abiertas
+    updated_at = Column(DateTime, default=get_venezuela_now, onupdate=datetime.datetime.now)
+
 class Payment(Base):
     __tablename__ = "payments"
 
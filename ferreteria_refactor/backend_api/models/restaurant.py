@@ -87,6 +87,7 @@ class RestaurantOrderItem(Base):
     
     unit_price = Column(Numeric(12, 2), nullable=False) # Snapshot price
     subtotal = Column(Numeric(12, 2), nullable=False)
+    created_at = Column(DateTime, default=get_venezuela_now, nullable=True) # Hora de la comanda (antigüedad en el mapa de mesas)
 
     order = relationship("RestaurantOrder", back_populates="items")
     product = relationship("Product")
@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 
 from ..database.db import get_db
 from ..models import models
-from ..security import verify_password, create_access_token, get_password_hash
+from ..security import verify_and_update_password_async, create_access_token, get_password_hash
+from ..services.pin_service import pin_verifier
 from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -26,12 +27,8 @@ async def login_for_access_token(
         )
         
     try:
-        if not verify_password(form_data.password, user.password_hash):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        # bcrypt corre en el pool de hashing, no en el event loop
+        valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
     except Exception:
         # If hash is invalid/unknown (e.g. from old system), treat as auth failure
         raise HTTPException(
@@ -39,9 +36,21 @@ async def login_for_access_token(
             detail="Incorrect username or password (Security Update Required)",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        
+
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+
+    # Re-hash transparente si cambió BCRYPT_ROUNDS
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -63,27 +72,14 @@ def validate_pin(pin_data: dict, db: Session = Depends(get_db)):
             detail="user_id is required"
         )
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not user.is_active:
-        raise HTTPException(status_code=403, detail="User is inactive")
-    
-    # Check if user has a PIN set
-    if not user.pin:
-        raise HTTPException(
-            status_code=400,
-            detail="User does not have a PIN set. Please contact administrator."
-        )
-    
-    # Validate PIN
-    if user.pin == pin:
+    # Fast-path: PIN memorizado por usuario + bloqueo por intentos fallidos
+    principal = pin_verifier.verify(db, user_id, pin)
+    if principal:
         return {
             "valid": True,
-            "user_id": user.id,
-            "username": user.username,
-            "role": user.role.value if hasattr(user.role, 'value') else user.role,
+            "user_id": principal.id,
+            "username": principal.username,
+            "role": principal.role.value if hasattr(principal.role, 'value') else principal.role,
             "message": "PIN validated successfully"
         }
     else:
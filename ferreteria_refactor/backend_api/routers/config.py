@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import requests
 from decimal import Decimal
 from datetime import datetime
-from ..database.db import get_db
+from ..database.db import get_db, get_read_db
 from ..models import models
 from .. import schemas
 from ..dependencies import admin_only
@@ -12,6 +12,7 @@ from ..websocket.manager import manager
 from ..websocket.events import WebSocketEvents
 from ..template_presets import get_all_presets, get_preset_by_id
 from ..config import settings
+from ..services.price_table_service import PriceTableService
 
 router = APIRouter(
     prefix="/config",
@@ -65,6 +66,13 @@ async def create_exchange_rate(
     
     new_rate = models.ExchangeRate(**rate_data.dict())
     db.add(new_rate)
+    db.flush()
+    
+    # Nueva tasa por defecto: cambia la tasa de todos los productos sin tasa propia
+    version = None
+    if new_rate.is_default:
+        version = PriceTableService.reprice_for_rate(db, new_rate, defaults_changed=True)
+    
     db.commit()
     db.refresh(new_rate)
     
@@ -77,6 +85,13 @@ async def create_exchange_rate(
         "is_default": new_rate.is_default,
         "is_active": new_rate.is_active
     })
+    if version is not None:
+        await manager.broadcast(WebSocketEvents.PRICE_TABLE_UPDATED, {
+            "version": version.id,
+            "exchange_rate_id": new_rate.id,
+            "rows_changed": version.rows_changed,
+            "full": version.is_full
+        })
     
     return new_rate
 
@@ -91,13 +106,14 @@ def get_exchange_rate_by_id(id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/exchange-rates/{id}", response_model=schemas.ExchangeRateRead)
-async def update_exchange_rate(
+def update_exchange_rate(
     id: int,
     rate_data: schemas.ExchangeRateUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user: Any = Depends(admin_only)  # Protect mutation
 ):
-    """Update an exchange rate"""
+    """Update an exchange rate and reprice every product that depends on it"""
     rate = db.query(models.ExchangeRate).get(id)
     if not rate:
         raise HTTPException(status_code=404, detail="Exchange rate not found")
@@ -111,8 +127,16 @@ async def update_exchange_rate(
         ).update({"is_default": False})
     
     # Update fields
-    for key, value in rate_data.dict(exclude_unset=True).items():
+    changes = rate_data.dict(exclude_unset=True)
+    defaults_changed = any(
+        key in changes and changes[key] != getattr(rate, key) for key in ("is_default", "is_active")
+    )
+    for key, value in changes.items():
         setattr(rate, key, value)
+    db.flush()
+    
+    # Repricing en la misma transacción: una sola sentencia para todos los precios dependientes
+    version = PriceTableService.reprice_for_rate(db, rate, defaults_changed=defaults_changed)
     
     db.commit()
     db.refresh(rate)
@@ -124,8 +148,8 @@ async def update_exchange_rate(
     # Ideally we'd do the diff, but this is a quick action.
     log_action(db, user_id=1, action="UPDATE", table_name="exchange_rates", record_id=rate.id, changes=json.dumps({"rate": rate.rate, "is_active": rate.is_active}, default=str))
 
-    # Broadcast event
-    await manager.broadcast(WebSocketEvents.EXCHANGE_RATE_UPDATED, {
+    # Broadcast events
+    background_tasks.add_task(manager.broadcast, WebSocketEvents.EXCHANGE_RATE_UPDATED, {
         "id": rate.id,
         "name": rate.name,
         "rate": rate.rate, # Float
@@ -133,10 +157,27 @@ async def update_exchange_rate(
         "is_default": rate.is_default,
         "is_active": rate.is_active
     })
+    background_tasks.add_task(manager.broadcast, WebSocketEvents.PRICE_TABLE_UPDATED, {
+        "version": version.id,
+        "exchange_rate_id": rate.id,
+        "rows_changed": version.rows_changed,
+        "full": version.is_full
+    })
     
     return rate
 
 
+@router.get("/price-table")
+def get_price_table(since: Optional[int] = None, db: Session = Depends(get_read_db)):
+    """
+    Tabla de precios en moneda local (compacta: `columns` + `rows`).
+    - Sin `since`: tabla completa.
+    - Con `since`: solo las filas cambiadas después de esa versión. Si `full` es true
+      el cliente debe reemplazar su copia en lugar de aplicar el delta.
+    """
+    return PriceTableService.get_table(db, since)
+
+
 @router.delete("/exchange-rates/{id}")
 async def delete_exchange_rate(
     id: int,
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.orm import Session, joinedload
-from ..database.db import get_db
+from sqlalchemy import func, case, and_
+from ..database.db import get_db, get_read_db
 from ..models import models
+from ..services.ledger_service import CustomerLedgerService
 from typing import List, Optional
 from pydantic import BaseModel
 
@@ -127,145 +129,126 @@ def get_sale_valuation(sale_id: int, db: Session = Depends(get_db)):
         "exchange_rate_used": round(effective_rate, 4)
     }
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 @router.get("/aging-report")
-def get_aging_report(db: Session = Depends(get_db)):
+def get_aging_report(
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: Optional[str] = None,
+    order: str = "desc",
+    db: Session = Depends(get_read_db)
+):
     """
     Generates a breakdown of Accounts Receivable by age of debt.
     Buckets: Current (0-15), 15-30, 30-60, 60+ days.
+
+    Los buckets se calculan en SQL (CASE sobre la fecha de la factura, GROUP BY cliente),
+    apoyados en el índice parcial ix_sales_open_credit_customer_date:
+    el costo crece con el número de clientes, no de facturas.
+
+    Query params:
+    - limit / offset: Paginación opcional (por cliente)
+    - sort: 'total_debt' para ordenar por deuda total
+    - order: 'asc' or 'desc' (default 'desc')
     """
-    # Get all customers with 'credit' sales pending
-    # We fetch ALL customers to ensure we don't miss anyone, but filtering by Sales is better
-    
-    # 1. Fetch all pending credit sales
-    pending_sales = db.query(models.Sale).filter(
+    now = datetime.now()
+    debt = models.Sale.balance_pending
+
+    # Edad = (now - date).days  ->  edad <= N  equivale a  date > now - (N + 1) días
+    def bucket(condition):
+        return func.coalesce(func.sum(case((condition, debt), else_=0)), 0)
+
+    age_0_15 = models.Sale.date > now - timedelta(days=16)
+    age_0_30 = models.Sale.date > now - timedelta(days=31)
+    age_0_60 = models.Sale.date > now - timedelta(days=61)
+
+    total_debt = func.coalesce(func.sum(debt), 0)
+    query = db.query(
+        models.Sale.customer_id.label("client_id"),
+        models.Customer.name.label("client_name"),
+        total_debt.label("total_debt"),
+        bucket(age_0_15).label("current"),
+        bucket(and_(~age_0_15, age_0_30)).label("days_15_30"),
+        bucket(and_(~age_0_30, age_0_60)).label("days_30_60"),
+        bucket(~age_0_60).label("days_60_plus"),
+    ).outerjoin(
+        models.Customer, models.Customer.id == models.Sale.customer_id
+    ).filter(
         models.Sale.is_credit == True,
         models.Sale.paid == False,
         models.Sale.balance_pending > 0
-    ).options(joinedload(models.Sale.customer)).all()
-    
-    report = {}
-    
-    now = datetime.now()
-    
-    for sale in pending_sales:
-        client_id = sale.customer_id
-        client_name = sale.customer.name if sale.customer else "Unknown"
-        
-        if client_id not in report:
-            report[client_id] = {
-                "client_id": client_id,
-                "client_name": client_name,
-                "total_debt": 0.0,
-                "current": 0.0,   # 0-15 days
-                "days_15_30": 0.0,
-                "days_30_60": 0.0,
-                "days_60_plus": 0.0
-            }
-            
-        debt = float(sale.balance_pending)
-        report[client_id]["total_debt"] += debt
-        
-        # Calculate Age
-        # Using Sale Date as reference for Age (Invoice Age)
-        age_days = (now - sale.date).days
-        
-        if age_days <= 15:
-            report[client_id]["current"] += debt
-        elif age_days <= 30:
-            report[client_id]["days_15_30"] += debt
-        elif age_days <= 60:
-            report[client_id]["days_30_60"] += debt
-        else:
-            report[client_id]["days_60_plus"] += debt
+    ).group_by(models.Sale.customer_id, models.Customer.name)
+
+    if sort == "total_debt":
+        query = query.order_by(total_debt.asc() if order == "asc" else total_debt.desc())
+    else:
+        query = query.order_by(models.Sale.customer_id)
+
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
 
-    # Convert to list
-    return list(report.values())
+    return [
+        {
+            "client_id": row.client_id,
+            "client_name": row.client_name or "Unknown",
+            "total_debt": float(row.total_debt),
+            "current": float(row.current),
+            "days_15_30": float(row.days_15_30),
+            "days_30_60": float(row.days_30_60),
+            "days_60_plus": float(row.days_60_plus)
+        }
+        for row in query.all()
+    ]
 
 @router.get("/client/{client_id}/ledger")
-def get_client_ledger(client_id: int, db: Session = Depends(get_db)):
+def get_client_ledger(
+    client_id: int,
+    background_tasks: BackgroundTasks,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
     """
     Returns a chronological ledger of sales and payments for a client.
     Equivalent to a "Statement of Account".
+
+    - start_date / end_date: Rango de fechas (inclusive). El saldo arranca con el acumulado previo.
+    - limit / cursor: Paginación por cursor; usar `next_cursor` para pedir la siguiente página.
     """
     # 1. Get Client to ensure exists
     client = db.query(models.Customer).filter(models.Customer.id == client_id).first()
     if not client:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
-    # 2. Get Sales (Debits)
-    sales = db.query(models.Sale).filter(
-        models.Sale.customer_id == client_id,
-        models.Sale.is_credit == True
-    ).all()
-    
-    # 3. Get Payments (Credits) is TRICKY because payments are linked to SALES in SalePayment
-    # OR linked to Customer in Payment model (legacy/general).
-    # We should look at BOTH or strictly SalePayment?
-    # The current system uses SalePayment for credit payments.
-    
-    ledger_entries = []
-    
-    # Process Sales
-    for sale in sales:
-        ledger_entries.append({
-            "date": sale.date,
-            "type": "VENTA",
-            "ref": f"Factura #{sale.id}",
-            "debit": float(sale.total_amount),
-            "credit": 0.0,
-            "original_obj": sale
-        })
-        
-        # Process Payments linked to this sale
-        for payment in sale.payments:
-            amount_usd = float(payment.amount)
-            details_str = f"Abono a Fact. #{sale.id}"
-            
-            # Normalize to USD if needed
-            if payment.currency != "USD":
-                rate = float(payment.exchange_rate) if payment.exchange_rate else 1.0
-                if rate > 0:
-                    amount_usd = amount_usd / rate
-                details_str += f" ({payment.amount} {payment.currency} @ {rate})"
 
-            ledger_entries.append({
-                "date": payment.created_at if hasattr(payment, 'created_at') and payment.created_at else sale.date,
-                "type": "ABONO",
-                "ref": details_str, # Updated to include details
-                "debit": 0.0,
-                "credit": round(amount_usd, 2), # Normalized to USD for balance math
-                "original_obj": payment,
-                "original_currency": payment.currency,
-                "original_amount": float(payment.amount)
-            })
-            
-    # Sort by Date
-    ledger_entries.sort(key=lambda x: x["date"])
-    
-    # Calculate Balance
-    balance = 0.0
-    final_output = []
-    
-    for entry in ledger_entries:
-        balance += entry["debit"]
-        balance -= entry["credit"]
-        final_output.append({
-            "date": entry["date"].isoformat() if entry["date"] else None,
-            "type": entry["type"],
-            "ref": entry["ref"],
-            "debit": entry["debit"],
-            "credit": entry["credit"],
-            "balance": round(balance, 2)
-        })
-        
+    # 2. Movimientos (facturas a crédito + abonos) con saldo corrido calculado en SQL
+    page = CustomerLedgerService.get_page(
+        db, client_id,
+        date_from=datetime.combine(start_date, datetime.min.time()) if start_date else None,
+        date_to=datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None,
+        cursor=cursor,
+        limit=limit
+    )
+
+    # 3. Saldo actual de toda la cuenta (checkpoint + movimientos posteriores)
+    current_balance, scanned = CustomerLedgerService.balance_before(db, client_id)
+
+    # Muchos movimientos desde el último checkpoint: crear nuevos en segundo plano
+    if CustomerLedgerService.needs_checkpoint(max(scanned, page["scanned"])):
+        background_tasks.add_task(CustomerLedgerService.refresh_checkpoints, client_id)
+
     return {
         "client": {
             "id": client.id,
             "name": client.name,
             "limit": float(client.credit_limit or 0)
         },
-        "ledger": final_output,
-        "current_balance": round(balance, 2)
+        "ledger": page["entries"],
+        "opening_balance": page["opening_balance"],
+        "next_cursor": page["next_cursor"],
+        "current_balance": round(float(current_balance), 2)
     }
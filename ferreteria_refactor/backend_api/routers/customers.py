@@ -6,6 +6,7 @@ from ..models import models
 from .. import schemas
 from ..websocket.manager import manager
 from ..websocket.events import WebSocketEvents
+from ..services.credit_state_service import CreditStateService
 
 router = APIRouter(
     prefix="/customers",
@@ -77,37 +78,13 @@ async def update_customer(customer_id: int, customer_data: schemas.CustomerCreat
 
 @router.get("/{customer_id}/debt")
 def get_customer_debt(customer_id: int, db: Session = Depends(get_db)):
-    # Calculate Total Credit Sales
-    # Note: Logic assumes 'is_credit=True' sales contribute to debt.
-    # We might need to handle 'paid' status if we want to ignore fully paid ones,
-    # but for a running balance, usually we sum ALL credit sales and subtract ALL payments.
-    
-    # 1. Sum of all Credit Sales for this customer
-    # We must be careful not to double count if we have a different tracking system.
-    # Assuming: total_amount_bs or total_amount depending on currency?
-    # For now, let's standardise on USD (total_amount).
-    
-    from sqlalchemy import func
-    
-    total_credit_sales = db.query(func.sum(models.Sale.total_amount))\
-        .filter(models.Sale.customer_id == customer_id)\
-        .filter(models.Sale.is_credit == True)\
-        .scalar() or 0.0
-        
-    # 2. Sum of all Payments
-    # 2. Sum of all Payments (Converted to USD)
-    # We must retrieve payments and sum them manually to handle conversion if DB is mixed currency
-    payments = db.query(models.Payment).filter(models.Payment.customer_id == customer_id).all()
-    total_payments_usd = 0.0
-    
-    for p in payments:
-        if p.currency == "Bs" and p.exchange_rate_used > 0:
-            total_payments_usd += (p.amount / p.exchange_rate_used)
-        else:
-            total_payments_usd += p.amount
-            
-    debt = total_credit_sales - total_payments_usd
-    return {"debt": round(debt, 2)} # Round for clean display
+    if not db.query(models.Customer.id).filter(models.Customer.id == customer_id).first():
+        raise HTTPException(status_code=404, detail="Customer not found")
+    # Saldo pendiente de facturas a crédito (estado materializado, lectura por PK).
+    # Incluye abonos por factura, pagos FIFO y devoluciones.
+    state = CreditStateService.get_state(db, customer_id)
+    db.commit()  # Persistir el estado si se materializó en esta consulta
+    return {"debt": round(float(state.outstanding_balance), 2)} # Round for clean display
 
 @router.get("/{customer_id}/financial-status")
 def get_customer_financial_status(customer_id: int, db: Session = Depends(get_db)):
@@ -118,43 +95,30 @@ def get_customer_financial_status(customer_id: int, db: Session = Depends(get_db
     - Overdue invoices count and amount
     - Block status
     """
-    from sqlalchemy import func
-    from datetime import datetime
-    
     customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Calculate total debt from balance_pending of unpaid credit sales
-    total_debt = db.query(func.sum(models.Sale.balance_pending)).filter(
-        models.Sale.customer_id == customer_id,
-        models.Sale.is_credit == True,
-        models.Sale.paid == False
-    ).scalar() or 0.0
-    
-    # Count and sum overdue invoices
-    now = datetime.now()
-    overdue_invoices = db.query(models.Sale).filter(
-        models.Sale.customer_id == customer_id,
-        models.Sale.is_credit == True,
-        models.Sale.paid == False,
-        models.Sale.due_date < now
-    ).all()
+    # Total debt from the materialized credit state (customer_credit_state)
+    state = CreditStateService.get_state(db, customer_id)
+    total_debt = float(state.outstanding_balance)
     
-    overdue_count = len(overdue_invoices)
-    overdue_amount = sum(sale.balance_pending or 0 for sale in overdue_invoices)
+    # Overdue invoices: only scanned when the oldest due date has passed
+    overdue_count, overdue_amount = CreditStateService.overdue_summary(db, customer_id)
+    db.commit()  # Persistir el estado si se materializó en esta consulta
     
     # Calculate available credit
-    available_credit = max(0, customer.credit_limit - total_debt)
+    credit_limit = float(customer.credit_limit or 0)
+    available_credit = max(0, credit_limit - total_debt)
     
     return {
         "customer_id": customer.id,
         "customer_name": customer.name,
         "total_debt": round(total_debt, 2),
-        "credit_limit": round(customer.credit_limit, 2),
+        "credit_limit": round(credit_limit, 2),
         "available_credit": round(available_credit, 2),
         "overdue_invoices": overdue_count,
-        "overdue_amount": round(overdue_amount, 2),
+        "overdue_amount": round(float(overdue_amount), 2),
         "is_blocked": customer.is_blocked,
         "payment_term_days": customer.payment_term_days
     }
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
-from ..database.db import get_db
+from ..database.db import get_db, get_read_db
 from ..models import models
 from .. import schemas
 from datetime import datetime
 from ..dependencies import warehouse_or_admin
 from ..websocket.manager import manager
 from ..websocket.events import WebSocketEvents
+from ..services.stock_ledger_service import StockLedgerService
 
 router = APIRouter(
     prefix="/inventory",
@@ -142,16 +143,60 @@ async def remove_stock(adjustment: schemas.StockAdjustmentCreate, db: Session =
 from ..dependencies import any_authenticated
 
 @router.get("/kardex", response_model=List[schemas.KardexRead], dependencies=[any_authenticated])
-def get_kardex(product_id: Optional[int] = None, limit: int = 100, db: Session = Depends(get_db)):
+def get_kardex(
+    product_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    before_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Movimientos del kardex, del más reciente al más antiguo.
+    - date_from / date_to: rango de fechas (date_to exclusivo)
+    - before_date + before_id: página siguiente (fecha e id del último movimiento recibido)
+    """
+    from sqlalchemy import tuple_
     from sqlalchemy.orm import joinedload
-    query = db.query(models.Kardex).options(joinedload(models.Kardex.product))
+    K = models.Kardex
+    query = db.query(K).options(joinedload(K.product))
     if product_id:
-        query = query.filter(models.Kardex.product_id == product_id)
-    return query.order_by(models.Kardex.date.desc()).limit(limit).all()
+        query = query.filter(K.product_id == product_id)
+    if warehouse_id:
+        query = query.filter(K.warehouse_id == warehouse_id)
+    if date_from:
+        query = query.filter(K.date >= date_from)
+    if date_to:
+        query = query.filter(K.date < date_to)
+    if before_date is not None and before_id is not None:
+        query = query.filter(tuple_(K.date, K.id) < tuple_(before_date, before_id))
+    return query.order_by(K.date.desc(), K.id.desc()).limit(min(limit, 500)).all()
+
+@router.get("/stock-as-of", response_model=List[schemas.StockAsOfRead], dependencies=[any_authenticated])
+def get_stock_as_of(
+    date: datetime,
+    warehouse_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Existencia por producto y almacén antes de `date`, según el kardex
+    (foto de cierre más cercana + movimientos posteriores).
+    """
+    query = StockLedgerService.stock_as_of(
+        db, date, warehouse_id=warehouse_id, product_ids=[product_id] if product_id else None
+    )
+    return [
+        {"product_id": row.product_id, "warehouse_id": row.warehouse_id, "quantity": row.quantity}
+        for row in db.execute(query) if row.quantity
+    ]
 
 # --- INTER-COMPANY TRANSFER ENDPOINTS ---
 from fastapi import UploadFile, File, Body
 from ..services.inventory_service import InventoryService
+from ..services.serial_intake_service import SerialIntakeService, VALIDATE_MAX_SERIALS
 from ..schemas import TransferPackageSchema, TransferResultSchema
 from pydantic import BaseModel
 from typing import Optional
@@ -212,3 +257,12 @@ def validate_imei(product_id: int, imei: str, db: Session = Depends(get_db)):
     Check if an IMEI is valid and available for a given product.
     """
     return InventoryService.validate_imei_availability(db, product_id, imei)
+
+@router.post("/imei/validate", response_model=List[schemas.SerialValidationResult])
+def validate_imeis(request: schemas.SerialValidationRequest, db: Session = Depends(get_db)):
+    """
+    Check many IMEIs/serials at once (results in the order received).
+    """
+    if len(request.serials) > VALIDATE_MAX_SERIALS:
+        raise HTTPException(status_code=400, detail=f"Máximo {VALIDATE_MAX_SERIALS} seriales por consulta")
+    return SerialIntakeService.validate(db, request.serials, product_id=request.product_id)
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 
-from ....database.db import get_db
+from ....database.db import get_db, get_read_db
 from ....dependencies import get_current_active_user, require_admin_role
 from ....models.restaurant import RestaurantMenuSection, RestaurantMenuItem, RestaurantRecipe
 from ....models.models import Product
 from ....schemas import restaurant_ext as schemas
+from ....services.menu_service import MenuService
 
 router = APIRouter(
     prefix="/menu",
@@ -19,47 +20,17 @@ router = APIRouter(
 # ===========================
 
 @router.get("/full", response_model=schemas.FullMenu)
-def get_full_menu(db: Session = Depends(get_db)):
-    """Get complete menu tree for POS"""
-    sections = db.query(RestaurantMenuSection).filter(
-        RestaurantMenuSection.is_active == True
-    ).order_by(RestaurantMenuSection.sort_order).all()
-    
-    # Enrich simple objects for response
-    # Real implementation might need careful query opt, especially for prices
-    result_sections = []
-    for sec in sections:
-        items_data = []
-        for item in sec.items:
-            if not item.is_active: 
-                continue
-                
-            prod_name = item.product.name if item.product else "Unknown"
-            final_price = item.price_override if item.price_override else (item.product.price if item.product else 0)
-            
-            items_data.append(schemas.MenuItemRead(
-                id=item.id,
-                section_id=sec.id,
-                product_id=item.product_id,
-                alias=item.alias or prod_name,
-                price=final_price,
-                product_name=prod_name,
-                sort_order=item.sort_order,
-                is_active=item.is_active
-            ))
-        
-        # Sort items in Python (simple enough for small menus)
-        items_data.sort(key=lambda x: x.sort_order)
-        
-        result_sections.append(schemas.MenuSectionRead(
-            id=sec.id,
-            name=sec.name,
-            sort_order=sec.sort_order,
-            is_active=sec.is_active,
-            items=items_data
-        ))
-        
-    return {"sections": result_sections}
+def get_full_menu(request: Request, db: Session = Depends(get_read_db)):
+    """
+    Get complete menu tree for POS.
+    Servido desde caché con ETag: las tablets que envían If-None-Match reciben 304
+    mientras el menú no cambie.
+    """
+    version, etag, body = MenuService.get_menu(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Menu-Version": str(version)}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/sections", response_model=schemas.MenuSectionRead)
 def create_section(section: schemas.MenuSectionCreate, db: Session = Depends(get_db)):
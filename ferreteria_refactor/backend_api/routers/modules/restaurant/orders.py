@@ -5,14 +5,16 @@ from datetime import datetime
 
 from ....database.db import get_db
 from ....dependencies import get_current_active_user, require_restaurant_module
-from ....models.restaurant import RestaurantTable, RestaurantOrder, RestaurantOrderItem, RestaurantRecipe, TableStatusDB, OrderStatusDB, OrderItemStatusDB
+from ....models.restaurant import RestaurantTable, RestaurantOrder, RestaurantOrderItem, TableStatusDB, OrderStatusDB, OrderItemStatusDB
 from ....models.models import Product
-from ....schemas.restaurant import OrderCreate, OrderRead, OrderItemCreate, TableRead, OrderMove, OrderSplit
+from ....schemas.restaurant import OrderCreate, OrderRead, OrderItemCreate, OrderItemRead, TableRead, OrderMove, OrderSplit
 from ....schemas.restaurant_checkout import RestaurantCheckout
 from ....services.sales_service import SalesService
 from ....services.printer_service import PrinterService
+from ....services.recipe_inventory_service import RecipeInventoryService
 from ....websocket.manager import manager
 from ....websocket.events import WebSocketEvents
+from ....websocket.kitchen_feed import kitchen_feed, station_for, KitchenEvents
 from .... import schemas
 from fastapi import BackgroundTasks
 import asyncio
@@ -142,6 +144,19 @@ def add_items_to_order(order_id: int, items: List[OrderItemCreate], background_t
     db.commit()
     db.refresh(order)
     
+    # KDS: un evento por item nuevo en la estación de su producto
+    if new_items_list:
+        events = [
+            kitchen_feed.record(station_for(item.product), KitchenEvents.ITEM_ADDED, {
+                "order_id": order.id,
+                "table_id": order.table_id,
+                "order_created_at": order.created_at,
+                "item": OrderItemRead.model_validate(item).model_dump(mode="json")
+            })
+            for item in new_items_list
+        ]
+        background_tasks.add_task(kitchen_feed.publish, events)
+    
     # TRIGGER KITCHEN PRINT
     try:
         if new_items_list:
@@ -199,7 +214,7 @@ def get_pending_kitchen_orders(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/items/{item_id}/status")
-def update_order_item_status(item_id: int, status: str, db: Session = Depends(get_db)):
+def update_order_item_status(item_id: int, status: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Actualizar estado de un item (ej: PENDING -> READY)
     """
@@ -209,19 +224,31 @@ def update_order_item_status(item_id: int, status: str, db: Session = Depends(ge
     except ValueError:
          raise HTTPException(status_code=400, detail=f"Invalid status. Allowed: {[e.value for e in OrderItemStatusDB]}")
 
-    item = db.query(RestaurantOrderItem).filter(RestaurantOrderItem.id == item_id).first()
+    item = db.query(RestaurantOrderItem).filter(RestaurantOrderItem.id == item_id).options(
+        joinedload(RestaurantOrderItem.product)
+    ).first()
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
 
     item.status = new_status
     db.commit()
     
+    # KDS: delta del item (las pantallas ya no recargan todas las órdenes)
+    event_type = KitchenEvents.ITEM_CANCELLED if new_status == OrderItemStatusDB.CANCELLED else KitchenEvents.ITEM_STATUS
+    event = kitchen_feed.record(station_for(item.product), event_type, {
+        "order_id": item.order_id,
+        "item_id": item.id,
+        "status": new_status.value
+    })
+    background_tasks.add_task(kitchen_feed.publish, [event])
+    
     return {"status": "success", "item_id": item_id, "new_status": new_status.value}
 
 @router.post("/{order_id}/checkout")
 def checkout_order(
     order_id: int, 
     checkout_data: RestaurantCheckout,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
@@ -250,38 +277,17 @@ def checkout_order(
     if not order_items:
          raise HTTPException(status_code=400, detail="Cannot checkout an empty order")
 
+    # --- RECIPE INVENTORY LOGIC (ESCANDALLO) ---
+    # Todas las recetas de la orden en una consulta; se confirma junto con la venta.
+    # NOTE: The Dish itself (item.product) will still be processed by SalesService.
+    order_items = [item for item in order_items if item.product]
+    warehouse_id = SalesService.resolve_warehouse_id(db)
+    updated_ingredients = RecipeInventoryService.deduct_for_items(
+        db, order_items, warehouse_id,
+        description=f"Receta - Orden Restaurante #{order.id} (Mesa {order.table_id})"
+    )
+
     for item in order_items:
-        # Check if product is correctly loaded
-        if not item.product:
-             continue 
-        
-        # --- RECIPE INVENTORY LOGIC (ESCANDALLO) ---
-        try:
-            # 1. Check if this product is a Dish with a Recipe
-            recipes = db.query(RestaurantRecipe).filter(RestaurantRecipe.product_id == item.product_id).all()
-            
-            if recipes:
-                # It has a recipe! Deduct ingredients.
-                for recipe_item in recipes:
-                    # Assuming recipe_item.ingredient is loaded or we fetch it
-                    # We need to fetch the ingredient product to update its stock
-                    ingredient = db.query(Product).filter(Product.id == recipe_item.ingredient_id).first()
-                    if ingredient:
-                        try:
-                            # Safely handle potential None/Decimal types
-                            qty_needed = float(recipe_item.quantity or 0)
-                            qty_sold = float(item.quantity or 0)
-                            total_needed = qty_needed * qty_sold
-                            
-                            current_stock = float(ingredient.stock or 0)
-                            ingredient.stock = current_stock - total_needed
-                            db.add(ingredient)
-                        except Exception as e:
-                            print(f"[ERROR] Error calculating recipe deduction for {ingredient.name}: {e}")
-                # NOTE: The Dish itself (item.product) will still be processed by SalesService.
-        except Exception as e:
-            print(f"[ERROR] Critical Recipe Logic Failed: {e}")
-        
         sale_items.append(schemas.SaleDetailCreate(
             product_id=item.product_id,
             quantity=float(item.quantity),
@@ -321,7 +327,8 @@ def checkout_order(
         ],
         total_amount=float(order.total_amount), # Expected total
         payment_method=checkout_data.payment_method, # Main method
-        notes=f"Restaurant Order #{order.id} - Table {order.table_id}"
+        notes=f"Restaurant Order #{order.id} - Table {order.table_id}",
+        warehouse_id=warehouse_id # Mismo almacén que los ingredientes
     )
 
     # 3. Llamar al Servicio de Ventas (Reutilización de Lógica)
@@ -332,7 +339,7 @@ def checkout_order(
             db=db, 
             sale_data=sale_create, 
             user_id=current_user.id
-        )
+        )  # Commit incluye el descargo de ingredientes
         new_sale_id = result["sale_id"]
         
     except HTTPException as e:
@@ -351,6 +358,21 @@ def checkout_order(
         table.status = TableStatusDB.AVAILABLE
         
     db.commit()
+
+    # KDS: la orden cobrada sale de las pantallas
+    events = kitchen_feed.record_order(
+        (item.product for item in order_items), KitchenEvents.ORDER_CLOSED,
+        {"order_id": order.id, "status": OrderStatusDB.PAID.value}
+    )
+    background_tasks.add_task(kitchen_feed.publish, events)
+
+    if updated_ingredients:
+        background_tasks.add_task(run_broadcast, WebSocketEvents.PRODUCTS_BULK_UPDATED, {
+            "source": "restaurant_recipe",
+            "order_id": order.id,
+            "warehouse_id": warehouse_id,
+            "products": updated_ingredients
+        })
     
     return {"status": "success", "sale_id": new_sale_id, "message": "Order closed and table freed"}
 
@@ -388,7 +410,7 @@ def print_precheck(
         raise HTTPException(status_code=500, detail=f"Error printing pre-check: {e}")
 
 @router.post("/{order_id}/move")
-def move_order(order_id: int, move_data: OrderMove, db: Session = Depends(get_db)):
+def move_order(order_id: int, move_data: OrderMove, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Mover una orden a otra mesa (Cambio de Mesa).
     La mesa destino debe estar disponible.
@@ -427,11 +449,18 @@ def move_order(order_id: int, move_data: OrderMove, db: Session = Depends(get_db
         old_table.status = TableStatusDB.AVAILABLE
 
     db.commit()
+
+    # KDS: la tarjeta muestra la mesa nueva
+    events = kitchen_feed.record_order(
+        (item.product for item in order.items), KitchenEvents.ORDER_MOVED,
+        {"order_id": order.id, "table_id": order.table_id}
+    )
+    background_tasks.add_task(kitchen_feed.publish, events)
     return {"status": "success", "message": f"Moved order to table {target_table.name}"}
 
 
 @router.post("/{order_id}/split")
-def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get_db), current_user = Depends(get_current_active_user)):
+def split_order(order_id: int, split_data: OrderSplit, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user = Depends(get_current_active_user)):
     """
     Dividir una cuenta.
     Crea una NUEVA orden en la MISMA mesa con los items seleccionados.
@@ -458,6 +487,7 @@ def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get
 
     total_moved = 0
     total_removed_from_original = 0
+    new_items, reduced_items, removed_items = [], [], []  # Para los eventos del KDS
 
     # 3. Procesar Items
     for split_item in split_data.items_to_split:
@@ -484,6 +514,7 @@ def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get
         new_item = RestaurantOrderItem(
             order_id=new_order.id,
             product_id=original_item.product_id,
+            product=original_item.product,
             quantity=qty_to_move,
             unit_price=original_item.unit_price,
             subtotal=subtotal_moved, # Calc subtotal
@@ -491,6 +522,7 @@ def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get
             status=original_item.status # Preserve status (e.g. if already cooked)
         )
         db.add(new_item)
+        new_items.append(new_item)
         total_moved += subtotal_moved
         
         # B. Reducir/Eliminar de Original
@@ -498,11 +530,13 @@ def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get
             # Mover todo -> Eliminar de original (o marcar status, pero mejor eliminar para 'split')
             # Ojo: delete() en ORM a veces es tricky con listas, mejor db.delete
             db.delete(original_item)
+            removed_items.append((original_item.id, station_for(original_item.product)))
             total_removed_from_original += float(original_item.subtotal)
         else:
             # Reducir parcial
             original_item.quantity = qty_original - qty_to_move
             original_item.subtotal = float(original_item.subtotal) - subtotal_moved
+            reduced_items.append(original_item)
             total_removed_from_original += subtotal_moved
     
     # 4. Actualizar Totales
@@ -514,6 +548,26 @@ def split_order(order_id: int, split_data: OrderSplit, db: Session = Depends(get
          original_order.total_amount = 0 # Should not happen with validation above
          
     db.commit()
+
+    # KDS: los items pasan a la nueva orden (misma mesa) y la original queda con el resto
+    events = [
+        kitchen_feed.record(station_for(item.product), event_type, {
+            "order_id": order.id,
+            "table_id": order.table_id,
+            "order_created_at": order.created_at,
+            "item": OrderItemRead.model_validate(item).model_dump(mode="json")
+        })
+        for order, items, event_type in (
+            (new_order, new_items, KitchenEvents.ITEM_ADDED),
+            (original_order, reduced_items, KitchenEvents.ITEM_UPDATED),
+        )
+        for item in items
+    ] + [
+        kitchen_feed.record(station, KitchenEvents.ITEM_REMOVED, {"order_id": original_order.id, "item_id": item_id})
+        for item_id, station in removed_items
+    ]
+    if events:
+        background_tasks.add_task(kitchen_feed.publish, events)
     
     return {
         "status": "success", 
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from ....database.db import get_db
+from ....database.db import get_db, get_read_db
 from ....dependencies import get_current_active_user, require_restaurant_module
 from ....models.restaurant import RestaurantTable
 from ....schemas.restaurant import TableCreate, TableRead, TableUpdate
+from ....services.floor_service import floor_state
 
 # Prefix matches file structure logic, but will be mounted in main with /api/v1/restaurant
 router = APIRouter(
@@ -38,6 +39,15 @@ def get_tables(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
         
     return tables
 
+@router.get("/floor")
+def get_floor_state(zone: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Estado del mapa de mesas: por mesa activa, estado, orden abierta, cantidad de items,
+    total acumulado y antigüedad de la comanda pendiente más antigua.
+    Se sirve desde memoria; solo consulta la BD por las mesas que cambiaron.
+    """
+    return floor_state.get(db, zone)
+
 @router.post("/", response_model=TableRead, status_code=status.HTTP_201_CREATED)
 def create_table(table: TableCreate, db: Session = Depends(get_db)):
     """
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..database.db import get_db
+from ..database.db import get_db, get_read_db
 from ..models import models
 from .. import schemas
+from ..services.effective_price_service import EffectivePriceService
 from datetime import datetime
 
 router = APIRouter(
@@ -25,6 +26,16 @@ def get_price_lists(
     # Ensure default sorting by created_at or ID
     return query.order_by(models.PriceList.id.asc()).offset(skip).limit(limit).all()
 
+@router.get("/effective-prices")
+def get_effective_prices(since: Optional[int] = None, db: Session = Depends(get_read_db)):
+    """
+    Precios de venta efectivos para el POS (compacto: `columns` + `rows`).
+    Una fila por producto / presentación / lista / escalón (min_quantity), con descuento
+    e impuesto resueltos. Con `since` solo las filas cambiadas después de esa versión;
+    si `full` es true el cliente debe reemplazar su copia.
+    """
+    return EffectivePriceService.get_table(db, since)
+
 @router.post("/", response_model=schemas.PriceListRead, status_code=status.HTTP_201_CREATED)
 def create_price_list(
     list_data: schemas.PriceListCreate,
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 import json
 import asyncio
+import os
+import shutil
+import tempfile
 from datetime import date, datetime
-from ..database.db import get_db
+from ..database.db import get_db, get_read_db
 from ..models import models
 from ..models.models import UserRole
 from .. import schemas
@@ -432,8 +435,39 @@ async def import_products(
             detail=f"Error creando productos: {str(e)}"
         )
 
+@router.post("/import/upsert", status_code=202, dependencies=[Depends(has_role([UserRole.ADMIN, UserRole.WAREHOUSE]))])
+def start_upsert_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    update_stock: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    Actualización de lista de precios (.xlsx o .csv): crea los productos nuevos y actualiza
+    costo, precio, margen y stock de los existentes (por SKU o código de presentación).
+    Corre en segundo plano; consultar el avance en /products/import/jobs/{job_id}
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in (".xlsx", ".csv"):
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos .xlsx o .csv")
+
+    # Copia al disco por bloques: el archivo nunca se carga completo en memoria
+    with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+
+    job = ProductImportService.create_job(db, file.filename, update_stock)
+    background_tasks.add_task(ProductImportService.run_upsert_job, job["id"], tmp.name, update_stock)
+    return job
+
+@router.get("/import/jobs/{job_id}", dependencies=[Depends(has_role([UserRole.ADMIN, UserRole.WAREHOUSE]))])
+def get_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = ProductImportService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    return job
+
 @router.get("/export/excel")
-def export_excel(db: Session = Depends(get_db)):
+def export_excel(db: Session = Depends(get_read_db)):
     """
     Export all active products to Excel
     """
@@ -455,29 +489,19 @@ def export_excel(db: Session = Depends(get_db)):
     )
 
 @router.get("/export/pdf")
-def export_pdf(db: Session = Depends(get_db)):
+def export_pdf(db: Session = Depends(get_read_db)):
     """
-    Export all active products to PDF
+    Export all active products to PDF.
+    Se genera por páginas y se reutiliza mientras el catálogo no cambie.
     """
     # Get business name from config if available
     business_name = "Inventario"
     
-    products = db.query(models.Product).filter(
-        models.Product.is_active == True
-    ).options(
-        joinedload(models.Product.category),
-        joinedload(models.Product.supplier)
-    ).all()
-    
-    buffer = ProductExportService.export_to_pdf(products, business_name)
+    path = ProductExportService.catalog_pdf(db, business_name)
     
     filename = f"inventario_{date.today().strftime('%Y-%m-%d')}.pdf"
     
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    return FileResponse(path, media_type="application/pdf", filename=filename)
 
 # ========================================
 # PRODUCT CRUD ENDPOINTS (with dynamic routes)
@@ -859,28 +883,35 @@ def bulk_create_products(products: List[schemas.ProductCreate], db: Session = De
 # IMAGE MANAGEMENT ENDPOINTS
 # ============================================
 
-from fastapi.responses import FileResponse
-from PIL import Image
-import os
-import io
-
-# Image storage directory - environment aware
-IS_DOCKER = os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true'
-if IS_DOCKER:
-    IMAGES_DIR = "/app/data/images/products"
-    PLACEHOLDER_PATH = "/app/ferreteria_refactor/backend_api/assets/placeholder.webp"
-else:
-    # Local development paths
-    # __file__ is in: ferreteria_refactor/backend_api/routers/products.py
-    # We need: ferreteria_refactor/backend_api/data/images/products
-    current_file = os.path.abspath(__file__)  # .../routers/products.py
-    routers_dir = os.path.dirname(current_file)  # .../routers
-    backend_api_dir = os.path.dirname(routers_dir)  # .../backend_api
-    IMAGES_DIR = os.path.join(backend_api_dir, "data", "images", "products")
-    PLACEHOLDER_PATH = os.path.join(backend_api_dir, "assets", "placeholder.webp")
-
-# Ensure directory exists
-os.makedirs(IMAGES_DIR, exist_ok=True)
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from ..services.image_service import ImageService, MAX_BUNDLE_IDS, MAX_UPLOAD_BYTES, PLACEHOLDER_PATH, SIZES
+
+@router.get("/images/bundle")
+def get_image_bundle(request: Request, ids: str, size: str = "thumb", db: Session = Depends(get_read_db)):
+    """
+    Miniaturas de varios productos en una sola respuesta (grilla del POS).
+    ids: lista separada por comas. Formato del cuerpo: ver ImageService.pack
+    (los productos sin miniatura vienen en "missing").
+    """
+    if size not in SIZES:
+        raise HTTPException(status_code=400, detail=f"Tamaño inválido (opciones: {', '.join(SIZES)})")
+    try:
+        product_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids debe ser una lista de números separada por comas")
+    if not product_ids or len(product_ids) > MAX_BUNDLE_IDS:
+        raise HTTPException(status_code=400, detail=f"Entre 1 y {MAX_BUNDLE_IDS} productos por paquete")
+
+    key, path, content = ImageService.bundle(db, product_ids, size)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if content is not None:
+        return Response(content, media_type="application/octet-stream", headers=headers)
+    return FileResponse(path, media_type="application/octet-stream", headers=headers)
+
 
 @router.post("/{product_id}/image")
 async def upload_product_image(
@@ -891,9 +922,8 @@ async def upload_product_image(
     """
     Upload or replace product image.
     - Validates file size (max 2MB)
-    - Converts to WebP format
-    - Resizes to max 800x800px
-    - Updates product.updated_at automatically
+    - Converts to WebP in every size (full 800px, thumb 160px) in the image thread pool
+    - Content-hashed filenames: the image_url changes whenever the image changes
     """
     # 1. Verify product exists
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -902,65 +932,51 @@ async def upload_product_image(
     
     # 2. Validate file size (max 2MB)
     contents = await file.read()
-    file_size = len(contents)
-    if file_size > 2 * 1024 * 1024:
+    if len(contents) > MAX_UPLOAD_BYTES:
         raise HTTPException(status_code=400, detail="Imagen muy pesada (máximo 2MB)")
     
-    # 3. Validate file type and process with Pillow
+    # 3. Process with Pillow outside the event loop
     try:
-        img = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if necessary (for WebP compatibility)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        
-        # Resize maintaining aspect ratio
-        img.thumbnail((800, 800), Image.Resampling.LANCZOS)
-        
-        # Save as WebP
-        image_filename = f"{product_id}.webp"
-        image_path = os.path.join(IMAGES_DIR, image_filename)
-        img.save(image_path, "WEBP", quality=80)
-        
+        image_url = await ImageService.save(product_id, contents)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error procesando imagen: {str(e)}")
     
-    # 4. Update database
-    product.image_url = f"/images/products/{image_filename}"
-    product.updated_at = datetime.now() # Force update to bust cache
+    # 4. Update database, then drop the previous files
+    product.image_url = image_url
+    product.updated_at = datetime.now()
     db.commit()
+    ImageService.remove(product_id, keep_url=image_url)
     
     return {
         "success": True,
-        "image_url": product.image_url,
+        "image_url": image_url,
+        "thumbnail_url": ImageService.url_for(image_url, "thumb"),
         "message": "Imagen subida correctamente"
     }
 
 
 @router.get("/{product_id}/image")
-def get_product_image(product_id: int, db: Session = Depends(get_db)):
+def get_product_image(product_id: int, request: Request, size: str = "full", db: Session = Depends(get_read_db)):
     """
-    Get product image file.
-    Returns placeholder if product has no image.
+    Get product image file (size: full | thumb).
+    Returns placeholder if product has no image. La URL no cambia con la imagen:
+    se revalida con ETag (304). Las URLs con hash (/images/products/...) son immutable.
     """
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    
-    if not product or not product.image_url:
+    if size not in SIZES:
+        raise HTTPException(status_code=400, detail=f"Tamaño inválido (opciones: {', '.join(SIZES)})")
+
+    image_path = ImageService.resolve(db, product_id, size)
+    if not image_path:
         # Return placeholder
         if os.path.exists(PLACEHOLDER_PATH):
-            return FileResponse(PLACEHOLDER_PATH, media_type="image/webp")
-        raise HTTPException(status_code=404, detail="Imagen no encontrada")
-    
-    # Build full path
-    image_path = os.path.join(IMAGES_DIR, f"{product_id}.webp")
-    
-    if not os.path.exists(image_path):
-        # Fallback to placeholder
-        if os.path.exists(PLACEHOLDER_PATH):
-            return FileResponse(PLACEHOLDER_PATH, media_type="image/webp")
+            return FileResponse(PLACEHOLDER_PATH, media_type="image/webp", headers={"Cache-Control": "no-cache"})
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
-    
-    return FileResponse(image_path, media_type="image/webp")
+
+    etag = f'"{os.path.splitext(os.path.basename(image_path))[0]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image_path, media_type="image/webp", headers=headers)
 
 
 @router.delete("/{product_id}/image")
@@ -977,16 +993,14 @@ def delete_product_image(product_id: int, db: Session = Depends(get_db)):
     if not product.image_url:
         raise HTTPException(status_code=404, detail="El producto no tiene imagen")
     
-    # Delete file from disk
-    image_path = os.path.join(IMAGES_DIR, f"{product_id}.webp")
-    if os.path.exists(image_path):
-        os.remove(image_path)
-    
     # Clear database reference
     product.image_url = None
     # updated_at is auto-updated by SQLAlchemy onupdate
     db.commit()
     
+    # Delete every size from disk
+    ImageService.remove(product_id)
+    
     return {
         "success": True,
         "message": "Imagen eliminada correctamente"
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from decimal import Decimal
@@ -7,6 +7,7 @@ from ..models import models
 from .. import schemas
 from ..websocket.manager import manager
 from ..websocket.events import WebSocketEvents
+from ..services.purchase_service import PurchaseReceivingService
 
 router = APIRouter(
     prefix="/purchases",
@@ -14,7 +15,11 @@ router = APIRouter(
 )
 
 @router.post("", response_model=schemas.PurchaseOrderResponse)
-async def create_purchase_order(order_data: schemas.PurchaseOrderCreate, db: Session = Depends(get_db)):
+def create_purchase_order(
+    order_data: schemas.PurchaseOrderCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Create a new purchase order with automatic:
     - Multi-Warehouse Stock updates (ProductStock + Global)
@@ -52,113 +57,13 @@ async def create_purchase_order(order_data: schemas.PurchaseOrderCreate, db: Ses
         db.add(purchase)
         db.flush()  # Get purchase ID
         
-        updated_products_info = []
-
-        # Process items
-        for item in order_data.items:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if not product:
-                continue
-            
-            # SAVE PURCHASE ITEM (History)
-            purchase_item = models.PurchaseItem(
-                purchase_id=purchase.id,
-                product_id=product.id,
-                quantity=item.quantity,
-                unit_cost=item.unit_cost
-            )
-            db.add(purchase_item)
-
-            # =================================================
-            # MULTI-WAREHOUSE STOCK LOGIC
-            # =================================================
-            # 1. Update Specific Warehouse Stock
-            product_stock = db.query(models.ProductStock).filter(
-                models.ProductStock.product_id == product.id,
-                models.ProductStock.warehouse_id == order_data.warehouse_id
-            ).first()
-
-            if not product_stock:
-                # Create if not exists
-                product_stock = models.ProductStock(
-                    product_id=product.id,
-                    warehouse_id=order_data.warehouse_id,
-                    quantity=0
-                )
-                db.add(product_stock)
-            
-            product_stock.quantity += item.quantity
-
-            # 2. Update Global Stock (Cache)
-            old_stock = product.stock
-            old_cost_price = product.cost_price # Capture old cost for margin calc
-            product.stock += item.quantity
-            
-            # Update cost price (Last Cost / Replacement Cost Strategy)
-            # User Preference: Newest purchase price overrides historical average
-            if item.update_cost and item.unit_cost > 0:
-                 product.cost_price = item.unit_cost
-            
-            # Update Sale Price (PVP) if requested
-            if item.update_price:
-                if item.new_sale_price and item.new_sale_price > 0:
-                    # Direct update from frontend
-                    product.price = item.new_sale_price
-                elif item.update_cost and item.unit_cost > 0:
-                     # Intelligent auto-update if only "update price" is checked but no value sent
-                     # Use Replacment Cost Strategy (Item Unit Cost) to protect margin
-                     tax_multiplier = Decimal(1) + (product.tax_rate / 100) if product.tax_rate else Decimal(1)
-                     
-                     # 1. Try to use stored profit margin
-                     if product.profit_margin and product.profit_margin > 0:
-                         margin_multiplier = Decimal(1) + (product.profit_margin / 100)
-                         product.price = item.unit_cost * margin_multiplier * tax_multiplier
-                     
-                     # 2. Fallback: Calculate margin on-the-fly from current price/cost
-                     # BUGFIX: Must use OLD cost to infer margin, not the new one we just set!
-                     elif product.price > 0 and old_cost_price > 0:
-                         # Reverse engineer current margin based on OLD dynamic
-                         # Price = OldCost * (1+Margin) * (1+Tax) -> Margin = (Price / (OldCost * Tax)) - 1
-                         current_base_price = product.price / tax_multiplier
-                         current_margin = ((current_base_price / old_cost_price) - 1) * 100
-                         
-                         # Apply this historical margin to new cost
-                         margin_multiplier = Decimal(1) + (current_margin / 100)
-                         product.price = item.unit_cost * margin_multiplier * tax_multiplier
-                         
-                         # Update stored margin for consistency
-                         product.profit_margin = current_margin
-                     
-                     # 3. Last Resort: Keep existing price (margin shrinks)
-                     else:
-                         pass # Price stays same, margin will be updated below automatically
- 
-            # Auto-update profit margin (Markup) based on new values
-            if product.cost_price > 0 and product.price > 0:
-                product.profit_margin = ((product.price - product.cost_price) / product.cost_price) * 100
-
-            # Create Kardex entry LINKED TO WAREHOUSE
-            kardex = models.Kardex(
-                product_id=product.id,
-                warehouse_id=order_data.warehouse_id, # IMPORTANT
-                movement_type=models.MovementType.PURCHASE,
-                quantity=item.quantity,
-                balance_after=product.stock, # Note: Current Kardex balance logic is global, refactor later for per-warehouse balance
-                description=f"Compra #{purchase.id} - {supplier.name}",
-                date=purchase_date
-            )
-            db.add(kardex)
-            
-            # Collect info for broadcast
-            updated_products_info.append({
-                "id": product.id,
-                "name": product.name,
-                "price": float(product.price),
-                "cost_price": float(product.cost_price), 
-                "stock": float(product.stock),
-                "profit_margin": float(product.profit_margin) if product.profit_margin else 0,
-                "exchange_rate_id": product.exchange_rate_id
-            })
+        # Process items (batched: historial, existencias, costo/precio y kardex)
+        updated_products_info = PurchaseReceivingService.receive_items(
+            db, purchase, order_data.items,
+            warehouse_id=order_data.warehouse_id,
+            description=f"Compra #{purchase.id} - {supplier.name}",
+            movement_date=purchase_date
+        )
         
         # Update supplier balance if credit purchase
         if order_data.payment_type == 'CREDIT':
@@ -171,12 +76,13 @@ async def create_purchase_order(order_data: schemas.PurchaseOrderCreate, db: Ses
         db.commit()
         db.refresh(purchase)
         
-        # Emission of events
-        for p_info in updated_products_info:
-            await manager.broadcast(WebSocketEvents.PRODUCT_UPDATED, p_info)
-            await manager.broadcast(WebSocketEvents.PRODUCT_STOCK_UPDATED, {
-                "id": p_info["id"], 
-                "stock": p_info["stock"]
+        # Un solo evento de catálogo para toda la compra
+        if updated_products_info:
+            background_tasks.add_task(manager.broadcast, WebSocketEvents.PRODUCTS_BULK_UPDATED, {
+                "source": "purchase",
+                "purchase_id": purchase.id,
+                "warehouse_id": order_data.warehouse_id,
+                "products": updated_products_info
             })
 
         return purchase
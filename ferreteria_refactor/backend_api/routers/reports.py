@@ -5,9 +5,10 @@ from sqlalchemy import func, desc
 from typing import Optional
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from ..database.db import get_db
+from ..database.db import get_db, get_read_db
 from ..models import models
 from ..dependencies import admin_only
+from ..services.inventory_valuation_service import InventoryValuationService
 from ..utils.payment_utils import normalize_payment_method, get_currency_symbol, normalize_currency_code
 
 router = APIRouter(
@@ -20,7 +21,7 @@ router = APIRouter(
 def get_dashboard_financials(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Financial metrics for dashboard - real money collected by currency
@@ -200,7 +201,7 @@ def get_dashboard_financials(
     }
 
 @router.get("/dashboard/cashflow")
-def get_dashboard_cashflow(db: Session = Depends(get_db)):
+def get_dashboard_cashflow(db: Session = Depends(get_read_db)):
     """
     Calculate physical cash balance by currency in open cash sessions
     
@@ -326,7 +327,7 @@ def get_detailed_sales_report(
     customer_id: Optional[int] = None,
     product_id: Optional[int] = None,
     payment_method: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Detailed sales report with filters"""
     # Convert dates to datetime
@@ -364,7 +365,7 @@ def get_sales_by_product(
     end_date: date,
     category_id: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get aggregated sales by product for a period.
@@ -415,7 +416,7 @@ def get_sales_by_product(
 def get_sales_summary(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Summary statistics for sales period"""
     start_dt = datetime.combine(start_date, datetime.min.time())
@@ -526,7 +527,7 @@ def get_sales_summary(
 def get_cash_flow_report(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """All cash movements in period"""
     start_dt = datetime.combine(start_date, datetime.min.time())
@@ -579,7 +580,7 @@ def get_cash_flow_report(
 def get_sales_by_product(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Sales aggregated by Product
@@ -618,7 +619,7 @@ def get_top_products(
     end_date: date,
     limit: int = 10,
     by: str = "quantity",
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Top products by NET quantity or revenue (Gross - Returns)"""
     start_dt = datetime.combine(start_date, datetime.min.time())
@@ -680,7 +681,7 @@ def get_top_products(
     return final_list[:limit]
 
 @router.get("/customer-debts")
-def get_customer_debt_report(db: Session = Depends(get_db)):
+def get_customer_debt_report(db: Session = Depends(get_read_db)):
     """All customers with outstanding debt"""
     customers = db.query(models.Customer).all()
     
@@ -713,58 +714,45 @@ def get_customer_debt_report(db: Session = Depends(get_db)):
     return report
 
 @router.get("/low-stock")
-def get_low_stock_products(threshold: int = 5, db: Session = Depends(get_db)):
+def get_low_stock_products(threshold: int = 5, db: Session = Depends(get_read_db)):
     """Products with stock <= threshold"""
     products = db.query(models.Product).filter(models.Product.stock <= threshold).all()
     return products
 
 @router.get("/inventory-valuation")
-def get_inventory_valuation(exchange_rate: float = 1.0, db: Session = Depends(get_db)):
+def get_inventory_valuation(
+    exchange_rate: float = 1.0,
+    as_of: Optional[date] = None,
+    warehouse_id: Optional[int] = None,
+    group_by: Optional[str] = Query(None, pattern="^(warehouse|category)$"),
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db)
+):
     """
     Inventory Financials:
     - Total Cost: Sum(Stock * Cost Price)
     - Potential Revenue: Sum(Stock * Sale Price)
     - Potential Profit: Revenue - Cost
-    """
-    products = db.query(models.Product).filter(models.Product.is_active == True).all()
-    
-    total_cost_usd = Decimal("0.00")
-    total_revenue_usd = Decimal("0.00")
-    total_stock_units = Decimal("0.00")
-    
-    for p in products:
-        # Safety check for None and force Decimal conversion
-        stock = Decimal(str(p.stock)) if p.stock is not None else Decimal("0")
-        cost = Decimal(str(p.cost_price)) if p.cost_price is not None else Decimal("0")
-        price = Decimal(str(p.price)) if p.price is not None else Decimal("0")
-        
-        # Only count positive stock
-        if stock > 0:
-            total_stock_units += stock
-            total_cost_usd += (stock * cost)
-            total_revenue_usd += (stock * price)
-            
-    potential_profit = total_revenue_usd - total_cost_usd
-    margin_percent = 0
-    if total_revenue_usd > 0:
-        margin_percent = (potential_profit / total_revenue_usd) * 100
 
+    - as_of: valuación al cierre de ese día (existencias del kardex, costo de la última compra);
+      los cierres de mes ya cerrados se guardan y no se recalculan
+    - warehouse_id: solo un almacén
+    - group_by: desglose por "warehouse" o "category" (lista "groups")
+    """
+    result = InventoryValuationService.valuation(
+        db, as_of=as_of, warehouse_id=warehouse_id, group_by=group_by, cache_db=write_db
+    )
+    # Bs values for display if needed
     return {
-        "total_products": len(products),
-        "total_stock_units": float(total_stock_units),
-        "total_cost_usd": float(total_cost_usd),
-        "total_revenue_usd": float(total_revenue_usd),
-        "potential_profit_usd": float(potential_profit),
-        "margin_percent": float(round(margin_percent, 2)),
-        # Bs values for display if needed
-        "total_cost_bs": float(total_cost_usd) * exchange_rate,
-        "total_revenue_bs": float(total_revenue_usd) * exchange_rate
+        **result,
+        "total_cost_bs": result["total_cost_usd"] * exchange_rate,
+        "total_revenue_bs": result["total_revenue_usd"] * exchange_rate
     }
 
 # ===== PROFIT ANALYSIS ENDPOINTS =====
 
 @router.get("/profit/product/{product_id}")
-def get_product_profitability(product_id: int, db: Session = Depends(get_db)):
+def get_product_profitability(product_id: int, db: Session = Depends(get_read_db)):
     """Get profitability stats for a specific product"""
     product = db.query(models.Product).get(product_id)
     if not product:
@@ -807,7 +795,7 @@ def get_product_profitability(product_id: int, db: Session = Depends(get_db)):
 def get_sales_profitability(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get total profitability for a date range"""
     query = db.query(models.SaleDetail).join(models.Sale)
@@ -901,7 +889,7 @@ def get_sales_profitability(
     }
 
 @router.get("/profit/month")
-def get_month_profitability(db: Session = Depends(get_db)):
+def get_month_profitability(db: Session = Depends(get_read_db)):
     """Get profitability for current month"""
     now = datetime.now()
     start_of_month = datetime(now.year, now.month, 1)
@@ -941,7 +929,7 @@ def get_month_profitability(db: Session = Depends(get_db)):
 @router.get("/daily-close")
 def get_daily_close(
     date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Daily Closing Report (IMPROVED):
@@ -1147,7 +1135,7 @@ import io
 def export_sales_excel(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: models.User = Depends(get_current_active_user) # Uncomment when auth is ready or if generic
 ):
     """
@@ -1173,7 +1161,7 @@ def export_sales_excel(
 def export_product_sales_excel(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Genera un archivo Excel con el reporte de productos vendidos.
@@ -1195,7 +1183,7 @@ def export_product_sales_excel(
 async def export_excel_report(
     start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate a comprehensive management report in Excel format.
@@ -1528,7 +1516,7 @@ async def export_excel_report(
 async def export_general_report(
     start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate a comprehensive 360° audit report in Excel format with flattened multi-currency columns.
@@ -1787,7 +1775,7 @@ async def export_general_report(
 def get_sales_by_payment_method(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Sales breakdown by payment method.
@@ -1831,7 +1819,7 @@ def get_sales_by_customer(
     start_date: date,
     end_date: date,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Top customers by sales volume.
@@ -1865,7 +1853,7 @@ def export_detailed_report(
     start_date: date,
     end_date: date,
     format: str = "xlsx",
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Export detailed combined report to Excel (Multi-sheet).
@@ -154,6 +154,7 @@ def process_return(return_data: schemas.ReturnCreate, db: Session = Depends(get_
         product = db.query(models.Product).get(item.product_id)
         
         # Handle stock based on condition
+        # Las devoluciones solo mueven products.stock (no product_stocks): su kardex va sin almacén
         if item.condition == "GOOD":
             # GOOD condition: Simply restore to stock
             product.stock += item.quantity
@@ -190,7 +191,7 @@ def process_return(return_data: schemas.ReturnCreate, db: Session = Depends(get_
             kardex_adjustment = models.Kardex(
                 product_id=product.id,
                 movement_type="ADJUSTMENT_OUT",
-                quantity=item.quantity,
+                quantity=-item.quantity,  # Negative for outgoing
                 balance_after=product.stock,
                 description=f"Auto-merma por devolución dañada - Venta #{sale.id}",
                 date=datetime.now()
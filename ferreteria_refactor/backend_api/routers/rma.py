@@ -6,7 +6,8 @@ from ..database.db import get_db
 from ..models import models
 from ..schemas import rma_schemas
 from ..dependencies import get_current_user
-from ..services.inventory_service import InventoryService # Reuse if needed
+from ..services.serial_intake_service import VALIDATE_MAX_SERIALS, normalize_serial
+from ..services.serial_resolution_service import SerialResolutionService
 
 router = APIRouter(
     prefix="/rma",
@@ -20,65 +21,23 @@ def check_warranty_status(imei: str, db: Session = Depends(get_db)):
     """
     Check if an IMEI is eligible for warranty/return.
     """
-    # 1. Find the instance
-    instance = db.query(models.ProductInstance).filter(models.ProductInstance.serial_number == imei).first()
-    if not instance:
-        return {
-            "valid": False,
-            "message": "IMEI no encontrado en el sistema.",
-            "warranty_status": "NOT_FOUND"
-        }
+    info = SerialResolutionService.resolve(db, [imei]).get(normalize_serial(imei))
+    return {"imei": normalize_serial(imei), **SerialResolutionService.warranty(info)}
 
-    # 2. Check current status
-    if instance.status == models.ProductInstanceStatus.AVAILABLE:
-        return {
-            "valid": False,
-            "message": "El equipo figura como DISPONIBLE (No ha sido vendido).",
-            "warranty_status": "NOT_SOLD"
-        }
 
-    # 3. Find the Sale Detail Instance link
-    # We want the LATEST sale (in case it was sold, returned, sold again)
-    # So order by ID desc
-    sale_link = db.query(models.SaleDetailInstance).join(models.SaleDetail).filter(
-        models.SaleDetailInstance.product_instance_id == instance.id
-    ).order_by(models.SaleDetailInstance.id.desc()).first()
-
-    if not sale_link:
-        return {
-            "valid": False,
-            "message": "No se encontró registro de venta asociado a este serial.",
-            "warranty_status": "NO_SALE_RECORD"
-        }
-
-    sale_detail = sale_link.sale_detail
-    sale = sale_detail.sale
-    product = sale_detail.product
-    customer = sale.customer
-
-    # 4. Calculate Days
-    sale_date = sale.date
+@router.post("/check", response_model=List[rma_schemas.RMACheckResponse])
+def check_warranty_status_batch(request: rma_schemas.RMACheckBatchRequest, db: Session = Depends(get_db)):
+    """
+    Warranty status of many IMEIs in one query (results in the order received).
+    """
+    if len(request.imeis) > VALIDATE_MAX_SERIALS:
+        raise HTTPException(status_code=400, detail=f"Máximo {VALIDATE_MAX_SERIALS} seriales por consulta")
+    resolved = SerialResolutionService.resolve(db, request.imeis)
     now = datetime.now()
-    delta = now - sale_date
-    days_elapsed = delta.days
-    
-    # 5. Determine Eligibility (Hardcoded 90 days for now, or use warranty_end_date if set)
-    warranty_limit = 90
-    is_within_warranty = days_elapsed <= warranty_limit
-    
-    status_str = "ACTIVE" if is_within_warranty else "EXPIRED"
-    msg = "Garantía Activa" if is_within_warranty else f"Garantía Vencida (hace {days_elapsed - warranty_limit} días)"
-
-    return {
-        "valid": True, # Valid as in "Found and Sold", logic about accepting expired is up to frontend/manager
-        "message": msg,
-        "sale_date": sale_date,
-        "customer_name": customer.name if customer else "Cliente Casual",
-        "product_name": product.name,
-        "days_elapsed": days_elapsed,
-        "warranty_status": status_str,
-        "original_price": sale_detail.unit_price # Return strictly the unit price paid
-    }
+    return [
+        {"imei": imei, **SerialResolutionService.warranty(resolved.get(imei), now)}
+        for imei in (normalize_serial(i) for i in request.imeis)
+    ]
 
 
 @router.post("/process", response_model=rma_schemas.RMAProcessResponse)
@@ -94,19 +53,17 @@ def process_rma_return(
     - Records Financial Return
     """
     
-    # 1. Re-Verify (Security)
-    instance = db.query(models.ProductInstance).filter(models.ProductInstance.serial_number == payload.imei).first()
-    if not instance:
+    # 1. Re-Verify (Security) - instance locked until commit (no double returns)
+    info = SerialResolutionService.resolve(db, [payload.imei], lock=True).get(normalize_serial(payload.imei))
+    if not info:
         raise HTTPException(status_code=404, detail="IMEI not found")
-
-    sale_link = db.query(models.SaleDetailInstance).filter(
-        models.SaleDetailInstance.product_instance_id == instance.id
-    ).order_by(models.SaleDetailInstance.id.desc()).first()
-    
-    if not sale_link:
+    if info["sale_detail_id"] is None:
         raise HTTPException(status_code=400, detail="Item has no sale record")
-        
-    sale_detail = sale_link.sale_detail
+    if info["status"] != models.ProductInstanceStatus.SOLD:
+        raise HTTPException(status_code=400, detail=f"Item is not sold (status: {info['status'].value})")
+
+    instance = db.get(models.ProductInstance, info["id"])
+    sale_detail = db.get(models.SaleDetail, info["sale_detail_id"])
     product = sale_detail.product
     
     # 2. INVENTORY LOGIC
@@ -116,7 +73,7 @@ def process_rma_return(
         
         # Increase Stock (Global and Warehouse)
         # We need to know WHICH warehouse. Ideally the one it was sold from (sale.warehouse_id) or default.
-        warehouse_id = sale_detail.sale.warehouse_id or 1 # Fallback to 1
+        warehouse_id = info["sale_warehouse_id"] or 1 # Fallback to 1
         
         # Update Warehouse Stock
         wh_stock = db.query(models.ProductStock).filter(
@@ -17,7 +17,7 @@ router = APIRouter(
 )
 
 # Importar la clave pública del middleware
-from ..middleware.license_guard import PUBLIC_KEY, LICENSE_FILE, get_machine_id
+from ..middleware.license_guard import PUBLIC_KEY, LICENSE_FILE, get_machine_id, license_cache
 
 
 class LicenseActivationRequest(BaseModel):
@@ -167,6 +167,7 @@ def activate_license(request: LicenseActivationRequest):
         LICENSE_FILE.parent.mkdir(parents=True, exist_ok=True)
         with open(LICENSE_FILE, 'w') as f:
             f.write(token)
+        license_cache.invalidate()
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,5 +1,5 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.security import HTTPBasic
 from sqlalchemy.orm import Session
 from .. import schemas
@@ -7,9 +7,12 @@ from ..database.db import get_db
 from ..models import models
 from typing import List
 from datetime import timedelta
-from ..security import verify_password, get_password_hash, create_access_token
+from ..security import verify_and_update_password, get_password_hash, create_access_token
 from ..config import settings
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, invalidate_user_cache
+from ..services.pin_service import pin_verifier
+from ..websocket.manager import manager
+from ..websocket.events import WebSocketEvents
 
 
 router = APIRouter(
@@ -21,6 +24,23 @@ security = HTTPBasic()
 
 # Deleted local hash_password and verify_password in favor of imported ones
 
+def notify_user_changed(user: models.User, background_tasks: BackgroundTasks, role_changed: bool = False):
+    """
+    Invalida el principal cacheado del usuario y emite USER_UPDATED
+    (y USER_ROLE_CHANGED si cambió el rol) para los demás clientes.
+    """
+    invalidate_user_cache(user.username)
+    pin_verifier.invalidate(user.id)
+    payload = {
+        "id": user.id,
+        "username": user.username,
+        "role": user.role.value if hasattr(user.role, 'value') else user.role,
+        "is_active": user.is_active
+    }
+    background_tasks.add_task(manager.broadcast, WebSocketEvents.USER_UPDATED, payload)
+    if role_changed:
+        background_tasks.add_task(manager.broadcast, WebSocketEvents.USER_ROLE_CHANGED, payload)
+
 @router.post("/", response_model=schemas.UserRead)
 @router.post("", response_model=schemas.UserRead, include_in_schema=False)
 def create_user(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -58,12 +78,19 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 @router.put("/{user_id}", response_model=schemas.UserRead)
-def update_user(user_id: int, user_data: schemas.UserUpdate, db: Session = Depends(get_db)):
+def update_user(
+    user_id: int,
+    user_data: schemas.UserUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Update user"""
     user = db.query(models.User).get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    previous_role = user.role
+
     if user_data.password:
         user.password_hash = get_password_hash(user_data.password)
     if user_data.role:
@@ -95,10 +122,11 @@ def update_user(user_id: int, user_data: schemas.UserUpdate, db: Session = Depen
 
     db.commit()
     db.refresh(user)
+    notify_user_changed(user, background_tasks, role_changed=user.role != previous_role)
     return user
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+def delete_user(user_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Deactivate user (soft delete)"""
     user = db.query(models.User).get(user_id)
     if not user:
@@ -106,6 +134,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     user.is_active = False
     db.commit()
+    notify_user_changed(user, background_tasks)
     return {"message": "User deactivated successfully"}
 
 @router.post("/login")
@@ -113,7 +142,8 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     """Authenticate user"""
     user = db.query(models.User).filter(models.User.username == credentials.username).first()
     
-    if not user or not verify_password(credentials.password, user.password_hash):
+    valid, new_hash = verify_and_update_password(credentials.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -124,6 +154,11 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
         )
+
+    # Re-hash transparente si cambió BCRYPT_ROUNDS
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
     
     return {
         "id": user.id,
@@ -185,12 +220,14 @@ def pin_login(payload: dict, db: Session = Depends(get_db)):
 @router.post("/verify-pin/{user_id}")
 def verify_pin(user_id: int, pin: str, db: Session = Depends(get_db)):
     """Verify user PIN for authorization (e.g., discounts)"""
-    user = db.query(models.User).get(user_id)
-    if not user:
+    principal = pin_verifier.get_principal(db, user_id)
+    if not principal:
         raise HTTPException(status_code=404, detail="User not found")
+    if not principal.pin_digest:
+        return {"verified": False}
     
-    if user.pin == pin:
-        return {"verified": True, "role": user.role.value if hasattr(user.role, 'value') else user.role}
+    if pin_verifier.verify(db, user_id, pin):
+        return {"verified": True, "role": principal.role.value if hasattr(principal.role, 'value') else principal.role}
     else:
         return {"verified": False}
 
@@ -213,6 +250,7 @@ def update_pin(user_id: int, pin_data: dict, db: Session = Depends(get_db)):
     user.pin = pin
     db.commit()
     db.refresh(user)
+    pin_verifier.invalidate(user.id)
     
     return {
         "id": user.id,
@@ -230,7 +268,10 @@ def update_own_pin(pin_data: dict, db: Session = Depends(get_db), current_user =
     if not pin.isdigit() or len(pin) < 4 or len(pin) > 6:
         raise HTTPException(status_code=400, detail="PIN must be 4-6 digits")
     
-    current_user.pin = pin
+    # current_user es un principal cacheado: cargar el modelo para modificarlo
+    user = db.query(models.User).get(current_user.id)
+    user.pin = pin
     db.commit()
+    pin_verifier.invalidate(user.id)
     
     return {"status": "success", "message": "PIN updated successfully"}
@@ -4,6 +4,7 @@ Handles WebSocket connections and keeps them alive
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from ..websocket.manager import manager
+from ..websocket.kitchen_feed import kitchen_feed, ALL_STATIONS
 import json
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
@@ -45,3 +46,35 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+
+
+@router.websocket("/kitchen")
+async def kitchen_websocket_endpoint(websocket: WebSocket):
+    """
+    Flujo de la pantalla de cocina (KDS): ws://localhost:8000/api/v1/ws/kitchen
+    El cliente envía {"type": "subscribe", "stations": ["*"], "epoch": ..., "cursors": {...}}
+    al conectar (y al reconectar, con su último seq por estación).
+    """
+    await websocket.accept()
+    try:
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                await websocket.send_text("pong")
+                continue
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if message.get("type") == "subscribe":
+                await kitchen_feed.subscribe(
+                    websocket,
+                    stations=[str(s) for s in message.get("stations") or [ALL_STATIONS]],
+                    epoch=message.get("epoch"),
+                    cursors=message.get("cursors")
+                )
+    except WebSocketDisconnect:
+        kitchen_feed.unsubscribe(websocket)
+    except Exception as e:
+        print(f"[KDS] WebSocket error: {e}")
+        kitchen_feed.unsubscribe(websocket)
@@ -242,6 +242,7 @@ class ProductRead(ProductBase):
     stocks: List[ProductStockRead] = [] # NEW: Include warehouse stocks
     has_imei: Optional[bool] = False # NEW: Include serialized status exposed to frontend
     prices: List[ProductPriceRead] = [] # NEW: Multi-Price List
+    thumbnail_url: Optional[str] = None  # Miniatura precalculada (grilla del POS)
     
     class Config:
         from_attributes = True
@@ -260,6 +261,7 @@ class SaleDetailCreate(BaseModel):
     serial_numbers: Optional[List[str]] = Field(None, description="Lista de seriales para productos serializados") # NEW
     price_list_id: Optional[int] = None # NEW: Price List Validation
     auth_user_id: Optional[int] = None # NEW: Supervisor Auth for Price List
+    auth_pin: Optional[str] = None # Supervisor PIN (verificado en servidor si se envía)
 
     class Config:
         from_attributes = True
@@ -657,6 +659,18 @@ class SerializedEntry(BaseModel):
     imeis: List[str]
     cost: Optional[Decimal] = Decimal("0.0000")
 
+class SerialValidationRequest(BaseModel):
+    serials: List[str]
+    product_id: Optional[int] = None  # Si se indica, el serial debe ser de este producto
+
+class SerialValidationResult(BaseModel):
+    serial: str
+    valid: bool
+    message: str
+    instance_id: Optional[int] = None
+    status: Optional[str] = None
+    warehouse_id: Optional[int] = None
+
 # Currency Schemas
 class CurrencyBase(BaseModel):
     name: str
@@ -697,11 +711,18 @@ class KardexRead(BaseModel):
     quantity: Decimal
     balance_after: Decimal
     description: Optional[str] = None
+    warehouse_id: Optional[int] = None
+    warehouse_balance: Optional[Decimal] = None
     product: Optional['ProductRead'] = None
     
     class Config:
         from_attributes = True
 
+class StockAsOfRead(BaseModel):
+    product_id: int
+    warehouse_id: Optional[int] = None
+    quantity: Decimal
+
 # Category Schemas
 class CategoryBase(BaseModel):
     name: str
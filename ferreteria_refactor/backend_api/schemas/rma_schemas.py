@@ -14,7 +14,11 @@ class RMAAction(str, Enum):
     STORE_CREDIT = "STORE_CREDIT"
     REPLACEMENT = "REPLACEMENT"
 
+class RMACheckBatchRequest(BaseModel):
+    imeis: List[str]
+
 class RMACheckResponse(BaseModel):
+    imei: Optional[str] = None
     valid: bool
     message: str
     sale_date: Optional[datetime] = None
@@ -22,6 +26,7 @@ class RMACheckResponse(BaseModel):
     product_name: Optional[str] = None
     days_elapsed: Optional[int] = None
     warranty_status: str # ACTIVE, EXPIRED, NOT_FOUND
+    warranty_expiration_date: Optional[datetime] = None
     original_price: Optional[Decimal] = None
     
 class RMAProcessRequest(BaseModel):
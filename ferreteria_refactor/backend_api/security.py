@@ -1,11 +1,24 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
 # Hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max = default: cualquier hash con otro work factor se marca para re-hash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# Pool acotado para bcrypt: el trabajo de CPU no bloquea el event loop
+# ni compite con el threadpool general de FastAPI
+_hash_executor = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="pwd-hash")
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +26,22 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y retorna (valido, nuevo_hash).
+    nuevo_hash no es None si el hash guardado usa otro work factor y debe reemplazarse.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password ejecutado en el pool de hashing."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_and_update_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,235 @@
+"""
+Customer Credit State Service
+Exposición de crédito materializada por cliente (tabla customer_credit_state):
+
+- Saldo pendiente, facturas abiertas y vencimiento más antiguo por cliente
+- Se actualiza en la misma transacción cada vez que una factura a crédito cambia
+  (venta, abono, pago FIFO, devolución, edición) mediante eventos del mapper de Sale
+- La validación de crédito de una venta es una lectura por PK bajo bloqueo de fila
+- verify() compara contra un recálculo completo (ver scripts/verify_credit_state.py)
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, event, false, func, insert, select, true, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import models
+
+# Atributos de Sale que afectan la exposición de crédito
+_TRACKED = ("customer_id", "is_credit", "paid", "balance_pending", "due_date")
+
+# Tolerancia para comparar saldos en verify()
+_BALANCE_TOLERANCE = Decimal("0.005")
+
+
+def _open_credit_filter(Sale=models.Sale):
+    return and_(Sale.is_credit == true(), Sale.paid == false(), Sale.customer_id.isnot(None))
+
+
+def _recompute_query(customer_id: Optional[int] = None):
+    Sale = models.Sale
+    query = select(
+        Sale.customer_id,
+        func.coalesce(func.sum(Sale.balance_pending), 0).label("outstanding_balance"),
+        func.count(Sale.id).label("open_invoices"),
+        func.min(Sale.due_date).label("oldest_due_date"),
+    ).where(_open_credit_filter()).group_by(Sale.customer_id)
+    if customer_id is not None:
+        query = query.where(Sale.customer_id == customer_id)
+    return query
+
+
+def _recompute(connection, customer_id: int) -> dict:
+    row = connection.execute(_recompute_query(customer_id)).first()
+    if row is None:
+        return {"outstanding_balance": Decimal("0"), "open_invoices": 0, "oldest_due_date": None}
+    return {
+        "outstanding_balance": Decimal(str(row.outstanding_balance)),
+        "open_invoices": row.open_invoices,
+        "oldest_due_date": row.oldest_due_date,
+    }
+
+
+class CreditStateService:
+    """Lectura, bloqueo y verificación de customer_credit_state."""
+
+    @staticmethod
+    def get_state(db: Session, customer_id: int, for_update: bool = False) -> models.CustomerCreditState:
+        """
+        Retorna el estado del cliente (lo crea desde las facturas si no existe).
+        Con for_update=True bloquea la fila hasta el fin de la transacción (SELECT ... FOR UPDATE),
+        serializando ventas a crédito concurrentes del mismo cliente.
+        """
+        State = models.CustomerCreditState
+        query = db.query(State).filter(State.customer_id == customer_id).populate_existing()
+        if for_update:
+            query = query.with_for_update()
+        state = query.first()
+        if state is not None:
+            return state
+
+        # Primera consulta del cliente: materializar desde las facturas
+        values = _recompute(db.connection(), customer_id)
+        try:
+            with db.begin_nested():
+                db.execute(insert(State).values(customer_id=customer_id, updated_at=datetime.now(), **values))
+        except IntegrityError:
+            pass  # Otra transacción lo creó primero
+        return query.first()
+
+    @staticmethod
+    def overdue_summary(db: Session, customer_id: int, now: datetime = None):
+        """(cantidad, monto) de facturas vencidas. Solo consulta sales si hay alguna vencida."""
+        now = now or datetime.now()
+        state = CreditStateService.get_state(db, customer_id)
+        if state.oldest_due_date is None or state.oldest_due_date >= now:
+            return 0, Decimal("0")
+        count, amount = db.query(
+            func.count(models.Sale.id), func.coalesce(func.sum(models.Sale.balance_pending), 0)
+        ).filter(
+            _open_credit_filter(),
+            models.Sale.customer_id == customer_id,
+            models.Sale.due_date < now
+        ).one()
+        return count, Decimal(str(amount))
+
+    @staticmethod
+    def verify(db: Session, fix: bool = False):
+        """
+        Compara customer_credit_state contra un recálculo completo desde sales.
+
+        Returns:
+            Lista de diferencias [{customer_id, stored, expected}]. Con fix=True las corrige.
+        """
+        State = models.CustomerCreditState
+        expected = {
+            row.customer_id: {
+                "outstanding_balance": Decimal(str(row.outstanding_balance)),
+                "open_invoices": row.open_invoices,
+                "oldest_due_date": row.oldest_due_date,
+            }
+            for row in db.execute(_recompute_query())
+        }
+        empty = {"outstanding_balance": Decimal("0"), "open_invoices": 0, "oldest_due_date": None}
+
+        mismatches = []
+        stored_ids = set()
+        for state in db.query(State).all():
+            stored_ids.add(state.customer_id)
+            stored = {
+                "outstanding_balance": Decimal(str(state.outstanding_balance)),
+                "open_invoices": state.open_invoices,
+                "oldest_due_date": state.oldest_due_date,
+            }
+            wanted = expected.get(state.customer_id, empty)
+            if (
+                abs(stored["outstanding_balance"] - wanted["outstanding_balance"]) > _BALANCE_TOLERANCE
+                or stored["open_invoices"] != wanted["open_invoices"]
+                or stored["oldest_due_date"] != wanted["oldest_due_date"]
+            ):
+                mismatches.append({"customer_id": state.customer_id, "stored": stored, "expected": wanted})
+                if fix:
+                    for key, value in wanted.items():
+                        setattr(state, key, value)
+
+        # Clientes con facturas abiertas pero sin fila de estado
+        for customer_id, wanted in expected.items():
+            if customer_id not in stored_ids:
+                mismatches.append({"customer_id": customer_id, "stored": None, "expected": wanted})
+                if fix:
+                    db.add(State(customer_id=customer_id, **wanted))
+
+        if fix and mismatches:
+            db.commit()
+        return mismatches
+
+
+# --- Mantenimiento incremental ---
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[attr].value
+
+
+def _open_amount(customer_id, is_credit, paid, balance_pending):
+    """Aporte de una factura a la exposición: None si no está abierta."""
+    if not customer_id or not is_credit or paid is None or paid:
+        return None
+    return Decimal(str(balance_pending or 0))
+
+
+def _apply_delta(connection, customer_id, balance_delta, invoices_delta, due_changed):
+    State = models.CustomerCreditState
+    values = {
+        "outstanding_balance": State.outstanding_balance + balance_delta,
+        "open_invoices": State.open_invoices + invoices_delta,
+        "updated_at": datetime.now(),
+    }
+    if due_changed:
+        values["oldest_due_date"] = (
+            select(func.min(models.Sale.due_date))
+            .where(_open_credit_filter(), models.Sale.customer_id == customer_id)
+            .scalar_subquery()
+        )
+    result = connection.execute(update(State).where(State.customer_id == customer_id).values(**values))
+    if result.rowcount == 0:
+        # Sin estado previo: materializar (la factura ya está escrita en esta transacción)
+        connection.execute(insert(State).values(
+            customer_id=customer_id, updated_at=datetime.now(), **_recompute(connection, customer_id)
+        ))
+
+
+def _sale_changed(connection, old, new):
+    """old/new = (customer_id, is_credit, paid, balance_pending, due_date) o None."""
+    old_amount = _open_amount(*old[:4]) if old else None
+    new_amount = _open_amount(*new[:4]) if new else None
+    if old_amount is None and new_amount is None:
+        return  # Venta de contado: sin costo adicional
+
+    old_customer = old[0] if old_amount is not None else None
+    new_customer = new[0] if new_amount is not None else None
+    if old_customer == new_customer:
+        due_changed = old[4] != new[4] if old and new else True
+        _apply_delta(
+            connection, new_customer,
+            new_amount - old_amount, 0, due_changed
+        )
+        return
+    if old_customer is not None:
+        _apply_delta(connection, old_customer, -old_amount, -1, True)
+    if new_customer is not None:
+        _apply_delta(connection, new_customer, new_amount, 1, True)
+
+
+def _snapshot(target):
+    return tuple(getattr(target, attr) for attr in _TRACKED)
+
+
+@event.listens_for(models.Sale, "after_insert")
+def _sale_inserted(mapper, connection, target):
+    _sale_changed(connection, None, _snapshot(target))
+
+
+@event.listens_for(models.Sale, "after_delete")
+def _sale_deleted(mapper, connection, target):
+    _sale_changed(connection, _snapshot(target), None)
+
+
+@event.listens_for(models.Sale, "after_update")
+def _sale_updated(mapper, connection, target):
+    state = getattr(target, "_sa_instance_state")
+    if not any(state.attrs[attr].history.has_changes() for attr in _TRACKED):
+        return
+    old = tuple(_old_value(state, attr) for attr in _TRACKED)
+    _sale_changed(connection, old, _snapshot(target))
+
+
+# Cargar el valor anterior al asignar, aunque el atributo estuviera expirado,
+# para que el delta de after_update sea exacto.
+for _attr in _TRACKED:
+    event.listen(getattr(models.Sale, _attr), "set", lambda *args: None, active_history=True)
@@ -0,0 +1,311 @@
+"""
+Effective Price Service
+Precio de venta efectivo materializado (tabla effective_prices):
+
+- Una fila por (producto, presentación, lista de precios, escalón de cantidad) con el precio
+  de lista, el descuento activo, el precio final y el impuesto incluido
+- Se recalcula con un INSERT ... SELECT ... ON CONFLICT DO UPDATE limitado a los productos
+  modificados, al confirmar la transacción que cambió el catálogo (producto, presentación,
+  precio de lista, regla de precio o lista de precios)
+- Comparte versiones con product_price_table: el POS descarga solo el delta
+  (GET /price-lists/effective-prices?since=N)
+- create_sale resuelve los precios de todo el carrito en una sola consulta (lookup)
+"""
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean, Integer, Numeric, case, cast, delete, event, func, literal, null, or_, select,
+    true, tuple_
+)
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .price_table_service import PriceTableService, _dialect_insert, latest_product_prices
+
+COLUMNS = [
+    "product_id", "unit_id", "price_list_id", "min_quantity", "conversion_factor", "price",
+    "discount_percentage", "final_price", "tax_amount", "price_mayor_1", "price_mayor_2",
+    "requires_auth"
+]
+
+# Atributos de Product que cambian algún precio
+_PRODUCT_ATTRS = (
+    "price", "price_mayor_1", "price_mayor_2", "discount_percentage", "is_discount_active",
+    "tax_rate", "is_active", "exchange_rate_id", "units", "prices", "price_rules"
+)
+_PRICE_LIST_ATTRS = ("requires_auth", "is_active")
+
+# Claves en session.info para los cambios pendientes de la transacción
+_PENDING_KEY = "effective_prices_pending"
+_FULL_KEY = "effective_prices_full"
+# Con más productos que esto, un recálculo completo es más barato (y evita listas IN enormes)
+_FULL_REBUILD_AT = 2000
+
+
+class EffectivePriceService:
+
+    @staticmethod
+    def _source(product_ids: Iterable[int] = None):
+        """SELECT con las columnas de origen de cada fila (antes de aplicar descuento e impuesto)."""
+        P, U, PP, PL, R = (
+            models.Product, models.ProductUnit, models.ProductPrice, models.PriceList, models.PriceRule
+        )
+        zero_id = literal(0, Integer)
+        no_tier = literal(0, Numeric(12, 3))
+        base_factor = literal(1, Numeric(14, 4))
+        no_discount = literal(0, Numeric(5, 2))
+        no_auth = literal(False, Boolean)
+        no_price = cast(null(), Numeric(18, 4))
+        tax = func.coalesce(P.tax_rate, 0)
+        product_discount = case(
+            (P.is_discount_active == True, func.coalesce(P.discount_percentage, 0)), else_=0
+        )
+
+        base = select(
+            P.id.label("product_id"),
+            zero_id.label("unit_id"),
+            zero_id.label("price_list_id"),
+            no_tier.label("min_quantity"),
+            base_factor.label("conversion_factor"),
+            P.price.label("price"),
+            product_discount.label("discount_percentage"),
+            tax.label("tax_rate"),
+            P.price_mayor_1.label("price_mayor_1"),
+            P.price_mayor_2.label("price_mayor_2"),
+            no_auth.label("requires_auth"),
+        )
+
+        # Presentación: precio propio o precio base x factor; descuento propio o el del producto
+        units = select(
+            P.id, U.id, zero_id, no_tier, U.conversion_factor,
+            case((U.price_usd > 0, U.price_usd), else_=P.price * U.conversion_factor),
+            case(
+                (U.is_discount_active == True, func.coalesce(U.discount_percentage, 0)),
+                else_=product_discount
+            ),
+            tax,
+            P.price_mayor_1 * U.conversion_factor,
+            P.price_mayor_2 * U.conversion_factor,
+            no_auth,
+        ).join(U, U.product_id == P.id)
+
+        # Listas de precio: precio fijo por unidad base (sin descuento promocional)
+        list_join = (PP, PP.product_id == P.id), (PL, PL.id == PP.price_list_id)
+        list_filter = (PP.id.in_(latest_product_prices()), PL.is_active == True)
+        price_lists = select(
+            P.id, zero_id, PP.price_list_id, no_tier, base_factor, PP.price,
+            no_discount, tax, no_price, no_price, func.coalesce(PL.requires_auth, False),
+        ).join(*list_join[0]).join(*list_join[1]).where(*list_filter)
+
+        unit_price_lists = select(
+            P.id, U.id, PP.price_list_id, no_tier, U.conversion_factor, PP.price * U.conversion_factor,
+            no_discount, tax, no_price, no_price, func.coalesce(PL.requires_auth, False),
+        ).join(U, U.product_id == P.id).join(*list_join[0]).join(*list_join[1]).where(*list_filter)
+
+        # Escalones por cantidad (PriceRule, en unidades base del precio general)
+        tiers = select(
+            R.product_id.label("product_id"),
+            R.min_quantity.label("min_quantity"),
+            func.min(R.price).label("price"),
+        ).where(R.min_quantity > 0).group_by(R.product_id, R.min_quantity).subquery("tiers")
+        rules = select(
+            P.id, zero_id, zero_id, tiers.c.min_quantity, base_factor, tiers.c.price,
+            no_discount, tax, no_price, no_price, no_auth,
+        ).join(tiers, tiers.c.product_id == P.id)
+
+        parts = [base, units, price_lists, unit_price_lists, rules]
+        parts = [part.where(P.is_active == True) for part in parts]
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            parts = [part.where(P.id.in_(product_ids)) for part in parts]
+
+        return parts[0].union_all(*parts[1:]).subquery("effective_source")
+
+    @staticmethod
+    def rebuild(db: Session, product_ids: Iterable[int] = None, full: bool = False,
+                version: models.PriceTableVersion = None) -> models.PriceTableVersion:
+        """
+        Recalcula effective_prices (toda la tabla o solo `product_ids`) en una sentencia.
+        Las filas cambiadas reciben `version` (se crea una si no se indica).
+        No hace commit: el llamador decide la transacción.
+        """
+        E = models.EffectivePrice
+        if version is None:
+            version = models.PriceTableVersion(is_full=full, rows_changed=0)
+            db.add(version)
+            db.flush()
+        if product_ids is not None:
+            product_ids = list(product_ids)
+
+        source = EffectivePriceService._source(None if full else product_ids)
+        final_price = func.round(source.c.price * (100 - source.c.discount_percentage) / 100, 4)
+        tax_amount = func.round(final_price - final_price * 100 / (100 + source.c.tax_rate), 4)
+        query = select(
+            source.c.product_id,
+            source.c.unit_id,
+            source.c.price_list_id,
+            source.c.min_quantity,
+            source.c.conversion_factor,
+            source.c.price,
+            source.c.discount_percentage,
+            final_price,
+            source.c.tax_rate,
+            tax_amount,
+            source.c.price_mayor_1,
+            source.c.price_mayor_2,
+            source.c.requires_auth,
+            literal(version.id, Integer),
+        ).where(source.c.price.isnot(None), true())
+
+        insert = _dialect_insert(db)
+        stmt = insert(E).from_select(
+            ["product_id", "unit_id", "price_list_id", "min_quantity", "conversion_factor", "price",
+             "discount_percentage", "final_price", "tax_rate", "tax_amount", "price_mayor_1",
+             "price_mayor_2", "requires_auth", "version"],
+            query
+        )
+        updatable = ("conversion_factor", "price", "discount_percentage", "final_price", "tax_rate",
+                     "tax_amount", "price_mayor_1", "price_mayor_2", "requires_auth")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[E.product_id, E.unit_id, E.price_list_id, E.min_quantity],
+            set_={**{col: stmt.excluded[col] for col in updatable}, "version": stmt.excluded.version},
+            where=or_(*[getattr(E, col).is_distinct_from(stmt.excluded[col]) for col in updatable])
+        )
+        changed = db.execute(stmt).rowcount or 0
+
+        # Filas sin origen (producto inactivo, presentación/regla/precio de lista eliminados)
+        if full or product_ids is not None:
+            keys = select(source.c.product_id, source.c.unit_id, source.c.price_list_id, source.c.min_quantity)
+            orphans = delete(E).where(~tuple_(E.product_id, E.unit_id, E.price_list_id, E.min_quantity).in_(keys))
+            if not full:
+                orphans = orphans.where(E.product_id.in_(product_ids))
+            deleted = db.execute(orphans).rowcount or 0
+            if deleted:
+                version.is_full = True
+                changed += deleted
+
+        version.rows_changed = (version.rows_changed or 0) + changed
+        db.flush()
+        return version
+
+    @staticmethod
+    def refresh_catalog(db: Session, product_ids: Iterable[int] = None, full: bool = False):
+        """Recalcula ambas tablas de precios para un cambio de catálogo, bajo una sola versión."""
+        if product_ids is not None:
+            product_ids = sorted(product_ids)
+            if not product_ids and not full:
+                return None
+            if len(product_ids) > _FULL_REBUILD_AT:
+                product_ids, full = None, True
+        version = PriceTableService.rebuild(db, product_ids=product_ids, full=full)
+        return EffectivePriceService.rebuild(db, product_ids=product_ids, full=full, version=version)
+
+    @staticmethod
+    def ensure_built(db: Session):
+        """Construye la tabla completa si está vacía y hay productos (arranque / migración)."""
+        if db.query(models.EffectivePrice.id).first() is not None:
+            return
+        if db.query(models.Product.id).filter(models.Product.is_active == True).first() is None:
+            return
+        version = EffectivePriceService.rebuild(db, full=True)
+        version.is_full = True
+        db.commit()
+        print(f"[PRICES] Precios efectivos construidos (v{version.id}, {version.rows_changed} filas)")
+
+    @staticmethod
+    def lookup(db: Session, keys: Iterable[Tuple[int, int, int]]) -> Dict[Tuple[int, int, int], models.EffectivePrice]:
+        """
+        Precios sin escalón para un conjunto de claves (producto, presentación, lista) en una consulta.
+        Las claves sin fila (no construida, lista inactiva, producto fuera de la lista) no aparecen.
+        """
+        keys = list(set(keys))
+        if not keys:
+            return {}
+        E = models.EffectivePrice
+        rows = db.query(E).filter(
+            tuple_(E.product_id, E.unit_id, E.price_list_id).in_(keys),
+            E.min_quantity == 0
+        ).all()
+        return {(row.product_id, row.unit_id, row.price_list_id): row for row in rows}
+
+    @staticmethod
+    def get_table(db: Session, since: Optional[int] = None) -> dict:
+        """Tabla compacta (filas como listas) completa o incremental, igual que la tabla de precios."""
+        E, V = models.EffectivePrice, models.PriceTableVersion
+        current = PriceTableService.current_version(db)
+        last_full = db.query(func.max(V.id)).filter(V.is_full == True).scalar() or 0
+        full = since is None or since < last_full
+
+        query = select(
+            E.product_id, E.unit_id, E.price_list_id, E.min_quantity, E.conversion_factor, E.price,
+            E.discount_percentage, E.final_price, E.tax_amount, E.price_mayor_1, E.price_mayor_2,
+            E.requires_auth
+        ).order_by(E.product_id, E.unit_id, E.price_list_id, E.min_quantity)
+        if not full:
+            query = query.where(E.version > since)
+
+        def _num(value):
+            return float(value) if value is not None else None
+
+        return {
+            "version": current,
+            "full": full,
+            "columns": COLUMNS,
+            "rows": [
+                [r.product_id, r.unit_id, r.price_list_id, float(r.min_quantity), float(r.conversion_factor),
+                 float(r.price), float(r.discount_percentage), float(r.final_price), float(r.tax_amount),
+                 _num(r.price_mayor_1), _num(r.price_mayor_2), bool(r.requires_auth)]
+                for r in db.execute(query)
+            ]
+        }
+
+    @staticmethod
+    def mark_dirty(db: Session, product_ids: Iterable[int]):
+        """Registra productos modificados con UPDATE masivo (sin eventos del ORM)."""
+        db.info.setdefault(_PENDING_KEY, []).extend(product_ids)
+
+
+# --- Mantenimiento incremental ---
+
+def _changed(obj, attrs) -> bool:
+    state = getattr(obj, "_sa_instance_state")
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_catalog_changes(session, flush_context, instances):
+    pending = []
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.Product):
+            if obj in session.new or obj in session.deleted or _changed(obj, _PRODUCT_ATTRS):
+                pending.append(obj)  # Los nuevos aún no tienen id: se resuelve al confirmar
+        elif isinstance(obj, (models.ProductUnit, models.ProductPrice, models.PriceRule)):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            pending.append(obj.product_id or obj.product)
+        elif isinstance(obj, models.PriceList):
+            if obj in session.deleted or (obj in session.dirty and _changed(obj, _PRICE_LIST_ATTRS)):
+                session.info[_FULL_KEY] = True
+    if pending:
+        session.info.setdefault(_PENDING_KEY, []).extend(pending)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_effective_prices(session):
+    session.flush()  # Lo que commit() haría de todos modos; before_flush registra los cambios
+    if not session.info.get(_PENDING_KEY) and not session.info.get(_FULL_KEY):
+        return
+    pending = session.info.pop(_PENDING_KEY, [])
+    full = session.info.pop(_FULL_KEY, False)
+    product_ids = {getattr(p, "id", p) for p in pending if p is not None}
+    product_ids.discard(None)
+    EffectivePriceService.refresh_catalog(session, product_ids=None if full else product_ids, full=full)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_catalog_changes(session, previous_transaction):
+    if previous_transaction.parent is not None:
+        return  # Rollback de un savepoint: la transacción principal sigue viva
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_FULL_KEY, None)
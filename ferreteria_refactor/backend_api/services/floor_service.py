@@ -0,0 +1,166 @@
+"""
+Restaurant Floor State
+Estado del mapa de mesas en memoria (por proceso):
+
+- Una consulta agrupada da, por mesa: estado, orden abierta, cantidad de items,
+  total acumulado y la comanda pendiente más antigua
+- Los endpoints que cambian mesas, órdenes o items marcan sus mesas como desactualizadas
+  al confirmar (eventos de sesión); la siguiente lectura recarga solo esas mesas
+- Las lecturas sin cambios no consultan la BD. FLOOR_SNAPSHOT_TTL_SECONDS fuerza una
+  recarga completa periódica (cambios hechos por otro worker)
+"""
+import threading
+import time
+from itertools import chain
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, event, false, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.restaurant import (
+    RestaurantTable, RestaurantOrder, RestaurantOrderItem, OrderStatusDB, OrderItemStatusDB
+)
+from ..utils.time_utils import get_venezuela_now
+
+_CLOSED_ORDERS = (OrderStatusDB.PAID, OrderStatusDB.CANCELLED)
+_PENDING_ITEMS = (OrderItemStatusDB.PENDING, OrderItemStatusDB.SENT, OrderItemStatusDB.PREPARING)
+
+_TABLES_KEY = "floor_tables"
+_ORDERS_KEY = "floor_orders"
+_FULL_KEY = "floor_full"
+
+
+def _floor_query(table_ids: Iterable[int] = None, order_ids: Iterable[int] = None):
+    T, O, I = RestaurantTable, RestaurantOrder, RestaurantOrderItem
+    item_time = func.coalesce(I.created_at, O.created_at)
+    query = (
+        select(
+            T.id, T.name, T.zone, T.capacity, T.status,
+            func.max(O.id).label("open_order_id"),
+            func.count(I.id).label("item_count"),
+            func.coalesce(func.sum(I.subtotal), 0).label("running_total"),
+            func.min(case((I.status.in_(_PENDING_ITEMS), item_time))).label("oldest_pending_at"),
+        )
+        .outerjoin(O, and_(O.table_id == T.id, O.status.notin_(_CLOSED_ORDERS)))
+        .outerjoin(I, and_(I.order_id == O.id, I.status != OrderItemStatusDB.CANCELLED))
+        .where(T.is_active == True)
+        .group_by(T.id, T.name, T.zone, T.capacity, T.status)
+        .order_by(T.zone, T.id)
+    )
+    if table_ids is not None or order_ids is not None:
+        conditions = []
+        if table_ids:
+            conditions.append(T.id.in_(list(table_ids)))
+        if order_ids:
+            conditions.append(T.id.in_(select(O.table_id).where(O.id.in_(list(order_ids))).scalar_subquery()))
+        query = query.where(or_(*conditions)) if conditions else query.where(false())
+    return query
+
+
+def _to_state(row) -> dict:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "zone": row.zone,
+        "capacity": row.capacity,
+        "status": row.status.value if row.status else None,
+        "open_order_id": row.open_order_id,
+        "item_count": row.item_count,
+        "running_total": float(row.running_total or 0),
+        "oldest_pending_at": row.oldest_pending_at,
+    }
+
+
+class FloorState:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._stale_tables, self._stale_orders = set(), set()
+        self._full_reload = True
+
+    def mark_stale(self, table_ids=(), order_ids=(), full: bool = False):
+        with self._lock:
+            self._stale_tables.update(table_ids)
+            self._stale_orders.update(order_ids)
+            self._full_reload = self._full_reload or full
+
+    def _sync(self, db: Session):
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl
+            full = self._full_reload or self._tables is None or expired
+            tables, orders = self._stale_tables, self._stale_orders
+            self._stale_tables, self._stale_orders, self._full_reload = set(), set(), False
+        if not full and not tables and not orders:
+            return
+
+        if full:
+            snapshot = {row.id: _to_state(row) for row in db.execute(_floor_query())}
+            with self._lock:
+                self._tables, self._loaded_at = snapshot, time.monotonic()
+            return
+
+        rows = {row.id: _to_state(row) for row in db.execute(_floor_query(tables, orders))}
+        with self._lock:
+            for table_id in tables:
+                self._tables.pop(table_id, None)  # Mesa eliminada / desactivada
+            self._tables.update(rows)
+
+    def get(self, db: Session, zone: str = None) -> dict:
+        """Estado de todas las mesas activas; la antigüedad se calcula al momento de leer."""
+        self._sync(db)
+        now = get_venezuela_now()
+        with self._lock:
+            tables = [dict(t) for t in self._tables.values() if zone is None or t["zone"] == zone]
+        tables.sort(key=lambda t: (t["zone"] or "", t["id"]))
+        for table in tables:
+            oldest = table["oldest_pending_at"]
+            table["oldest_pending_age_seconds"] = int((now - oldest).total_seconds()) if oldest else None
+            table["oldest_pending_at"] = oldest.isoformat() if oldest else None
+        return {"generated_at": now.isoformat(), "tables": tables}
+
+
+floor_state = FloorState(settings.FLOOR_SNAPSHOT_TTL_SECONDS)
+
+
+# --- Invalidación al confirmar cambios ---
+
+def _history_values(obj, attr):
+    history = getattr(obj, "_sa_instance_state").attrs[attr].history
+    return [value for value in chain(history.deleted, history.unchanged, history.added) if value is not None]
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_floor_changes(session, flush_context, instances):
+    tables, orders = session.info.setdefault(_TABLES_KEY, set()), session.info.setdefault(_ORDERS_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, RestaurantTable):
+            if obj.id is None:
+                session.info[_FULL_KEY] = True
+            else:
+                tables.add(obj.id)
+        elif isinstance(obj, RestaurantOrder):
+            tables.update(_history_values(obj, "table_id"))  # Incluye la mesa anterior al mover
+        elif isinstance(obj, RestaurantOrderItem):
+            if obj.order_id is not None:
+                orders.update(_history_values(obj, "order_id"))
+            elif obj.order is not None and obj.order.table_id is not None:
+                tables.add(obj.order.table_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_floor_changes(session):
+    tables = session.info.pop(_TABLES_KEY, None)
+    orders = session.info.pop(_ORDERS_KEY, None)
+    full = session.info.pop(_FULL_KEY, False)
+    if tables or orders or full:
+        floor_state.mark_stale(tables or (), orders or (), full)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_floor_changes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        for key in (_TABLES_KEY, _ORDERS_KEY, _FULL_KEY):
+            session.info.pop(key, None)
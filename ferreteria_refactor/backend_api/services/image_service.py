@@ -0,0 +1,305 @@
+"""
+Product Image Service
+Procesamiento y almacenamiento de imágenes de productos:
+
+- Decodificar, redimensionar y codificar WebP corre en un pool de hilos acotado
+  (IMAGE_WORKERS), nunca en el event loop
+- Cada subida genera todos los tamaños de SIZES: "thumb" para la grilla del POS, "full" para detalle
+- Nombres con hash del contenido ({id}-{hash}.webp, {id}-{hash}.thumb.webp): la URL cambia
+  cuando cambia la imagen, así que esos archivos se sirven como immutable
+- Paquetes de miniaturas para la grilla del POS: varias imágenes en una respuesta,
+  cacheados en disco con la clave de los hashes del conjunto
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+from ..config import settings
+from ..models import models
+from ..utils.cache import TTLCache
+
+# Tamaño -> lado máximo en px (de mayor a menor: cada uno se reduce desde el anterior)
+SIZES = {"full": 800, "thumb": 160}
+QUALITY = {"full": 80, "thumb": 70}
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+URL_PREFIX = "/images/products/"
+
+_MISSING = object()
+_HASHED = re.compile(r"^(\d+)-([0-9a-f]{16})(?:\.([a-z]+))?\.webp$")
+
+
+def _images_dir() -> str:
+    if getattr(sys, 'frozen', False):
+        # FROZEN (PyInstaller): junto al ejecutable
+        return os.path.join(os.path.dirname(sys.executable), "data", "images", "products")
+    if os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true':
+        return "/app/data/images/products"
+    # Local development: .../backend_api/data/images/products
+    backend_api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(backend_api_dir, "data", "images", "products")
+
+
+IMAGES_DIR = _images_dir()
+if os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true':
+    PLACEHOLDER_PATH = "/app/ferreteria_refactor/backend_api/assets/placeholder.webp"
+else:
+    PLACEHOLDER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "placeholder.webp")
+
+os.makedirs(IMAGES_DIR, exist_ok=True)
+
+# Paquetes de miniaturas (fuera del directorio servido como estático)
+BUNDLES_DIR = os.path.join(os.path.dirname(IMAGES_DIR), "bundles")
+BUNDLE_MAGIC = b"IMGB"
+MAX_BUNDLE_IDS = 500
+MAX_CACHED_BUNDLES = 200
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+
+
+def file_name(product_id: int, digest: str, size: str = "full") -> str:
+    suffix = "" if size == "full" else f".{size}"
+    return f"{product_id}-{digest}{suffix}.webp"
+
+
+def render_sizes(contents: bytes) -> Dict[str, bytes]:
+    """Todos los tamaños de una imagen como WebP (uso intensivo de CPU: correr en el pool)."""
+    with Image.open(io.BytesIO(contents)) as source:
+        img = source.convert("RGB") if source.mode not in ("RGB", "L") else source.copy()
+
+    rendered = {}
+    for size, side in sorted(SIZES.items(), key=lambda s: -s[1]):
+        img.thumbnail((side, side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=QUALITY[size])
+        rendered[size] = buffer.getvalue()
+    return rendered
+
+
+def _write_atomic(path: str, data: bytes):
+    # Temporal único en el mismo directorio: varios hilos/workers pueden generar el mismo archivo
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)  # mkstemp crea con 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ImageService:
+    # (product_id, tamaño) -> ruta en disco o None (sin imagen / placeholder)
+    _paths = TTLCache(maxsize=8192, ttl=60)
+
+    @staticmethod
+    def write_sizes(product_id: int, contents: bytes) -> str:
+        """Genera y guarda todos los tamaños; devuelve el image_url (tamaño full)."""
+        digest = hashlib.sha256(contents).hexdigest()[:16]
+        for size, data in render_sizes(contents).items():
+            path = os.path.join(IMAGES_DIR, file_name(product_id, digest, size))
+            if not os.path.exists(path):  # Mismo hash: ya generado
+                _write_atomic(path, data)
+        return URL_PREFIX + file_name(product_id, digest)
+
+    @staticmethod
+    async def save(product_id: int, contents: bytes) -> str:
+        """write_sizes en el pool de imágenes (no bloquea el event loop)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, ImageService.write_sizes, product_id, contents)
+
+    @staticmethod
+    def url_for(image_url: Optional[str], size: str = "full") -> Optional[str]:
+        """URL de un tamaño; las imágenes anteriores (sin hash) solo tienen full."""
+        if not image_url:
+            return None
+        match = _HASHED.match(os.path.basename(image_url))
+        if match:
+            return URL_PREFIX + file_name(int(match.group(1)), match.group(2), size)
+        return image_url if size == "full" else None
+
+    @staticmethod
+    def remove(product_id: int, keep_url: str = None, names: Iterable[str] = None):
+        """Borra los archivos del producto (salvo los tamaños de keep_url); names: listado ya leído."""
+        keep = {os.path.basename(ImageService.url_for(keep_url, size)) for size in SIZES} if keep_url else set()
+        prefix = f"{product_id}-"
+        for name in (os.listdir(IMAGES_DIR) if names is None else names):
+            if name in keep:
+                continue
+            if name == f"{product_id}.webp" or (name.startswith(prefix) and _HASHED.match(name)):
+                try:
+                    os.remove(os.path.join(IMAGES_DIR, name))
+                except OSError:
+                    pass
+        ImageService.invalidate(product_id)
+
+    @staticmethod
+    def invalidate(product_id: int):
+        for size in SIZES:
+            ImageService._paths.pop((product_id, size), None)
+
+    @staticmethod
+    def resolve(db: Session, product_id: int, size: str = "full") -> Optional[str]:
+        """Ruta del archivo a servir; consulta la BD solo si no está en caché (o el archivo ya no existe)."""
+        key = (product_id, size)
+        path = ImageService._paths.get(key, _MISSING)
+        # El caché es por proceso: otro worker pudo borrar o reemplazar el archivo
+        if path is not _MISSING and (path is None or os.path.exists(path)):
+            return path
+
+        image_url = db.query(models.Product.image_url).filter(models.Product.id == product_id).scalar()
+        url = ImageService.url_for(image_url, size) or ImageService.url_for(image_url, "full")
+        path = os.path.join(IMAGES_DIR, os.path.basename(url)) if url else None
+        if path and not os.path.exists(path):
+            path = None
+        ImageService._paths.set(key, path)
+        return path
+
+    @staticmethod
+    def regenerate(db: Session, product_ids: Iterable[int] = None, force: bool = False) -> dict:
+        """
+        Genera los tamaños que falten (o todos con force) para productos con imagen.
+        Las imágenes anteriores ({id}.webp) pasan al esquema con hash. No hace commit.
+        """
+        query = db.query(models.Product.id, models.Product.image_url).filter(models.Product.image_url.isnot(None))
+        if product_ids is not None:
+            query = query.filter(models.Product.id.in_(list(product_ids)))
+
+        pending, missing_source = [], 0
+        for product_id, image_url in query:
+            source = os.path.join(IMAGES_DIR, os.path.basename(image_url))
+            if not os.path.exists(source):
+                missing_source += 1
+                continue
+            hashed = _HASHED.match(os.path.basename(image_url)) is not None
+            complete = hashed and all(
+                os.path.exists(os.path.join(IMAGES_DIR, os.path.basename(ImageService.url_for(image_url, size))))
+                for size in SIZES
+            )
+            if force or not complete:
+                pending.append((product_id, image_url, source))
+
+        def _process(item):
+            product_id, _, source = item
+            with open(source, "rb") as f:
+                return ImageService.write_sizes(product_id, f.read())
+
+        final_urls = dict(zip((item[0] for item in pending), _executor.map(_process, pending)))
+        updates = [
+            {"id": product_id, "image_url": final_urls[product_id]}
+            for product_id, old_url, _ in pending if final_urls[product_id] != old_url
+        ]
+        if updates:
+            db.execute(update(models.Product), updates)
+        names = os.listdir(IMAGES_DIR) if final_urls else []
+        for product_id, url in final_urls.items():
+            ImageService.remove(product_id, keep_url=url, names=names)  # Archivos anteriores / sin hash
+
+        return {"processed": len(pending), "renamed": len(updates), "missing_source": missing_source}
+
+    # --- Paquetes de miniaturas ---
+
+    @staticmethod
+    def pack(size: str, items: List[Tuple[int, bytes]], missing: List[int]) -> bytes:
+        """
+        Contenedor binario:
+            b"IMGB" | uint32 big-endian: largo del índice | índice JSON | imágenes concatenadas
+        Índice: {"size", "items": [[product_id, offset, length], ...], "missing": [ids]}
+        (offset relativo al inicio de las imágenes).
+        """
+        index, offset = [], 0
+        for product_id, data in items:
+            index.append([product_id, offset, len(data)])
+            offset += len(data)
+        header = json.dumps({"size": size, "items": index, "missing": missing}, separators=(",", ":")).encode()
+        return b"".join([BUNDLE_MAGIC, struct.pack(">I", len(header)), header] + [data for _, data in items])
+
+    @staticmethod
+    def bundle(db: Session, product_ids: Iterable[int], size: str = "thumb") -> Tuple[str, str, Optional[bytes]]:
+        """
+        Paquete de imágenes precalculadas para varios productos (una consulta).
+
+        Returns:
+            (clave/ETag, ruta del paquete en caché, contenido si no se pudo cachear)
+            La clave es el hash de (producto, hash de imagen) del conjunto: cambia si cambia alguna.
+        """
+        ids = sorted(set(product_ids))
+        urls = dict(db.query(models.Product.id, models.Product.image_url).filter(models.Product.id.in_(ids)))
+        entries, missing = [], []
+        for product_id in ids:
+            url = ImageService.url_for(urls.get(product_id), size)
+            match = _HASHED.match(os.path.basename(url)) if url else None
+            if match:
+                entries.append((product_id, match.group(2), os.path.join(IMAGES_DIR, os.path.basename(url))))
+            else:
+                missing.append(product_id)  # Sin imagen o imagen anterior sin miniatura
+
+        signature = f"{size}|" + ",".join(f"{pid}:{digest}" for pid, digest, _ in entries) \
+            + "|" + ",".join(map(str, missing))
+        key = hashlib.sha256(signature.encode()).hexdigest()[:24]
+        path = os.path.join(BUNDLES_DIR, f"{key}.bin")
+        if os.path.exists(path):
+            return key, path, None
+
+        items = []
+        for product_id, _, file_path in entries:
+            try:
+                with open(file_path, "rb") as f:
+                    items.append((product_id, f.read()))
+            except OSError:
+                missing.append(product_id)
+        content = ImageService.pack(size, items, sorted(missing))
+        if len(items) < len(entries):
+            return key, path, content  # Faltan archivos en disco: no cachear este paquete
+
+        os.makedirs(BUNDLES_DIR, exist_ok=True)
+        _write_atomic(path, content)
+        ImageService._prune_bundles()
+        return key, path, None
+
+    @staticmethod
+    def _prune_bundles():
+        names = [n for n in os.listdir(BUNDLES_DIR) if n.endswith(".bin")]
+        if len(names) <= MAX_CACHED_BUNDLES:
+            return
+        paths = sorted((os.path.join(BUNDLES_DIR, n) for n in names), key=os.path.getmtime)
+        for old_path in paths[:len(paths) - MAX_CACHED_BUNDLES]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+class ProductImageFiles(StaticFiles):
+    """/images/products: los archivos con hash se sirven immutable con ETag fuerte."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        match = _HASHED.match(os.path.basename(str(full_path)))
+        if not match:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        etag = f'"{match.group(2)}-{match.group(3) or "full"}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+        if etag in Headers(scope=scope).get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers,
+                            media_type="image/webp")
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Dict, Any
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, UploadFile
 import json
@@ -8,6 +9,9 @@ from decimal import Decimal
 from ..models import models
 from ..schemas import TransferPackageSchema, TransferItemSchema, TransferResultSchema
 from .. import schemas
+from .transfer_service import TransferService
+from .stock_ledger_service import StockLedgerService
+from .serial_intake_service import SerialIntakeService
 
 class InventoryService:
     
@@ -46,80 +50,68 @@ class InventoryService:
         """
         items_data: List of dicts like {'product_id': 1, 'quantity': 10}
         warehouse_id: Optional ID of the warehouse to deduct stock from
+        Productos y existencias se precargan (bloqueados, en orden de id) y se escriben en bloque.
         """
-        transfer_items = []
-        
-        for item in items_data:
-            pid = item['product_id']
-            qty = Decimal(str(item['quantity']))
-            
-            product = db.query(models.Product).filter(models.Product.id == pid).first()
+        quantities = TransferService.aggregate((item['product_id'], item['quantity']) for item in items_data)
+        product_ids = list(quantities)
+        Product = models.Product
+
+        products = {
+            row.id: {"name": row.name, "sku": row.sku, "stock": Decimal(str(row.stock or 0))}
+            for row in db.execute(
+                select(Product.id, Product.name, Product.sku, Product.stock)
+                .where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+            )
+        }
+        stocks = TransferService.lock_stocks(db, product_ids, [warehouse_id]) if warehouse_id else {}
+
+        # Validación completa antes de escribir
+        for pid, qty in quantities.items():
+            product = products.get(pid)
             if not product:
                 raise HTTPException(status_code=404, detail=f"Product ID {pid} not found")
-            
-            # Validate SKU
-            if not product.sku:
-                 raise HTTPException(status_code=400, detail=f"Product '{product.name}' (ID: {pid}) has no SKU. Transfer denied.")
-            
-            # --- WAREHOUSE SPECIFIC LOGIC ---
-            balance_after = product.stock # Default to global
-            
+            if not product["sku"]:
+                 raise HTTPException(status_code=400, detail=f"Product '{product['name']}' (ID: {pid}) has no SKU. Transfer denied.")
             if warehouse_id:
-                # Find Warehouse Stock
-                p_stock = db.query(models.ProductStock).filter(
-                    models.ProductStock.product_id == pid,
-                    models.ProductStock.warehouse_id == warehouse_id
-                ).first()
-                
-                if not p_stock:
-                    # Create if not exists (though for export usually implies it exists, but create 0 for consistency)
-                    p_stock = models.ProductStock(
-                        product_id=pid,
-                        warehouse_id=warehouse_id,
-                        quantity=Decimal("0.000")
-                    )
-                    db.add(p_stock)
-                    db.flush() # Get ID if needed, though we have obj
-                
-                # Check Local Stock
-                if p_stock.quantity < qty:
-                    raise HTTPException(status_code=400, detail=f"Insufficient stock in WAREHOUSE for '{product.name}'. Requested: {qty}, Available: {p_stock.quantity}")
-
-                # Deduct Local Stock
-                p_stock.quantity -= qty
-                
-                # Deduct Global Stock (to keep sync)
-                product.stock -= qty
-                balance_after = p_stock.quantity
-                
-            else:
+                available = stocks[(pid, warehouse_id)]["quantity"]
+                if available < qty:
+                    raise HTTPException(status_code=400, detail=f"Insufficient stock in WAREHOUSE for '{product['name']}'. Requested: {qty}, Available: {available}")
+            elif product["stock"] < qty:
                 # GLOBAL ONLY FALLBACK (Legacy)
-                if product.stock < qty:
-                    raise HTTPException(status_code=400, detail=f"Insufficient global stock for '{product.name}'. Requested: {qty}, Available: {product.stock}")
-                
-                product.stock -= qty
-                balance_after = product.stock
-            
-            # Create Kardex
-            kardex = models.Kardex(
-                product_id=product.id,
-                movement_type=models.MovementType.EXTERNAL_TRANSFER_OUT,
-                quantity=-qty,
-                balance_after=balance_after,
-                description=f"Transfer OUT to External (Generated package)",
-                warehouse_id=warehouse_id, # Link to warehouse if applicable
-                date=datetime.now()
-            )
-            db.add(kardex)
-            
-            # Add to transfer list
+                raise HTTPException(status_code=400, detail=f"Insufficient global stock for '{product['name']}'. Requested: {qty}, Available: {product['stock']}")
+
+        now = datetime.now()
+        kardex_rows, transfer_items = [], []
+        for pid, qty in quantities.items():
+            product = products[pid]
+            # Deduct Global Stock (to keep sync)
+            product["stock"] -= qty
+            balance_after = product["stock"]
+            if warehouse_id:
+                stock = stocks[(pid, warehouse_id)]
+                stock["quantity"] -= qty
+                balance_after = stock["quantity"]
+
+            kardex_rows.append({
+                "product_id": pid,
+                "movement_type": models.MovementType.EXTERNAL_TRANSFER_OUT,
+                "quantity": -qty,
+                "balance_after": balance_after,
+                "description": "Transfer OUT to External (Generated package)",
+                "warehouse_id": warehouse_id, # Link to warehouse if applicable
+                "date": now
+            })
             transfer_items.append({
-                "sku": product.sku,
+                "sku": product["sku"],
                 "quantity": float(qty), # Serialize as float for JSON
-                "name": product.name
+                "name": product["name"]
             })
-            
+
         try:
+            db.execute(update(Product), [{"id": pid, "stock": products[pid]["stock"]} for pid in product_ids])
+            if warehouse_id:
+                TransferService.write_stocks(db, stocks, [(pid, warehouse_id) for pid in product_ids])
+            StockLedgerService.append(db, kardex_rows)
             db.commit()
         except Exception as e:
             db.rollback()
@@ -129,7 +121,7 @@ class InventoryService:
         package = {
             "source_company": source_company,
             "source_warehouse_id": warehouse_id, # Include source metadata
-            "generated_at": datetime.now().isoformat(),
+            "generated_at": now.isoformat(),
             "items": transfer_items
         }
         
@@ -139,6 +131,7 @@ class InventoryService:
     def process_transfer_package(db: Session, file_content: bytes) -> Dict[str, Any]:
         """
         Parses JSON package and updates inventory (EXTERNAL_TRANSFER_IN).
+        Los SKUs se resuelven en una sola consulta; un movimiento de kardex por producto.
         """
         try:
             data = json.loads(file_content.decode('utf-8'))
@@ -152,11 +145,22 @@ class InventoryService:
         success_count = 0
         failure_count = 0
         errors = []
-        
+
+        Product = models.Product
+        skus = sorted({str(item["sku"]) for item in data["items"] if item.get("sku")})
+        products = {
+            row.sku: {"id": row.id, "stock": Decimal(str(row.stock or 0))}
+            for row in db.execute(
+                select(Product.id, Product.sku, Product.stock)
+                .where(Product.sku.in_(skus)).order_by(Product.id).with_for_update()
+            )
+        } if skus else {}
+
         # Process Items
+        received = {}  # product_id -> cantidad total
         for item in data["items"]:
             sku = item.get("sku")
-            qty = float(item.get("quantity", 0))
+            qty = Decimal(str(item.get("quantity", 0)))
             name = item.get("name", "Unknown")
             
             if not sku:
@@ -164,29 +168,31 @@ class InventoryService:
                 failure_count += 1
                 continue
                 
-            # Find Product by SKU
-            product = db.query(models.Product).filter(models.Product.sku == sku).first()
-            
+            product = products.get(str(sku))
             if product:
-                # Add Stock
-                product.stock += Decimal(str(qty))
-                
-                # Create Kardex
-                kardex = models.Kardex(
-                    product_id=product.id,
-                    movement_type=models.MovementType.EXTERNAL_TRANSFER_IN,
-                    quantity=qty,
-                    balance_after=product.stock,
-                    description=f"Transfer IN from {data.get('source_company', 'Unknown')}",
-                    date=datetime.now()
-                )
-                db.add(kardex)
+                product["stock"] += qty
+                received[product["id"]] = received.get(product["id"], Decimal(0)) + qty
                 success_count += 1
             else:
                 errors.append(f"SKU Not Found: {sku} ({name}) - Manual creation required")
                 failure_count += 1
-        
+
         try:
+            if received:
+                balances = {p["id"]: p["stock"] for p in products.values()}
+                now = datetime.now()
+                db.execute(update(Product), [{"id": pid, "stock": balances[pid]} for pid in received])
+                StockLedgerService.append(db, [
+                    {
+                        "product_id": pid,
+                        "movement_type": models.MovementType.EXTERNAL_TRANSFER_IN,
+                        "quantity": qty,
+                        "balance_after": balances[pid],
+                        "description": f"Transfer IN from {data.get('source_company', 'Unknown')}",
+                        "date": now
+                    }
+                    for pid, qty in received.items()
+                ])
             db.commit()
         except Exception as e:
             db.rollback()
@@ -201,113 +207,23 @@ class InventoryService:
     @staticmethod
     def process_bulk_entry(db: Session, entry_data: schemas.SerializedEntry) -> Dict[str, Any]:
         """
-        Efficiently processes mass entry of serialized items (IMEIs).
-        Uses bulk_save_objects for performance.
-        Agregates Kardex and Stock Updates.
+        Mass entry of serialized items (IMEIs).
+        Staging + set-based duplicate checks, see SerialIntakeService.
         """
-        # 1. Fetch Product
-        product = db.query(models.Product).filter(models.Product.id == entry_data.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        if not product.has_imei:
-            raise HTTPException(status_code=400, detail=f"Product '{product.name}' is not serialized (has_imei=False). Cannot add IMEIs.")
-
-        # 2. Check for Duplicates (Fast Pre-check)
-        existing_imeis = db.query(models.ProductInstance.serial_number).filter(
-            models.ProductInstance.serial_number.in_(entry_data.imeis)
-        ).all()
-        
-        if existing_imeis:
-            existing_list = [e[0] for e in existing_imeis]
-            raise HTTPException(status_code=400, detail=f"Duplicate IMEIs found in database: {existing_list[:5]}...")
-
-        # 3. Preparation for Bulk Insert
-        instances_to_create = []
-        now = datetime.now()
-        
-        for imei in entry_data.imeis:
-            instance = models.ProductInstance(
-                product_id=product.id,
-                warehouse_id=entry_data.warehouse_id,
-                serial_number=imei,
-                status=models.ProductInstanceStatus.AVAILABLE,
-                cost=entry_data.cost or product.cost_price,
-                created_at=now
-            )
-            instances_to_create.append(instance)
-            
-        # 4. Perform Bulk Insert
-        try:
-            db.bulk_save_objects(instances_to_create)
-        except Exception as e:
-             db.rollback()
-             raise HTTPException(status_code=500, detail=f"Bulk Insert Error: {str(e)}")
-
-        # 5. Update Numeric Stock (Hybrid Sync)
-        qty_added = Decimal(len(instances_to_create))
-        
-        # 5a. Update Global Stock
-        product.stock += qty_added
-        
-        # 5b. Update Warehouse Stock
-        p_stock = db.query(models.ProductStock).filter(
-            models.ProductStock.product_id == product.id,
-            models.ProductStock.warehouse_id == entry_data.warehouse_id
-        ).first()
-        
-        balance_after_wh = Decimal("0.00")
-        
-        if p_stock:
-            p_stock.quantity += qty_added
-            balance_after_wh = p_stock.quantity
-        else:
-            p_stock = models.ProductStock(
-                product_id=product.id,
-                warehouse_id=entry_data.warehouse_id,
-                quantity=qty_added
-            )
-            db.add(p_stock)
-            balance_after_wh = qty_added
-
-        # 6. Create AGGREGATED Kardex Entry (1 for 100 items)
-        kardex = models.Kardex(
-            product_id=product.id,
-            warehouse_id=entry_data.warehouse_id,
-            movement_type=models.MovementType.PURCHASE, # Or ADJUSTMENT_IN
-            quantity=qty_added,
-            balance_after=product.stock, # Global balance usually tracked here
-            description=f"Bulk Import ({int(qty_added)} Units). Ref: IMEIs {entry_data.imeis[0]}...{entry_data.imeis[-1]}",
-            date=now
-        )
-        db.add(kardex)
-        
+        result = SerialIntakeService.intake(db, entry_data)
         try:
             db.commit()
         except Exception as e:
             db.rollback()
             raise HTTPException(status_code=500, detail=f"Commit Error: {str(e)}")
-            
-        return {
-            "status": "success", 
-            "added_count": int(qty_added),
-            "new_stock_level": float(product.stock)
-        }
+        return result
 
     @staticmethod
     def validate_imei_availability(db: Session, product_id: int, imei: str) -> Dict[str, Any]:
         """
         Validates if an IMEI exists and is available for sale.
         """
-        instance = db.query(models.ProductInstance).filter(
-            models.ProductInstance.product_id == product_id,
-            models.ProductInstance.serial_number == imei
-        ).first()
-
-        if not instance:
-            return {"valid": False, "message": "Serial no encontrado en inventario."}
-        
-        if instance.status != models.ProductInstanceStatus.AVAILABLE:
-            return {"valid": False, "message": f"Serial no disponible (Estado: {instance.status})"}
-            
-        return {"valid": True, "message": "Serial válido", "instance_id": instance.id}
+        result = SerialIntakeService.validate(db, [imei], product_id=product_id)[0]
+        if not result["valid"]:
+            return {"valid": False, "message": result["message"]}
+        return {"valid": True, "message": result["message"], "instance_id": result["instance_id"]}
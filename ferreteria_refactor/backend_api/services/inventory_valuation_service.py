@@ -0,0 +1,191 @@
+"""
+Inventory Valuation Service
+Valuación del inventario (costo y valor de venta) actual o al cierre de un día:
+
+- Actual: un solo SELECT agregado sobre product_stocks + stock sin almacén
+  (products.stock - suma por almacén), igual que la conciliación del kardex
+- Histórica: existencias del libro de stock (foto de cierre + movimientos, ver
+  StockLedgerService.stock_as_of) valuadas al último costo de compra hasta esa fecha;
+  los productos sin compras usan su costo actual
+- Cierres de mes ya cerrados: el resultado se guarda en inventory_valuations y se reutiliza;
+  se invalida junto con las fotos de stock si llega un movimiento con fecha anterior
+- Desglose opcional por almacén o por categoría
+
+El valor de venta usa el precio del momento del cálculo (no hay historial de precios), igual
+que el costo de los productos sin compras. Un cierre de mes guardado conserva los precios y
+costos de cuando se calculó por primera vez; "priced_at" indica ese momento.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import case, func, null, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .stock_ledger_service import StockLedgerService
+
+ZERO = Decimal(0)
+HUNDRED = Decimal(100)
+GROUP_BY = ("warehouse", "category")
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _totals(products, units, cost, revenue) -> dict:
+    units, cost, revenue = _to_decimal(units), _to_decimal(cost), _to_decimal(revenue)
+    profit = revenue - cost
+    margin = (profit / revenue) * HUNDRED if revenue > 0 else ZERO
+    return {
+        "total_products": int(products or 0),
+        "total_stock_units": float(units),
+        "total_cost_usd": float(cost),
+        "total_revenue_usd": float(revenue),
+        "potential_profit_usd": float(profit),
+        "margin_percent": float(round(margin, 2))
+    }
+
+
+class InventoryValuationService:
+
+    @staticmethod
+    def is_closed_month_end(day: date, today: Optional[date] = None) -> bool:
+        """Último día de un mes que ya terminó (su valuación ya no cambia salvo movimientos atrasados)."""
+        return (day + timedelta(days=1)).day == 1 and day < (today or date.today())
+
+    @staticmethod
+    def current_lines(warehouse_id: Optional[int] = None):
+        """SELECT (product_id, warehouse_id, quantity) con la existencia actual."""
+        PS, P = models.ProductStock, models.Product
+        assigned = select(
+            PS.product_id.label("product_id"), PS.warehouse_id.label("warehouse_id"), PS.quantity.label("quantity")
+        )
+        if warehouse_id is not None:
+            return assigned.where(PS.warehouse_id == warehouse_id)
+
+        per_product = select(
+            PS.product_id, func.sum(PS.quantity).label("quantity")
+        ).group_by(PS.product_id).subquery("per_product")
+        unassigned = select(
+            P.id, null(),
+            func.coalesce(P.stock, 0) - func.coalesce(per_product.c.quantity, 0)
+        ).outerjoin(per_product, per_product.c.product_id == P.id)
+        return union_all(assigned, unassigned)
+
+    @staticmethod
+    def _aggregate(db: Session, lines, at: Optional[datetime], group_by: Optional[str]):
+        """
+        Un SELECT: existencia por producto (y almacén si se agrupa por almacén), solo positivas,
+        por costo y precio, agrupada por la clave pedida.
+        """
+        P, PI, PO = models.Product, models.PurchaseItem, models.PurchaseOrder
+        lines = lines.subquery("lines")
+        keys = [lines.c.product_id] + ([lines.c.warehouse_id] if group_by == "warehouse" else [])
+        stock = select(*keys, func.sum(lines.c.quantity).label("quantity")).group_by(*keys).subquery("stock")
+
+        if at is None:
+            cost = func.coalesce(P.cost_price, 0)
+        else:
+            # Costo de reposición vigente en esa fecha: la última compra anterior
+            last_cost = select(PI.unit_cost).join(PO, PO.id == PI.purchase_id).where(
+                PI.product_id == P.id, PI.unit_cost > 0, PO.purchase_date < at
+            ).order_by(PO.purchase_date.desc(), PI.id.desc()).limit(1).correlate(P).scalar_subquery()
+            cost = func.coalesce(last_cost, P.cost_price, 0)
+
+        quantity = case((stock.c.quantity > 0, stock.c.quantity), else_=0)
+        if group_by == "warehouse":
+            key = stock.c.warehouse_id
+        elif group_by == "category":
+            key = P.category_id
+        else:
+            key = null()
+        query = select(
+            key.label("key"),
+            func.count(stock.c.product_id).label("products"),
+            func.sum(quantity).label("units"),
+            func.sum(quantity * cost).label("cost"),
+            func.sum(quantity * func.coalesce(P.price, 0)).label("revenue")
+        ).join(P, P.id == stock.c.product_id).where(P.is_active == True)
+        if group_by is not None:
+            query = query.group_by(key)
+        return db.execute(query).all()
+
+    @staticmethod
+    def _group_names(db: Session, group_by: str, keys) -> dict:
+        model = models.Warehouse if group_by == "warehouse" else models.Category
+        ids = [k for k in keys if k is not None]
+        if not ids:
+            return {}
+        return dict(db.execute(select(model.id, model.name).where(model.id.in_(ids))).all())
+
+    @staticmethod
+    def compute(db: Session, as_of: Optional[date] = None, warehouse_id: Optional[int] = None,
+                group_by: Optional[str] = None) -> dict:
+        """
+        Valuación en USD.
+
+        Args:
+            as_of: Cierre de este día (None o día de hoy en adelante = existencia actual)
+            warehouse_id: Solo este almacén
+            group_by: None, "warehouse" o "category" (agrega "groups" al resultado)
+        """
+        if as_of is not None and as_of >= date.today():
+            as_of = None
+        if as_of is None:
+            at, lines = None, InventoryValuationService.current_lines(warehouse_id)
+        else:
+            at = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+            lines = StockLedgerService.stock_as_of(db, at, warehouse_id=warehouse_id)
+
+        total = InventoryValuationService._aggregate(db, lines, at, None)[0]
+        result = {
+            "as_of": as_of.isoformat() if as_of else None,
+            "priced_at": datetime.now().isoformat(timespec="seconds"),
+            **_totals(total.products, total.units, total.cost, total.revenue)
+        }
+        if group_by is None:
+            return result
+
+        rows = InventoryValuationService._aggregate(db, lines, at, group_by)
+        names = InventoryValuationService._group_names(db, group_by, [r.key for r in rows])
+        empty_name = "Sin almacén" if group_by == "warehouse" else "Sin categoría"
+        groups = [
+            {"id": r.key, "name": names.get(r.key, empty_name), **_totals(r.products, r.units, r.cost, r.revenue)}
+            for r in rows
+        ]
+        result["group_by"] = group_by
+        result["groups"] = sorted(groups, key=lambda g: -g["total_cost_usd"])
+        return result
+
+    @staticmethod
+    def valuation(db: Session, as_of: Optional[date] = None, warehouse_id: Optional[int] = None,
+                  group_by: Optional[str] = None, cache_db: Optional[Session] = None) -> dict:
+        """
+        compute() con caché permanente para cierres de mes ya cerrados (incluido el valor de venta
+        y el costo sin compras, con los precios de su "priced_at").
+        Se lee con `db` (réplica) y se guarda con `cache_db` (escritura); sin cache_db no se guarda.
+        """
+        if as_of is None or not InventoryValuationService.is_closed_month_end(as_of):
+            return InventoryValuationService.compute(db, as_of, warehouse_id, group_by)
+
+        V = models.InventoryValuation
+        scope = f"{group_by or 'total'}:{warehouse_id or '*'}"
+        cached = db.execute(
+            select(V.result).where(V.valuation_date == as_of, V.scope == scope).limit(1)
+        ).scalar()
+        if cached is not None:
+            return cached
+
+        result = InventoryValuationService.compute(db, as_of, warehouse_id, group_by)
+        if cache_db is not None:
+            try:
+                cache_db.add(V(valuation_date=as_of, scope=scope, result=result))
+                cache_db.commit()
+            except Exception as e:
+                cache_db.rollback()
+                print(f"[VALUATION] WARN: No se pudo guardar la valuación de {as_of} ({scope}): {e}")
+        return result
@@ -0,0 +1,346 @@
+"""
+Customer Ledger Service
+Estado de cuenta del cliente calculado en la base de datos:
+
+- Una sola consulta UNION ALL (facturas a crédito = débitos, abonos = créditos en USD)
+- Saldo corrido con SUM() OVER (ORDER BY fecha) en vez de acumular en Python
+- Paginación por cursor (keyset) y filtro por rango de fechas
+- Checkpoints de saldo cada LEDGER_CHECKPOINT_INTERVAL movimientos: el saldo de apertura
+  de una página solo suma los movimientos desde el checkpoint más cercano
+"""
+import base64
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    DateTime, Integer, Numeric, String, and_, case, cast, delete, event, func, literal, null, select, tuple_
+)
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.util import identity_key
+
+from ..config import settings
+from ..models import models
+
+# Orden del estado de cuenta: (fecha, factura, tipo, id). Los abonos usan la fecha de su
+# factura (SalePayment no tiene fecha propia) y van después de ella.
+KIND_SALE = 0
+KIND_PAYMENT = 1
+
+LedgerKey = Tuple[datetime, int, int, int]
+
+
+def _ledger_subquery(customer_id: int):
+    Sale, SalePayment = models.Sale, models.SalePayment
+
+    # Normalizar abono a USD (misma regla que el estado de cuenta original)
+    credit_usd = case(
+        (
+            and_(func.coalesce(SalePayment.currency, "") != "USD", SalePayment.exchange_rate > 0),
+            func.round(SalePayment.amount / SalePayment.exchange_rate, 2)
+        ),
+        else_=func.round(SalePayment.amount, 2)
+    )
+
+    debits = select(
+        Sale.date.label("date"),
+        Sale.id.label("sale_id"),
+        literal(KIND_SALE, Integer).label("kind"),
+        Sale.id.label("entry_id"),
+        Sale.total_amount.label("amount"),
+        cast(null(), String).label("currency"),
+        cast(null(), Numeric(18, 4)).label("original_amount"),
+        cast(null(), Numeric(14, 4)).label("exchange_rate"),
+    ).where(Sale.customer_id == customer_id, Sale.is_credit == True)
+
+    credits = select(
+        Sale.date,
+        Sale.id,
+        literal(KIND_PAYMENT, Integer),
+        SalePayment.id,
+        -credit_usd,
+        SalePayment.currency,
+        SalePayment.amount,
+        SalePayment.exchange_rate,
+    ).join(Sale, Sale.id == SalePayment.sale_id).where(
+        Sale.customer_id == customer_id, Sale.is_credit == True
+    )
+
+    return debits.union_all(credits).subquery("ledger")
+
+
+def _key_columns(ledger):
+    return (ledger.c.date, ledger.c.sale_id, ledger.c.kind, ledger.c.entry_id)
+
+
+def _key_values(key: LedgerKey):
+    date, sale_id, kind, entry_id = key
+    return tuple_(
+        literal(date, DateTime), literal(sale_id, Integer),
+        literal(kind, Integer), literal(entry_id, Integer)
+    )
+
+
+def encode_cursor(key: LedgerKey) -> str:
+    date, sale_id, kind, entry_id = key
+    raw = f"{date.isoformat()}|{sale_id}|{kind}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> LedgerKey:
+    try:
+        date, sale_id, kind, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(date), int(sale_id), int(kind), int(entry_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+class CustomerLedgerService:
+    """Estado de cuenta paginado con saldo corrido y checkpoints."""
+
+    _refreshing = set()
+    _refreshing_lock = threading.Lock()
+
+    @staticmethod
+    def _nearest_checkpoint(db: Session, customer_id: int, upto_key: LedgerKey = None,
+                            before_date: datetime = None):
+        CP = models.CustomerLedgerCheckpoint
+        query = db.query(CP).filter(CP.customer_id == customer_id)
+        if upto_key is not None:
+            query = query.filter(
+                tuple_(CP.entry_date, CP.sale_id, CP.entry_kind, CP.entry_id) <= _key_values(upto_key)
+            )
+        elif before_date is not None:
+            query = query.filter(CP.entry_date < before_date)
+        return query.order_by(
+            CP.entry_date.desc(), CP.sale_id.desc(), CP.entry_kind.desc(), CP.entry_id.desc()
+        ).first()
+
+    @staticmethod
+    def balance_before(db: Session, customer_id: int, upto_key: LedgerKey = None,
+                       before_date: datetime = None):
+        """
+        Saldo acumulado hasta `upto_key` (inclusive), antes de `before_date`,
+        o de toda la cuenta si no se indica ninguno.
+
+        Returns:
+            (saldo, movimientos escaneados desde el checkpoint)
+        """
+        checkpoint = CustomerLedgerService._nearest_checkpoint(db, customer_id, upto_key, before_date)
+        ledger = _ledger_subquery(customer_id)
+        key = tuple_(*_key_columns(ledger))
+
+        conditions = []
+        if checkpoint is not None:
+            conditions.append(key > _key_values(
+                (checkpoint.entry_date, checkpoint.sale_id, checkpoint.entry_kind, checkpoint.entry_id)
+            ))
+        if upto_key is not None:
+            conditions.append(key <= _key_values(upto_key))
+        elif before_date is not None:
+            conditions.append(ledger.c.date < before_date)
+
+        total, scanned = db.execute(
+            select(func.coalesce(func.sum(ledger.c.amount), 0), func.count()).where(*conditions)
+        ).one()
+        base = Decimal(str(checkpoint.balance)) if checkpoint is not None else Decimal("0")
+        return base + Decimal(str(total)), scanned
+
+    @staticmethod
+    def get_page(db: Session, customer_id: int, date_from: datetime = None, date_to: datetime = None,
+                 cursor: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Página del estado de cuenta en orden cronológico.
+
+        Args:
+            date_from: Movimientos desde esta fecha (inclusive)
+            date_to: Movimientos antes de esta fecha (exclusivo)
+            cursor: `next_cursor` de la página anterior
+            limit: Máximo de movimientos (None = todos)
+
+        Returns:
+            dict con entries, opening_balance, next_cursor y scanned
+            (movimientos sumados fuera de la página para el saldo de apertura)
+        """
+        ledger = _ledger_subquery(customer_id)
+        key_cols = _key_columns(ledger)
+        key = tuple_(*key_cols)
+
+        conditions = []
+        scanned = 0
+        opening = Decimal("0")
+        if cursor:
+            start_key = decode_cursor(cursor)
+            opening, scanned = CustomerLedgerService.balance_before(db, customer_id, upto_key=start_key)
+            conditions.append(key > _key_values(start_key))
+        elif date_from is not None:
+            opening, scanned = CustomerLedgerService.balance_before(db, customer_id, before_date=date_from)
+            conditions.append(ledger.c.date >= date_from)
+        if date_to is not None:
+            conditions.append(ledger.c.date < date_to)
+
+        running = func.sum(ledger.c.amount).over(order_by=key_cols, rows=(None, 0)).label("running")
+        page = select(ledger, running).where(*conditions).subquery("page")
+        query = select(page).order_by(page.c.date, page.c.sale_id, page.c.kind, page.c.entry_id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+
+        rows = db.execute(query).all()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor((last.date, last.sale_id, last.kind, last.entry_id))
+
+        entries = []
+        for row in rows:
+            amount = float(row.amount)
+            balance = opening + Decimal(str(row.running))
+            if row.kind == KIND_SALE:
+                entry_type, ref, debit, credit = "VENTA", f"Factura #{row.sale_id}", amount, 0.0
+            else:
+                ref = f"Abono a Fact. #{row.sale_id}"
+                if row.currency != "USD":
+                    rate = float(row.exchange_rate) if row.exchange_rate else 1.0
+                    ref += f" ({row.original_amount} {row.currency} @ {rate})"
+                entry_type, debit, credit = "ABONO", 0.0, -amount
+            entries.append({
+                "date": row.date.isoformat() if row.date else None,
+                "type": entry_type,
+                "ref": ref,
+                "debit": debit,
+                "credit": credit,
+                "balance": round(float(balance), 2)
+            })
+
+        return {
+            "entries": entries,
+            "opening_balance": round(float(opening), 2),
+            "next_cursor": next_cursor,
+            "scanned": scanned
+        }
+
+    @staticmethod
+    def needs_checkpoint(scanned: int) -> bool:
+        return scanned >= settings.LEDGER_CHECKPOINT_INTERVAL
+
+    @staticmethod
+    def refresh_checkpoints(customer_id: int, db: Session = None):
+        """
+        Agrega checkpoints desde el último existente hasta el final de la cuenta.
+        Pensado para BackgroundTasks: abre su propia sesión si no se pasa una.
+        """
+        with CustomerLedgerService._refreshing_lock:
+            if customer_id in CustomerLedgerService._refreshing:
+                return 0
+            CustomerLedgerService._refreshing.add(customer_id)
+
+        own_session = db is None
+        if own_session:
+            from ..database.db import SessionLocal
+            db = SessionLocal()
+        try:
+            interval = settings.LEDGER_CHECKPOINT_INTERVAL
+            last = CustomerLedgerService._nearest_checkpoint(db, customer_id)
+            base = Decimal(str(last.balance)) if last is not None else Decimal("0")
+            count = last.entry_count if last is not None else 0
+
+            ledger = _ledger_subquery(customer_id)
+            key_cols = _key_columns(ledger)
+            conditions = []
+            if last is not None:
+                conditions.append(tuple_(*key_cols) > _key_values(
+                    (last.entry_date, last.sale_id, last.entry_kind, last.entry_id)
+                ))
+            running = func.sum(ledger.c.amount).over(order_by=key_cols, rows=(None, 0)).label("running")
+            query = select(*key_cols, running).where(*conditions).order_by(*key_cols)
+
+            created = 0
+            for n, row in enumerate(db.execute(query.execution_options(yield_per=1000)), start=1):
+                if n % interval == 0 and row.date is not None:
+                    db.add(models.CustomerLedgerCheckpoint(
+                        customer_id=customer_id,
+                        entry_date=row.date,
+                        sale_id=row.sale_id,
+                        entry_kind=row.kind,
+                        entry_id=row.entry_id,
+                        balance=base + Decimal(str(row.running)),
+                        entry_count=count + n
+                    ))
+                    created += 1
+            if created:
+                db.commit()
+            return created
+        except Exception as e:
+            db.rollback()
+            print(f"[LEDGER] WARN: No se pudieron crear checkpoints del cliente {customer_id}: {e}")
+            return 0
+        finally:
+            if own_session:
+                db.close()
+            with CustomerLedgerService._refreshing_lock:
+                CustomerLedgerService._refreshing.discard(customer_id)
+
+
+# --- Invalidación de checkpoints ---
+# Un movimiento nuevo, editado o borrado con fecha anterior a un checkpoint lo deja
+# desactualizado: se eliminan los checkpoints del cliente desde esa fecha.
+
+def _invalidate_checkpoints(connection, customer_ids, since):
+    customer_ids = [c for c in customer_ids if c is not None]
+    if not customer_ids or since is None:
+        return
+    CP = models.CustomerLedgerCheckpoint
+    connection.execute(
+        delete(CP).where(CP.customer_id.in_(customer_ids), CP.entry_date >= since)
+    )
+
+
+def _history_values(target, attr):
+    history = getattr(target, "_sa_instance_state").attrs[attr].history
+    return [v for v in (history.added or ()) + (history.deleted or ()) + (history.unchanged or ())]
+
+
+@event.listens_for(models.Sale, "after_insert")
+@event.listens_for(models.Sale, "after_delete")
+def _sale_written(mapper, connection, target):
+    if target.is_credit and target.customer_id:
+        _invalidate_checkpoints(connection, [target.customer_id], target.date)
+
+
+@event.listens_for(models.Sale, "after_update")
+def _sale_updated(mapper, connection, target):
+    state = getattr(target, "_sa_instance_state")
+    relevant = ("date", "total_amount", "customer_id", "is_credit")
+    if not any(state.attrs[attr].history.has_changes() for attr in relevant):
+        return
+    if not any(_history_values(target, "is_credit")):
+        return
+    dates = [d for d in _history_values(target, "date") if d is not None]
+    _invalidate_checkpoints(connection, _history_values(target, "customer_id"), min(dates) if dates else None)
+
+
+@event.listens_for(models.SalePayment, "after_insert")
+@event.listens_for(models.SalePayment, "after_update")
+@event.listens_for(models.SalePayment, "after_delete")
+def _payment_written(mapper, connection, target):
+    # Evitar SELECT si la factura ya está en la sesión (caso normal en create_sale)
+    sale = target.__dict__.get("sale")
+    if sale is None:
+        session = object_session(target)
+        if session is not None:
+            sale = session.identity_map.get(identity_key(models.Sale, target.sale_id))
+    if sale is not None:
+        customer_id, is_credit, date = sale.customer_id, sale.is_credit, sale.date
+    else:
+        row = connection.execute(
+            select(models.Sale.customer_id, models.Sale.is_credit, models.Sale.date)
+            .where(models.Sale.id == target.sale_id)
+        ).first()
+        if row is None:
+            return
+        customer_id, is_credit, date = row
+    if is_credit and customer_id:
+        _invalidate_checkpoints(connection, [customer_id], date)
@@ -0,0 +1,133 @@
+"""
+Restaurant Menu Service
+Árbol del menú (secciones -> platos) para las tablets de los meseros:
+
+- Se arma con una sola consulta (sección + plato + producto) sin modelos Pydantic
+- Se guarda serializado junto con su ETag (hash del contenido)
+- La versión sube al confirmar cambios en secciones, platos o nombre/precio de productos;
+  MENU_CACHE_TTL_SECONDS acota lo que otro worker puede servir un menú ya cambiado
+"""
+import hashlib
+import json
+import threading
+from itertools import chain
+from typing import Tuple
+
+from sqlalchemy import and_, event, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.models import Product
+from ..models.restaurant import RestaurantMenuSection, RestaurantMenuItem
+from ..utils.cache import TTLCache
+
+# Atributos de Product que se muestran en el menú
+_PRODUCT_ATTRS = ("name", "price")
+_DIRTY_KEY = "menu_dirty"
+
+
+class MenuService:
+    _version = 1
+    _lock = threading.Lock()
+    _cache = TTLCache(maxsize=4, ttl=settings.MENU_CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def build_tree(db: Session) -> dict:
+        """Menú activo completo en una consulta (mismo formato que FullMenu)."""
+        S, I, P = RestaurantMenuSection, RestaurantMenuItem, Product
+        rows = db.execute(
+            select(
+                S.id.label("section_id"), S.name.label("section_name"),
+                S.sort_order.label("section_sort"), S.is_active.label("section_active"),
+                I.id.label("item_id"), I.product_id, I.alias, I.price_override,
+                I.sort_order.label("item_sort"), I.is_active.label("item_active"),
+                P.name.label("product_name"), P.price.label("product_price"),
+            )
+            .outerjoin(I, and_(I.section_id == S.id, I.is_active == True))
+            .outerjoin(P, P.id == I.product_id)
+            .where(S.is_active == True)
+            .order_by(S.sort_order, S.id, I.sort_order, I.id)
+        ).all()
+
+        sections, by_id = [], {}
+        for row in rows:
+            section = by_id.get(row.section_id)
+            if section is None:
+                section = by_id[row.section_id] = {
+                    "name": row.section_name,
+                    "sort_order": row.section_sort,
+                    "is_active": row.section_active,
+                    "id": row.section_id,
+                    "items": [],
+                }
+                sections.append(section)
+            if row.item_id is None:
+                continue
+
+            prod_name = row.product_name if row.product_name is not None else "Unknown"
+            final_price = row.price_override if row.price_override else (row.product_price or 0)
+            section["items"].append({
+                "product_id": row.product_id,
+                "alias": row.alias or prod_name,
+                "price_override": float(row.price_override) if row.price_override is not None else None,
+                "sort_order": row.item_sort,
+                "is_active": row.item_active,
+                "id": row.item_id,
+                "section_id": row.section_id,
+                "product_name": prod_name,
+                "price": float(final_price),
+            })
+        return {"sections": sections}
+
+    @staticmethod
+    def get_menu(db: Session) -> Tuple[int, str, bytes]:
+        """(versión, ETag, cuerpo JSON) del menú actual; solo consulta la BD si no está en caché."""
+        version = MenuService._version
+        cached = MenuService._cache.get(version)
+        if cached is not None:
+            return cached
+
+        body = json.dumps(MenuService.build_tree(db), separators=(",", ":")).encode()
+        etag = '"menu-%s"' % hashlib.sha1(body).hexdigest()[:20]
+        entry = (version, etag, body)
+        if version == MenuService._version:  # No guardar si cambió mientras se armaba
+            MenuService._cache.set(version, entry)
+        return entry
+
+    @staticmethod
+    def invalidate():
+        with MenuService._lock:
+            MenuService._version += 1
+        MenuService._cache.clear()
+
+
+# --- Invalidación al confirmar cambios ---
+
+@event.listens_for(Session, "before_flush")
+def _collect_menu_changes(session, flush_context, instances):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (RestaurantMenuSection, RestaurantMenuItem)):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+        elif isinstance(obj, Product):
+            if obj in session.new:
+                continue  # Aún no está en ningún plato
+            state = getattr(obj, "_sa_instance_state")
+            if obj in session.dirty and not any(state.attrs[a].history.has_changes() for a in _PRODUCT_ATTRS):
+                continue
+        else:
+            continue
+        session.info[_DIRTY_KEY] = True
+        return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_menu_version(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        MenuService.invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_menu_changes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_DIRTY_KEY, None)
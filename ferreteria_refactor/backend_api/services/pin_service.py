@@ -0,0 +1,127 @@
+"""
+PIN Verification Service
+Verificación rápida de PIN de supervisor (descuentos, anulaciones, listas de precio)
+con caché por usuario y bloqueo por intentos fallidos.
+"""
+import hashlib
+import hmac
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import models
+from ..utils.cache import TTLCache
+
+
+def _pin_digest(pin: str) -> bytes:
+    return hashlib.sha256(str(pin).encode("utf-8")).digest()
+
+
+class PinPrincipal:
+    """Datos mínimos del usuario que autoriza con PIN."""
+    __slots__ = ("id", "username", "role", "is_active", "pin_digest")
+
+    def __init__(self, user: models.User):
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+        self.is_active = user.is_active
+        self.pin_digest = _pin_digest(user.pin) if user.pin else None
+
+
+class PinVerifier:
+    """
+    Verificador de PIN memorizado por usuario.
+
+    - Cachea (id, rol, activo, digest del PIN) para no consultar `users` en cada autorización
+    - Cuenta intentos fallidos y bloquea al usuario PIN_LOCKOUT_SECONDS tras PIN_MAX_ATTEMPTS
+    - invalidate(user_id) al cambiar PIN, rol o estado del usuario
+    """
+
+    def __init__(self, max_attempts: int = None, lockout_seconds: int = None):
+        self.max_attempts = max_attempts or settings.PIN_MAX_ATTEMPTS
+        self.lockout_seconds = lockout_seconds or settings.PIN_LOCKOUT_SECONDS
+        self._principals = TTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+        self._failures = {}  # user_id -> (intentos, bloqueado_hasta)
+        self._lock = threading.Lock()
+
+    def get_principal(self, db: Session, user_id: int) -> Optional[PinPrincipal]:
+        principal = self._principals.get(user_id)
+        if principal is None:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+            if not user:
+                return None
+            principal = PinPrincipal(user)
+            self._principals.set(user_id, principal)
+        return principal
+
+    def check_lockout(self, user_id: int):
+        """Raises HTTPException 429 si el usuario está bloqueado por intentos fallidos."""
+        with self._lock:
+            attempts, locked_until = self._failures.get(user_id, (0, 0.0))
+            remaining = locked_until - time.monotonic()
+            if remaining <= 0 and locked_until:
+                # Bloqueo vencido: reiniciar contador
+                self._failures.pop(user_id, None)
+        if remaining > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"PIN bloqueado por intentos fallidos. Intente en {int(remaining) + 1} segundos."
+            )
+
+    def _register_failure(self, user_id: int):
+        with self._lock:
+            attempts, _ = self._failures.get(user_id, (0, 0.0))
+            attempts += 1
+            locked_until = time.monotonic() + self.lockout_seconds if attempts >= self.max_attempts else 0.0
+            self._failures[user_id] = (attempts, locked_until)
+
+    def _register_success(self, user_id: int):
+        with self._lock:
+            self._failures.pop(user_id, None)
+
+    def verify(self, db: Session, user_id: int, pin: str) -> Optional[PinPrincipal]:
+        """
+        Verifica el PIN del usuario.
+
+        Returns:
+            PinPrincipal si el PIN es correcto, None si es incorrecto
+
+        Raises:
+            HTTPException: 404 si no existe, 403 si está inactivo,
+                           400 si no tiene PIN, 429 si está bloqueado
+        """
+        self.check_lockout(user_id)
+
+        principal = self.get_principal(db, user_id)
+        if principal is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if not principal.is_active:
+            raise HTTPException(status_code=403, detail="User is inactive")
+        if principal.pin_digest is None:
+            raise HTTPException(
+                status_code=400,
+                detail="User does not have a PIN set. Please contact administrator."
+            )
+
+        if hmac.compare_digest(principal.pin_digest, _pin_digest(pin or "")):
+            self._register_success(user_id)
+            return principal
+
+        self._register_failure(user_id)
+        return None
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Invalida el PIN cacheado de un usuario (o de todos si user_id es None)."""
+        if user_id is None:
+            self._principals.clear()
+        else:
+            self._principals.pop(user_id)
+
+
+# Global instance
+pin_verifier = PinVerifier()
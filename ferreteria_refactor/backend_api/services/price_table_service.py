@@ -0,0 +1,214 @@
+"""
+Price Table Service
+Tabla de precios en moneda local (product_price_table) versionada:
+
+- Un solo INSERT ... SELECT ... ON CONFLICT DO UPDATE recalcula todas las filas que
+  dependen de una tasa (producto base, presentaciones y listas de precio)
+- Jerarquía de tasa igual al POS: Presentación > Producto > Tasa por defecto
+- Solo las filas cuyo precio cambió reciben la nueva versión, así los clientes
+  descargan únicamente el delta (GET /config/price-table?since=N)
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, literal, or_, select, true, tuple_, Integer
+from sqlalchemy.orm import Session
+
+from ..models import models
+
+COLUMNS = ["product_id", "unit_id", "price_list_id", "exchange_rate_id", "price_usd", "price_local"]
+
+
+def _dialect_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Tabla de precios no soportada en {dialect}")
+    return insert
+
+
+def latest_product_prices():
+    """Ids de ProductPrice vigentes: uno por (producto, lista), el último registrado."""
+    PP = models.ProductPrice
+    return select(func.max(PP.id)).group_by(PP.product_id, PP.price_list_id)
+
+
+class PriceTableService:
+
+    @staticmethod
+    def default_rate_id(db: Session) -> Optional[int]:
+        """Tasa por defecto en moneda local (la tasa USD por defecto no convierte nada)."""
+        ER = models.ExchangeRate
+        return db.query(ER.id).filter(
+            ER.is_default == True,
+            ER.is_active == True
+        ).order_by((ER.currency_code == "USD").asc(), ER.id).limit(1).scalar()
+
+    @staticmethod
+    def _source(default_rate_id: Optional[int], product_ids: Iterable[int] = None):
+        """SELECT con (producto, unidad, lista, tasa efectiva, precio USD) de los productos activos."""
+        P, U, PP = models.Product, models.ProductUnit, models.ProductPrice
+        default_rate = literal(default_rate_id, Integer)
+        product_rate = func.coalesce(P.exchange_rate_id, default_rate)
+
+        base = select(
+            P.id.label("product_id"),
+            literal(0, Integer).label("unit_id"),
+            literal(0, Integer).label("price_list_id"),
+            product_rate.label("exchange_rate_id"),
+            P.price.label("price_usd"),
+        ).where(P.is_active == True)
+
+        units = select(
+            P.id,
+            U.id,
+            literal(0, Integer),
+            func.coalesce(U.exchange_rate_id, P.exchange_rate_id, default_rate),
+            case((U.price_usd > 0, U.price_usd), else_=P.price * U.conversion_factor),
+        ).join(U, U.product_id == P.id).where(P.is_active == True)
+
+        price_lists = select(
+            P.id,
+            literal(0, Integer),
+            PP.price_list_id,
+            product_rate,
+            PP.price,
+        ).join(PP, PP.product_id == P.id).where(P.is_active == True, PP.id.in_(latest_product_prices()))
+
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            base = base.where(P.id.in_(product_ids))
+            units = units.where(P.id.in_(product_ids))
+            price_lists = price_lists.where(P.id.in_(product_ids))
+
+        return base.union_all(units, price_lists).subquery("price_source")
+
+    @staticmethod
+    def rebuild(db: Session, exchange_rate_id: int = None, product_ids: Iterable[int] = None,
+                full: bool = False) -> models.PriceTableVersion:
+        """
+        Recalcula la tabla de precios en una sola sentencia y registra una nueva versión.
+
+        Args:
+            exchange_rate_id: Solo filas cuya tasa efectiva es esta (cambio de tasa)
+            product_ids: Solo estos productos (cambios de catálogo)
+            full: Toda la tabla, eliminando filas huérfanas (cambio de tasa por defecto)
+
+        No hace commit: el llamador decide la transacción.
+        """
+        T, ER = models.ProductPriceTable, models.ExchangeRate
+        rate = db.get(ER, exchange_rate_id) if exchange_rate_id else None
+
+        version = models.PriceTableVersion(
+            exchange_rate_id=exchange_rate_id,
+            rate=rate.rate if rate else None,
+            is_full=full
+        )
+        db.add(version)
+        db.flush()
+
+        source = PriceTableService._source(
+            PriceTableService.default_rate_id(db), None if full else product_ids
+        )
+        query = select(
+            source.c.product_id,
+            source.c.unit_id,
+            source.c.price_list_id,
+            source.c.exchange_rate_id,
+            source.c.price_usd,
+            ER.rate,
+            func.round(source.c.price_usd * ER.rate, 4),
+            literal(version.id, Integer),
+        ).join(ER, ER.id == source.c.exchange_rate_id).where(true())
+        if exchange_rate_id is not None and not full:
+            query = query.where(source.c.exchange_rate_id == exchange_rate_id)
+
+        insert = _dialect_insert(db)
+        stmt = insert(T).from_select(
+            ["product_id", "unit_id", "price_list_id", "exchange_rate_id",
+             "price_usd", "rate", "price_local", "version"],
+            query
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[T.product_id, T.unit_id, T.price_list_id],
+            set_={
+                "exchange_rate_id": stmt.excluded.exchange_rate_id,
+                "price_usd": stmt.excluded.price_usd,
+                "rate": stmt.excluded.rate,
+                "price_local": stmt.excluded.price_local,
+                "version": stmt.excluded.version,
+            },
+            where=or_(
+                T.price_local.is_distinct_from(stmt.excluded.price_local),
+                T.price_usd.is_distinct_from(stmt.excluded.price_usd),
+                T.exchange_rate_id.is_distinct_from(stmt.excluded.exchange_rate_id),
+            )
+        )
+        changed = db.execute(stmt).rowcount or 0
+
+        # Filas sin origen (producto inactivo, presentación o precio de lista eliminados)
+        if full or product_ids is not None:
+            keys = select(source.c.product_id, source.c.unit_id, source.c.price_list_id)
+            orphans = delete(T).where(~tuple_(T.product_id, T.unit_id, T.price_list_id).in_(keys))
+            if not full:
+                orphans = orphans.where(T.product_id.in_(list(product_ids)))
+            deleted = db.execute(orphans).rowcount or 0
+            if deleted:
+                # Los clientes no reciben borrados en el delta: forzar descarga completa
+                version.is_full = True
+                changed += deleted
+
+        version.rows_changed = changed
+        db.flush()
+        return version
+
+    @staticmethod
+    def reprice_for_rate(db: Session, rate: models.ExchangeRate, defaults_changed: bool = False):
+        """Recalcula los precios que dependen de `rate` (toda la tabla si cambió la tasa por defecto)."""
+        if defaults_changed:
+            return PriceTableService.rebuild(db, exchange_rate_id=rate.id, full=True)
+        return PriceTableService.rebuild(db, exchange_rate_id=rate.id)
+
+    @staticmethod
+    def ensure_built(db: Session):
+        """Construye la tabla completa si nunca se ha generado (arranque / migración)."""
+        if db.query(models.PriceTableVersion.id).first() is None:
+            version = PriceTableService.rebuild(db, full=True)
+            version.is_full = True
+            db.commit()
+            print(f"[PRICES] Tabla de precios construida (v{version.id}, {version.rows_changed} filas)")
+
+    @staticmethod
+    def current_version(db: Session) -> int:
+        return db.query(func.max(models.PriceTableVersion.id)).scalar() or 0
+
+    @staticmethod
+    def get_table(db: Session, since: Optional[int] = None) -> dict:
+        """
+        Tabla compacta (filas como listas) completa o incremental.
+        Con `since` retorna solo las filas cambiadas después de esa versión, salvo que
+        haya habido una reconstrucción completa posterior.
+        """
+        T, V = models.ProductPriceTable, models.PriceTableVersion
+        current = PriceTableService.current_version(db)
+        last_full = db.query(func.max(V.id)).filter(V.is_full == True).scalar() or 0
+        full = since is None or since < last_full
+
+        query = select(
+            T.product_id, T.unit_id, T.price_list_id, T.exchange_rate_id, T.price_usd, T.price_local
+        ).order_by(T.product_id, T.unit_id, T.price_list_id)
+        if not full:
+            query = query.where(T.version > since)
+
+        return {
+            "version": current,
+            "full": full,
+            "columns": COLUMNS,
+            "rows": [
+                [r.product_id, r.unit_id, r.price_list_id, r.exchange_rate_id,
+                 float(r.price_usd), float(r.price_local)]
+                for r in db.execute(query)
+            ]
+        }
@@ -2,16 +2,55 @@
 Product Export Service
 Handles bulk product export to Excel and PDF
 """
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
 import pandas as pd
+from concurrent.futures import Future, ProcessPoolExecutor
 from io import BytesIO
 from datetime import date
-from typing import List
+from typing import Dict, Iterator, List, Optional
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
 from reportlab.lib.units import inch
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from ..config import settings
 from ..models import models
+from .image_service import IMAGES_DIR
+
+# PDF del catálogo: páginas de tamaño fijo, cacheadas en disco por versión del catálogo
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(IMAGES_DIR)), "exports")
+MAX_CACHED_EXPORTS = 5
+PDF_ROWS_PER_PAGE = 40
+PDF_WORKER_MIN_ROWS = 2000  # Desde aquí se genera en un proceso aparte
+PDF_MARGIN = 30
+PDF_HEADER = ['ID', 'Nombre', 'SKU', 'Precio', 'Stock', 'Categoría']
+PDF_COL_WIDTHS = [0.6*inch, 2.4*inch, 1.2*inch, 0.9*inch, 0.7*inch, 1.3*inch]
+PDF_TABLE_STYLE = TableStyle([
+    # Header
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+
+    # Body
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+])
+
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
 
 
 class ProductExportService:
@@ -82,94 +121,6 @@ class ProductExportService:
         buffer.seek(0)
         return buffer
     
-    @staticmethod
-    def export_to_pdf(products: List[models.Product], business_name: str = "Inventario") -> BytesIO:
-        """
-        Export products to PDF file
-        
-        Returns:
-            BytesIO buffer with PDF file
-        """
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#1a365d'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        
-        # Title
-        title = Paragraph(f"<b>{business_name}</b><br/>Reporte de Inventario", title_style)
-        elements.append(title)
-        
-        # Date
-        date_text = Paragraph(
-            f"<b>Fecha:</b> {date.today().strftime('%d/%m/%Y')}",
-            styles['Normal']
-        )
-        elements.append(date_text)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Prepare table data
-        table_data = [['ID', 'Nombre', 'SKU', 'Precio', 'Stock', 'Categoría']]
-        
-        for p in products:
-            table_data.append([
-                str(p.id),
-                p.name[:30] + '...' if len(p.name) > 30 else p.name,
-                p.sku or '-',
-                f"${p.price:.2f}",
-                f"{p.stock:.0f}",
-                (p.category.name[:15] if p.category else '-')
-            ])
-        
-        # Create table
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            # Header
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            
-            # Body
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        
-        elements.append(table)
-        
-        # Summary
-        elements.append(Spacer(1, 0.3*inch))
-        total_products = len(products)
-        total_stock = sum(p.stock for p in products)
-        total_value = sum(p.price * p.stock for p in products)
-        
-        summary = Paragraph(
-            f"<b>Resumen:</b> {total_products} productos | "
-            f"Stock total: {total_stock:.0f} unidades | "
-            f"Valor total: ${total_value:,.2f}",
-            styles['Normal']
-        )
-        elements.append(summary)
-        
-        # Build PDF
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer
-    
     @staticmethod
     def generate_template() -> BytesIO:
         """
@@ -268,3 +219,176 @@ Categoría: Ferretería
         
         buffer.seek(0)
         return buffer
+
+    # --- PDF del catálogo ---
+
+    @staticmethod
+    def pdf_totals(db: Session) -> dict:
+        """Totales del reporte y versión del catálogo, calculados en SQL (sin cargar productos)."""
+        P = models.Product
+        row = db.execute(
+            select(
+                func.count(P.id).label("count"),
+                func.coalesce(func.sum(P.stock), 0).label("stock"),
+                func.coalesce(func.sum(P.price * P.stock), 0).label("value"),
+                func.max(P.updated_at).label("updated_at"),
+                func.max(P.id).label("max_id"),
+            ).where(P.is_active == True)
+        ).one()
+        totals = {"count": row.count, "stock": float(row.stock), "value": float(row.value)}
+        # El PDF imprime el nombre de la categoría y categories no tiene updated_at: se incluyen
+        # sus nombres (tabla pequeña) en la versión
+        C = models.Category
+        categories = db.execute(select(C.id, C.name).order_by(C.id)).all()
+        # Cambia con cualquier alta/baja/edición de productos o categorías, movimiento de stock o cambio de día
+        version = f"{date.today()}|{row.count}|{row.max_id}|{row.updated_at}|{row.stock}|{row.value}|" \
+            + ",".join(f"{c.id}:{c.name}" for c in categories)
+        totals["version"] = hashlib.sha256(version.encode()).hexdigest()[:20]
+        return totals
+
+    @staticmethod
+    def pdf_pages(db: Session, rows_per_page: Optional[int] = None) -> Iterator[list]:
+        """Filas de la tabla en bloques de una página, leídas con cursor del lado del servidor."""
+        rows_per_page = rows_per_page or PDF_ROWS_PER_PAGE
+        P, C = models.Product, models.Category
+        result = db.execute(
+            select(P.id, P.name, P.sku, P.price, P.stock, C.name.label("category"))
+            .outerjoin(C, C.id == P.category_id)
+            .where(P.is_active == True)
+            .order_by(P.id)
+            .execution_options(yield_per=rows_per_page)
+        )
+        for chunk in result.partitions(rows_per_page):
+            yield [
+                [
+                    str(r.id),
+                    r.name[:30] + '...' if len(r.name) > 30 else r.name,
+                    r.sku or '-',
+                    f"${r.price or 0:.2f}",
+                    f"{r.stock or 0:.0f}",
+                    (r.category[:15] if r.category else '-')
+                ]
+                for r in chunk
+            ]
+
+    @staticmethod
+    def write_pdf(db: Session, output, totals: dict, business_name: str = "Inventario",
+                  rows_per_page: Optional[int] = None):
+        """
+        Dibuja el PDF página por página: cada página es una tabla de tamaño fijo que se
+        descarta al pasar a la siguiente (memoria constante sin importar el catálogo).
+        """
+        rows_per_page = rows_per_page or PDF_ROWS_PER_PAGE
+        width, height = A4
+        pdf = canvas.Canvas(output, pagesize=A4)
+        pdf.setTitle(f"{business_name} - Reporte de Inventario")
+        total_pages = max(1, -(-totals["count"] // rows_per_page))
+        today = date.today().strftime('%d/%m/%Y')
+
+        def header(page: int) -> float:
+            pdf.setFillColor(colors.HexColor('#1a365d'))
+            pdf.setFont("Helvetica-Bold", 16)
+            pdf.drawCentredString(width / 2, height - 50, f"{business_name} - Reporte de Inventario")
+            pdf.setFillColor(colors.black)
+            pdf.setFont("Helvetica", 9)
+            pdf.drawString(PDF_MARGIN, height - 72, f"Fecha: {today}")
+            pdf.drawRightString(width - PDF_MARGIN, height - 72, f"Página {page} de {total_pages}")
+            top = height - 80
+            if page == 1:
+                pdf.setFont("Helvetica-Bold", 9)
+                pdf.drawString(
+                    PDF_MARGIN, height - 90,
+                    f"Resumen: {totals['count']} productos | Stock total: {totals['stock']:.0f} unidades | "
+                    f"Valor total: ${totals['value']:,.2f}"
+                )
+                top = height - 98
+            return top
+
+        page = 0
+        for rows in ProductExportService.pdf_pages(db, rows_per_page):
+            page += 1
+            top = header(page)
+            table = Table([PDF_HEADER] + rows, colWidths=PDF_COL_WIDTHS, repeatRows=1)
+            table.setStyle(PDF_TABLE_STYLE)
+            _, table_height = table.wrapOn(pdf, width - 2 * PDF_MARGIN, top - PDF_MARGIN)
+            table.drawOn(pdf, PDF_MARGIN, top - table_height)
+            pdf.showPage()
+
+        if page == 0:
+            header(1)
+            pdf.showPage()
+        pdf.save()
+
+    @staticmethod
+    def catalog_pdf(db: Session, business_name: str = "Inventario") -> str:
+        """
+        Ruta del PDF del catálogo actual: desde la caché en disco (por versión del catálogo)
+        o generándolo. Catálogos grandes se generan en un proceso aparte.
+        """
+        totals = ProductExportService.pdf_totals(db)
+        path = os.path.join(EXPORTS_DIR, f"inventario-{totals['version']}.pdf")
+        if os.path.exists(path):
+            return path
+
+        with _inflight_lock:
+            future = _inflight.get(path)
+            owner = future is None
+            if owner:
+                future = _inflight[path] = Future()
+        if not owner:
+            return future.result()  # Otra petición ya lo está generando
+
+        try:
+            os.makedirs(EXPORTS_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            executor = _process_executor() if totals["count"] >= PDF_WORKER_MIN_ROWS else None
+            if executor is not None:
+                executor.submit(_render_catalog_pdf, tmp_path, totals, business_name).result()
+            else:
+                ProductExportService.write_pdf(db, tmp_path, totals, business_name)
+            os.replace(tmp_path, path)
+            ProductExportService._prune_exports()
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(path, None)
+
+    @staticmethod
+    def _prune_exports():
+        paths = sorted(
+            (os.path.join(EXPORTS_DIR, n) for n in os.listdir(EXPORTS_DIR) if n.endswith(".pdf")),
+            key=os.path.getmtime
+        )
+        for old_path in paths[:-MAX_CACHED_EXPORTS]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def _render_catalog_pdf(path: str, totals: dict, business_name: str):
+    """Punto de entrada del proceso de exportación: sesión de lectura propia."""
+    from ..database.db import ReadSessionLocal
+    db = ReadSessionLocal()
+    try:
+        ProductExportService.write_pdf(db, path, totals, business_name)
+    finally:
+        db.close()
+
+
+def _process_executor() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos (spawn) para exportaciones grandes; None en el ejecutable de escritorio."""
+    global _executor
+    if settings.EXPORT_WORKER_PROCESSES <= 0 or getattr(sys, 'frozen', False):
+        return None
+    with _inflight_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_WORKER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
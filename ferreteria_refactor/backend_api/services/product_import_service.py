@@ -1,241 +1,639 @@
 """
 Product Import Service
 Handles bulk product import from Excel files
+
+Importación por columnas (no fila por fila):
+- Validación y cálculo de precio (costo × margen × IVA) vectorizados sobre el DataFrame
+- Categoría / proveedor / tasa se resuelven con un mapa nombre -> id por tabla (una consulta c/u)
+- SKUs repetidos en el archivo y ya existentes en BD se detectan con consultas IN por bloque
+- Las filas aceptadas se insertan con INSERT masivo (executemany) por bloques
+
+Actualización de listas de precios (upsert):
+- Lee .xlsx (openpyxl read_only) o CSV por bloques, sin cargar el archivo completo
+- Empareja por SKU o por código de barras de presentación y aplica costo, precio, margen
+  y stock con INSERT ... ON CONFLICT (sku) DO UPDATE por bloque
+- Corre como tarea en segundo plano; el progreso se consulta por id de trabajo
 """
+import csv
+import os
+import uuid
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from io import BytesIO
+from openpyxl import load_workbook
+from sqlalchemy import bindparam, delete, insert, select, update
 from sqlalchemy.orm import Session
 from ..models import models
+from ..utils.time_utils import get_venezuela_now
+from .effective_price_service import EffectivePriceService
+from .price_table_service import _dialect_insert
+from .stock_ledger_service import StockLedgerService
+
+# Trabajos de importación en segundo plano (tabla import_jobs, visible desde todos los workers)
+MAX_JOBS = 20
+MAX_JOB_ERRORS = 500
+
+# Columnas del producto actual que se comparan en modo upsert
+MATCH_COLUMNS = ['product_id', 'db_sku', 'db_name', 'cur_cost', 'cur_price', 'cur_margin', 'cur_stock', 'factor']
+# Campo del producto -> (columna del archivo, valor actual); solo se actualizan los que trae el archivo
+UPSERT_FIELDS = {
+    'cost_price': ('costo', 'cur_cost'),
+    'price': ('precio_usd', 'cur_price'),
+    'profit_margin': ('margen_ganancia', 'cur_margin'),
+    'stock': ('stock', 'cur_stock'),
+}
 
 
 class ProductImportService:
-    
+
     REQUIRED_COLUMNS = ['nombre', 'precio_usd', 'stock']
     OPTIONAL_COLUMNS = [
         'sku', 'descripcion', 'categoria', 'proveedor', 'tasa_cambio',
         'stock_minimo', 'ubicacion', 'descuento_porcentaje', 'descuento_activo',
         'costo', 'margen_ganancia', 'iva'
     ]
-    
+    # Columna del Excel -> (modelo, mensaje si no existe)
+    LOOKUP_COLUMNS = {
+        'categoria': (models.Category, "Categoría '{}' no existe"),
+        'proveedor': (models.Supplier, "Proveedor '{}' no existe"),
+        'tasa_cambio': (models.ExchangeRate, "Tasa de cambio '{}' no existe"),
+    }
+    TRUE_VALUES = ['SI', 'SÍ', 'YES', 'TRUE', '1']
+    CHUNK_SIZE = 1000
+
     @staticmethod
     def validate_excel_format(df: pd.DataFrame) -> List[str]:
         """Validate that Excel has required columns"""
         errors = []
-        
+
         # Check required columns
         for col in ProductImportService.REQUIRED_COLUMNS:
             if col not in df.columns:
                 errors.append(f"Columna requerida faltante: '{col}'")
-        
+
         return errors
-    
+
+    # --- Columnas ---
+
     @staticmethod
-    def validate_product_row(row: pd.Series, row_num: int, db: Session) -> List[str]:
-        """Validate a single product row"""
-        errors = []
-        
-        # Required fields
-        if pd.isna(row.get('nombre')) or str(row.get('nombre')).strip() == '':
-            errors.append(f"Fila {row_num}: Nombre es requerido")
-        
-        # Price validation (Moved to processing phase to allow calculation from Cost + Margin)
-        pass
-        
-        # Stock validation
-        try:
-            stock = float(row.get('stock', 0))
-            if stock < 0:
-                errors.append(f"Fila {row_num}: Stock no puede ser negativo")
-        except (ValueError, TypeError):
-            errors.append(f"Fila {row_num}: Stock inválido")
-            
-        # Cost validation (if provided)
-        try:
-            if not pd.isna(row.get('costo')):
-                cost = float(row.get('costo', 0))
-                if cost < 0:
-                     errors.append(f"Fila {row_num}: Costo no puede ser negativo")
-        except (ValueError, TypeError):
-            errors.append(f"Fila {row_num}: Costo inválido")
-        
-        # SKU uniqueness (if provided)
-        if not pd.isna(row.get('sku')) and str(row.get('sku')).strip() != '':
-            sku = str(row.get('sku')).strip()
-            existing = db.query(models.Product).filter(models.Product.sku == sku).first()
-            if existing:
-                errors.append(f"Fila {row_num}: SKU '{sku}' ya existe")
-        
-        # Category validation (if provided)
-        if not pd.isna(row.get('categoria')) and str(row.get('categoria')).strip() != '':
-            cat_name = str(row.get('categoria')).strip()
-            category = db.query(models.Category).filter(models.Category.name == cat_name).first()
-            if not category:
-                errors.append(f"Fila {row_num}: Categoría '{cat_name}' no existe")
-        
-        # Supplier validation (if provided)
-        if not pd.isna(row.get('proveedor')) and str(row.get('proveedor')).strip() != '':
-            sup_name = str(row.get('proveedor')).strip()
-            supplier = db.query(models.Supplier).filter(models.Supplier.name == sup_name).first()
-            if not supplier:
-                errors.append(f"Fila {row_num}: Proveedor '{sup_name}' no existe")
-        
-        # Exchange rate validation (if provided)
-        if not pd.isna(row.get('tasa_cambio')) and str(row.get('tasa_cambio')).strip() != '':
-            rate_name = str(row.get('tasa_cambio')).strip()
-            rate = db.query(models.ExchangeRate).filter(models.ExchangeRate.name == rate_name).first()
-            if not rate:
-                errors.append(f"Fila {row_num}: Tasa de cambio '{rate_name}' no existe")
-        
-        return errors
-    
+    def _text(df: pd.DataFrame, col: str) -> pd.Series:
+        """Texto sin espacios; None si la celda está vacía."""
+        if col not in df.columns:
+            return pd.Series(None, index=df.index, dtype=object)
+        values = df[col].astype("string").str.strip()
+        return values.where(values.notna() & (values != ""), None).astype(object)
+
+    @staticmethod
+    def _number(df: pd.DataFrame, col: str) -> Tuple[pd.Series, pd.Series]:
+        """(valores numéricos con NaN si falta, máscara de celdas no numéricas)."""
+        if col not in df.columns:
+            empty = pd.Series(float("nan"), index=df.index)
+            return empty, pd.Series(False, index=df.index)
+        raw = df[col]
+        values = pd.to_numeric(raw, errors="coerce").astype(float)
+        return values, raw.notna() & values.isna()
+
+    @staticmethod
+    def load_lookups(db: Session, columns) -> Dict[str, Dict[str, int]]:
+        """Un mapa nombre -> id por cada columna de referencia presente en el archivo."""
+        lookups = {}
+        for col, (model, _) in ProductImportService.LOOKUP_COLUMNS.items():
+            if col in columns:
+                lookups[col] = {name: id_ for name, id_ in db.query(model.name, model.id)}
+        return lookups
+
+    @staticmethod
+    def existing_skus(db: Session, skus) -> set:
+        """SKUs que ya existen en BD (una consulta IN por bloque)."""
+        skus = list(skus)
+        found = set()
+        step = ProductImportService.CHUNK_SIZE
+        for start in range(0, len(skus), step):
+            chunk = skus[start:start + step]
+            found.update(sku for (sku,) in db.query(models.Product.sku).filter(models.Product.sku.in_(chunk)))
+        return found
+
+    @staticmethod
+    def prepare_products(df: pd.DataFrame, db: Session, lookups: Dict[str, Dict[str, int]] = None,
+                         first_row: int = 2, upsert: bool = False) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+        """
+        Valida y calcula todas las filas de una vez.
+        Con upsert=True un SKU existente no es error (la fila actualiza ese producto).
+
+        Returns:
+            (DataFrame con las columnas de Product de las filas aceptadas, [(fila Excel, error)])
+        """
+        df = df.reset_index(drop=True)
+        rows = pd.Series(range(first_row, first_row + len(df)), index=df.index)
+        lookups = lookups if lookups is not None else ProductImportService.load_lookups(db, df.columns)
+        errors: List[Tuple[int, str]] = []
+
+        def reject(mask, message, values=None):
+            if values is None:
+                errors.extend((row, message) for row in rows[mask])
+            else:
+                errors.extend((row, message.format(v)) for row, v in zip(rows[mask], values[mask]))
+
+        # Filas vacías (sin nombre) se ignoran
+        raw_name = df['nombre']
+        keep = raw_name.notna()
+        name = ProductImportService._text(df, 'nombre')
+        reject(keep & name.isna(), "Nombre es requerido")
+
+        stock, bad_stock = ProductImportService._number(df, 'stock')
+        stock = stock.fillna(0)
+        reject(keep & bad_stock, "Stock inválido")
+        reject(keep & (stock < 0), "Stock no puede ser negativo")
+
+        cost, bad_cost = ProductImportService._number(df, 'costo')
+        reject(keep & bad_cost, "Costo inválido")
+        reject(keep & (cost < 0), "Costo no puede ser negativo")
+
+        # SKU: repetido dentro del archivo o ya existente en BD
+        sku = ProductImportService._text(df, 'sku')
+        has_sku = keep & sku.notna()
+        repeated = has_sku & sku.where(has_sku).duplicated(keep='first')
+        if repeated.any():
+            first_seen = dict(zip(sku[has_sku & ~repeated], rows[has_sku & ~repeated]))
+            repeated_rows = sku[repeated].map(first_seen)
+            errors.extend(
+                (row, f"SKU '{value}' repetido en el archivo (fila {first})")
+                for row, value, first in zip(rows[repeated], sku[repeated], repeated_rows)
+            )
+        if not upsert:
+            taken = ProductImportService.existing_skus(db, sku[has_sku & ~repeated].unique())
+            reject(has_sku & ~repeated & sku.isin(taken), "SKU '{}' ya existe", sku)
+
+        # Referencias por nombre
+        ids = {}
+        for col, (_, message) in ProductImportService.LOOKUP_COLUMNS.items():
+            names = ProductImportService._text(df, col)
+            ids[col] = names.map(lookups.get(col, {}))
+            reject(keep & names.notna() & ids[col].isna(), message, names)
+
+        invalid_rows = set(row for row, _ in errors)
+        valid = keep & ~rows.isin(invalid_rows)
+
+        # Precio: explícito, o Costo * (1 + Margen) * (1 + IVA)
+        cost = cost.fillna(0)
+        margin, _ = ProductImportService._number(df, 'margen_ganancia')
+        tax, _ = ProductImportService._number(df, 'iva')
+        tax = tax.where(tax.between(0, 100), 0.0)
+        price, _ = ProductImportService._number(df, 'precio_usd')
+        price = price.fillna(0)
+        derive = (price <= 0) & (cost > 0) & margin.notna()
+        derived = (cost * (1 + margin / 100) * (1 + tax / 100)).round(2)
+        price = price.where(~derive, derived)
+        reject(valid & (price <= 0),
+               "Precio inválido (Debe ser > 0 o proveer Costo y Margen válidos para calcularlo)")
+        valid &= price > 0
+
+        # Descuento solo si está en rango 0-100
+        discount, _ = ProductImportService._number(df, 'descuento_porcentaje')
+        has_discount = discount.between(0, 100)
+        discount_flag = ProductImportService._text(df, 'descuento_activo').fillna('NO').str.upper()
+        min_stock, _ = ProductImportService._number(df, 'stock_minimo')
+
+        products = pd.DataFrame({
+            'name': name,
+            'price': price,
+            'stock': stock,
+            'sku': sku,
+            'description': ProductImportService._text(df, 'descripcion'),
+            'min_stock': min_stock.fillna(5),
+            'location': ProductImportService._text(df, 'ubicacion'),
+            'cost_price': cost,
+            'profit_margin': margin,
+            'tax_rate': tax,
+            'is_active': True,
+            'category_id': ids['categoria'],
+            'supplier_id': ids['proveedor'],
+            'exchange_rate_id': ids['tasa_cambio'],
+            'discount_percentage': discount.where(has_discount, 0.0),
+            'is_discount_active': has_discount & discount_flag.isin(ProductImportService.TRUE_VALUES),
+        })[valid]
+
+        errors.sort(key=lambda e: e[0])
+        return products, errors
+
+    @staticmethod
+    def to_records(products: pd.DataFrame) -> List[Dict]:
+        """Filas como dicts con tipos nativos (NaN -> None) para el INSERT masivo."""
+        products = products.astype(object).where(products.notna(), None)
+        records = products.to_dict('records')
+        for record in records:
+            for key in ('category_id', 'supplier_id', 'exchange_rate_id'):
+                if record.get(key) is not None:
+                    record[key] = int(record[key])
+        return records
+
     @staticmethod
     def parse_excel_to_products(file_content: bytes, db: Session) -> Tuple[List[Dict], List[str]]:
         """
         Parse Excel file and return list of product dicts and errors
-        
+
         Returns:
             (products_to_create, errors)
         """
         try:
-            df = pd.read_excel(BytesIO(file_content))
+            df = pd.read_excel(BytesIO(file_content), dtype=object)
         except Exception as e:
             return [], [f"Error leyendo archivo Excel: {str(e)}"]
-        
+
         # Validate format
         format_errors = ProductImportService.validate_excel_format(df)
         if format_errors:
             return [], format_errors
-        
-        products_to_create = []
-        all_errors = []
-        
-        for idx, row in df.iterrows():
-            row_num = idx + 2  # Excel row (1-indexed + header)
-            
-            # Skip empty rows
-            if pd.isna(row.get('nombre')):
-                continue
-            
-            # Validate row
-            row_errors = ProductImportService.validate_product_row(row, row_num, db)
-            if row_errors:
-                all_errors.extend(row_errors)
-                continue
-            
-            # Cost Price
-            cost_price = 0.0
-            if not pd.isna(row.get('costo')):
-                cost_price = float(row.get('costo', 0))
-            
-            # Profit Margin
-            profit_margin = None
-            if not pd.isna(row.get('margen_ganancia')):
-                profit_margin = float(row.get('margen_ganancia', 0))
-
-            # Tax Rate (IVA)
-            tax_rate = 0.0
-            if not pd.isna(row.get('iva')):
-                try:
-                    parsed_tax = float(row.get('iva', 0))
-                    if 0 <= parsed_tax <= 100:
-                        tax_rate = parsed_tax
-                except (ValueError, TypeError):
-                    pass # Ignore invalid tax, default 0
-            
-            # Price Calculation Logic
-            # 1. Try to read explicit price
-            price = 0.0
-            if not pd.isna(row.get('precio_usd')):
-                try:
-                    price = float(row['precio_usd'])
-                except:
-                    price = 0.0
-            
-            # 2. If explicit price is missing/invalid, try to calculate from Cost + Margin + Tax
-            if price <= 0 and cost_price > 0 and profit_margin is not None:
-                # Formula: Cost * (1 + Margin) * (1 + Tax)
-                base_price = cost_price * (1 + profit_margin / 100)
-                price = base_price * (1 + tax_rate / 100)
-                # Round to 2 decimals
-                price = round(price, 2)
-            
-            # 3. Final Validation: Price must be > 0
-            if price <= 0:
-                all_errors.append(f"Fila {row_num}: Precio inválido (Debe ser > 0 o proveer Costo y Margen válidos para calcularlo)")
-                continue
-
-            # Build product dict
-            product_data = {
-                'name': str(row['nombre']).strip(),
-                'price': price,
-                'stock': float(row['stock']),
-                'sku': str(row.get('sku', '')).strip() if not pd.isna(row.get('sku')) else None,
-                'description': str(row.get('descripcion', '')).strip() if not pd.isna(row.get('descripcion')) else None,
-                'min_stock': float(row.get('stock_minimo', 5)) if not pd.isna(row.get('stock_minimo')) else 5,
-                'location': str(row.get('ubicacion', '')).strip() if not pd.isna(row.get('ubicacion')) else None,
-                'cost_price': cost_price,
-                'profit_margin': profit_margin,
-                'tax_rate': tax_rate,
-                'is_active': True
-            }
-            
-            # Category ID
-            if not pd.isna(row.get('categoria')) and str(row.get('categoria')).strip() != '':
-                cat_name = str(row.get('categoria')).strip()
-                category = db.query(models.Category).filter(models.Category.name == cat_name).first()
-                if category:
-                    product_data['category_id'] = category.id
-            
-            # Supplier ID
-            if not pd.isna(row.get('proveedor')) and str(row.get('proveedor')).strip() != '':
-                sup_name = str(row.get('proveedor')).strip()
-                supplier = db.query(models.Supplier).filter(models.Supplier.name == sup_name).first()
-                if supplier:
-                    product_data['supplier_id'] = supplier.id
-            
-            # Exchange Rate ID
-            if not pd.isna(row.get('tasa_cambio')) and str(row.get('tasa_cambio')).strip() != '':
-                rate_name = str(row.get('tasa_cambio')).strip()
-                rate = db.query(models.ExchangeRate).filter(models.ExchangeRate.name == rate_name).first()
-                if rate:
-                    product_data['exchange_rate_id'] = rate.id
-            
-            # Discount
-            if not pd.isna(row.get('descuento_porcentaje')):
-                try:
-                    discount = float(row.get('descuento_porcentaje', 0))
-                    if 0 <= discount <= 100:
-                        product_data['discount_percentage'] = discount
-                        
-                        # Discount active
-                        discount_active = str(row.get('descuento_activo', 'NO')).strip().upper()
-                        product_data['is_discount_active'] = discount_active in ['SI', 'SÍ', 'YES', 'TRUE', '1']
-                except (ValueError, TypeError):
-                    pass
-            
-            products_to_create.append(product_data)
-        
-        return products_to_create, all_errors
-    
+
+        products, errors = ProductImportService.prepare_products(df, db)
+        return (
+            ProductImportService.to_records(products),
+            [f"Fila {row}: {message}" for row, message in errors]
+        )
+
+    @staticmethod
+    def insert_products(products_data: List[Dict], db: Session) -> List[int]:
+        """INSERT masivo por bloques; devuelve los ids creados (sin confirmar)."""
+        created_ids = []
+        step = ProductImportService.CHUNK_SIZE
+        for start in range(0, len(products_data), step):
+            chunk = products_data[start:start + step]
+            created_ids.extend(db.execute(insert(models.Product).returning(models.Product.id), chunk).scalars())
+        # INSERT masivo sin eventos del ORM: calcular precios efectivos al confirmar
+        EffectivePriceService.mark_dirty(db, created_ids)
+        return created_ids
+
     @staticmethod
     def bulk_create_products(products_data: List[Dict], db: Session) -> int:
         """Create products in batch"""
-        created_count = 0
-        
-        for product_data in products_data:
-            try:
-                product = models.Product(**product_data)
-                db.add(product)
-                created_count += 1
-            except Exception as e:
-                print(f"Error creating product {product_data.get('name')}: {e}")
-                continue
-        
+        if not products_data:
+            return 0
+
         try:
+            created_ids = ProductImportService.insert_products(products_data, db)
             db.commit()
         except Exception as e:
             db.rollback()
             raise Exception(f"Error guardando productos: {str(e)}")
-        
-        return created_count
+
+        return len(created_ids)
+
+    # --- Actualización de listas de precios (upsert por bloques) ---
+
+    @staticmethod
+    def iter_file_chunks(path: str, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """Bloques de filas (.xlsx o .csv) como DataFrames; el primero siempre se entrega (encabezado)."""
+        chunk_size = chunk_size or ProductImportService.CHUNK_SIZE
+        if path.lower().endswith('.csv'):
+            handle = open(path, newline='', encoding='utf-8-sig')
+            try:
+                dialect = csv.Sniffer().sniff(handle.read(4096), delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            handle.seek(0)
+            rows, close = csv.reader(handle, dialect), handle.close
+        else:
+            workbook = load_workbook(path, read_only=True, data_only=True)
+            rows, close = workbook.active.iter_rows(values_only=True), workbook.close
+
+        try:
+            header = [str(c).strip() if c is not None else '' for c in next(rows, [])]
+            width, chunk, sent = len(header), [], False
+            for row in rows:
+                row = [None if value == '' else value for value in row[:width]]
+                chunk.append(row + [None] * (width - len(row)))
+                if len(chunk) == chunk_size:
+                    yield pd.DataFrame(chunk, columns=header, dtype=object)
+                    chunk, sent = [], True
+            if chunk or not sent:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+        finally:
+            close()
+
+    @staticmethod
+    def count_rows(path: str) -> Optional[int]:
+        """Filas de datos (sin encabezado); None si el .xlsx no declara sus dimensiones."""
+        if path.lower().endswith('.csv'):
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                return max(sum(1 for _ in handle) - 1, 0)
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+            return max(max_row - 1, 0) if max_row else None
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def match_existing(db: Session, skus) -> pd.DataFrame:
+        """
+        Productos existentes por SKU o, si no, por código de barras de presentación
+        (bloqueados hasta el commit). Índice: código del archivo; columnas: MATCH_COLUMNS.
+        """
+        P, U = models.Product, models.ProductUnit
+        skus = list(skus)
+        found = {}
+        step = ProductImportService.CHUNK_SIZE
+
+        def _entry(row, factor):
+            return [
+                row.id, row.sku, row.name, float(row.cost_price or 0), float(row.price or 0),
+                float(row.profit_margin) if row.profit_margin is not None else None,
+                float(row.stock or 0), factor
+            ]
+
+        for start in range(0, len(skus), step):
+            chunk = skus[start:start + step]
+            for row in db.execute(
+                select(P.id, P.sku, P.name, P.cost_price, P.price, P.profit_margin, P.stock)
+                .where(P.sku.in_(chunk))
+                .with_for_update()
+            ):
+                found[row.sku] = _entry(row, 1.0)
+
+            rest = [code for code in chunk if code not in found]
+            if rest:
+                for row in db.execute(
+                    select(U.barcode, U.conversion_factor, P.id, P.sku, P.name, P.cost_price, P.price,
+                           P.profit_margin, P.stock)
+                    .join(P, P.id == U.product_id)
+                    .where(U.barcode.in_(rest))
+                    .order_by(U.id)
+                    .with_for_update(of=P)
+                ):
+                    if row.barcode not in found:
+                        found[row.barcode] = _entry(row, float(row.conversion_factor or 1))
+
+        current = pd.DataFrame.from_dict(found, orient='index', columns=MATCH_COLUMNS)
+        numeric = ['cur_cost', 'cur_price', 'cur_margin', 'cur_stock', 'factor']
+        current[numeric] = current[numeric].astype(float)
+        return current
+
+    @staticmethod
+    def _import_warehouse(db: Session) -> Optional[int]:
+        """Almacén donde se registran los ajustes de stock: el principal o el primero activo."""
+        warehouse = db.query(models.Warehouse.id).filter(models.Warehouse.is_main == True).first() \
+            or db.query(models.Warehouse.id).filter(models.Warehouse.is_active == True).first()
+        return warehouse.id if warehouse else None
+
+    @staticmethod
+    def _apply_stock_moves(db: Session, moves: List[Tuple[int, float, float]], warehouse_id: Optional[int],
+                           description: str):
+        """Ajustes (producto, diferencia, stock final): almacén + kardex, en escrituras masivas."""
+        if warehouse_id is not None:
+            S = models.ProductStock
+            stock_ids = dict(db.query(S.product_id, S.id).filter(
+                S.warehouse_id == warehouse_id,
+                S.product_id.in_([pid for pid, _, _ in moves])
+            ))
+            existing = [{"b_id": stock_ids[pid], "b_qty": delta} for pid, delta, _ in moves if pid in stock_ids]
+            if existing:
+                stock_table = S.__table__
+                db.execute(
+                    update(stock_table)
+                    .where(stock_table.c.id == bindparam("b_id"))
+                    .values(quantity=stock_table.c.quantity + bindparam("b_qty")),
+                    existing
+                )
+            missing = [
+                {"product_id": pid, "warehouse_id": warehouse_id, "quantity": delta}
+                for pid, delta, _ in moves if pid not in stock_ids
+            ]
+            if missing:
+                db.execute(insert(S), missing)
+
+        StockLedgerService.append(db, [
+            {
+                "product_id": pid,
+                "warehouse_id": warehouse_id,
+                "movement_type": models.MovementType.ADJUSTMENT_IN if delta > 0 else models.MovementType.ADJUSTMENT_OUT,
+                "quantity": delta,
+                "balance_after": balance,
+                "description": description,
+            }
+            for pid, delta, balance in moves
+        ])
+
+    @staticmethod
+    def upsert_chunk(db: Session, df: pd.DataFrame, lookups: Dict[str, Dict[str, int]], first_row: int,
+                     seen: Dict[str, int], warehouse_id: Optional[int] = None, update_stock: bool = True,
+                     description: str = "Importación de lista de precios") -> dict:
+        """
+        Crea o actualiza los productos de un bloque (sin confirmar).
+
+        Args:
+            seen: SKU -> fila donde apareció por primera vez (entre bloques); también
+                ("product", id) -> fila para los productos existentes ya emparejados
+
+        Returns:
+            {"created", "updated", "unchanged", "errors": [(fila, error)]}
+        """
+        products, errors = ProductImportService.prepare_products(df, db, lookups, first_row, upsert=True)
+        columns = list(products.columns)
+        rows = products.index.to_series() + first_row
+
+        # SKU ya visto en un bloque anterior
+        again = products['sku'].isin(list(seen))
+        errors.extend(
+            (row, f"SKU '{sku}' repetido en el archivo (fila {seen[sku]})")
+            for row, sku in zip(rows[again], products['sku'][again])
+        )
+        products, rows = products[~again], rows[~again]
+        has_sku = products['sku'].notna()
+        seen.update(zip(products['sku'][has_sku], rows[has_sku]))
+
+        current = ProductImportService.match_existing(db, products['sku'][has_sku].unique())
+        products = products.join(current, on='sku')
+        matched = products['product_id'].notna()
+
+        # El mismo producto por SKU y por código de presentación (en este bloque o en uno anterior):
+        # se acepta solo la primera fila, como los SKU repetidos
+        product_key = products['product_id'].where(matched).map(lambda pid: ("product", int(pid)), na_action='ignore')
+        earlier = product_key.map(lambda key: seen.get(key), na_action='ignore')
+        in_chunk = matched & product_key.duplicated(keep='first')
+        repeated = matched & (earlier.notna() | in_chunk)
+        if repeated.any():
+            first_seen = dict(zip(product_key[matched & ~in_chunk], rows[matched & ~in_chunk]))
+            errors.extend(
+                (row, f"Producto '{name}' repetido en el archivo con otro código (fila {seen.get(key, first_seen[key])})")
+                for row, name, key in zip(rows[repeated], products['db_name'][repeated], product_key[repeated])
+            )
+            products, rows = products[~repeated], rows[~repeated]
+            matched, product_key = matched[~repeated], product_key[~repeated]
+        seen.update(zip(product_key[matched], rows[matched]))
+
+        # Código de presentación: costo/precio por presentación y stock en presentaciones -> unidad base
+        factor = products['factor'].fillna(1.0)
+        products['price'] = (products['price'] / factor).round(4)
+        products['cost_price'] = (products['cost_price'] / factor).round(4)
+        products['stock'] = (products['stock'] * factor).round(3)
+        if not update_stock:
+            products['stock'] = products['stock'].where(~matched, products['cur_stock'])
+
+        def same(new, old):
+            return (products[new].round(4) == products[old].round(4)) | (products[new].isna() & products[old].isna())
+
+        # Columnas ausentes del archivo: se conserva el valor actual (no se comparan ni se escriben)
+        fields = [
+            field for field, (column, _) in UPSERT_FIELDS.items()
+            if column in df.columns and (update_stock or field != 'stock')
+        ]
+        unchanged = pd.Series(True, index=products.index)
+        for field in fields:
+            unchanged &= same(field, UPSERT_FIELDS[field][1])
+        changed = matched & ~unchanged
+        created = ~matched
+        by_id = changed & products['db_sku'].isna()  # Presentación de un producto sin SKU
+        upsert = created | (changed & ~by_id)
+
+        products.loc[matched, 'sku'] = products.loc[matched, 'db_sku']
+        products.loc[matched, 'name'] = products.loc[matched, 'db_name']
+
+        touched, moves = [], []
+        if upsert.any():
+            insert_ = _dialect_insert(db)
+            stmt = insert_(models.Product)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[models.Product.sku],
+                set_={field: stmt.excluded[field] for field in fields + ['updated_at']}
+            ).returning(models.Product.id, sort_by_parameter_order=True)
+            records = ProductImportService.to_records(products.loc[upsert, columns])
+            ids = db.execute(stmt, records).scalars().all()
+            products.loc[upsert, 'product_id'] = ids
+            touched.extend(ids)
+
+        if by_id.any():
+            updates = products.loc[by_id, ['product_id'] + fields].rename(columns={'product_id': 'id'})
+            updates = ProductImportService.to_records(updates.assign(id=updates['id'].astype(int)))
+            db.execute(update(models.Product), [{**u, 'updated_at': get_venezuela_now()} for u in updates])
+            touched.extend(u['id'] for u in updates)
+
+        if touched:
+            # Escrituras masivas sin eventos del ORM
+            EffectivePriceService.mark_dirty(db, touched)
+
+        if update_stock or created.any():
+            delta = products['stock'] - products['cur_stock'].fillna(0)
+            moving = (created | changed) & (delta.round(3) != 0)
+            if not update_stock:
+                moving &= created
+            moves = [
+                (int(pid), float(qty), float(balance))
+                for pid, qty, balance in zip(products['product_id'][moving], delta[moving], products['stock'][moving])
+            ]
+            if moves:
+                ProductImportService._apply_stock_moves(db, moves, warehouse_id, description)
+
+        return {
+            "created": int(created.sum()),
+            "updated": int(changed.sum()),
+            "unchanged": int((matched & ~changed).sum()),
+            "errors": errors,
+        }
+
+    @staticmethod
+    def import_file(db: Session, path: str, job_id: str = None, update_stock: bool = True) -> dict:
+        """Recorre el archivo por bloques y confirma cada bloque; informa el progreso al trabajo."""
+        totals = {"created": 0, "updated": 0, "unchanged": 0, "error_count": 0, "errors": []}
+        ProductImportService._update_job(db, job_id, status="running", total_rows=ProductImportService.count_rows(path))
+        db.commit()
+
+        lookups, seen, warehouse_id = None, {}, None
+        first_row = 2
+        for df in ProductImportService.iter_file_chunks(path):
+            if lookups is None:
+                missing = ProductImportService.validate_excel_format(df)
+                if 'sku' not in df.columns:
+                    missing.append("Columna requerida faltante: 'sku'")
+                if missing:
+                    raise ValueError("; ".join(missing))
+                lookups = ProductImportService.load_lookups(db, df.columns)
+                warehouse_id = ProductImportService._import_warehouse(db)
+
+            result = ProductImportService.upsert_chunk(
+                db, df, lookups, first_row, seen, warehouse_id=warehouse_id, update_stock=update_stock
+            )
+
+            first_row += len(df)
+            for key in ("created", "updated", "unchanged"):
+                totals[key] += result[key]
+            totals["error_count"] += len(result["errors"])
+            room = MAX_JOB_ERRORS - len(totals["errors"])
+            totals["errors"].extend(f"Fila {row}: {message}" for row, message in result["errors"][:room])
+            # El avance se confirma junto con el bloque
+            ProductImportService._update_job(db, job_id, processed_rows=first_row - 2, **totals)
+            db.commit()
+
+        return totals
+
+    # --- Trabajos en segundo plano ---
+
+    @staticmethod
+    def _job_dict(job: models.ImportJob) -> dict:
+        return {
+            "id": job.id,
+            "filename": job.filename,
+            "update_stock": job.update_stock,
+            "status": job.status,
+            "total_rows": job.total_rows,
+            "processed_rows": job.processed_rows,
+            "created": job.created,
+            "updated": job.updated,
+            "unchanged": job.unchanged,
+            "error_count": job.error_count,
+            "errors": list(job.errors or []),
+            "detail": job.detail,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+
+    @staticmethod
+    def create_job(db: Session, filename: str, update_stock: bool = True) -> dict:
+        """Registra el trabajo (confirmado) y descarta los más antiguos que MAX_JOBS."""
+        job = models.ImportJob(
+            id=uuid.uuid4().hex, filename=filename, update_stock=update_stock, status="pending",
+            processed_rows=0, created=0, updated=0, unchanged=0, error_count=0, errors=[],
+            started_at=get_venezuela_now()
+        )
+        db.add(job)
+        db.flush()
+        keep = select(models.ImportJob.id).order_by(models.ImportJob.started_at.desc()).limit(MAX_JOBS)
+        db.execute(delete(models.ImportJob).where(models.ImportJob.id.not_in(keep.scalar_subquery())))
+        db.commit()
+        return ProductImportService._job_dict(job)
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[dict]:
+        job = db.get(models.ImportJob, job_id, populate_existing=True)
+        return ProductImportService._job_dict(job) if job else None
+
+    @staticmethod
+    def _update_job(db: Session, job_id: Optional[str], **changes):
+        """Actualiza el trabajo en la transacción en curso (se confirma con ella)."""
+        if job_id is None:
+            return
+        if "errors" in changes:
+            changes["errors"] = list(changes["errors"])
+        db.execute(update(models.ImportJob).where(models.ImportJob.id == job_id).values(**changes))
+
+    @staticmethod
+    def run_upsert_job(job_id: str, path: str, update_stock: bool = True):
+        """Tarea en segundo plano: sesión propia, borra el archivo temporal al terminar."""
+        from ..database.db import SessionLocal
+        db = SessionLocal()
+        try:
+            ProductImportService.import_file(db, path, job_id, update_stock)
+            ProductImportService._update_job(db, job_id, status="done", finished_at=get_venezuela_now())
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[IMPORT] Error en importación {job_id}: {e}")
+            ProductImportService._update_job(
+                db, job_id, status="failed", detail=str(e), finished_at=get_venezuela_now()
+            )
+            db.commit()
+        finally:
+            db.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,191 @@
+"""
+Purchase Receiving Service
+Recepción de compras por lotes:
+
+- Precarga productos y existencias del almacén en dos consultas (con bloqueo de filas)
+- Calcula costo, precio y margen de todas las líneas en una sola pasada en memoria
+- Escribe con UPDATE/INSERT masivos (executemany) en lugar de una consulta por línea
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .. import schemas
+from .effective_price_service import EffectivePriceService
+from .stock_ledger_service import StockLedgerService
+
+ZERO = Decimal(0)
+HUNDRED = Decimal(100)
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _reprice(product: dict, item: schemas.PurchaseItemCreate, old_cost: Decimal):
+    """
+    Aplica costo de reposición y precio sugerido a un producto (dict en memoria).
+    Misma estrategia que la recepción original:
+    1. Precio enviado por el frontend
+    2. Margen guardado sobre el costo nuevo
+    3. Margen implícito (precio / costo anterior) aplicado al costo nuevo
+    4. Mantener el precio (el margen se recalcula)
+    """
+    # Update cost price (Last Cost / Replacement Cost Strategy)
+    if item.update_cost and item.unit_cost > 0:
+        product["cost_price"] = item.unit_cost
+
+    if item.update_price:
+        if item.new_sale_price and item.new_sale_price > 0:
+            product["price"] = item.new_sale_price
+        elif item.update_cost and item.unit_cost > 0:
+            tax_rate = product["tax_rate"]
+            tax_multiplier = Decimal(1) + (tax_rate / HUNDRED) if tax_rate else Decimal(1)
+            margin = product["profit_margin"]
+
+            if margin and margin > 0:
+                product["price"] = item.unit_cost * (Decimal(1) + margin / HUNDRED) * tax_multiplier
+            elif product["price"] > 0 and old_cost > 0:
+                # Must use OLD cost to infer margin, not the new one
+                current_margin = ((product["price"] / tax_multiplier / old_cost) - 1) * HUNDRED
+                product["price"] = item.unit_cost * (Decimal(1) + current_margin / HUNDRED) * tax_multiplier
+                product["profit_margin"] = current_margin
+
+    # Auto-update profit margin (Markup) based on new values
+    if product["cost_price"] > 0 and product["price"] > 0:
+        product["profit_margin"] = ((product["price"] - product["cost_price"]) / product["cost_price"]) * HUNDRED
+
+
+class PurchaseReceivingService:
+
+    @staticmethod
+    def receive_items(
+        db: Session,
+        purchase: models.PurchaseOrder,
+        items: List[schemas.PurchaseItemCreate],
+        warehouse_id: int,
+        description: str,
+        movement_date: datetime
+    ) -> List[dict]:
+        """
+        Registra las líneas de una compra: historial, existencias, costo/precio y kardex.
+        Las líneas con productos inexistentes se ignoran (como antes).
+
+        Returns:
+            Lista de productos actualizados (para el evento de catálogo)
+        """
+        product_ids = sorted({item.product_id for item in items})
+        if not product_ids:
+            return []
+
+        Product, ProductStock = models.Product, models.ProductStock
+
+        # 1. Precarga (orden por id para bloquear siempre en el mismo orden)
+        products = {
+            row.id: dict(row._mapping)
+            for row in db.execute(
+                select(
+                    Product.id, Product.name, Product.stock, Product.cost_price, Product.price,
+                    Product.profit_margin, Product.tax_rate, Product.exchange_rate_id
+                ).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+            )
+        }
+        for product in products.values():
+            for key in ("stock", "cost_price", "price"):
+                product[key] = _to_decimal(product[key])
+            product["tax_rate"] = _to_decimal(product["tax_rate"])
+
+        stocks = {
+            row.product_id: {"id": row.id, "quantity": _to_decimal(row.quantity)}
+            for row in db.execute(
+                select(ProductStock.id, ProductStock.product_id, ProductStock.quantity).where(
+                    ProductStock.product_id.in_(product_ids),
+                    ProductStock.warehouse_id == warehouse_id
+                ).order_by(ProductStock.product_id).with_for_update()
+            )
+        }
+
+        # 2. Pasada única en memoria (las líneas repetidas de un producto se acumulan en orden)
+        purchase_items, kardex_rows, touched = [], [], []
+        for item in items:
+            product = products.get(item.product_id)
+            if product is None:
+                continue
+
+            purchase_items.append({
+                "purchase_id": purchase.id,
+                "product_id": product["id"],
+                "quantity": item.quantity,
+                "unit_cost": item.unit_cost
+            })
+
+            stock = stocks.setdefault(product["id"], {"id": None, "quantity": ZERO})
+            stock["quantity"] += item.quantity
+
+            old_cost = product["cost_price"]
+            product["stock"] += item.quantity
+            _reprice(product, item, old_cost)
+
+            kardex_rows.append({
+                "product_id": product["id"],
+                "warehouse_id": warehouse_id,
+                "movement_type": models.MovementType.PURCHASE,
+                "quantity": item.quantity,
+                "balance_after": product["stock"],
+                "description": description,
+                "date": movement_date
+            })
+            if product["id"] not in touched:
+                touched.append(product["id"])
+
+        if not touched:
+            return []
+
+        # 3. Escrituras masivas
+        db.execute(insert(models.PurchaseItem), purchase_items)
+        db.execute(update(Product), [
+            {
+                "id": pid,
+                "stock": products[pid]["stock"],
+                "cost_price": products[pid]["cost_price"],
+                "price": products[pid]["price"],
+                "profit_margin": products[pid]["profit_margin"]
+            }
+            for pid in touched
+        ])
+        # UPDATE masivo sin eventos del ORM: recalcular precios efectivos al confirmar
+        EffectivePriceService.mark_dirty(db, touched)
+
+        stock_updates = [
+            {"id": stocks[pid]["id"], "quantity": stocks[pid]["quantity"]}
+            for pid in touched if stocks[pid]["id"] is not None
+        ]
+        stock_inserts = [
+            {"product_id": pid, "warehouse_id": warehouse_id, "quantity": stocks[pid]["quantity"]}
+            for pid in touched if stocks[pid]["id"] is None
+        ]
+        if stock_updates:
+            db.execute(update(ProductStock), stock_updates)
+        if stock_inserts:
+            db.execute(insert(ProductStock), stock_inserts)
+
+        StockLedgerService.append(db, kardex_rows)
+
+        return [
+            {
+                "id": pid,
+                "name": products[pid]["name"],
+                "price": float(products[pid]["price"]),
+                "cost_price": float(products[pid]["cost_price"]),
+                "stock": float(products[pid]["stock"]),
+                "profit_margin": float(products[pid]["profit_margin"]) if products[pid]["profit_margin"] else 0,
+                "exchange_rate_id": products[pid]["exchange_rate_id"]
+            }
+            for pid in touched
+        ]
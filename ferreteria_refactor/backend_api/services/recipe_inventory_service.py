@@ -0,0 +1,148 @@
+"""
+Recipe Inventory Service
+Descargo de inventario por receta (escandallo) al cobrar una orden de restaurante:
+
+- Expande las recetas de todos los platos de la orden en una sola consulta
+  (receta + ingrediente + existencia del almacén, con bloqueo de los ingredientes)
+- Agrega en memoria lo que consume cada ingrediente (Decimal)
+- Descuenta con UPDATE masivos (stock = stock - x) y registra un kardex por ingrediente
+- No hace commit: corre en la misma transacción que la venta
+"""
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Iterable, List
+
+from sqlalchemy import and_, bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models import models
+from ..models.restaurant import RestaurantRecipe, RestaurantOrderItem
+from .stock_ledger_service import StockLedgerService
+
+ZERO = Decimal(0)
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class RecipeInventoryService:
+
+    @staticmethod
+    def deduct_for_items(
+        db: Session,
+        order_items: Iterable[RestaurantOrderItem],
+        warehouse_id: int,
+        description: str
+    ) -> List[dict]:
+        """
+        Descuenta los ingredientes de los platos vendidos en `warehouse_id`.
+        Los platos sin receta no consumen nada aquí (su propio stock lo descuenta la venta).
+
+        Returns:
+            Ingredientes actualizados (para el evento de inventario)
+        """
+        dishes = {}
+        for item in order_items:
+            dishes[item.product_id] = dishes.get(item.product_id, ZERO) + _to_decimal(item.quantity)
+        if not dishes:
+            return []
+
+        R, Product, ProductStock = RestaurantRecipe, models.Product, models.ProductStock
+
+        # 1. Expansión de recetas en una consulta (orden por ingrediente = orden de bloqueo estable)
+        rows = db.execute(
+            select(
+                R.product_id, R.ingredient_id, R.quantity,
+                Product.name, Product.stock, Product.price, Product.exchange_rate_id,
+                ProductStock.id.label("stock_id"),
+            )
+            .join(Product, Product.id == R.ingredient_id)
+            .outerjoin(ProductStock, and_(
+                ProductStock.product_id == R.ingredient_id,
+                ProductStock.warehouse_id == warehouse_id
+            ))
+            .where(R.product_id.in_(list(dishes)))
+            .order_by(R.ingredient_id)
+            .with_for_update(of=Product)
+        ).all()
+        if not rows:
+            return []
+
+        # 2. Consumo agregado por ingrediente
+        ingredients = OrderedDict()
+        for row in rows:
+            needed = _to_decimal(row.quantity) * dishes[row.product_id]
+            ingredient = ingredients.get(row.ingredient_id)
+            if ingredient is None:
+                ingredient = ingredients[row.ingredient_id] = {
+                    "id": row.ingredient_id,
+                    "name": row.name,
+                    "price": row.price,
+                    "exchange_rate_id": row.exchange_rate_id,
+                    "stock": _to_decimal(row.stock),
+                    "stock_id": row.stock_id,
+                    "quantity": ZERO,
+                }
+            ingredient["quantity"] += needed
+        ingredients = [i for i in ingredients.values() if i["quantity"]]
+        if not ingredients:
+            return []
+
+        # 3. Escrituras masivas (decremento relativo: no pisa cambios concurrentes del almacén)
+        stock_table, product_table = ProductStock.__table__, Product.__table__
+        db.execute(
+            update(product_table)
+            .where(product_table.c.id == bindparam("b_id"))
+            .values(stock=product_table.c.stock - bindparam("b_qty")),
+            [{"b_id": i["id"], "b_qty": i["quantity"]} for i in ingredients]
+        )
+        existing = [i for i in ingredients if i["stock_id"] is not None]
+        if existing:
+            db.execute(
+                update(stock_table)
+                .where(stock_table.c.id == bindparam("b_id"))
+                .values(quantity=stock_table.c.quantity - bindparam("b_qty")),
+                [{"b_id": i["stock_id"], "b_qty": i["quantity"]} for i in existing]
+            )
+        missing = [i for i in ingredients if i["stock_id"] is None]
+        if missing:
+            db.execute(insert(ProductStock), [
+                {"product_id": i["id"], "warehouse_id": warehouse_id, "quantity": -i["quantity"]}
+                for i in missing
+            ])
+
+        for ingredient in ingredients:
+            ingredient["stock"] -= ingredient["quantity"]
+        StockLedgerService.append(db, [
+            {
+                "product_id": i["id"],
+                "warehouse_id": warehouse_id,
+                "movement_type": models.MovementType.SALE,
+                "quantity": -i["quantity"],
+                "balance_after": i["stock"],
+                "description": description,
+            }
+            for i in ingredients
+        ])
+
+        # Los objetos ya cargados en la sesión no deben escribir su stock anterior encima
+        touched = {i["id"] for i in ingredients}
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, Product) and obj.id in touched:
+                db.expire(obj, ["stock"])
+            elif isinstance(obj, ProductStock) and obj.product_id in touched and obj.warehouse_id == warehouse_id:
+                db.expire(obj, ["quantity"])
+
+        return [
+            {
+                "id": i["id"],
+                "name": i["name"],
+                "price": float(i["price"] or 0),
+                "stock": float(i["stock"]),
+                "exchange_rate_id": i["exchange_rate_id"],
+            }
+            for i in ingredients
+        ]
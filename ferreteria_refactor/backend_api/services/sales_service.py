@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import update
 from datetime import datetime, timedelta
 from fastapi import HTTPException, BackgroundTasks
 from decimal import Decimal
@@ -8,8 +8,14 @@ from ..models import models
 from .. import schemas
 from ..websocket.manager import manager
 from ..websocket.events import WebSocketEvents
+from .pin_service import pin_verifier
+from .credit_state_service import CreditStateService
+from .effective_price_service import EffectivePriceService
+from .serial_resolution_service import SerialResolutionService
+from .stock_ledger_service import StockLedgerService  # noqa: F401 - saldo corrido de los movimientos del kardex
 import asyncio
 import uuid
+from itertools import chain
 
 # DUPLICATED HELPER due to circular import risks if we try to import from routers
 def run_broadcast(event: str, data: dict):
@@ -33,6 +39,21 @@ class SalesService:
         else: # DAYS
             return datetime.now() + timedelta(days=duration)
 
+    @staticmethod
+    def resolve_warehouse_id(db: Session, warehouse_id: int = None) -> int:
+        """Almacén de la venta: el indicado, el principal o el primero activo."""
+        if warehouse_id:
+            return warehouse_id
+        # Default to Main Warehouse
+        main_wh = db.query(models.Warehouse).filter(models.Warehouse.is_main == True).first()
+        if main_wh:
+            return main_wh.id
+        # Fallback to first warehouse or error
+        first_wh = db.query(models.Warehouse).filter(models.Warehouse.is_active == True).first()
+        if first_wh:
+            return first_wh.id
+        raise HTTPException(status_code=500, detail="No active warehouse found to deduct stock")
+
     @staticmethod
     def create_sale(db: Session, sale_data: schemas.SaleCreate, user_id: int, background_tasks: BackgroundTasks = None):
         try:
@@ -52,25 +73,19 @@ class SalesService:
                     )
                 
                 # 2. Check for overdue invoices
-                overdue_count = db.query(models.Sale).filter(
-                    models.Sale.customer_id == sale_data.customer_id,
-                    models.Sale.is_credit == True,
-                    models.Sale.paid == False,
-                    models.Sale.due_date < datetime.now()
-                ).count()
-                
-                if overdue_count > 0:
+                # Estado materializado bajo bloqueo de fila: serializa ventas a crédito
+                # concurrentes del mismo cliente hasta el commit
+                credit_state = CreditStateService.get_state(db, customer.id, for_update=True)
+                now = datetime.now()
+                if credit_state.oldest_due_date is not None and credit_state.oldest_due_date < now:
+                    overdue_count, _ = CreditStateService.overdue_summary(db, customer.id, now)
                     raise HTTPException(
                         status_code=400,
                         detail=f"Cliente tiene {overdue_count} factura(s) vencida(s). Debe ponerse al día antes de nuevas ventas a crédito."
                     )
                 
                 # 3. Check credit limit
-                current_debt = db.query(func.sum(models.Sale.balance_pending)).filter(
-                    models.Sale.customer_id == sale_data.customer_id,
-                    models.Sale.is_credit == True,
-                    models.Sale.paid == False
-                ).scalar() or Decimal("0.00")
+                current_debt = credit_state.outstanding_balance or Decimal("0.00")
                 
                 if (current_debt + sale_data.total_amount) > customer.credit_limit:
                     raise HTTPException(
@@ -79,19 +94,7 @@ class SalesService:
                     )
             
             # 0.5. Determine Source Warehouse
-            warehouse_id = sale_data.warehouse_id
-            if not warehouse_id:
-                # Default to Main Warehouse
-                main_wh = db.query(models.Warehouse).filter(models.Warehouse.is_main == True).first()
-                if main_wh:
-                    warehouse_id = main_wh.id
-                else:
-                    # Fallback to first warehouse or error
-                    first_wh = db.query(models.Warehouse).filter(models.Warehouse.is_active == True).first()
-                    if first_wh:
-                        warehouse_id = first_wh.id
-                    else:
-                        raise HTTPException(status_code=500, detail="No active warehouse found to deduct stock")
+            warehouse_id = SalesService.resolve_warehouse_id(db, sale_data.warehouse_id)
 
             # 1. Create Sale Header
             # CRITICAL FIX: Respect Frontend's VES calculation (preserves anchoring)
@@ -143,6 +146,26 @@ class SalesService:
                     quote.status = "CONVERTED" # Mark as Sold/Converted
                     db.add(quote) # Ensure update is tracked       
             # 2. Process Items
+            # Precios de lista de todo el carrito en una sola consulta (effective_prices)
+            list_items = [item for item in sale_data.items if item.price_list_id]
+            price_lists, list_prices = {}, {}
+            if list_items:
+                price_lists = {
+                    pl.id: pl for pl in db.query(models.PriceList).filter(
+                        models.PriceList.id.in_({item.price_list_id for item in list_items})
+                    )
+                }
+                list_prices = EffectivePriceService.lookup(db, chain.from_iterable(
+                    [(item.product_id, 0, item.price_list_id), (item.product_id, item.unit_id or 0, item.price_list_id)]
+                    for item in list_items
+                ))
+
+            # Seriales de todo el carrito en una sola consulta (instancias bloqueadas)
+            serials = SerialResolutionService.resolve(
+                db, chain.from_iterable(item.serial_numbers or [] for item in sale_data.items), lock=True
+            )
+            taken_serials, sold_instance_ids = set(), []
+
             for item in sale_data.items:
                 # Fetch Product with Pessimistic Lock
                 product = db.query(models.Product).filter(models.Product.id == item.product_id).with_for_update().first()
@@ -159,7 +182,7 @@ class SalesService:
                 
                 if item.price_list_id and updated_products_info is not None: # Check if price list requested
                      # 1. Fetch Price List Details
-                     price_list = db.query(models.PriceList).filter(models.PriceList.id == item.price_list_id).first()
+                     price_list = price_lists.get(item.price_list_id)
                      if not price_list:
                          raise HTTPException(status_code=400, detail=f"Price List ID {item.price_list_id} not found")
                      
@@ -168,7 +191,13 @@ class SalesService:
                          if not item.auth_user_id:
                              raise HTTPException(status_code=403, detail=f"Price List '{price_list.name}' requires authorization (PIN).")
                          
-                         supervisor = db.query(models.User).filter(models.User.id == item.auth_user_id).first()
+                         # PIN fast-path: principal memorizado + bloqueo por intentos fallidos
+                         if item.auth_pin is not None:
+                             supervisor = pin_verifier.verify(db, item.auth_user_id, item.auth_pin)
+                             if not supervisor:
+                                 raise HTTPException(status_code=403, detail="Invalid supervisor PIN.")
+                         else:
+                             supervisor = pin_verifier.get_principal(db, item.auth_user_id)
                          if not supervisor:
                              raise HTTPException(status_code=403, detail="Invalid authorization user.")
                          
@@ -178,23 +207,30 @@ class SalesService:
                              # User asked for "Supervisor/Admin". 
                              pass 
                              
-                     # 3. Fetch Authoritative Price
-                     db_price_record = db.query(models.ProductPrice).filter(
-                         models.ProductPrice.product_id == product.id,
-                         models.ProductPrice.price_list_id == item.price_list_id
-                     ).first()
-                     
-                     if not db_price_record:
-                         # Fallback or Error? 
-                         # If explicitly requested a list, and product not in it, maybe return Error.
-                         # Or fallback to Base Price?
-                         # For security, let's Error implies configuration mismatch.
-                         raise HTTPException(status_code=400, detail=f"Product '{product.name}' not found in Price List '{price_list.name}'")
-                     
-                     # 4. OVERRIDE: Trust NO ONE. Use DB Price.
-                     # CRITICAL FIX: Pricing is per Base Unit. Must multiply by factor for Boxes/Packs.
-                     base_price = db_price_record.price
-                     factor = Decimal(str(item.conversion_factor)) if item.conversion_factor else Decimal("1.0")
+                     # 3. Fetch Authoritative Price (precargado; presentación con su factor en BD)
+                     unit_row = list_prices.get((product.id, item.unit_id, item.price_list_id)) if item.unit_id else None
+                     if unit_row is not None:
+                         base_price = unit_row.final_price
+                         factor = Decimal("1.0")
+                     else:
+                         base_row = list_prices.get((product.id, 0, item.price_list_id))
+                         if base_row is not None:
+                             base_price = base_row.final_price
+                         else:
+                             # Sin fila materializada (lista inactiva o tabla aún sin construir)
+                             db_price_record = db.query(models.ProductPrice).filter(
+                                 models.ProductPrice.product_id == product.id,
+                                 models.ProductPrice.price_list_id == item.price_list_id
+                             ).first()
+                             
+                             if not db_price_record:
+                                 # For security, let's Error implies configuration mismatch.
+                                 raise HTTPException(status_code=400, detail=f"Product '{product.name}' not found in Price List '{price_list.name}'")
+                             base_price = db_price_record.price
+                         
+                         # 4. OVERRIDE: Trust NO ONE. Use DB Price.
+                         # CRITICAL FIX: Pricing is per Base Unit. Must multiply by factor for Boxes/Packs.
+                         factor = Decimal(str(item.conversion_factor)) if item.conversion_factor else Decimal("1.0")
                      effective_price = base_price * factor
                      
                      print(f"[SECURITY] Overriding price for {product.name}. Frontend: {item.unit_price} -> DB: {base_price} x {factor} = {effective_price}")
@@ -272,7 +308,7 @@ class SalesService:
                             quantity=-qty_to_deduct,
                             balance_after=child_product.stock, # Legacy balance
                             description=f"Sale via combo: {product.name}{unit_description} (Sale #{new_sale.id})",
-                            # warehouse_id=warehouse_id # TODO: Add warehouse_id to Kardex
+                            warehouse_id=warehouse_id
                         )
                         db.add(kardex_entry)
                         
@@ -298,24 +334,11 @@ class SalesService:
                         if len(item.serial_numbers) != units_to_deduct:
                              raise HTTPException(status_code=400, detail=f"Quantity mismatch for serialized product '{product.name}'. Expected {int(units_to_deduct)} serials, got {len(item.serial_numbers)}.")
 
-                        # Fetch and Lock Instances
-                        sold_instances = db.query(models.ProductInstance).filter(
-                            models.ProductInstance.product_id == product.id,
-                            models.ProductInstance.warehouse_id == warehouse_id,
-                            models.ProductInstance.serial_number.in_(item.serial_numbers),
-                            models.ProductInstance.status == models.ProductInstanceStatus.AVAILABLE
-                        ).with_for_update().all()
-                        
-                        # Validate Existence
-                        if len(sold_instances) != len(item.serial_numbers):
-                            found_sns = {i.serial_number for i in sold_instances}
-                            missing = set(item.serial_numbers) - found_sns
-                            raise HTTPException(status_code=400, detail=f"Serial numbers not found or unavailable in this warehouse: {list(missing)}")
-                            
-                        # Update Status to SOLD
-                        for instance in sold_instances:
-                            instance.status = models.ProductInstanceStatus.SOLD
-                            # instance.updated_at = datetime.now() # Auto
+                        # Validate against the instances resolved (and locked) for the whole cart
+                        sold_instances = SerialResolutionService.take_for_sale(
+                            serials, item.serial_numbers, product.id, warehouse_id, taken_serials
+                        )
+                        sold_instance_ids.extend(instance["id"] for instance in sold_instances)
 
                     product_stock = db.query(models.ProductStock).filter(
                         models.ProductStock.product_id == product.id,
@@ -349,7 +372,8 @@ class SalesService:
                         movement_type="SALE",
                         quantity=-units_to_deduct,
                         balance_after=product.stock,
-                        description=f"Sale #{new_sale.id} from Warehouse #{warehouse_id}"
+                        description=f"Sale #{new_sale.id} from Warehouse #{warehouse_id}",
+                        warehouse_id=warehouse_id
                     )
                     db.add(kardex_entry)
                 
@@ -389,7 +413,7 @@ class SalesService:
                     for instance in sold_instances:
                         sdi = models.SaleDetailInstance(
                             sale_detail_id=detail.id,
-                            product_instance_id=instance.id,
+                            product_instance_id=instance["id"],
                             warranty_end_date=warranty_expiration, # Legacy field updated
                             warranty_expiration_date=warranty_expiration # New Standardized Field
                         )
@@ -418,6 +442,13 @@ class SalesService:
                                  )
                                  db.add(comm_log)
         
+            # Update Status to SOLD (all serialized lines at once)
+            if sold_instance_ids:
+                db.execute(
+                    update(models.ProductInstance).where(models.ProductInstance.id.in_(sold_instance_ids))
+                    .values(status=models.ProductInstanceStatus.SOLD, updated_at=datetime.now())
+                )
+
             # 3. Process Payments (New Multi-Payment Logic)
             if sale_data.payments:
                 for p in sale_data.payments:
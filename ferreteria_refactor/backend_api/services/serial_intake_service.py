@@ -0,0 +1,245 @@
+"""
+Serial Intake Service
+Ingreso masivo de equipos serializados (IMEIs / seriales) y validación por lotes.
+
+- Los seriales se normalizan y se valida su formato en una sola pasada (IMEI de 15 dígitos:
+  dígito verificador Luhn) mientras se arma el lote
+- El lote va a una tabla temporal de staging: COPY en Postgres, executemany en SQLite
+- Repetidos dentro del lote y ya registrados se detectan con GROUP BY / JOIN sobre el staging,
+  no con un IN de todos los seriales
+- Si el lote está limpio: INSERT ... SELECT desde el staging, una sola actualización del stock
+  del producto y del almacén, y un solo movimiento de kardex
+- Un lote con errores no escribe nada y se informan todos los problemas juntos
+"""
+import io
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, insert, literal, select, text, update
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .stock_ledger_service import StockLedgerService
+
+SERIAL_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9\-/.]{3,49}$")
+IMEI_LENGTH = 15
+VALIDATE_MAX_SERIALS = 1000
+_ERROR_SAMPLE = 10
+_VALIDATE_BATCH = 500
+
+# Tabla temporal (por conexión) con el lote recibido
+_staging = Table(
+    "serial_intake_staging", MetaData(),
+    Column("line_no", Integer),
+    Column("serial_number", String),
+)
+
+
+def normalize_serial(value: str) -> str:
+    return (value or "").strip().upper()
+
+
+def _luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        n = int(ch)
+        if i % 2:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return total % 10 == 0
+
+
+def serial_format_error(serial: str) -> Optional[str]:
+    if not SERIAL_PATTERN.match(serial):
+        return "formato inválido"
+    if len(serial) == IMEI_LENGTH and serial.isdigit() and not _luhn_ok(serial):
+        return "IMEI con dígito verificador inválido"
+    return None
+
+
+def _sample(values: List[str]) -> str:
+    shown = ", ".join(values[:_ERROR_SAMPLE])
+    return f"{shown} (+{len(values) - _ERROR_SAMPLE} más)" if len(values) > _ERROR_SAMPLE else shown
+
+
+class SerialIntakeService:
+
+    @staticmethod
+    def _stage(db: Session, serials: List[str]):
+        """Carga el lote en la tabla temporal de staging (vacía al empezar)."""
+        connection = db.connection()
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "CREATE TEMP TABLE IF NOT EXISTS serial_intake_staging "
+                "(line_no integer, serial_number text) ON COMMIT DROP"
+            ))
+            connection.execute(text("TRUNCATE serial_intake_staging"))
+            buffer = io.StringIO("".join(f"{i}\t{s}\n" for i, s in enumerate(serials)))
+            cursor = connection.connection.dbapi_connection.cursor()
+            try:
+                if hasattr(cursor, "copy_expert"):  # psycopg2
+                    cursor.copy_expert("COPY serial_intake_staging (line_no, serial_number) FROM STDIN", buffer)
+                else:  # psycopg 3
+                    with cursor.copy("COPY serial_intake_staging (line_no, serial_number) FROM STDIN") as copy:
+                        copy.write(buffer.getvalue())
+            finally:
+                cursor.close()
+        else:
+            connection.execute(text(
+                "CREATE TEMP TABLE IF NOT EXISTS serial_intake_staging (line_no INTEGER, serial_number VARCHAR)"
+            ))
+            connection.execute(text("DELETE FROM serial_intake_staging"))
+            if serials:
+                connection.execute(
+                    insert(_staging), [{"line_no": i, "serial_number": s} for i, s in enumerate(serials)]
+                )
+
+    @staticmethod
+    def _find_conflicts(db: Session) -> Dict[str, List[str]]:
+        """Repetidos dentro del lote y seriales ya registrados (en cualquier producto)."""
+        PI = models.ProductInstance
+        repeated = db.execute(
+            select(_staging.c.serial_number).group_by(_staging.c.serial_number)
+            .having(func.count() > 1).order_by(_staging.c.serial_number)
+        ).scalars().all()
+        registered = db.execute(
+            select(_staging.c.serial_number).distinct()
+            .join(PI, PI.serial_number == _staging.c.serial_number)
+            .order_by(_staging.c.serial_number)
+        ).scalars().all()
+        return {"repeated": list(repeated), "registered": list(registered)}
+
+    @staticmethod
+    def intake(db: Session, entry_data) -> Dict[str, Any]:
+        """
+        Ingreso de un lote de seriales de un producto en un almacén (sin confirmar).
+        Lanza 400 con todos los problemas del lote si hay seriales inválidos, repetidos o ya registrados.
+        """
+        P, PS, PI = models.Product, models.ProductStock, models.ProductInstance
+        product = db.execute(
+            select(P.id, P.name, P.has_imei, P.cost_price).where(P.id == entry_data.product_id)
+        ).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if not product.has_imei:
+            raise HTTPException(status_code=400, detail=f"Product '{product.name}' is not serialized (has_imei=False). Cannot add IMEIs.")
+        if not db.execute(select(models.Warehouse.id).where(models.Warehouse.id == entry_data.warehouse_id)).first():
+            raise HTTPException(status_code=404, detail="Warehouse not found")
+
+        # 1. Normalización y formato (una pasada)
+        serials, invalid = [], []
+        for raw in entry_data.imeis:
+            serial = normalize_serial(raw)
+            if not serial:
+                continue
+            error = serial_format_error(serial)
+            if error:
+                invalid.append(f"{serial} ({error})")
+            else:
+                serials.append(serial)
+        if not serials and not invalid:
+            raise HTTPException(status_code=400, detail="No se recibieron seriales")
+
+        # 2. Staging + duplicados por conjuntos
+        SerialIntakeService._stage(db, serials)
+        conflicts = SerialIntakeService._find_conflicts(db)
+        problems = []
+        if invalid:
+            problems.append(f"Formato inválido: {_sample(invalid)}")
+        if conflicts["repeated"]:
+            problems.append(f"Repetidos en el lote: {_sample(conflicts['repeated'])}")
+        if conflicts["registered"]:
+            problems.append(f"Ya registrados: {_sample(conflicts['registered'])}")
+        if problems:
+            raise HTTPException(status_code=400, detail="; ".join(problems))
+
+        # 3. Instancias desde el staging
+        now = datetime.now()
+        cost = entry_data.cost or product.cost_price or 0
+        db.execute(
+            insert(PI).from_select(
+                ["product_id", "warehouse_id", "serial_number", "status", "cost", "created_at"],
+                select(
+                    literal(product.id), literal(entry_data.warehouse_id), _staging.c.serial_number,
+                    literal(models.ProductInstanceStatus.AVAILABLE, PI.status.type),
+                    literal(cost, PI.cost.type), literal(now, PI.created_at.type)
+                ).order_by(_staging.c.line_no)
+            )
+        )
+
+        # 4. Stock numérico: una actualización por producto y por almacén
+        qty_added = Decimal(len(serials))
+        new_stock = db.execute(
+            update(P).where(P.id == product.id).values(stock=func.coalesce(P.stock, 0) + qty_added)
+            .returning(P.stock)
+        ).scalar()
+        stock_id = db.execute(
+            select(PS.id).where(PS.product_id == product.id, PS.warehouse_id == entry_data.warehouse_id)
+            .with_for_update()
+        ).scalar()
+        if stock_id is None:
+            db.execute(insert(PS).values(product_id=product.id, warehouse_id=entry_data.warehouse_id, quantity=qty_added))
+        else:
+            db.execute(update(PS).where(PS.id == stock_id).values(quantity=PS.quantity + qty_added))
+
+        # 5. Un movimiento de kardex por lote
+        StockLedgerService.append(db, [{
+            "product_id": product.id,
+            "warehouse_id": entry_data.warehouse_id,
+            "movement_type": models.MovementType.PURCHASE,
+            "quantity": qty_added,
+            "balance_after": new_stock,
+            "description": f"Bulk Import ({int(qty_added)} Units). Ref: IMEIs {serials[0]}...{serials[-1]}",
+            "date": now
+        }])
+
+        return {
+            "status": "success",
+            "added_count": int(qty_added),
+            "new_stock_level": float(new_stock)
+        }
+
+    @staticmethod
+    def validate(db: Session, serials: List[str], product_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Disponibilidad para la venta de varios seriales (en el orden recibido).
+        Una consulta por cada _VALIDATE_BATCH seriales distintos.
+        """
+        PI = models.ProductInstance
+        normalized = [normalize_serial(s) for s in serials]
+        unique = list(dict.fromkeys(s for s in normalized if s))
+        found = {}
+        for start in range(0, len(unique), _VALIDATE_BATCH):
+            rows = db.execute(
+                select(PI.id, PI.serial_number, PI.product_id, PI.warehouse_id, PI.status)
+                .where(PI.serial_number.in_(unique[start:start + _VALIDATE_BATCH]))
+            ).all()
+            found.update((row.serial_number, row) for row in rows)
+
+        results, seen = [], set()
+        for serial in normalized:
+            row = found.get(serial)
+            result = {"serial": serial, "valid": False, "instance_id": None, "status": None, "warehouse_id": None}
+            if row is not None:
+                result.update(instance_id=row.id, status=row.status.value, warehouse_id=row.warehouse_id)
+
+            if not serial:
+                result["message"] = "Serial vacío."
+            elif serial in seen:
+                result["message"] = "Serial repetido en la lista."
+            elif row is None:
+                result["message"] = "Serial no encontrado en inventario."
+            elif product_id is not None and row.product_id != product_id:
+                result["message"] = "Serial pertenece a otro producto."
+            elif row.status != models.ProductInstanceStatus.AVAILABLE:
+                result["message"] = f"Serial no disponible (Estado: {row.status})"
+            else:
+                result.update(valid=True, message="Serial válido")
+            seen.add(serial)
+            results.append(result)
+        return results
@@ -0,0 +1,116 @@
+"""
+Serial Resolution Service
+Resuelve varios seriales (IMEIs) en una sola consulta: la instancia, su última venta
+(sale_detail_instances -> sale_details -> sales) y el vencimiento de la garantía.
+
+- Ventas: todos los seriales del carrito se resuelven y bloquean (FOR UPDATE OF
+  product_instances, en orden de id) antes de recorrer las líneas
+- Garantías / RMA: estado y vencimiento de uno o varios seriales sin consultas encadenadas
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
+
+from ..models import models
+from .serial_intake_service import normalize_serial
+
+DEFAULT_WARRANTY_DAYS = 90  # Ventas sin fecha de vencimiento registrada
+_RESOLVE_BATCH = 500
+
+
+class SerialResolutionService:
+
+    @staticmethod
+    def resolve(db: Session, serials: Iterable[str], lock: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        {serial normalizado: datos de la instancia y de su última venta} para los seriales que existen.
+        lock=True bloquea las filas de product_instances hasta el fin de la transacción.
+        """
+        PI, SDI, SD, S, C, P = (
+            models.ProductInstance, models.SaleDetailInstance, models.SaleDetail,
+            models.Sale, models.Customer, models.Product
+        )
+        latest = aliased(SDI)
+        last_link = select(func.max(latest.id)).where(latest.product_instance_id == PI.id).scalar_subquery()
+
+        unique = list(dict.fromkeys(s for s in (normalize_serial(s) for s in serials) if s))
+        resolved = {}
+        for start in range(0, len(unique), _RESOLVE_BATCH):
+            query = select(
+                PI.id, PI.serial_number, PI.product_id, PI.warehouse_id, PI.status,
+                P.name.label("product_name"),
+                SD.id.label("sale_detail_id"), SD.sale_id, SD.unit_price, SD.cost_at_sale,
+                S.date.label("sale_date"), S.warehouse_id.label("sale_warehouse_id"),
+                C.name.label("customer_name"),
+                func.coalesce(
+                    SDI.warranty_expiration_date, SDI.warranty_end_date, SD.warranty_expiration_date
+                ).label("warranty_expires")
+            ).join(P, P.id == PI.product_id
+            ).outerjoin(SDI, and_(SDI.product_instance_id == PI.id, SDI.id == last_link)
+            ).outerjoin(SD, SD.id == SDI.sale_detail_id
+            ).outerjoin(S, S.id == SD.sale_id
+            ).outerjoin(C, C.id == S.customer_id
+            ).where(PI.serial_number.in_(unique[start:start + _RESOLVE_BATCH])).order_by(PI.id)
+            if lock:
+                query = query.with_for_update(of=PI)
+            for row in db.execute(query):
+                resolved[row.serial_number] = dict(row._mapping)
+        return resolved
+
+    @staticmethod
+    def take_for_sale(resolved: Dict[str, Dict[str, Any]], serials: List[str], product_id: int,
+                      warehouse_id: int, taken: set) -> List[Dict[str, Any]]:
+        """
+        Instancias de una línea del carrito: deben existir, ser del producto, estar en el almacén y
+        DISPONIBLES, y no repetirse en el carrito (`taken` acumula las ya usadas).
+        """
+        instances, missing = [], []
+        for serial in (normalize_serial(s) for s in serials):
+            info = resolved.get(serial)
+            if (info is None or serial in taken or info["product_id"] != product_id
+                    or info["warehouse_id"] != warehouse_id
+                    or info["status"] != models.ProductInstanceStatus.AVAILABLE):
+                missing.append(serial)
+                continue
+            taken.add(serial)
+            instances.append(info)
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Serial numbers not found or unavailable in this warehouse: {missing}")
+        return instances
+
+    @staticmethod
+    def warranty(info: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Estado de garantía (formato de RMACheckResponse) a partir de un resultado de resolve()."""
+        if info is None:
+            return {"valid": False, "message": "IMEI no encontrado en el sistema.", "warranty_status": "NOT_FOUND"}
+        if info["status"] == models.ProductInstanceStatus.AVAILABLE:
+            return {
+                "valid": False,
+                "message": "El equipo figura como DISPONIBLE (No ha sido vendido).",
+                "warranty_status": "NOT_SOLD"
+            }
+        if info["sale_detail_id"] is None:
+            return {
+                "valid": False,
+                "message": "No se encontró registro de venta asociado a este serial.",
+                "warranty_status": "NO_SALE_RECORD"
+            }
+
+        now = now or datetime.now()
+        sale_date = info["sale_date"]
+        expires = info["warranty_expires"] or sale_date + timedelta(days=DEFAULT_WARRANTY_DAYS)
+        is_within_warranty = now <= expires
+        return {
+            "valid": True,  # Encontrado y vendido; aceptar una garantía vencida lo decide el encargado
+            "message": "Garantía Activa" if is_within_warranty else f"Garantía Vencida (hace {(now - expires).days} días)",
+            "sale_date": sale_date,
+            "customer_name": info["customer_name"] or "Cliente Casual",
+            "product_name": info["product_name"],
+            "days_elapsed": (now - sale_date).days,
+            "warranty_status": "ACTIVE" if is_within_warranty else "EXPIRED",
+            "warranty_expiration_date": expires,
+            "original_price": info["unit_price"]
+        }
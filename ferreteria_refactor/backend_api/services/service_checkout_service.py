@@ -166,7 +166,9 @@ class ServiceCheckoutService:
                             movement_type=models.MovementType.SALE, # Use Enum
                             quantity=-qty,
                             balance_after=prod.stock,
-                            description=f"Service Checkout #{order.ticket_number}"
+                            description=f"Service Checkout #{order.ticket_number}",
+                            # Mismo bucket que la existencia descontada (sin fila en el almacén 1 -> sin almacén)
+                            warehouse_id=stock_record.warehouse_id if stock_record else None
                         )
                         db.add(kardex)
 
@@ -0,0 +1,430 @@
+"""
+Stock Ledger Service
+El kardex como libro de stock de solo inserción:
+
+- Cada movimiento guarda el saldo corrido de su producto en su almacén (warehouse_balance),
+  calculado como saldo anterior del libro + cantidad (no desde product.stock global)
+- Fotos de existencias por almacén (stock_snapshots): la apertura del libro y el cierre de
+  cada mes. "Stock al día X" = foto anterior más cercana + movimientos desde entonces, así
+  una consulta o un recálculo recorre una foto y como máximo un mes de movimientos
+- Antes de cada foto se concilian el libro y product_stocks: las diferencias (stock cambiado
+  sin movimiento, p. ej. desde la ficha del producto) se registran como ajustes
+- Postgres: kardex particionada por mes sobre `date`; las particiones de los próximos meses
+  se crean al iniciar y en el hilo de mantenimiento
+
+Los escritores masivos usan StockLedgerService.append; las filas agregadas con el ORM se
+completan en before_insert. El saldo corrido asume que el escritor ya bloqueó la fila de
+product_stocks del producto (como las ventas, compras y transferencias).
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session, object_session
+
+from ..models import models
+
+ZERO = Decimal(0)
+SNAPSHOT_INTERVAL_SECONDS = 6 * 3600
+MAINTENANCE_LOCK_KEY = 0x4B415244  # pg_advisory_xact_lock: "KARD"
+PARTITION_MONTHS_AHEAD = 3
+_HEAD_BATCH = 500
+
+# Saldos de la transacción en curso (filas del ORM de un mismo flush)
+_HEADS_KEY = "stock_ledger_heads"
+
+Bucket = Tuple[int, Optional[int]]
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def month_end_after(day: date) -> date:
+    """Primer cierre de mes posterior a `day`."""
+    end = next_month(month_start(day)) - timedelta(days=1)
+    return end if end > day else next_month(day + timedelta(days=1)) - timedelta(days=1)
+
+
+def _today_start() -> datetime:
+    return datetime.combine(date.today(), datetime.min.time())
+
+
+def _bucket_filter(table, product_id: int, warehouse_id: Optional[int]):
+    warehouse = table.c.warehouse_id.is_(None) if warehouse_id is None else table.c.warehouse_id == warehouse_id
+    return and_(table.c.product_id == product_id, warehouse)
+
+
+class StockLedgerService:
+
+    _scheduler = None
+
+    # --- Saldo corrido ---
+
+    @staticmethod
+    def last_balances(connection, buckets: Iterable[Bucket]) -> Dict[Bucket, Decimal]:
+        """Último saldo del libro por (producto, almacén): una búsqueda por índice por cada uno."""
+        K = models.Kardex.__table__
+        buckets = list(dict.fromkeys(buckets))
+        balances = {}
+        for start in range(0, len(buckets), _HEAD_BATCH):
+            heads = [
+                select(K.c.id).where(_bucket_filter(K, pid, wid), K.c.warehouse_balance.isnot(None))
+                .order_by(K.c.id.desc()).limit(1).scalar_subquery()
+                for pid, wid in buckets[start:start + _HEAD_BATCH]
+            ]
+            for row in connection.execute(
+                select(K.c.product_id, K.c.warehouse_id, K.c.warehouse_balance).where(K.c.id.in_(heads))
+            ):
+                balances[(row.product_id, row.warehouse_id)] = _to_decimal(row.warehouse_balance)
+        return balances
+
+    @staticmethod
+    def append(db: Session, rows: List[dict]):
+        """
+        INSERT masivo de movimientos con su saldo corrido por almacén.
+        rows: dicts con las columnas de Kardex (product_id, warehouse_id, movement_type, quantity...)
+        """
+        if not rows:
+            return
+        connection = db.connection()
+        heads = StockLedgerService.last_balances(
+            connection, ((row["product_id"], row.get("warehouse_id")) for row in rows)
+        )
+        now = datetime.now()
+        for row in rows:
+            bucket = (row["product_id"], row.get("warehouse_id"))
+            heads[bucket] = heads.get(bucket, ZERO) + _to_decimal(row["quantity"])
+            row["warehouse_balance"] = heads[bucket]
+            row.setdefault("warehouse_id", None)
+            row.setdefault("date", now)
+        db.execute(insert(models.Kardex), rows)
+        _invalidate_snapshots(connection, min(row["date"] for row in rows))
+
+    # --- Stock a una fecha ---
+
+    @staticmethod
+    def snapshot_before(db: Session, at: datetime) -> Optional[date]:
+        """Foto más reciente que cubre solo movimientos anteriores a `at`."""
+        S = models.StockSnapshot
+        return db.execute(select(func.max(S.snapshot_date)).where(S.snapshot_date < at.date())).scalar()
+
+    @staticmethod
+    def stock_as_of(db: Session, at: datetime, warehouse_id: Optional[int] = None,
+                    product_ids: Optional[List[int]] = None, snapshot_date: Optional[date] = None):
+        """
+        SELECT (product_id, warehouse_id, quantity) con la existencia antes de `at`:
+        foto más cercana + movimientos con fecha en [día siguiente a la foto, at).
+
+        Args:
+            warehouse_id: Solo este almacén (None = todos, incluidos movimientos sin almacén)
+            snapshot_date: Foto base (por defecto snapshot_before(at))
+        """
+        S, K = models.StockSnapshot, models.Kardex
+        if snapshot_date is None:
+            snapshot_date = StockLedgerService.snapshot_before(db, at)
+
+        tail = select(
+            K.product_id.label("product_id"), K.warehouse_id.label("warehouse_id"), K.quantity.label("quantity")
+        ).where(K.date < at)
+        parts = []
+        if snapshot_date is not None:
+            parts.append(
+                select(S.product_id, S.warehouse_id, S.quantity).where(S.snapshot_date == snapshot_date)
+            )
+            tail = tail.where(K.date >= datetime.combine(snapshot_date + timedelta(days=1), datetime.min.time()))
+        parts.append(tail)
+
+        filtered = []
+        for part in parts:
+            table = part.selected_columns
+            if warehouse_id is not None:
+                part = part.where(table.warehouse_id == warehouse_id)
+            if product_ids is not None:
+                part = part.where(table.product_id.in_(product_ids))
+            filtered.append(part)
+
+        movements = union_all(*filtered).subquery("movements")
+        return select(
+            movements.c.product_id, movements.c.warehouse_id,
+            func.sum(movements.c.quantity).label("quantity")
+        ).group_by(movements.c.product_id, movements.c.warehouse_id)
+
+    # --- Fotos ---
+
+    @staticmethod
+    def _write_snapshot(db: Session, snapshot_date: date, source, is_opening: bool = False) -> int:
+        S = models.StockSnapshot
+        db.execute(delete(S).where(S.snapshot_date == snapshot_date))
+        rows = source.subquery("source")
+        result = db.execute(insert(S).from_select(
+            ["snapshot_date", "product_id", "warehouse_id", "quantity", "is_opening"],
+            select(
+                literal(snapshot_date), rows.c.product_id, rows.c.warehouse_id, rows.c.quantity,
+                literal(is_opening)
+            )
+        ))
+        return result.rowcount
+
+    @staticmethod
+    def reconcile(db: Session, description: str = "Conciliación de existencias con el kardex") -> int:
+        """
+        Registra como ajuste la diferencia entre product_stocks (y el stock global sin almacén)
+        y el último saldo del libro de cada producto. Retorna los ajustes registrados.
+        """
+        PS, P, K = models.ProductStock, models.Product, models.Kardex
+        current = {
+            (row.product_id, row.warehouse_id): _to_decimal(row.quantity)
+            for row in db.execute(select(PS.product_id, PS.warehouse_id, func.sum(PS.quantity).label("quantity"))
+                                  .group_by(PS.product_id, PS.warehouse_id))
+        }
+        # Sin almacén: lo que el stock global tiene de más sobre la suma de los almacenes
+        per_product = {}
+        for (pid, _), qty in current.items():
+            per_product[pid] = per_product.get(pid, ZERO) + qty
+        for pid, stock in db.execute(select(P.id, P.stock)):
+            unassigned = _to_decimal(stock) - per_product.get(pid, ZERO)
+            if unassigned != 0:
+                current[(pid, None)] = unassigned
+
+        latest = select(func.max(K.id).label("id")).where(K.warehouse_balance.isnot(None)) \
+            .group_by(K.product_id, K.warehouse_id).subquery()
+        ledger = {
+            (row.product_id, row.warehouse_id): _to_decimal(row.warehouse_balance)
+            for row in db.execute(select(K.product_id, K.warehouse_id, K.warehouse_balance).join(latest, latest.c.id == K.id))
+        }
+
+        now = datetime.now()
+        adjustments = []
+        for bucket in sorted(set(current) | set(ledger), key=lambda b: (b[0], b[1] or 0)):
+            difference = current.get(bucket, ZERO) - ledger.get(bucket, ZERO)
+            if difference == 0:
+                continue
+            product_id, warehouse_id = bucket
+            adjustments.append({
+                "product_id": product_id,
+                "warehouse_id": warehouse_id,
+                "movement_type": models.MovementType.ADJUSTMENT_IN if difference > 0 else models.MovementType.ADJUSTMENT_OUT,
+                "quantity": difference,
+                "balance_after": current.get(bucket, ZERO),
+                "description": description,
+                "date": now
+            })
+        StockLedgerService.append(db, adjustments)
+        return len(adjustments)
+
+    @staticmethod
+    def ensure_snapshots(db: Session, today: Optional[date] = None) -> List[date]:
+        """
+        Crea las fotos de cierre de los meses ya terminados que falten (cada una desde la
+        anterior + un mes de movimientos) y concilia el libro antes. Sin confirmar.
+        """
+        today = today or date.today()
+        S = models.StockSnapshot
+        latest = db.execute(select(func.max(S.snapshot_date))).scalar()
+        if latest is None:
+            StockLedgerService.rebuild(db)
+            latest = db.execute(select(func.max(S.snapshot_date))).scalar()
+
+        last_closed = month_start(today) - timedelta(days=1)
+        month_end = month_end_after(latest)
+        created = []
+        if month_end <= last_closed:
+            StockLedgerService.reconcile(db)
+        base = latest
+        while month_end <= last_closed:
+            source = StockLedgerService.stock_as_of(
+                db, datetime.combine(month_end + timedelta(days=1), datetime.min.time()), snapshot_date=base
+            )
+            StockLedgerService._write_snapshot(db, month_end, source)
+            created.append(month_end)
+            base = month_end
+            month_end = month_end_after(month_end)
+        return created
+
+    @staticmethod
+    def rebuild(db: Session) -> dict:
+        """
+        Reconstruye el libro desde cero (sin confirmar):
+        1. Foto de apertura (día anterior al primer movimiento) = existencia actual - suma del libro
+        2. Saldo corrido de cada movimiento = apertura + suma acumulada (en orden de id)
+        Luego ensure_snapshots crea los cierres de mes.
+        """
+        S, K, PS, P = models.StockSnapshot, models.Kardex, models.ProductStock, models.Product
+        db.execute(delete(S))
+        db.execute(delete(models.InventoryValuation))
+
+        first = db.execute(select(func.min(K.date))).scalar()
+        opening_date = (first.date() if first else date.today()) - timedelta(days=1)
+
+        current = {}
+        for row in db.execute(select(PS.product_id, PS.warehouse_id, func.sum(PS.quantity).label("quantity"))
+                              .group_by(PS.product_id, PS.warehouse_id)):
+            current[(row.product_id, row.warehouse_id)] = _to_decimal(row.quantity)
+        per_product = {}
+        for (pid, _), qty in current.items():
+            per_product[pid] = per_product.get(pid, ZERO) + qty
+        for pid, stock in db.execute(select(P.id, P.stock)):
+            current[(pid, None)] = _to_decimal(stock) - per_product.get(pid, ZERO)
+
+        totals = {
+            (row.product_id, row.warehouse_id): _to_decimal(row.quantity)
+            for row in db.execute(select(K.product_id, K.warehouse_id, func.sum(K.quantity).label("quantity"))
+                                  .group_by(K.product_id, K.warehouse_id))
+        }
+        opening = {
+            bucket: current.get(bucket, ZERO) - totals.get(bucket, ZERO)
+            for bucket in set(current) | set(totals)
+        }
+        opening_rows = [
+            {"snapshot_date": opening_date, "product_id": pid, "warehouse_id": wid, "quantity": qty, "is_opening": True}
+            for (pid, wid), qty in opening.items()
+        ]
+        if opening_rows:
+            db.execute(insert(S), opening_rows)
+
+        # Saldo corrido: apertura + SUM() OVER (PARTITION BY producto, almacén ORDER BY id)
+        running = select(
+            K.id.label("id"),
+            func.sum(K.quantity).over(
+                partition_by=(K.product_id, K.warehouse_id), order_by=K.id, rows=(None, 0)
+            ).label("running"),
+            func.coalesce(S.quantity, 0).label("opening")
+        ).outerjoin(S, and_(
+            S.snapshot_date == opening_date, S.product_id == K.product_id,
+            func.coalesce(S.warehouse_id, 0) == func.coalesce(K.warehouse_id, 0)
+        )).subquery("running")
+        table = K.__table__
+        db.execute(
+            table.update().where(table.c.id == running.c.id)
+            .values(warehouse_balance=running.c.opening + running.c.running)
+        )
+        return {"opening_date": opening_date, "opening_rows": len(opening_rows)}
+
+    # --- Particiones (Postgres) ---
+
+    @staticmethod
+    def ensure_partitions(connection, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+        """Crea las particiones mensuales de kardex desde el mes actual hasta `months_ahead` meses."""
+        if connection.dialect.name != "postgresql":
+            return []
+        kind = connection.execute(text("SELECT relkind FROM pg_class WHERE relname = 'kardex'")).scalar()
+        if kind != "p":
+            return []
+        created = []
+        start = month_start(date.today())
+        for _ in range(months_ahead + 1):
+            end = next_month(start)
+            name = f"kardex_y{start.year}m{start.month:02d}"
+            exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+            if exists is None:
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF kardex "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+                created.append(name)
+            start = end
+        return created
+
+    # --- Mantenimiento ---
+
+    @staticmethod
+    def acquire_maintenance_lock(db: Session) -> bool:
+        """
+        Un solo proceso (cada worker de uvicorn tiene su hilo de mantenimiento) reconstruye,
+        concilia y escribe fotos a la vez. El lock dura hasta el fin de la transacción.
+        Postgres: False si otro proceso lo tiene. SQLite: espera el lock de escritura.
+        """
+        connection = db.connection()
+        if connection.dialect.name == "postgresql":
+            return bool(connection.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}
+            ).scalar())
+        # Escritura vacía: toma el lock de escritura antes de leer las fotos existentes
+        connection.execute(delete(models.StockSnapshot).where(models.StockSnapshot.id == -1))
+        return True
+
+    @staticmethod
+    def run_maintenance():
+        """Particiones futuras + fotos de cierre pendientes, con sesión propia."""
+        from ..database.db import SessionLocal
+        db = SessionLocal()
+        try:
+            if not StockLedgerService.acquire_maintenance_lock(db):
+                db.rollback()
+                return
+            partitions = StockLedgerService.ensure_partitions(db.connection())
+            snapshots = StockLedgerService.ensure_snapshots(db)
+            db.commit()
+            if partitions or snapshots:
+                print(f"[KARDEX] Particiones creadas: {partitions} | Fotos de cierre: {[str(d) for d in snapshots]}")
+        except Exception as e:
+            db.rollback()
+            print(f"[KARDEX] WARN: Mantenimiento del libro de stock falló: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def start_scheduler(interval: int = SNAPSHOT_INTERVAL_SECONDS):
+        """Hilo daemon: run_maintenance al iniciar y cada `interval` segundos. Idempotente."""
+        if StockLedgerService._scheduler is not None and StockLedgerService._scheduler.is_alive():
+            return StockLedgerService._scheduler
+
+        def _loop():
+            while True:
+                StockLedgerService.run_maintenance()
+                time.sleep(interval)
+
+        StockLedgerService._scheduler = threading.Thread(target=_loop, name="stock-ledger", daemon=True)
+        StockLedgerService._scheduler.start()
+        return StockLedgerService._scheduler
+
+
+# --- Invalidación de fotos ---
+# Un movimiento con fecha anterior a hoy puede caer antes de una foto ya escrita:
+# se eliminan las fotos de cierre desde esa fecha (la apertura se conserva) y las
+# valuaciones de cierre guardadas.
+
+def _invalidate_snapshots(connection, since: Optional[datetime]):
+    if since is None or since >= _today_start():
+        return
+    S = models.StockSnapshot.__table__
+    connection.execute(delete(S).where(S.c.snapshot_date >= since.date(), S.c.is_opening == False))
+    V = models.InventoryValuation.__table__
+    connection.execute(delete(V).where(V.c.valuation_date >= since.date()))
+
+
+@event.listens_for(models.Kardex, "before_insert")
+def _stamp_balance(mapper, connection, target):
+    if target.warehouse_balance is not None:
+        return
+    session = object_session(target)
+    heads = session.info.setdefault(_HEADS_KEY, {}) if session is not None else {}
+    bucket = (target.product_id, target.warehouse_id)
+    if bucket not in heads:
+        heads[bucket] = StockLedgerService.last_balances(connection, [bucket]).get(bucket, ZERO)
+    heads[bucket] += _to_decimal(target.quantity)
+    target.warehouse_balance = heads[bucket]
+
+
+@event.listens_for(models.Kardex, "after_insert")
+def _kardex_inserted(mapper, connection, target):
+    _invalidate_snapshots(connection, target.date)
+
+
+@event.listens_for(Session, "after_flush")
+def _clear_heads(session, flush_context):
+    session.info.pop(_HEADS_KEY, None)
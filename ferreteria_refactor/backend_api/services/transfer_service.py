@@ -0,0 +1,160 @@
+"""
+Transfer Service
+Transferencias de inventario entre almacenes por lotes:
+
+- Agrupa las líneas por producto (un producto repetido se mueve una sola vez)
+- Precarga y bloquea las existencias de origen y destino en una consulta, en orden de id
+  (dos transferencias o una venta concurrentes esperan en vez de leer cantidades viejas)
+- Escribe con UPDATE/INSERT masivos: existencias de ambos lados, detalle y kardex
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .. import schemas
+from .stock_ledger_service import StockLedgerService
+
+ZERO = Decimal(0)
+
+# (product_id, warehouse_id) -> {"id": id de product_stocks o None, "quantity": Decimal}
+StockMap = Dict[Tuple[int, int], dict]
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class TransferService:
+
+    @staticmethod
+    def aggregate(lines: Iterable[Tuple[int, object]]) -> Dict[int, Decimal]:
+        """Cantidad total por producto, ordenado por id de producto."""
+        totals = defaultdict(lambda: ZERO)
+        for product_id, quantity in lines:
+            quantity = _to_decimal(quantity)
+            if quantity <= 0:
+                raise HTTPException(status_code=400, detail=f"Invalid quantity for product ID {product_id}: {quantity}")
+            totals[product_id] += quantity
+        return dict(sorted(totals.items()))
+
+    @staticmethod
+    def lock_stocks(db: Session, product_ids: List[int], warehouse_ids: List[int]) -> StockMap:
+        """
+        Existencias de los productos en los almacenes, bloqueadas en orden de id.
+        Las combinaciones sin fila quedan con id None y cantidad 0 (se insertan al escribir).
+        """
+        S = models.ProductStock
+        stocks = {
+            (row.product_id, row.warehouse_id): {"id": row.id, "quantity": _to_decimal(row.quantity)}
+            for row in db.execute(
+                select(S.id, S.product_id, S.warehouse_id, S.quantity).where(
+                    S.product_id.in_(product_ids),
+                    S.warehouse_id.in_(warehouse_ids)
+                ).order_by(S.id).with_for_update()
+            )
+        }
+        for product_id in product_ids:
+            for warehouse_id in warehouse_ids:
+                stocks.setdefault((product_id, warehouse_id), {"id": None, "quantity": ZERO})
+        return stocks
+
+    @staticmethod
+    def write_stocks(db: Session, stocks: StockMap, keys: Iterable[Tuple[int, int]]):
+        """UPDATE masivo de las filas existentes e INSERT masivo de las que faltan."""
+        updates, inserts = [], []
+        for product_id, warehouse_id in keys:
+            stock = stocks[(product_id, warehouse_id)]
+            if stock["id"] is not None:
+                updates.append({"id": stock["id"], "quantity": stock["quantity"]})
+            else:
+                inserts.append({"product_id": product_id, "warehouse_id": warehouse_id, "quantity": stock["quantity"]})
+        if updates:
+            db.execute(update(models.ProductStock), updates)
+        if inserts:
+            db.execute(insert(models.ProductStock), inserts)
+
+    @staticmethod
+    def product_names(db: Session, product_ids: List[int]) -> Dict[int, str]:
+        """Nombres de los productos; 404 si alguno no existe."""
+        names = dict(db.execute(
+            select(models.Product.id, models.Product.name).where(models.Product.id.in_(product_ids))
+        ).all())
+        missing = [pid for pid in product_ids if pid not in names]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Products not found: {missing}")
+        return names
+
+    @staticmethod
+    def execute(
+        db: Session,
+        transfer: models.InventoryTransfer,
+        items: List[schemas.TransferDetailCreate]
+    ) -> Dict[int, Decimal]:
+        """
+        Mueve las existencias de una transferencia (ya guardada, con id) sin confirmar.
+        Verifica todas las líneas antes de escribir y reporta todos los faltantes juntos.
+
+        Returns:
+            Cantidad movida por producto
+        """
+        quantities = TransferService.aggregate((item.product_id, item.quantity) for item in items)
+        if not quantities:
+            raise HTTPException(status_code=400, detail="Transfer has no items")
+        product_ids = list(quantities)
+        source_id, target_id = transfer.source_warehouse_id, transfer.target_warehouse_id
+
+        names = TransferService.product_names(db, product_ids)
+        stocks = TransferService.lock_stocks(db, product_ids, [source_id, target_id])
+
+        shortages = [
+            f"Insufficient stock for product '{names[pid]}'. "
+            f"Available: {stocks[(pid, source_id)]['quantity']}, Requested: {qty}"
+            for pid, qty in quantities.items() if stocks[(pid, source_id)]["quantity"] < qty
+        ]
+        if shortages:
+            raise HTTPException(status_code=400, detail="; ".join(shortages))
+
+        # Pasada en memoria: ambos lados y un par de movimientos de kardex por producto
+        movement_date = transfer.date or datetime.now()
+        kardex_rows = []
+        for pid, qty in quantities.items():
+            source, target = stocks[(pid, source_id)], stocks[(pid, target_id)]
+            source["quantity"] -= qty
+            target["quantity"] += qty
+            kardex_rows.append({
+                "product_id": pid,
+                "warehouse_id": source_id,
+                "movement_type": models.MovementType.TRANSFER_OUT,
+                "quantity": -qty,
+                "balance_after": source["quantity"],
+                "description": f"Transferencia #{transfer.id} hacia almacén {target_id}",
+                "date": movement_date
+            })
+            kardex_rows.append({
+                "product_id": pid,
+                "warehouse_id": target_id,
+                "movement_type": models.MovementType.TRANSFER_IN,
+                "quantity": qty,
+                "balance_after": target["quantity"],
+                "description": f"Transferencia #{transfer.id} desde almacén {source_id}",
+                "date": movement_date
+            })
+
+        # Escrituras masivas
+        TransferService.write_stocks(
+            db, stocks, [(pid, wid) for pid in product_ids for wid in (source_id, target_id)]
+        )
+        db.execute(insert(models.TransferDetail), [
+            {"transfer_id": transfer.id, "product_id": pid, "quantity": qty}
+            for pid, qty in quantities.items()
+        ])
+        StockLedgerService.append(db, kardex_rows)
+        return quantities
@@ -0,0 +1,70 @@
+"""
+Cachés en memoria para datos calientes (por proceso).
+
+TTLCache es un LRU acotado con expiración por entrada. Es thread-safe porque
+los endpoints síncronos de FastAPI se ejecutan en el threadpool.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Caché LRU con tamaño máximo y tiempo de vida (segundos) por entrada.
+
+    Args:
+        maxsize: Número máximo de entradas antes de expulsar la menos usada
+        ttl: Tiempo de vida por defecto de cada entrada
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retorna el valor si existe y no ha expirado."""
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Guarda un valor. `ttl` sobreescribe el tiempo de vida por defecto."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Elimina una entrada (invalidación explícita)."""
+        with self._lock:
+            entry = self._data.pop(key, self._MISSING)
+        if entry is self._MISSING:
+            return default
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, self._MISSING) is not self._MISSING
@@ -11,6 +11,9 @@ class WebSocketEvents:
     EXCHANGE_RATE_CREATED = "exchange_rate:created"
     EXCHANGE_RATE_DELETED = "exchange_rate:deleted"
     
+    # Price Table (precios en moneda local versionados)
+    PRICE_TABLE_UPDATED = "price_table:updated"
+    
     # Products
     PRODUCT_UPDATED = "product:updated"
     PRODUCT_CREATED = "product:created"
@@ -18,6 +21,7 @@ class WebSocketEvents:
     PRODUCT_STOCK_UPDATED = "product:stock_updated"
     PRODUCT_LOW_STOCK = "product:low_stock"
     PRODUCT_OUT_OF_STOCK = "product:out_of_stock"
+    PRODUCTS_BULK_UPDATED = "product:bulk_updated"  # Varios productos en un solo evento (compras)
     
     # Cash Sessions
     CASH_SESSION_OPENED = "cash_session:opened"
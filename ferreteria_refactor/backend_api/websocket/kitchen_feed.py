@@ -0,0 +1,155 @@
+"""
+Kitchen Feed
+Flujo de eventos de la pantalla de cocina (KDS) por estación:
+
+- Cada estación (categoría del producto, "general" si no tiene) numera sus eventos (seq)
+- Los últimos KITCHEN_FEED_BUFFER eventos de cada estación quedan en un buffer circular
+- Los eventos de orden (cobrada, cambio de mesa) se registran en cada estación con items de la
+  orden; la pantalla los aplica por order_id, así que recibirlos más de una vez no cambia nada
+- Una pantalla que se reconecta envía su último seq por estación y recibe solo lo que le faltó.
+  Si ya salió del buffer, o el servidor se reinició (otra `epoch`), se le pide recargar
+  GET /restaurant/orders/kitchen/pending
+"""
+import json
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket
+
+from ..config import settings
+from .manager import manager
+
+ALL_STATIONS = "*"
+DEFAULT_STATION = "general"
+
+
+def station_for(product) -> str:
+    """Estación de cocina de un producto: su categoría."""
+    category_id = getattr(product, "category_id", None)
+    return str(category_id) if category_id else DEFAULT_STATION
+
+
+class KitchenEvents:
+    ITEM_ADDED = "kitchen:item_added"
+    ITEM_UPDATED = "kitchen:item_updated"  # Cantidad cambiada (división de cuenta)
+    ITEM_STATUS = "kitchen:item_status"
+    ITEM_CANCELLED = "kitchen:item_cancelled"
+    ITEM_REMOVED = "kitchen:item_removed"  # Pasó completo a otra orden (división de cuenta)
+    ORDER_CLOSED = "kitchen:order_closed"
+    ORDER_MOVED = "kitchen:order_moved"
+    SUBSCRIBED = "kitchen:subscribed"
+
+
+class KitchenFeed:
+    def __init__(self, buffer_size: int):
+        self.epoch = uuid.uuid4().hex[:12]  # Cambia en cada arranque: invalida los cursores viejos
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()  # record() corre en el threadpool de los endpoints sync
+        self._sequences: Dict[str, int] = {}
+        self._buffers: Dict[str, deque] = {}
+        self._subscribers: Dict[WebSocket, Set[str]] = {}
+
+    def record(self, station: str, event_type: str, data: dict) -> dict:
+        """Numera y guarda un evento. Se llama al confirmar el cambio (orden = orden de commit)."""
+        with self._lock:
+            seq = self._sequences.get(station, 0) + 1
+            self._sequences[station] = seq
+            event = {
+                "type": event_type,
+                "station": station,
+                "seq": seq,
+                "epoch": self.epoch,
+                "data": data,
+                "timestamp": datetime.now().isoformat()
+            }
+            buffer = self._buffers.get(station)
+            if buffer is None:
+                buffer = self._buffers[station] = deque(maxlen=self.buffer_size)
+            buffer.append(event)
+        return event
+
+    def record_order(self, products: Iterable, event_type: str, data: dict) -> List[dict]:
+        """Evento de una orden completa: uno por cada estación de sus productos."""
+        stations = sorted({station_for(product) for product in products}) or [DEFAULT_STATION]
+        return [self.record(station, event_type, data) for station in stations]
+
+    def cursors(self, stations: Iterable[str] = None) -> Dict[str, int]:
+        with self._lock:
+            if stations is None or ALL_STATIONS in stations:
+                return dict(self._sequences)
+            return {station: self._sequences.get(station, 0) for station in stations}
+
+    def replay(self, station: str, since: int) -> Optional[List[dict]]:
+        """Eventos de `station` posteriores a `since`; None si ya no están todos en el buffer."""
+        with self._lock:
+            last = self._sequences.get(station, 0)
+            buffer = list(self._buffers.get(station, ()))
+        if since == last:
+            return []
+        if since > last or not buffer or buffer[0]["seq"] > since + 1:
+            return None
+        return [event for event in buffer if event["seq"] > since]
+
+    async def subscribe(self, websocket: WebSocket, stations: List[str], epoch: str = None,
+                        cursors: Dict[str, int] = None):
+        """
+        Registra la pantalla y le envía lo que se perdió.
+        `resync` en la respuesta indica que debe recargar las órdenes pendientes y
+        continuar desde los cursores recibidos.
+        """
+        stations = set(stations or [ALL_STATIONS])
+        self._subscribers[websocket] = stations
+
+        missed, resync = [], epoch != self.epoch or cursors is None
+        if not resync:
+            known = self.cursors(stations)
+            for station in set(known) | set(cursors):
+                if ALL_STATIONS not in stations and station not in stations:
+                    continue
+                events = self.replay(station, int(cursors.get(station, 0)))
+                if events is None:
+                    resync = True
+                    break
+                missed.extend(events)
+
+        current = self.cursors(stations)
+        await websocket.send_text(json.dumps({
+            "type": KitchenEvents.SUBSCRIBED,
+            "epoch": self.epoch,
+            "stations": sorted(stations),
+            "cursors": current,
+            "resync": resync
+        }))
+        if not resync:
+            missed.sort(key=lambda event: event["timestamp"])
+            for event in missed:
+                await websocket.send_text(json.dumps(event, default=manager._json_serializer))
+
+    def unsubscribe(self, websocket: WebSocket):
+        self._subscribers.pop(websocket, None)
+
+    async def publish(self, events: List[dict]):
+        """Envía eventos ya registrados a las pantallas suscritas a su estación."""
+        disconnected = []
+        for websocket, stations in list(self._subscribers.items()):
+            for event in events:
+                if ALL_STATIONS not in stations and event["station"] not in stations:
+                    continue
+                try:
+                    await websocket.send_text(json.dumps(event, default=manager._json_serializer))
+                except Exception as e:
+                    print(f"[KDS] Error sending to display: {e}")
+                    disconnected.append(websocket)
+                    break
+        for websocket in disconnected:
+            self.unsubscribe(websocket)
+
+    def get_subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# Global instance
+kitchen_feed = KitchenFeed(settings.KITCHEN_FEED_BUFFER)
@@ -23,7 +23,8 @@ const ProductCard = ({
     currentStock = 0,
     currencySymbol = '$',
     convertProductPrice, // Function from context to get VES price
-    isSelected = false
+    isSelected = false,
+    thumbnailSrc = null // Object URL del paquete de miniaturas (si ya se cargó)
 }) => {
 
     // Calculate Dual Price
@@ -52,7 +53,8 @@ const ProductCard = ({
                     {/* We can use the existing ProductThumbnail but larger, or render img directly for object-cover */}
                     {product.image_url ? (
                         <img
-                            src={product.image_url}
+                            src={thumbnailSrc || product.thumbnail_url || product.image_url}
+                            loading="lazy"
                             alt={product.name}
                             className="w-full h-full object-contain mix-blend-multiply group-hover:scale-110 transition-transform duration-500"
                             onError={(e) => { e.target.style.display = 'none'; }}
@@ -1,12 +1,44 @@
-import { useState } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import apiClient from '../../config/axios';
 import { Download, Upload, FileSpreadsheet, FileText, AlertCircle, CheckCircle, X } from 'lucide-react';
 import toast from 'react-hot-toast';
 
+const MAX_POLL_FAILURES = 10;
+
 const BulkProductActions = ({ onImportComplete }) => {
     const [uploading, setUploading] = useState(false);
     const [showImportModal, setShowImportModal] = useState(false);
     const [importResult, setImportResult] = useState(null);
+    const [upsertJob, setUpsertJob] = useState(null);
+    const pollFailures = useRef(0);
+
+    // Poll del trabajo de actualización de precios hasta que termine.
+    // Un error aislado (worker reiniciando, red) no da el trabajo por fallido: se reintenta
+    useEffect(() => {
+        if (!upsertJob || upsertJob.status === 'done' || upsertJob.status === 'failed') return;
+        const timer = setTimeout(async () => {
+            try {
+                const response = await apiClient.get(`/products/import/jobs/${upsertJob.id}`);
+                pollFailures.current = 0;
+                setUpsertJob(response.data);
+                if (response.data.status === 'done') {
+                    toast.success(`✅ ${response.data.created} creados, ${response.data.updated} actualizados, ${response.data.unchanged} sin cambios`);
+                    if (onImportComplete) onImportComplete();
+                } else if (response.data.status === 'failed') {
+                    toast.error(response.data.detail || 'Error al actualizar precios');
+                }
+            } catch (error) {
+                console.error('Error polling import job:', error);
+                pollFailures.current += 1;
+                if (pollFailures.current >= MAX_POLL_FAILURES) {
+                    setUpsertJob({ ...upsertJob, status: 'failed', detail: 'No se pudo consultar el avance' });
+                } else {
+                    setUpsertJob({ ...upsertJob });  // Reintentar en el próximo ciclo
+                }
+            }
+        }, pollFailures.current ? 3000 : 1000);
+        return () => clearTimeout(timer);
+    }, [upsertJob, onImportComplete]);
 
     const downloadTemplate = async () => {
         try {
@@ -75,6 +107,33 @@ const BulkProductActions = ({ onImportComplete }) => {
         }
     };
 
+    const handleUpsertUpload = async (event) => {
+        const file = event.target.files[0];
+        if (!file) return;
+
+        if (!file.name.endsWith('.xlsx') && !file.name.endsWith('.csv')) {
+            toast.error('Solo se permiten archivos .xlsx o .csv');
+            return;
+        }
+
+        const formData = new FormData();
+        formData.append('file', file);
+
+        try {
+            const response = await apiClient.post('/products/import/upsert', formData, {
+                headers: { 'Content-Type': 'multipart/form-data' }
+            });
+            setImportResult(null);
+            pollFailures.current = 0;
+            setUpsertJob(response.data);
+        } catch (error) {
+            console.error('Error starting price update:', error);
+            toast.error(error.response?.data?.detail || 'Error al iniciar la actualización');
+        } finally {
+            event.target.value = '';
+        }
+    };
+
     const exportToExcel = async () => {
         try {
             toast.loading('Generando archivo Excel...');
@@ -223,6 +282,51 @@ const BulkProductActions = ({ onImportComplete }) => {
                                 {uploading ? 'Subiendo...' : 'Seleccionar Archivo Excel'}
                             </label>
 
+                            {/* Actualizar precios (crea nuevos, actualiza existentes por SKU) */}
+                            <input
+                                type="file"
+                                accept=".xlsx,.csv"
+                                onChange={handleUpsertUpload}
+                                disabled={upsertJob?.status === 'pending' || upsertJob?.status === 'running'}
+                                className="hidden"
+                                id="file-upsert-modal"
+                            />
+                            <label
+                                htmlFor="file-upsert-modal"
+                                className="w-full flex items-center justify-center gap-2 px-4 py-3 rounded-lg transition-colors cursor-pointer border border-blue-600 text-blue-700 hover:bg-blue-50"
+                            >
+                                <FileSpreadsheet size={18} />
+                                Actualizar Lista de Precios (.xlsx / .csv)
+                            </label>
+
+                            {upsertJob && (
+                                <div className="p-3 rounded-lg bg-gray-50 border border-gray-200 text-sm space-y-2">
+                                    <p className="font-semibold text-gray-800">
+                                        {upsertJob.status === 'done' ? 'Actualización completada'
+                                            : upsertJob.status === 'failed' ? `Error: ${upsertJob.detail || ''}`
+                                                : `Procesando ${upsertJob.processed_rows}${upsertJob.total_rows ? ` de ${upsertJob.total_rows}` : ''} filas...`}
+                                    </p>
+                                    {upsertJob.total_rows > 0 && (
+                                        <div className="w-full bg-gray-200 rounded h-2">
+                                            <div
+                                                className="bg-blue-600 h-2 rounded"
+                                                style={{ width: `${Math.min(100, (upsertJob.processed_rows / upsertJob.total_rows) * 100)}%` }}
+                                            />
+                                        </div>
+                                    )}
+                                    <p className="text-gray-600">
+                                        {upsertJob.created} nuevos · {upsertJob.updated} actualizados · {upsertJob.unchanged} sin cambios · {upsertJob.error_count} errores
+                                    </p>
+                                    {upsertJob.errors.length > 0 && (
+                                        <ul className="max-h-32 overflow-y-auto text-red-700 space-y-1">
+                                            {upsertJob.errors.slice(0, 5).map((error, idx) => (
+                                                <li key={idx}>• {error}</li>
+                                            ))}
+                                        </ul>
+                                    )}
+                                </div>
+                            )}
+
                             {/* Import Result */}
                             {importResult && (
                                 <div className={`p-3 rounded-lg ${importResult.success ? 'bg-green-50 border border-green-200' : 'bg-red-50 border border-red-200'
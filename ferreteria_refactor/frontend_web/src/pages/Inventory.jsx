@@ -30,7 +30,7 @@ const Inventory = () => {
     }, []);
 
     const getMovementStyle = (type) => {
-        if (['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE', 'OUT'].includes(type)) {
+        if (['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE', 'OUT', 'TRANSFER_OUT', 'EXTERNAL_TRANSFER_OUT'].includes(type)) {
             return { color: 'text-rose-600', icon: <ArrowDownCircle size={16} className="mr-1.5" />, bg: 'bg-rose-50', border: 'border-rose-100' };
         }
         return { color: 'text-emerald-600', icon: <ArrowUpCircle size={16} className="mr-1.5" />, bg: 'bg-emerald-50', border: 'border-emerald-100' };
@@ -43,7 +43,11 @@ const Inventory = () => {
             'ADJUSTMENT_IN': 'Ajuste Entrada',
             'ADJUSTMENT_OUT': 'Ajuste Salida',
             'DAMAGED': 'Dañado',
-            'INTERNAL_USE': 'Uso Interno'
+            'INTERNAL_USE': 'Uso Interno',
+            'TRANSFER_IN': 'Transferencia Entrada',
+            'TRANSFER_OUT': 'Transferencia Salida',
+            'EXTERNAL_TRANSFER_IN': 'Transferencia Externa Entrada',
+            'EXTERNAL_TRANSFER_OUT': 'Transferencia Externa Salida'
         };
         return labels[type] || type;
     };
@@ -150,7 +154,7 @@ const Inventory = () => {
                                             </span>
                                         </td>
                                         <td className={`px-6 py-4 whitespace-nowrap text-sm text-right font-black ${style.color}`}>
-                                            {['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE'].includes(item.movement_type) ? '-' : '+'}{item.quantity}
+                                            {Number(item.quantity) < 0 ? '' : (['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE'].includes(item.movement_type) ? '-' : '+')}{item.quantity}
                                         </td>
                                         <td className="px-6 py-4 whitespace-nowrap text-sm text-right font-bold text-slate-700 bg-slate-50/50">
                                             {item.balance_after}
@@ -204,7 +208,7 @@ const Inventory = () => {
                                     </div>
                                     <div className="text-right">
                                         <div className={`text-lg font-black ${style.color}`}>
-                                            {['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE'].includes(item.movement_type) ? '-' : '+'}{item.quantity}
+                                            {Number(item.quantity) < 0 ? '' : (['SALE', 'ADJUSTMENT_OUT', 'DAMAGED', 'INTERNAL_USE'].includes(item.movement_type) ? '-' : '+')}{item.quantity}
                                         </div>
                                         <div className="text-[10px] text-slate-400 font-bold bg-slate-100 px-2 py-0.5 rounded-full inline-block mt-0.5">
                                             Saldo: {item.balance_after}
@@ -20,8 +20,8 @@ const MobileTableGrid = () => {
 
     const loadTables = async () => {
         try {
-            const data = await restaurantService.getTables();
-            setTables(data);
+            const data = await restaurantService.getFloorState();
+            setTables(data.tables);
             setLoading(false);
         } catch (error) {
             console.error(error);
@@ -20,6 +20,7 @@ import useBarcodeScanner from '../hooks/useBarcodeScanner';
 import ServiceImportModal from './POS/ServiceImportModal';
 import SerializedItemModal from '../components/pos/SerializedItemModal';
 import ProductCard from '../components/pos/ProductCard';
+import imageBundleService from '../services/imageBundleService';
 import POSSettingsModal from '../components/pos/POSSettingsModal';
 import PinAuthModal from '../components/common/PinAuthModal'; // NEW
 import { DEFAULT_THEME, POS_THEMES } from '../constants/posThemes';
@@ -268,6 +269,15 @@ const POS = () => {
     // ... Filter Logic ...
     const filteredCatalog = catalog.filter(p => p.name.toLowerCase().includes(searchTerm.toLowerCase())); // Simplified for replace block
 
+    // Miniaturas de la grilla en un solo paquete (en vez de una petición por producto)
+    const [thumbnails, setThumbnails] = useState({});
+    useEffect(() => {
+        if (catalog.length === 0) return;
+        imageBundleService.loadThumbnails(catalog)
+            .then(setThumbnails)
+            .catch(error => console.warn('Thumbnail bundle failed, using per-image URLs:', error));
+    }, [catalog]);
+
     // ... Categories Logic ...
     const rootCategories = categories.filter(cat => !cat.parent_id);
 
@@ -704,6 +714,7 @@ const POS = () => {
                                 <ProductCard
                                     key={product.id}
                                     product={product}
+                                    thumbnailSrc={thumbnails[product.id]}
                                     onClick={handleProductClick}
                                     currentStock={currentStock}
                                     currencySymbol={anchorCurrency.symbol}
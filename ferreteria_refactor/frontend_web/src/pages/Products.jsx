@@ -90,10 +90,17 @@ const Products = () => {
             setProducts(prev => prev.filter(p => p.id !== deletedProduct.id));
         });
 
+        // Compras: un solo evento con todos los productos afectados
+        const unsubBulk = subscribe('product:bulk_updated', (payload) => {
+            const changes = new Map((payload.products || []).map(p => [p.id, p]));
+            setProducts(prev => prev.map(p => changes.has(p.id) ? { ...p, ...changes.get(p.id) } : p));
+        });
+
         return () => {
             unsubCreate();
             unsubUpdate();
             unsubDelete();
+            unsubBulk();
         };
     }, [subscribe]);
 
@@ -3,6 +3,8 @@ import kitchenService from '../../services/kitchenService';
 import { Clock, CheckCircle, Flame, ChefHat, AlertTriangle, RefreshCw } from 'lucide-react';
 import toast from 'react-hot-toast';
 
+const KITCHEN_ACTIVE = ['PENDING', 'PREPARING'];
+
 const KitchenDisplay = () => {
     const [orders, setOrders] = useState([]);
     const [loading, setLoading] = useState(true);
@@ -19,11 +21,41 @@ const KitchenDisplay = () => {
         }
     };
 
-    // Polling every 10 seconds
+    // Deltas desde el flujo de cocina (sin polling)
+    const applyEvent = ({ type, data }) => {
+        setOrders(prev => {
+            let next;
+            if (type === 'kitchen:item_added' || type === 'kitchen:item_updated') {
+                const exists = prev.find(o => o.id === data.order_id);
+                if (!exists) {
+                    next = [...prev, { id: data.order_id, table_id: data.table_id, created_at: data.order_created_at, items: [data.item] }];
+                } else {
+                    next = prev.map(o => o.id !== data.order_id ? o : {
+                        ...o, items: [...o.items.filter(i => i.id !== data.item.id), data.item]
+                    });
+                }
+            } else if (type === 'kitchen:item_removed') {
+                next = prev.map(o => o.id !== data.order_id ? o : {
+                    ...o, items: o.items.filter(i => i.id !== data.item_id)
+                });
+            } else if (type === 'kitchen:order_closed') {
+                next = prev.filter(o => o.id !== data.order_id);
+            } else if (type === 'kitchen:order_moved') {
+                next = prev.map(o => o.id !== data.order_id ? o : { ...o, table_id: data.table_id });
+            } else {
+                next = prev.map(o => o.id !== data.order_id ? o : {
+                    ...o, items: o.items.map(i => i.id === data.item_id ? { ...i, status: data.status } : i)
+                });
+            }
+            // Igual que /kitchen/pending: solo órdenes con algo pendiente o en preparación
+            return next.filter(o => o.items.some(i => KITCHEN_ACTIVE.includes(i.status)));
+        });
+        setLastUpdated(new Date());
+    };
+
     useEffect(() => {
         fetchOrders();
-        const interval = setInterval(fetchOrders, 10000);
-        return () => clearInterval(interval);
+        return kitchenService.connectFeed({ onEvent: applyEvent, onResync: fetchOrders });
     }, []);
 
     const handleStatusChange = async (itemId, newStatus) => {
@@ -32,7 +64,7 @@ const KitchenDisplay = () => {
             // Let's do optimistic to feel snappy
             await kitchenService.updateItemStatus(itemId, newStatus);
             toast.success(`Hiciste click en ${newStatus}`);
-            fetchOrders(); // Sync with server
+            // El cambio llega por el flujo de cocina
         } catch (error) {
             toast.error('Error actualizando estado');
         }
@@ -0,0 +1,53 @@
+import apiClient from '../config/axios';
+
+// Miniaturas ya cargadas: thumbnail_url (con hash del contenido) -> object URL
+const loaded = new Map();
+const MAX_IDS = 500;
+
+/**
+ * Paquete de miniaturas (GET /products/images/bundle):
+ *   "IMGB" | uint32 BE largo del índice | índice JSON | imágenes concatenadas
+ * Índice: { items: [[product_id, offset, length], ...], missing: [ids] }
+ */
+const parseBundle = (buffer) => {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'IMGB') throw new Error('Paquete de imágenes inválido');
+    const indexLength = view.getUint32(4);
+    const index = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, indexLength)));
+    const dataStart = 8 + indexLength;
+    return index.items.map(([productId, offset, length]) => [
+        productId,
+        new Blob([new Uint8Array(buffer, dataStart + offset, length)], { type: 'image/webp' })
+    ]);
+};
+
+const imageBundleService = {
+    /**
+     * Carga en una sola petición las miniaturas que falten de los productos dados.
+     * Devuelve { [product_id]: object URL } de todos los que tienen miniatura.
+     */
+    loadThumbnails: async (products) => {
+        const withThumb = products.filter(p => p.thumbnail_url);
+        const pending = withThumb.filter(p => !loaded.has(p.thumbnail_url)).slice(0, MAX_IDS);
+
+        if (pending.length > 0) {
+            const byId = new Map(pending.map(p => [p.id, p.thumbnail_url]));
+            const response = await apiClient.get('/products/images/bundle', {
+                params: { ids: pending.map(p => p.id).join(','), size: 'thumb' },
+                responseType: 'arraybuffer'
+            });
+            for (const [productId, blob] of parseBundle(response.data)) {
+                if (byId.has(productId)) loaded.set(byId.get(productId), URL.createObjectURL(blob));
+            }
+        }
+
+        const result = {};
+        for (const p of withThumb) {
+            if (loaded.has(p.thumbnail_url)) result[p.id] = loaded.get(p.thumbnail_url);
+        }
+        return result;
+    }
+};
+
+export default imageBundleService;
@@ -12,6 +12,67 @@ const kitchenService = {
             params: { status }
         });
         return response.data;
+    },
+
+    /**
+     * Flujo de cocina por WebSocket (/api/v1/ws/kitchen).
+     * Reconecta enviando el último seq por estación; el servidor reenvía solo lo perdido
+     * o pide recargar (onResync) si ya no lo tiene.
+     */
+    connectFeed: ({ stations = ['*'], onEvent, onResync }) => {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const wsUrl = import.meta.env.DEV
+            ? 'ws://127.0.0.1:8000/api/v1/ws/kitchen'
+            : `${protocol}//${window.location.host}/api/v1/ws/kitchen`;
+
+        let socket = null;
+        let epoch = null;
+        let cursors = null;
+        let retry = 0;
+        let closed = false;
+        let pingTimer = null;
+        let retryTimer = null;
+
+        const open = () => {
+            socket = new WebSocket(wsUrl);
+            socket.onopen = () => {
+                retry = 0;
+                socket.send(JSON.stringify({ type: 'subscribe', stations, epoch, cursors }));
+                pingTimer = setInterval(() => socket.readyState === WebSocket.OPEN && socket.send('ping'), 30000);
+            };
+            socket.onmessage = (message) => {
+                if (message.data === 'pong') return;
+                const event = JSON.parse(message.data);
+                if (event.type === 'kitchen:subscribed') {
+                    epoch = event.epoch;
+                    if (event.resync) {
+                        // Recargar y seguir desde los cursores actuales del servidor
+                        cursors = { ...event.cursors };
+                        onResync();
+                    }
+                    return;
+                }
+                // Eventos ya aplicados (replay y envío en vivo pueden solaparse)
+                const last = cursors[event.station] || 0;
+                if (event.seq <= last) return;
+                cursors[event.station] = event.seq;
+                onEvent(event);
+            };
+            socket.onclose = () => {
+                clearInterval(pingTimer);
+                if (closed) return;
+                retryTimer = setTimeout(open, Math.min(1000 * 2 ** retry++, 30000));
+            };
+            socket.onerror = () => socket.close();
+        };
+
+        open();
+        return () => {
+            closed = true;
+            clearInterval(pingTimer);
+            clearTimeout(retryTimer);
+            socket?.close();
+        };
     }
 };
 
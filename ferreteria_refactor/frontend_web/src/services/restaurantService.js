@@ -7,6 +7,12 @@ const restaurantService = {
         return response.data;
     },
 
+    // Estado agregado del mapa de mesas (orden abierta, items, total, comanda más antigua)
+    getFloorState: async () => {
+        const response = await axiosInstance.get('/restaurant/tables/floor');
+        return response.data;
+    },
+
     createTable: async (tableData) => {
         const response = await axiosInstance.post('/restaurant/tables/', tableData);
         return response.data;
@@ -21,8 +21,9 @@ const unifiedReportService = {
     },
 
     // Inventory
-    getInventoryValuation: async (exchangeRate = 1.0) => {
-        const response = await apiClient.get('/reports/inventory-valuation', { params: { exchange_rate: exchangeRate } });
+    getInventoryValuation: async (exchangeRate = 1.0, params = {}) => {
+        // params: { as_of, warehouse_id, group_by: 'warehouse' | 'category' }
+        const response = await apiClient.get('/reports/inventory-valuation', { params: { exchange_rate: exchangeRate, ...params } });
         return response.data;
     },
 
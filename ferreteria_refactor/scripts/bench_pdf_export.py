@@ -0,0 +1,71 @@
+"""
+Benchmark: PDF del catálogo (ProductExportService.catalog_pdf).
+
+Crea N productos en una BD SQLite temporal y genera el PDF: primero en frío (en el proceso de
+exportación si N >= PDF_WORKER_MIN_ROWS) y luego desde la caché. Reporta tiempo, páginas,
+tamaño y memoria máxima del proceso principal.
+
+Uso:
+    python scripts/bench_pdf_export.py --rows 50000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# BD temporal (también la usa el proceso de exportación, que hereda el entorno
+# y vuelve a importar este módulo al arrancar)
+DB_PATH = os.environ.setdefault("BENCH_PDF_DB", os.path.join(tempfile.mkdtemp(), "bench_pdf.db"))
+os.environ["DB_URL"] = f"sqlite:///{DB_PATH}"
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+
+from backend_api.database.db import Base, engine, SessionLocal
+from backend_api.models import models
+from backend_api.services import product_export_service
+from backend_api.services.product_export_service import ProductExportService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+    product_export_service.EXPORTS_DIR = os.path.join(os.path.dirname(DB_PATH), "exports")
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([models.Category(name=f"Categoria {i}") for i in range(40)])
+        db.commit()
+        db.execute(insert(models.Product), [
+            {"name": f"Producto {i}", "sku": f"SKU-{i}", "price": 1 + i % 97 * 0.5,
+             "stock": i % 50, "category_id": 1 + i % 40}
+            for i in range(args.rows)
+        ])
+        db.commit()
+
+        t0 = time.perf_counter()
+        path = ProductExportService.catalog_pdf(db)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ProductExportService.catalog_pdf(db)
+        cached = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    with open(path, "rb") as f:
+        pages = f.read().count(b"/Type /Page\n")
+    in_worker = product_export_service._executor is not None
+    mode = "proceso aparte" if in_worker else "en línea"
+    print(f"{args.rows} productos -> {pages} páginas, {os.path.getsize(path) / 1e6:.1f} MB ({mode})")
+    print(f"Generación: {cold:.2f}s  |  Desde caché: {cached * 1000:.1f}ms")
+    print(f"Memoria máxima del proceso principal: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: importación de productos desde Excel (ProductImportService).
+
+Genera un catálogo de proveedor con N filas (con categorías, proveedores, SKUs repetidos y
+algunas filas inválidas), lo importa en una BD SQLite temporal y mide tiempo y consultas.
+
+Uso:
+    python scripts/bench_product_import.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend_api.database.db import Base
+from backend_api.models import models
+from backend_api.services.product_import_service import ProductImportService
+
+N_CATEGORIES = 40
+N_SUPPLIERS = 25
+
+
+def build_catalog(rows: int) -> bytes:
+    data = {
+        "nombre": [f"Producto {i}" for i in range(rows)],
+        "precio_usd": [None if i % 3 == 0 else round(1 + i % 97 * 0.5, 2) for i in range(rows)],
+        "stock": [i % 50 for i in range(rows)],
+        "sku": [f"SKU-{i}" for i in range(rows)],
+        "categoria": [f"Categoria {i % N_CATEGORIES}" for i in range(rows)],
+        "proveedor": [f"Proveedor {i % N_SUPPLIERS}" for i in range(rows)],
+        "costo": [round(0.5 + i % 89 * 0.3, 2) for i in range(rows)],
+        "margen_ganancia": [30] * rows,
+        "iva": [16] * rows,
+    }
+    df = pd.DataFrame(data).astype({"stock": object})
+    # ~1% de filas con errores: SKU repetido, stock inválido, categoría inexistente
+    df.loc[df.index % 250 == 1, "sku"] = "SKU-0"
+    df.loc[df.index % 250 == 2, "stock"] = "n/a"
+    df.loc[df.index % 250 == 3, "categoria"] = "No existe"
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def setup_db(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    db = Session()
+    db.add_all([models.Category(name=f"Categoria {i}") for i in range(N_CATEGORIES)])
+    db.add_all([models.Supplier(name=f"Proveedor {i}") for i in range(N_SUPPLIERS)])
+    db.commit()
+    db.close()
+    return engine, Session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"Generando catálogo de {args.rows} filas...")
+    t0 = time.perf_counter()
+    content = build_catalog(args.rows)
+    print(f"  {len(content) / 1024 / 1024:.1f} MB en {time.perf_counter() - t0:.1f}s")
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine, Session = setup_db(f"sqlite:///{path}")
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    db = Session()
+    try:
+        t0 = time.perf_counter()
+        products, errors = ProductImportService.parse_excel_to_products(content, db)
+        t_parse = time.perf_counter() - t0
+        parse_queries = len(statements)
+
+        t0 = time.perf_counter()
+        created = ProductImportService.bulk_create_products(products, db)
+        t_insert = time.perf_counter() - t0
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(path)
+
+    print(f"Lectura + validación: {t_parse:.2f}s ({parse_queries} consultas)")
+    print(f"Inserción:            {t_insert:.2f}s ({len(statements) - parse_queries} sentencias)")
+    print(f"Creados: {created}  |  Filas con error: {len(set(e.split(':')[0] for e in errors))}")
+    print(f"Total: {args.rows / (t_parse + t_insert):.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: ventas concurrentes en SQLite (perfil por defecto vs perfil de escritorio).
+
+Simula cajas registrando ventas (Sale + SaleDetail + ProductStock + Kardex) mientras
+otros hilos consultan reportes, que es el patrón que produce "database is locked".
+
+Uso:
+    python scripts/bench_sqlite_sales.py --writers 8 --readers 4 --sales 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from backend_api.database.db import Base
+from backend_api.database.sqlite_profile import apply_pragmas, SQLiteWriteGate, create_read_engine
+from backend_api.models import models
+
+N_PRODUCTS = 200
+
+
+def setup_db(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    wh = models.Warehouse(name="Principal", is_main=True, is_active=True)
+    db.add(wh)
+    db.flush()
+    for i in range(N_PRODUCTS):
+        p = models.Product(name=f"Bench {i}", sku=f"BENCH-{i}", price=Decimal("10"), stock=Decimal("1000000"))
+        db.add(p)
+        db.flush()
+        db.add(models.ProductStock(product_id=p.id, warehouse_id=wh.id, quantity=Decimal("1000000")))
+    warehouse_id = wh.id
+    db.commit()
+    db.close()
+    engine.dispose()
+    return warehouse_id
+
+
+def run(profile, writers, readers, sales_per_writer):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    url = f"sqlite:///{path}"
+    warehouse_id = setup_db(url)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    WriteSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    read_engine = engine
+    if profile == "desktop":
+        apply_pragmas(engine)
+        SQLiteWriteGate().install(WriteSession)
+        read_engine = create_read_engine(url)
+    ReadSession = sessionmaker(bind=read_engine)
+
+    errors = []
+    done = threading.Event()
+    reads = [0]
+
+    def writer(n):
+        for i in range(sales_per_writer):
+            db = WriteSession()
+            try:
+                sale = models.Sale(total_amount=Decimal("30"), payment_method="Efectivo", warehouse_id=warehouse_id)
+                db.add(sale)
+                db.flush()
+                for k in range(3):
+                    product_id = (n * sales_per_writer + i * 3 + k) % N_PRODUCTS + 1
+                    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+                    product.stock -= 1
+                    stock = db.query(models.ProductStock).filter(
+                        models.ProductStock.product_id == product_id,
+                        models.ProductStock.warehouse_id == warehouse_id
+                    ).first()
+                    stock.quantity -= 1
+                    db.add(models.SaleDetail(
+                        sale_id=sale.id, product_id=product_id, quantity=1,
+                        unit_price=Decimal("10"), subtotal=Decimal("10")
+                    ))
+                    db.add(models.Kardex(
+                        product_id=product_id, movement_type=models.MovementType.SALE,
+                        quantity=-1, balance_after=product.stock, warehouse_id=warehouse_id
+                    ))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                errors.append(str(e).splitlines()[0])
+            finally:
+                db.close()
+
+    def reader():
+        while not done.is_set():
+            db = ReadSession()
+            try:
+                db.query(func.sum(models.SaleDetail.subtotal)).scalar()
+                db.query(models.Product.id, models.Product.stock).all()
+                reads[0] += 1
+            except Exception as e:
+                errors.append(str(e).splitlines()[0])
+            finally:
+                db.close()
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in reader_threads:
+        t.start()
+    start = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in reader_threads:
+        t.join()
+
+    engine.dispose()
+    read_engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    total = writers * sales_per_writer - len([e for e in errors if "locked" in e])
+    print(
+        f"{profile:>8}: {total} ventas en {elapsed:.2f}s -> {total / elapsed:.1f} ventas/s, "
+        f"{reads[0]} lecturas, {len(errors)} errores"
+    )
+    for e in sorted(set(errors))[:3]:
+        print(f"          - {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--sales", type=int, default=50, help="Ventas por hilo escritor")
+    args = parser.parse_args()
+
+    for profile in ("default", "desktop"):
+        run(profile, args.writers, args.readers, args.sales)
@@ -0,0 +1,46 @@
+"""
+Regenera las miniaturas / tamaños de las imágenes de productos (ImageService.SIZES).
+
+- Sin argumentos: solo productos a los que les falta algún tamaño, y migra las imágenes
+  anteriores ({id}.webp) a nombres con hash
+- --force: vuelve a generar todos los tamaños (p. ej. después de cambiar SIZES o QUALITY)
+
+Uso:
+    python scripts/regenerate_product_images.py [--force] [--product 12 --product 15]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend_api.database.db import SessionLocal
+from backend_api.services.image_service import ImageService, IMAGES_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force", action="store_true", help="Regenerar aunque ya existan todos los tamaños")
+    parser.add_argument("--product", type=int, action="append", help="Solo este producto (repetible)")
+    args = parser.parse_args()
+
+    print(f"Directorio de imágenes: {IMAGES_DIR}")
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        result = ImageService.regenerate(db, product_ids=args.product, force=args.force)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"Procesadas: {result['processed']}  |  URL actualizada: {result['renamed']}  |  "
+          f"Sin archivo original: {result['missing_source']}  ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Mantenimiento del libro de stock (kardex): fotos de cierre, conciliación y reconstrucción.
+
+- Sin argumentos: crea las particiones futuras (Postgres) y las fotos de cierre que falten
+- --reconcile: registra como ajuste las diferencias entre product_stocks y el kardex
+- --rebuild: borra las fotos, recalcula la apertura y todos los saldos corridos y vuelve
+  a crear las fotos de cierre (después de importar datos o corregir movimientos a mano)
+
+Uso:
+    python scripts/stock_ledger.py [--reconcile] [--rebuild]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend_api.database.db import SessionLocal
+from backend_api.services.stock_ledger_service import StockLedgerService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reconcile", action="store_true", help="Registrar ajustes por diferencias con product_stocks")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular apertura, saldos corridos y fotos")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        if not StockLedgerService.acquire_maintenance_lock(db):
+            print("Otro proceso está haciendo el mantenimiento del kardex; intente más tarde.")
+            return
+        partitions = StockLedgerService.ensure_partitions(db.connection())
+        if partitions:
+            print(f"Particiones creadas: {', '.join(partitions)}")
+        if args.rebuild:
+            result = StockLedgerService.rebuild(db)
+            print(f"Apertura del libro: {result['opening_date']} ({result['opening_rows']} existencias)")
+        if args.reconcile:
+            print(f"Ajustes de conciliación: {StockLedgerService.reconcile(db)}")
+        snapshots = StockLedgerService.ensure_snapshots(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"Fotos de cierre creadas: {', '.join(str(d) for d in snapshots) or 'ninguna'}  "
+          f"({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
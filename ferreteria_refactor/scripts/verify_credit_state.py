@@ -0,0 +1,41 @@
+"""
+Verifica customer_credit_state contra un recálculo completo desde las facturas.
+
+Pensado para ejecutarse periódicamente (tarea programada / cron). Retorna código 1
+si encuentra diferencias, para que el programador de tareas lo reporte.
+
+Uso:
+    python scripts/verify_credit_state.py          # solo reportar
+    python scripts/verify_credit_state.py --fix    # corregir las diferencias
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import backend_api modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend_api.database.db import SessionLocal
+from backend_api.services.credit_state_service import CreditStateService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fix", action="store_true", help="Corregir las filas con diferencias")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = CreditStateService.verify(db, fix=args.fix)
+    finally:
+        db.close()
+
+    for m in mismatches:
+        print(f"Cliente #{m['customer_id']}: guardado={m['stored']} esperado={m['expected']}")
+    action = "corregidas" if args.fix else "encontradas"
+    print(f"{len(mismatches)} diferencia(s) {action}")
+    return 1 if mismatches and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,9 +9,10 @@ from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 
 from backend_api.main import app
-from backend_api.database.db import Base, get_db
+from backend_api.database.db import Base, get_db, get_read_db
 from backend_api.models import models
 from backend_api.security import create_access_token, get_password_hash
+from backend_api.dependencies import invalidate_user_cache
 
 # In-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -26,6 +27,7 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database for each test."""
+    invalidate_user_cache()  # Principals cacheados de tests anteriores
     Base.metadata.create_all(bind=engine)
     session = TestingSessionLocal()
     
@@ -75,6 +77,7 @@ def client(db_session):
             pass
             
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
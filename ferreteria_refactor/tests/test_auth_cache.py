@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.security import create_access_token
+from backend_api import dependencies
+
+
+@pytest.fixture
+def cashier(db_session: Session):
+    user = models.User(username="cashier_cache", password_hash="hash", role=models.UserRole.CASHIER, is_active=True)
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+def test_token_and_principal_are_cached(client: TestClient, cashier):
+    token = create_access_token(data={"sub": cashier.username})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/v1/cash/sessions/current", headers=headers)
+    assert response.status_code == 404  # Autenticado, sin caja abierta
+
+    assert token in dependencies._token_cache
+    principal = dependencies._principal_cache.get(cashier.username)
+    assert principal is not None
+    assert principal.id == cashier.id
+    assert principal.role == models.UserRole.CASHIER
+
+
+def test_deactivation_invalidates_principal(client: TestClient, cashier, auth_headers):
+    token = create_access_token(data={"sub": cashier.username})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/v1/cash/sessions/current", headers=headers).status_code == 404
+
+    response = client.delete(f"/api/v1/users/{cashier.id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert dependencies._principal_cache.get(cashier.username) is None
+
+    response = client.get("/api/v1/cash/sessions/current", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+
+def test_role_change_invalidates_principal(client: TestClient, cashier, auth_headers):
+    token = create_access_token(data={"sub": cashier.username})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # El resumen de comisiones es solo para ADMIN
+    assert client.get("/api/v1/commissions/summary", headers=headers).status_code == 403
+
+    response = client.put(f"/api/v1/users/{cashier.id}", json={"role": "ADMIN"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/commissions/summary", headers=headers).status_code != 403
+
+
+def test_validate_pin_lockout(client: TestClient, db_session: Session):
+    from backend_api.services.pin_service import pin_verifier
+    supervisor = models.User(username="supervisor_pin", password_hash="hash", role=models.UserRole.ADMIN, pin="4321", is_active=True)
+    db_session.add(supervisor)
+    db_session.commit()
+    pin_verifier.invalidate()
+
+    ok = client.post("/api/v1/auth/validate-pin", json={"user_id": supervisor.id, "pin": "4321"})
+    assert ok.json()["valid"] is True
+
+    for _ in range(pin_verifier.max_attempts):
+        bad = client.post("/api/v1/auth/validate-pin", json={"user_id": supervisor.id, "pin": "0000"})
+        assert bad.json()["valid"] is False
+
+    locked = client.post("/api/v1/auth/validate-pin", json={"user_id": supervisor.id, "pin": "4321"})
+    assert locked.status_code == 429
+    pin_verifier._failures.clear()
+
+
+def test_login_rehashes_on_work_factor_change(client: TestClient, db_session: Session):
+    from passlib.context import CryptContext
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4)
+    user = models.User(username="rehash_me", password_hash=old_context.hash("secret"), role=models.UserRole.CASHIER, is_active=True)
+    db_session.add(user)
+    db_session.commit()
+
+    response = client.post("/api/v1/auth/token", data={"username": "rehash_me", "password": "secret"})
+    assert response.status_code == 200
+
+    db_session.refresh(user)
+    assert not user.password_hash.startswith("$2b$04$")
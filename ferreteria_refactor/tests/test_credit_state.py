@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from backend_api import schemas
+from backend_api.models import models
+from backend_api.services.credit_state_service import CreditStateService
+from backend_api.services.sales_service import SalesService
+
+
+def open_invoice(db: Session, customer, amount: str, due_in_days: int = 15):
+    sale = models.Sale(
+        total_amount=Decimal(amount),
+        customer_id=customer.id,
+        is_credit=True,
+        paid=False,
+        balance_pending=Decimal(amount),
+        due_date=datetime.now() + timedelta(days=due_in_days),
+    )
+    db.add(sale)
+    db.commit()
+    return sale
+
+
+def state_of(db: Session, customer):
+    return db.get(models.CustomerCreditState, customer.id, populate_existing=True)
+
+
+@pytest.fixture
+def customer(db_session: Session):
+    customer = models.Customer(name="Ferretería Cliente", credit_limit=Decimal("100"), payment_term_days=15)
+    db_session.add(customer)
+    db_session.commit()
+    return customer
+
+
+def test_state_follows_sales_and_payments(db_session: Session, customer, client: TestClient, auth_headers):
+    first = open_invoice(db_session, customer, "40", due_in_days=5)
+    open_invoice(db_session, customer, "30", due_in_days=20)
+    state = state_of(db_session, customer)
+    assert state.outstanding_balance == Decimal("70")
+    assert state.open_invoices == 2
+    assert state.oldest_due_date == first.due_date
+
+    SalesService.register_payment(db_session, schemas.SalePaymentCreate(
+        sale_id=first.id, amount=Decimal("350"), currency="Bs", exchange_rate=Decimal("35")
+    ))
+    assert state_of(db_session, customer).outstanding_balance == Decimal("60")
+
+    # Pago FIFO del cliente: liquida la primera factura
+    response = client.post(
+        f"/api/v1/customers/{customer.id}/payments",
+        json={"amount": 35, "currency": "USD", "payment_method": "Efectivo", "exchange_rate": 1},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    state = state_of(db_session, customer)
+    assert state.outstanding_balance == Decimal("25")
+    assert state.open_invoices == 1
+    assert state.oldest_due_date > first.due_date
+
+    status = client.get(f"/api/v1/customers/{customer.id}/financial-status").json()
+    assert status["total_debt"] == 25.0
+    assert status["available_credit"] == 75.0
+    assert status["overdue_invoices"] == 0
+    assert CreditStateService.verify(db_session) == []
+
+
+def test_credit_check_uses_state(db_session: Session, customer):
+    open_invoice(db_session, customer, "90")
+    sale = schemas.SaleCreate(
+        customer_id=customer.id, is_credit=True, items=[], total_amount=Decimal("20"), total_amount_bs=0
+    )
+    with pytest.raises(HTTPException) as exc:
+        SalesService.create_sale(db_session, sale, user_id=1)
+    assert exc.value.status_code == 400
+    assert "Excede límite de crédito" in exc.value.detail
+
+    db_session.rollback()
+    open_invoice(db_session, customer, "5", due_in_days=-1)
+    with pytest.raises(HTTPException) as exc:
+        SalesService.create_sale(db_session, sale, user_id=1)
+    assert "1 factura(s) vencida(s)" in exc.value.detail
+
+
+def test_verify_detects_and_fixes_drift(db_session: Session, customer):
+    open_invoice(db_session, customer, "50")
+    state = state_of(db_session, customer)
+    state.outstanding_balance = Decimal("999")
+    db_session.commit()
+
+    mismatches = CreditStateService.verify(db_session, fix=True)
+    assert [m["customer_id"] for m in mismatches] == [customer.id]
+    assert state_of(db_session, customer).outstanding_balance == Decimal("50")
+    assert CreditStateService.verify(db_session) == []
@@ -0,0 +1,132 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.models import models
+
+
+def make_credit_sale(db: Session, customer, days_ago: int, balance: str, paid: bool = False):
+    sale = models.Sale(
+        date=datetime.now() - timedelta(days=days_ago, hours=1),
+        total_amount=Decimal(balance),
+        customer_id=customer.id,
+        is_credit=True,
+        paid=paid,
+        balance_pending=Decimal("0") if paid else Decimal(balance),
+    )
+    db.add(sale)
+    return sale
+
+
+@pytest.fixture
+def debtors(db_session: Session):
+    big = models.Customer(name="Constructora Grande", credit_limit=100000)
+    small = models.Customer(name="Cliente Pequeño", credit_limit=1000)
+    db_session.add_all([big, small])
+    db_session.flush()
+
+    make_credit_sale(db_session, big, 3, "100")     # current
+    make_credit_sale(db_session, big, 15, "50")     # current (15 días)
+    make_credit_sale(db_session, big, 20, "200")    # 15-30
+    make_credit_sale(db_session, big, 45, "300")    # 30-60
+    make_credit_sale(db_session, big, 90, "400")    # 60+
+    make_credit_sale(db_session, big, 90, "999", paid=True)  # pagada: no cuenta
+    make_credit_sale(db_session, small, 31, "10")   # 30-60
+    db_session.commit()
+    return big, small
+
+
+def test_aging_report_buckets(client: TestClient, debtors):
+    big, small = debtors
+    response = client.get("/api/v1/credits/aging-report")
+    assert response.status_code == 200
+    rows = {r["client_id"]: r for r in response.json()}
+
+    assert rows[big.id]["client_name"] == "Constructora Grande"
+    assert rows[big.id]["total_debt"] == 1050.0
+    assert rows[big.id]["current"] == 150.0
+    assert rows[big.id]["days_15_30"] == 200.0
+    assert rows[big.id]["days_30_60"] == 300.0
+    assert rows[big.id]["days_60_plus"] == 400.0
+
+    assert rows[small.id]["total_debt"] == 10.0
+    assert rows[small.id]["days_30_60"] == 10.0
+
+
+def test_aging_report_sorted_and_paginated(client: TestClient, debtors):
+    big, small = debtors
+    response = client.get("/api/v1/credits/aging-report?sort=total_debt&order=asc&limit=1")
+    assert [r["client_id"] for r in response.json()] == [small.id]
+
+    response = client.get("/api/v1/credits/aging-report?sort=total_debt&limit=1&offset=1")
+    assert [r["client_id"] for r in response.json()] == [small.id]
+
+
+@pytest.fixture
+def ledger_client(db_session: Session):
+    customer = models.Customer(name="Cliente Estado de Cuenta", credit_limit=5000)
+    db_session.add(customer)
+    db_session.flush()
+    for days_ago, total in [(40, "100"), (30, "250"), (20, "80"), (10, "40")]:
+        sale = make_credit_sale(db_session, customer, days_ago, total)
+        db_session.flush()
+        db_session.add(models.SalePayment(sale_id=sale.id, amount=Decimal("20"), currency="USD", exchange_rate=1))
+        db_session.add(models.SalePayment(sale_id=sale.id, amount=Decimal("700"), currency="Bs", exchange_rate=35))
+    db_session.commit()
+    return customer
+
+
+def test_client_ledger_running_balance(client: TestClient, ledger_client):
+    data = client.get(f"/api/v1/credits/client/{ledger_client.id}/ledger").json()
+    ledger = data["ledger"]
+
+    assert len(ledger) == 12
+    assert [e["type"] for e in ledger[:3]] == ["VENTA", "ABONO", "ABONO"]
+    assert ledger[2]["credit"] == 20.0
+    assert ledger[2]["ref"].endswith("(700.0000 Bs @ 35.0)")
+    assert ledger[2]["balance"] == 60.0
+    assert data["current_balance"] == 310.0 == ledger[-1]["balance"]
+
+
+def test_client_ledger_cursor_and_date_range(client: TestClient, ledger_client):
+    url = f"/api/v1/credits/client/{ledger_client.id}/ledger"
+    full = client.get(url).json()["ledger"]
+
+    pages, cursor = [], None
+    while True:
+        data = client.get(url, params={"limit": 5, **({"cursor": cursor} if cursor else {})}).json()
+        pages.extend(data["ledger"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert pages == full
+
+    since = (datetime.now() - timedelta(days=25)).date().isoformat()
+    data = client.get(url, params={"start_date": since}).json()
+    assert data["opening_balance"] == 270.0
+    assert data["ledger"] == full[6:]
+
+
+def test_client_ledger_checkpoints(client: TestClient, db_session: Session, ledger_client, monkeypatch):
+    from backend_api.config import settings
+    from backend_api.services.ledger_service import CustomerLedgerService
+    monkeypatch.setattr(settings, "LEDGER_CHECKPOINT_INTERVAL", 4)
+    url = f"/api/v1/credits/client/{ledger_client.id}/ledger"
+
+    assert CustomerLedgerService.refresh_checkpoints(ledger_client.id, db=db_session) == 3
+    checkpoints = db_session.query(models.CustomerLedgerCheckpoint).filter_by(customer_id=ledger_client.id).all()
+    assert [float(c.balance) for c in checkpoints] == [310.0, 330.0, 310.0]
+
+    data = client.get(url, params={"limit": 8}).json()
+    data = client.get(url, params={"cursor": data["next_cursor"]}).json()
+    assert [e["balance"] for e in data["ledger"]] == [310.0, 350.0, 330.0, 310.0]
+
+    # Abono a una factura vieja: invalida los checkpoints desde su fecha
+    oldest = db_session.query(models.Sale).filter_by(customer_id=ledger_client.id).order_by(models.Sale.date).first()
+    db_session.add(models.SalePayment(sale_id=oldest.id, amount=Decimal("10"), currency="USD", exchange_rate=1))
+    db_session.commit()
+    assert db_session.query(models.CustomerLedgerCheckpoint).filter_by(customer_id=ledger_client.id).count() == 0
+
+    data = client.get(url).json()
+    assert data["current_balance"] == 300.0
@@ -0,0 +1,75 @@
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services.effective_price_service import COLUMNS, EffectivePriceService
+
+
+def rows_by_key(data):
+    return {tuple(r[:4]): dict(zip(COLUMNS, r)) for r in data["rows"]}
+
+
+def test_catalog_changes_refresh_effective_prices(client: TestClient, db_session: Session):
+    wholesale = models.PriceList(name="Mayorista", requires_auth=True)
+    product = models.Product(
+        name="Cemento", sku="CEM-EP", price=Decimal("11.60"), tax_rate=Decimal("16"),
+        discount_percentage=Decimal("10"), is_discount_active=True
+    )
+    product.units.append(models.ProductUnit(unit_name="Paleta", conversion_factor=Decimal("5")))
+    product.price_rules.append(models.PriceRule(min_quantity=Decimal("10"), price=Decimal("10.50")))
+    db_session.add_all([wholesale, product])
+    db_session.flush()
+    db_session.add(models.ProductPrice(product_id=product.id, price_list_id=wholesale.id, price=Decimal("9")))
+    db_session.commit()  # Sin rebuild explícito: se recalcula al confirmar
+
+    pallet = product.units[0]
+    data = client.get("/api/v1/price-lists/effective-prices").json()
+    rows = rows_by_key(data)
+    assert set(rows) == {
+        (product.id, 0, 0, 0.0), (product.id, pallet.id, 0, 0.0), (product.id, 0, 0, 10.0),
+        (product.id, 0, wholesale.id, 0.0), (product.id, pallet.id, wholesale.id, 0.0),
+    }
+    base = rows[(product.id, 0, 0, 0.0)]
+    assert base["final_price"] == 10.44           # 11.60 - 10%
+    assert base["tax_amount"] == 1.44             # Impuesto incluido (16%)
+    assert rows[(product.id, pallet.id, 0, 0.0)]["final_price"] == 52.2
+    assert rows[(product.id, pallet.id, wholesale.id, 0.0)]["final_price"] == 45.0
+    assert rows[(product.id, 0, wholesale.id, 0.0)]["requires_auth"] is True
+    since = data["version"]
+
+    # Cambio de precio y eliminación de la regla: solo las filas afectadas en el delta
+    product.is_discount_active = False
+    db_session.delete(product.price_rules[0])
+    db_session.commit()
+
+    delta = client.get("/api/v1/price-lists/effective-prices", params={"since": since}).json()
+    assert delta["full"] is True  # Hubo filas eliminadas
+    rows = rows_by_key(delta)
+    assert (product.id, 0, 0, 10.0) not in rows
+    assert rows[(product.id, 0, 0, 0.0)]["final_price"] == 11.6
+
+    product.price = Decimal("12")
+    db_session.commit()
+    delta = client.get("/api/v1/price-lists/effective-prices", params={"since": delta["version"]}).json()
+    assert delta["full"] is False
+    assert set(rows_by_key(delta)) == {(product.id, 0, 0, 0.0), (product.id, pallet.id, 0, 0.0)}
+
+
+def test_lookup_resolves_cart_in_one_query(db_session: Session):
+    vip = models.PriceList(name="VIP")
+    product = models.Product(name="Tubo", sku="TUB-EP", price=Decimal("4"))
+    db_session.add_all([vip, product])
+    db_session.flush()
+    db_session.add(models.ProductPrice(product_id=product.id, price_list_id=vip.id, price=Decimal("3.5")))
+    db_session.commit()
+
+    found = EffectivePriceService.lookup(db_session, [
+        (product.id, 0, vip.id), (product.id, 0, vip.id), (product.id, 0, 999)
+    ])
+    assert list(found) == [(product.id, 0, vip.id)]
+    assert found[(product.id, 0, vip.id)].final_price == Decimal("3.5")
+
+    # Lista desactivada: sus filas desaparecen (create_sale usa la consulta directa)
+    vip.is_active = False
+    db_session.commit()
+    assert EffectivePriceService.lookup(db_session, [(product.id, 0, vip.id)]) == {}
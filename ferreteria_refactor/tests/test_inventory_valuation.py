@@ -0,0 +1,93 @@
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services.stock_ledger_service import StockLedgerService
+
+
+def test_current_valuation_by_warehouse_and_category(client, db_session: Session, auth_headers):
+    main, store = models.Warehouse(name="Principal", is_main=True), models.Warehouse(name="Tienda")
+    tools, paint = models.Category(name="Herramientas"), models.Category(name="Pinturas")
+    db_session.add_all([main, store, tools, paint])
+    db_session.flush()
+    hammer = models.Product(name="Martillo", sku="MAR-V", price=15, cost_price=10, stock=8, category_id=tools.id)
+    bucket = models.Product(name="Galón", sku="GAL-V", price=30, cost_price=20, stock=3, category_id=paint.id)
+    old = models.Product(name="Descontinuado", sku="DES-V", price=5, cost_price=4, stock=100, is_active=False)
+    db_session.add_all([hammer, bucket, old])
+    db_session.flush()
+    db_session.add_all([
+        models.ProductStock(product_id=hammer.id, warehouse_id=main.id, quantity=5),
+        models.ProductStock(product_id=hammer.id, warehouse_id=store.id, quantity=2),  # 1 sin almacén
+        models.ProductStock(product_id=bucket.id, warehouse_id=store.id, quantity=3),
+    ])
+    db_session.commit()
+
+    response = client.get("/api/v1/reports/inventory-valuation", headers=auth_headers,
+                          params={"exchange_rate": 40, "group_by": "warehouse"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["total_products"], data["total_stock_units"], data["total_cost_usd"], data["total_revenue_usd"]) == (
+        2, 11, 140, 210
+    )
+    assert data["total_cost_bs"] == 5600 and data["margin_percent"] == 33.33
+    by_warehouse = {g["name"]: (g["total_stock_units"], g["total_cost_usd"]) for g in data["groups"]}
+    assert by_warehouse == {"Principal": (5, 50), "Tienda": (5, 80), "Sin almacén": (1, 10)}
+
+    data = client.get("/api/v1/reports/inventory-valuation", headers=auth_headers,
+                      params={"group_by": "category", "warehouse_id": store.id}).json()
+    assert data["total_cost_usd"] == 80
+    assert {g["name"]: g["total_cost_usd"] for g in data["groups"]} == {"Herramientas": 20, "Pinturas": 60}
+
+
+def test_month_end_valuation_uses_the_ledger_and_is_cached(client, db_session: Session, auth_headers):
+    main = models.Warehouse(name="Principal", is_main=True)
+    supplier = models.Supplier(name="Proveedor")
+    db_session.add_all([main, supplier])
+    db_session.flush()
+    nails = models.Product(name="Clavos", sku="CLA-V", price=3, cost_price=2.5, stock=0)
+    db_session.add(nails)
+    db_session.flush()
+    # Compras de julio a 1.0 y de septiembre a 2.5 (costo actual)
+    for when, cost in ((datetime(2026, 7, 10), 1), (datetime(2026, 9, 10), 2.5)):
+        order = models.PurchaseOrder(supplier_id=supplier.id, purchase_date=when, warehouse_id=main.id)
+        db_session.add(order)
+        db_session.flush()
+        db_session.add(models.PurchaseItem(purchase_id=order.id, product_id=nails.id, quantity=100, unit_cost=cost))
+    db_session.commit()
+    StockLedgerService.append(db_session, [
+        {"product_id": nails.id, "warehouse_id": main.id, "movement_type": models.MovementType.PURCHASE,
+         "quantity": qty, "balance_after": 0, "description": "test", "date": when}
+        for when, qty in ((datetime(2026, 7, 10), 100), (datetime(2026, 8, 5), -40), (datetime(2026, 9, 10), 100))
+    ])
+    db_session.add(models.ProductStock(product_id=nails.id, warehouse_id=main.id, quantity=160))
+    nails.stock = 160
+    db_session.commit()
+    StockLedgerService.ensure_snapshots(db_session, today=date(2026, 10, 19))
+    db_session.commit()
+
+    def valuation(as_of):
+        response = client.get("/api/v1/reports/inventory-valuation", headers=auth_headers, params={"as_of": as_of})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    august = valuation("2026-08-31")
+    assert (august["as_of"], august["total_stock_units"], august["total_cost_usd"]) == ("2026-08-31", 60, 60)
+    assert valuation("2026-08-15")["total_stock_units"] == 60  # Día cualquiera: foto de julio + movimientos
+    assert valuation("2026-09-30")["total_cost_usd"] == 400
+    assert db_session.query(models.InventoryValuation).count() == 2
+
+    # El cierre guardado no se recalcula (ni su valor de venta, con los precios de "priced_at")...
+    nails.cost_price, nails.price = 9, 5
+    db_session.query(models.PurchaseItem).update({"unit_cost": 9})
+    db_session.commit()
+    cached = valuation("2026-08-31")
+    assert (cached["total_cost_usd"], cached["total_revenue_usd"]) == (60, 180)
+    assert cached["priced_at"] == august["priced_at"]
+
+    # ...salvo que llegue un movimiento con fecha anterior
+    StockLedgerService.append(db_session, [{
+        "product_id": nails.id, "warehouse_id": main.id, "movement_type": models.MovementType.ADJUSTMENT_IN,
+        "quantity": 10, "balance_after": 0, "description": "test", "date": datetime(2026, 8, 20)
+    }])
+    db_session.commit()
+    assert valuation("2026-08-31")["total_cost_usd"] == 70 * 9
+    assert valuation("2026-09-30")["total_cost_usd"] == 170 * 9
@@ -0,0 +1,67 @@
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.config import settings
+from backend_api.models import models
+from backend_api.models.restaurant import RestaurantTable, TableStatusDB
+from backend_api.websocket.kitchen_feed import KitchenFeed, KitchenEvents, kitchen_feed
+
+
+def test_replay_is_bounded_per_station():
+    feed = KitchenFeed(buffer_size=3)
+    for n in range(5):
+        feed.record("1", KitchenEvents.ITEM_ADDED, {"item": {"id": n}})
+    feed.record("2", KitchenEvents.ITEM_STATUS, {"item_id": 9, "status": "READY"})
+
+    assert feed.cursors() == {"1": 5, "2": 1}
+    assert [e["seq"] for e in feed.replay("1", 2)] == [3, 4, 5]
+    assert feed.replay("1", 5) == []
+    assert feed.replay("1", 1) is None   # El seq 2 ya salió del buffer
+    assert feed.replay("2", 7) is None   # Cursor de otra ejecución del servidor
+
+
+def test_reconnecting_display_receives_missed_events(client: TestClient):
+    with client.websocket_connect("/api/v1/ws/kitchen") as ws:
+        ws.send_text(json.dumps({"type": "subscribe", "stations": ["*"]}))
+        ack = json.loads(ws.receive_text())
+        assert ack["resync"] is True  # Primera conexión: cargar /kitchen/pending
+        epoch, cursors = ack["epoch"], ack["cursors"]
+
+    missed = kitchen_feed.record("general", KitchenEvents.ITEM_ADDED, {"order_id": 1, "item": {"id": 7}})
+    kitchen_feed.record("bar", KitchenEvents.ITEM_ADDED, {"order_id": 1, "item": {"id": 8}})
+
+    with client.websocket_connect("/api/v1/ws/kitchen") as ws:
+        ws.send_text(json.dumps({"type": "subscribe", "stations": ["general"], "epoch": epoch, "cursors": cursors}))
+        ack = json.loads(ws.receive_text())
+        assert ack["resync"] is False
+        event = json.loads(ws.receive_text())
+        assert (event["station"], event["seq"], event["data"]["item"]["id"]) == ("general", missed["seq"], 7)
+
+
+def test_move_and_split_are_published_to_the_kitchen(client: TestClient, db_session: Session, auth_headers,
+                                                      monkeypatch):
+    monkeypatch.setattr(settings, "MODULE_RESTAURANT_ENABLED", True)
+
+    t1 = RestaurantTable(name="M1", zone="Salón", status=TableStatusDB.AVAILABLE)
+    t2 = RestaurantTable(name="M2", zone="Salón", status=TableStatusDB.AVAILABLE)
+    burger = models.Product(name="Hamburguesa", sku="HAM-K", price=8)
+    db_session.add_all([t1, t2, burger])
+    db_session.commit()
+
+    order = client.post(f"/api/v1/restaurant/orders/open/{t1.id}", headers=auth_headers).json()
+    items = client.post(f"/api/v1/restaurant/orders/{order['id']}/items", headers=auth_headers,
+                        json=[{"product_id": burger.id, "quantity": 3}]).json()["items"]
+    start = kitchen_feed.cursors()["general"]
+
+    assert client.post(f"/api/v1/restaurant/orders/{order['id']}/move", headers=auth_headers,
+                       json={"target_table_id": t2.id}).status_code == 200
+    response = client.post(f"/api/v1/restaurant/orders/{order['id']}/split", headers=auth_headers,
+                           json={"items_to_split": [{"item_id": items[0]["id"], "quantity": 1}]})
+    assert response.status_code == 200, response.text
+    new_order_id = response.json()["new_order_id"]
+
+    events = [(e["type"], e["data"]) for e in kitchen_feed.replay("general", start)]
+    assert [t for t, _ in events] == [KitchenEvents.ORDER_MOVED, KitchenEvents.ITEM_ADDED, KitchenEvents.ITEM_UPDATED]
+    assert events[0][1] == {"order_id": order["id"], "table_id": t2.id}
+    assert (events[1][1]["order_id"], float(events[1][1]["item"]["quantity"])) == (new_order_id, 1)
+    assert (events[2][1]["order_id"], float(events[2][1]["item"]["quantity"])) == (order["id"], 2)
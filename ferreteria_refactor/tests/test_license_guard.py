@@ -0,0 +1,14 @@
+from backend_api.middleware.license_guard import is_whitelisted
+
+
+def test_license_guard_only_protects_the_api():
+    # Frontend (SPA, assets, favicon), imágenes y documentación
+    for path in ["/", "/pos", "/products/12/edit", "/assets/index-3f2a.js", "/favicon.ico",
+                 "/manifest.webmanifest", "/images/products/1-0123456789abcdef.webp", "/docs", "/openapi.json"]:
+        assert is_whitelisted(path), path
+
+    for path in ["/api/v1/health", "/api/v1/health/db-pools", "/api/v1/license/status", "/api/v1/ws/events"]:
+        assert is_whitelisted(path), path
+
+    for path in ["/api/v1/products", "/api/v1/products/sales/", "/api/v1/reports/inventory-valuation"]:
+        assert not is_whitelisted(path), path
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services.price_table_service import PriceTableService
+
+
+def rows_by_key(data):
+    return {tuple(r[:3]): r for r in data["rows"]}
+
+
+def test_rate_update_reprices_dependents(client: TestClient, db_session: Session, auth_headers):
+    ves = db_session.query(models.ExchangeRate).filter_by(currency_code="VES").first()
+    parallel = models.ExchangeRate(name="Paralelo", currency_code="VES", currency_symbol="Bs", rate=50, is_active=True)
+    db_session.add(parallel)
+    db_session.flush()
+    cement = models.Product(name="Cemento", sku="CEM-1", price=Decimal("10"))
+    pipe = models.Product(name="Tubo", sku="TUB-1", price=Decimal("4"), exchange_rate_id=parallel.id)
+    db_session.add_all([cement, pipe])
+    db_session.flush()
+    sack = models.ProductUnit(product_id=cement.id, unit_name="Paleta", conversion_factor=Decimal("5"))
+    db_session.add(sack)
+    db_session.commit()
+
+    PriceTableService.rebuild(db_session, full=True)
+    db_session.commit()
+
+    data = client.get("/api/v1/config/price-table").json()
+    assert data["full"] is True
+    rows = rows_by_key(data)
+    assert rows[(cement.id, 0, 0)][5] == 400.0      # 10 USD * 40
+    assert rows[(cement.id, sack.id, 0)][5] == 2000.0  # 5 * 10 USD * 40
+    assert rows[(pipe.id, 0, 0)][5] == 200.0        # Tasa propia del producto
+    since = data["version"]
+
+    response = client.put(f"/api/v1/config/exchange-rates/{ves.id}", json={"rate": "45"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    delta = client.get("/api/v1/config/price-table", params={"since": since}).json()
+    assert delta["full"] is False
+    assert delta["version"] > since
+    rows = rows_by_key(delta)
+    assert set(rows) == {(cement.id, 0, 0), (cement.id, sack.id, 0)}
+    assert rows[(cement.id, 0, 0)][5] == 450.0
+
+    # Sin cambios posteriores el delta está vacío
+    assert client.get("/api/v1/config/price-table", params={"since": delta["version"]}).json()["rows"] == []
+
+
+def test_duplicate_list_prices_resolve_to_the_latest_row(db_session: Session):
+    wholesale = models.PriceList(name="Mayorista")
+    cement = models.Product(name="Cemento", sku="CEM-2", price=Decimal("10"))
+    db_session.add_all([wholesale, cement])
+    db_session.flush()
+    # Sin restricción única en product_prices: el mismo par (producto, lista) dos veces
+    db_session.add(models.ProductPrice(product_id=cement.id, price_list_id=wholesale.id, price=Decimal("9")))
+    db_session.flush()
+    db_session.add(models.ProductPrice(product_id=cement.id, price_list_id=wholesale.id, price=Decimal("8.5")))
+    db_session.commit()
+
+    # Una sola fila por clave en el INSERT ... ON CONFLICT (Postgres rechaza afectar la misma fila dos veces)
+    source = PriceTableService._source(PriceTableService.default_rate_id(db_session))
+    keys = db_session.execute(
+        select(source.c.product_id, source.c.unit_id, source.c.price_list_id, func.count())
+        .group_by(source.c.product_id, source.c.unit_id, source.c.price_list_id)
+    ).all()
+    assert all(count == 1 for *_, count in keys)
+
+    PriceTableService.rebuild(db_session, full=True)
+    db_session.commit()
+    row = db_session.query(models.ProductPriceTable).filter_by(product_id=cement.id, price_list_id=wholesale.id).one()
+    assert float(row.price_usd) == 8.5
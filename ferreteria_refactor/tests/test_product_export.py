@@ -0,0 +1,47 @@
+import os
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services import product_export_service
+from backend_api.services.product_export_service import ProductExportService
+
+
+def test_pdf_export_is_paginated_and_cached_by_catalog_version(client, db_session: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(product_export_service, "EXPORTS_DIR", str(tmp_path))
+    monkeypatch.setattr(product_export_service, "PDF_ROWS_PER_PAGE", 10)
+    category = models.Category(name="Herramientas")
+    db_session.add(category)
+    db_session.add_all(
+        models.Product(name=f"Producto {i}", sku=f"EXP-{i}", price=2, stock=3, category=category)
+        for i in range(25)
+    )
+    db_session.add(models.Product(name="Inactivo", sku="EXP-X", price=100, stock=100, is_active=False))
+    db_session.commit()
+
+    totals = ProductExportService.pdf_totals(db_session)
+    assert (totals["count"], totals["stock"], totals["value"]) == (25, 75, 150)
+    pages = list(ProductExportService.pdf_pages(db_session, rows_per_page=10))
+    assert [len(rows) for rows in pages] == [10, 10, 5]
+    assert pages[0][0][-1] == "Herramientas"
+
+    response = client.get("/api/v1/products/export/pdf")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF") and response.content.count(b"/Type /Page\n") == 3
+    files = os.listdir(tmp_path)
+    assert files == [f"inventario-{totals['version']}.pdf"]
+
+    # Mismo catálogo: se sirve el archivo existente
+    assert client.get("/api/v1/products/export/pdf").content == response.content
+    assert os.listdir(tmp_path) == files
+
+    # Cambia el stock: nueva versión
+    db_session.query(models.Product).filter_by(sku="EXP-0").one().stock = 4
+    db_session.commit()
+    client.get("/api/v1/products/export/pdf")
+    assert len(os.listdir(tmp_path)) == 2
+
+    # Se renombra la categoría (impresa en el PDF): nueva versión
+    version = ProductExportService.pdf_totals(db_session)["version"]
+    category.name = "Ferretería"
+    db_session.commit()
+    assert ProductExportService.pdf_totals(db_session)["version"] != version
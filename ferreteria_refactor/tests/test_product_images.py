@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import struct
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services import image_service
+from backend_api.services.image_service import ImageService, ProductImageFiles
+
+
+def png_bytes(size=(1200, 600), color="red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_upload_creates_hashed_sizes_served_with_etag(client: TestClient, db_session: Session, auth_headers,
+                                                      tmp_path, monkeypatch):
+    monkeypatch.setattr(image_service, "IMAGES_DIR", str(tmp_path))
+    product = models.Product(name="Taladro", sku="TAL-IMG", price=50)
+    db_session.add(product)
+    db_session.commit()
+
+    response = client.post(f"/api/v1/products/{product.id}/image", headers=auth_headers,
+                           files={"file": ("foto.png", png_bytes(), "image/png")})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["thumbnail_url"] == data["image_url"].replace(".webp", ".thumb.webp")
+    with Image.open(tmp_path / os.path.basename(data["thumbnail_url"])) as thumb:
+        assert max(thumb.size) == 160
+    with Image.open(tmp_path / os.path.basename(data["image_url"])) as full:
+        assert full.size == (800, 400)
+
+    thumb = client.get(f"/api/v1/products/{product.id}/image?size=thumb")
+    assert thumb.status_code == 200 and thumb.headers["cache-control"] == "no-cache"
+    cached = client.get(f"/api/v1/products/{product.id}/image?size=thumb",
+                        headers={"If-None-Match": thumb.headers["etag"]})
+    assert cached.status_code == 304
+
+    # Nueva imagen: nuevos nombres y se borran los anteriores
+    second = client.post(f"/api/v1/products/{product.id}/image", headers=auth_headers,
+                         files={"file": ("foto.png", png_bytes(color="blue"), "image/png")}).json()
+    assert second["image_url"] != data["image_url"]
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(u) for u in (second["image_url"], second["thumbnail_url"])
+    )
+
+
+def test_regenerate_migrates_legacy_images(db_session: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_service, "IMAGES_DIR", str(tmp_path))
+    product = models.Product(name="Sierra", sku="SIE-IMG", price=20)
+    db_session.add(product)
+    db_session.flush()
+    Image.new("RGB", (800, 800), "green").save(tmp_path / f"{product.id}.webp", "WEBP")
+    product.image_url = f"/images/products/{product.id}.webp"
+    db_session.commit()
+    assert product.thumbnail_url is None
+
+    assert ImageService.regenerate(db_session) == {"processed": 1, "renamed": 1, "missing_source": 0}
+    db_session.commit()
+    db_session.refresh(product)
+    assert product.thumbnail_url is not None
+    assert not (tmp_path / f"{product.id}.webp").exists()
+    assert ImageService.regenerate(db_session)["processed"] == 0
+
+
+def test_hashed_static_files_are_immutable(tmp_path):
+    (tmp_path / "7-0123456789abcdef.thumb.webp").write_bytes(b"webp")
+    (tmp_path / "7.webp").write_bytes(b"webp")
+    app = FastAPI()
+    app.mount("/images/products", ProductImageFiles(directory=str(tmp_path)))
+    client = TestClient(app)
+
+    hashed = client.get("/images/products/7-0123456789abcdef.thumb.webp")
+    assert hashed.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert hashed.headers["etag"] == '"0123456789abcdef-thumb"'
+    assert client.get("/images/products/7-0123456789abcdef.thumb.webp",
+                      headers={"If-None-Match": hashed.headers["etag"]}).status_code == 304
+    assert "immutable" not in client.get("/images/products/7.webp").headers.get("cache-control", "")
+
+
+def test_thumbnail_bundle_packs_images_with_offset_index(client: TestClient, db_session: Session,
+                                                         tmp_path, monkeypatch):
+    monkeypatch.setattr(image_service, "IMAGES_DIR", str(tmp_path / "products"))
+    monkeypatch.setattr(image_service, "BUNDLES_DIR", str(tmp_path / "bundles"))
+    os.makedirs(tmp_path / "products")
+    drill = models.Product(name="Taladro", sku="TAL-B", price=50)
+    saw = models.Product(name="Sierra", sku="SIE-B", price=20)
+    rope = models.Product(name="Cuerda", sku="CUE-B", price=3)
+    db_session.add_all([drill, saw, rope])
+    db_session.flush()
+    drill.image_url = ImageService.write_sizes(drill.id, png_bytes(color="red"))
+    saw.image_url = ImageService.write_sizes(saw.id, png_bytes(color="blue"))
+    db_session.commit()
+
+    url = f"/api/v1/products/images/bundle?ids={saw.id},{drill.id},{rope.id}"
+    response = client.get(url)
+    assert response.status_code == 200
+    body = response.content
+    assert body[:4] == b"IMGB"
+    (index_length,) = struct.unpack(">I", body[4:8])
+    index = json.loads(body[8:8 + index_length])
+    data = body[8 + index_length:]
+    assert index["missing"] == [rope.id]
+    for product_id, offset, length in index["items"]:
+        product = db_session.get(models.Product, product_id)
+        thumb = tmp_path / "products" / os.path.basename(product.thumbnail_url)
+        assert data[offset:offset + length] == thumb.read_bytes()
+    assert len(os.listdir(tmp_path / "bundles")) == 1
+
+    assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    # Cambia una imagen: cambia la clave del paquete
+    saw.image_url = ImageService.write_sizes(saw.id, png_bytes(color="green"))
+    db_session.commit()
+    assert client.get(url).headers["etag"] != response.headers["etag"]
+
+
+def test_resolve_drops_cached_paths_deleted_by_another_worker(db_session: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_service, "IMAGES_DIR", str(tmp_path))
+    product = models.Product(name="Lija", sku="LIJ-IMG", price=1)
+    db_session.add(product)
+    db_session.flush()
+    old_url = ImageService.write_sizes(product.id, png_bytes(color="red"))
+    product.image_url = old_url
+    db_session.commit()
+    assert ImageService.resolve(db_session, product.id) == str(tmp_path / os.path.basename(old_url))
+
+    # Otro worker reemplaza la imagen: borra los archivos anteriores sin invalidar este caché
+    product.image_url = ImageService.write_sizes(product.id, png_bytes(color="blue"))
+    db_session.commit()
+    os.remove(tmp_path / os.path.basename(old_url))
+    assert ImageService.resolve(db_session, product.id) == str(tmp_path / os.path.basename(product.image_url))
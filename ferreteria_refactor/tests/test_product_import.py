@@ -0,0 +1,165 @@
+import os
+from io import BytesIO
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services.product_import_service import ProductImportService
+
+
+def to_xlsx(rows) -> bytes:
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_import_validates_by_column_and_inserts_in_bulk(db_session: Session):
+    db_session.add_all([
+        models.Category(name="Herramientas"),
+        models.Supplier(name="Acme"),
+        models.Product(name="Existente", sku="EXI-1", price=1),
+    ])
+    db_session.commit()
+
+    content = to_xlsx([
+        {"nombre": "Martillo", "precio_usd": 12.5, "stock": 10, "sku": 7501001, "categoria": "Herramientas",
+         "proveedor": "Acme", "descuento_porcentaje": 10, "descuento_activo": "si"},
+        {"nombre": "Taladro", "precio_usd": None, "stock": 3, "sku": "TAL-1", "costo": 100, "margen_ganancia": 30, "iva": 16},
+        {"nombre": "Copia", "precio_usd": 5, "stock": 1, "sku": "TAL-1"},
+        {"nombre": "Viejo", "precio_usd": 5, "stock": 1, "sku": "EXI-1"},
+        {"nombre": "Sierra", "precio_usd": 8, "stock": "abc", "categoria": "Jardín"},
+        {"nombre": "Gratis", "precio_usd": 0, "stock": 1},
+        {"nombre": None, "precio_usd": 1, "stock": 1},
+    ])
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        products, errors = ProductImportService.parse_excel_to_products(content, db_session)
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+
+    # Un mapa por tabla referenciada + una consulta IN de SKUs
+    assert len(statements) == 3
+    assert errors == [
+        "Fila 4: SKU 'TAL-1' repetido en el archivo (fila 3)",
+        "Fila 5: SKU 'EXI-1' ya existe",
+        "Fila 6: Stock inválido",
+        "Fila 6: Categoría 'Jardín' no existe",
+        "Fila 7: Precio inválido (Debe ser > 0 o proveer Costo y Margen válidos para calcularlo)",
+    ]
+    by_sku = {p["sku"]: p for p in products}
+    assert set(by_sku) == {"7501001", "TAL-1"}
+    assert by_sku["TAL-1"]["price"] == 150.8  # 100 * 1.30 * 1.16
+    assert by_sku["7501001"]["is_discount_active"] is True
+
+    assert ProductImportService.bulk_create_products(products, db_session) == 2
+    hammer = db_session.query(models.Product).filter_by(sku="7501001").one()
+    assert hammer.category.name == "Herramientas" and hammer.supplier.name == "Acme"
+    assert float(hammer.min_stock) == 5
+    assert db_session.query(models.EffectivePrice).filter_by(product_id=hammer.id).count() == 1
+
+
+def test_upsert_import_streams_csv_in_chunks(db_session: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(ProductImportService, "CHUNK_SIZE", 2)
+    warehouse = models.Warehouse(name="Principal", is_main=True)
+    cement = models.Product(name="Cemento", sku="CEM-1", price=10, cost_price=8, profit_margin=25, stock=5)
+    cement.units.append(models.ProductUnit(unit_name="Paleta", conversion_factor=40, barcode="PAL-CEM"))
+    nails = models.Product(name="Clavos", sku="CLA-1", price=2, cost_price=1.5, profit_margin=None, stock=100)
+    db_session.add_all([warehouse, cement, nails])
+    db_session.commit()
+
+    path = tmp_path / "proveedor.csv"
+    path.write_text(
+        "nombre;sku;precio_usd;costo;margen_ganancia;stock\n"
+        "Clavos;CLA-1;2;1.5;;100\n"          # Sin cambios
+        "Cemento (paleta);PAL-CEM;480;360;;1\n"  # Por presentación: 12 / 9 por unidad, 40 unidades
+        "Arena;ARE-1;;3;50;20\n"               # Nuevo: 4.5
+        "Repetido;CLA-1;3;2;;1\n",
+        encoding="utf-8"
+    )
+
+    totals = ProductImportService.import_file(db_session, str(path))
+    assert (totals["created"], totals["updated"], totals["unchanged"]) == (1, 1, 1)
+    assert totals["errors"] == ["Fila 5: SKU 'CLA-1' repetido en el archivo (fila 2)"]
+
+    db_session.expire_all()
+    assert (float(cement.price), float(cement.cost_price), float(cement.stock)) == (12, 9, 40)
+    sand = db_session.query(models.Product).filter_by(sku="ARE-1").one()
+    assert float(sand.price) == 4.5
+    moves = {k.product_id: float(k.quantity) for k in db_session.query(models.Kardex)}
+    assert moves == {cement.id: 35, sand.id: 20}
+    assert float(db_session.query(models.ProductStock).filter_by(product_id=cement.id).one().quantity) == 35
+    assert db_session.query(models.EffectivePrice).filter_by(product_id=sand.id).count() == 1
+
+
+def test_upsert_import_keeps_columns_missing_from_the_file(db_session: Session, tmp_path):
+    pipe = models.Product(name="Tubo", sku="TUB-1", price=8.4, cost_price=6, profit_margin=40, stock=3)
+    db_session.add(pipe)
+    db_session.commit()
+
+    path = tmp_path / "precios.csv"
+    path.write_text("sku,nombre,precio_usd,stock\nTUB-1,Tubo,9,3\n", encoding="utf-8")
+    totals = ProductImportService.import_file(db_session, str(path))
+    assert totals["updated"] == 1
+
+    db_session.expire_all()
+    assert (float(pipe.price), float(pipe.cost_price), float(pipe.profit_margin)) == (9, 6, 40)
+
+
+def test_upsert_import_rejects_a_product_listed_under_two_codes(db_session: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(ProductImportService, "CHUNK_SIZE", 2)
+    db_session.add(models.Warehouse(name="Principal", is_main=True))
+    cement = models.Product(name="Cemento", sku="CEM-1", price=10, cost_price=8, stock=10)
+    cement.units.append(models.ProductUnit(unit_name="Paleta", conversion_factor=40, barcode="PAL-CEM"))
+    nails = models.Product(name="Clavos", sku="CLA-1", price=2, cost_price=1.5, stock=100)
+    nails.units.append(models.ProductUnit(unit_name="Caja", conversion_factor=50, barcode="CAJ-CLA"))
+    db_session.add_all([cement, nails])
+    db_session.commit()
+
+    path = tmp_path / "proveedor.csv"
+    path.write_text(
+        "nombre,sku,precio_usd,stock\n"
+        "Cemento,CEM-1,10,15\n"
+        "Cemento (paleta),PAL-CEM,400,1\n"  # Mismo producto en el mismo bloque
+        "Clavos (caja),CAJ-CLA,100,3\n"
+        "Arena,ARE-1,4,20\n"
+        "Clavos,CLA-1,2,100\n",             # Mismo producto que la fila 4, en otro bloque
+        encoding="utf-8"
+    )
+    totals = ProductImportService.import_file(db_session, str(path))
+    assert (totals["created"], totals["updated"]) == (1, 2)
+    assert totals["errors"] == [
+        "Fila 3: Producto 'Cemento' repetido en el archivo con otro código (fila 2)",
+        "Fila 6: Producto 'Clavos' repetido en el archivo con otro código (fila 4)",
+    ]
+
+    db_session.expire_all()
+    assert (float(cement.stock), float(nails.stock)) == (15, 150)
+    stocks = {s.product_id: float(s.quantity) for s in db_session.query(models.ProductStock)}
+    assert (stocks[cement.id], stocks[nails.id]) == (5, 50)
+    sand = db_session.query(models.Product).filter_by(sku="ARE-1").one()
+    moves = sorted((k.product_id, float(k.quantity)) for k in db_session.query(models.Kardex))
+    assert moves == sorted([(cement.id, 5), (nails.id, 50), (sand.id, 20)])  # Un movimiento por producto
+
+
+def test_upsert_import_job_reports_progress(client, db_session: Session, auth_headers, monkeypatch, tmp_path):
+    monkeypatch.setattr(ProductImportService, "run_upsert_job", lambda job_id, path, update_stock: os.remove(path))
+    response = client.post(
+        "/api/v1/products/import/upsert", headers=auth_headers,
+        files={"file": ("lista.xlsx", to_xlsx([{"nombre": "A", "sku": "A-1", "precio_usd": 1, "stock": 0}]))}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    job = client.get(f"/api/v1/products/import/jobs/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "pending" and job["filename"] == "lista.xlsx"
+
+    # El avance queda en la tabla import_jobs: cualquier worker lo puede informar
+    path = tmp_path / "lista.csv"
+    path.write_text("nombre,sku,precio_usd,stock\nA,A-1,1,0\nB,B-1,0,0\n", encoding="utf-8")
+    ProductImportService.import_file(db_session, str(path), job_id)
+    job = client.get(f"/api/v1/products/import/jobs/{job_id}", headers=auth_headers).json()
+    assert (job["status"], job["processed_rows"], job["created"], job["error_count"]) == ("running", 2, 1, 1)
+    assert db_session.query(models.ImportJob).one().errors == job["errors"]
+    assert client.get("/api/v1/products/import/jobs/nope", headers=auth_headers).status_code == 404
@@ -0,0 +1,46 @@
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.models import models
+
+
+def test_purchase_receiving_batch(client: TestClient, db_session: Session):
+    supplier = models.Supplier(name="Proveedor Test", payment_terms=30, current_balance=0)
+    warehouse = models.Warehouse(name="Principal", is_main=True, is_active=True)
+    with_margin = models.Product(name="Tornillo", sku="TOR-1", price=Decimal("13"), cost_price=Decimal("10"),
+                                 profit_margin=Decimal("30"), stock=Decimal("5"))
+    implied = models.Product(name="Clavo", sku="CLA-1", price=Decimal("15"), cost_price=Decimal("10"),
+                             stock=Decimal("0"))
+    db_session.add_all([supplier, warehouse, with_margin, implied])
+    db_session.flush()
+    db_session.add(models.ProductStock(product_id=with_margin.id, warehouse_id=warehouse.id, quantity=Decimal("5")))
+    db_session.commit()
+
+    response = client.post("/api/v1/purchases", json={
+        "supplier_id": supplier.id,
+        "warehouse_id": warehouse.id,
+        "total_amount": "320",
+        "payment_type": "CREDIT",
+        "items": [
+            {"product_id": with_margin.id, "quantity": "10", "unit_cost": "20", "update_cost": True, "update_price": True},
+            {"product_id": implied.id, "quantity": "4", "unit_cost": "20", "update_cost": True, "update_price": True},
+            {"product_id": with_margin.id, "quantity": "2", "unit_cost": "20"},
+            {"product_id": 99999, "quantity": "1", "unit_cost": "1"},
+        ]
+    })
+    assert response.status_code == 200, response.text
+    db_session.expire_all()
+
+    assert with_margin.stock == Decimal("17")
+    assert with_margin.cost_price == Decimal("20")
+    assert with_margin.price == Decimal("26")
+    assert implied.price == Decimal("30")  # Margen implícito 50% sobre el costo nuevo
+    assert implied.profit_margin == Decimal("50")
+
+    stocks = {s.product_id: s.quantity for s in db_session.query(models.ProductStock).all()}
+    assert stocks == {with_margin.id: Decimal("17"), implied.id: Decimal("4")}
+
+    kardex = db_session.query(models.Kardex).filter_by(product_id=with_margin.id).order_by(models.Kardex.id).all()
+    assert [k.balance_after for k in kardex] == [Decimal("15"), Decimal("17")]
+    assert db_session.query(models.PurchaseItem).count() == 3
+    assert supplier.current_balance == Decimal("320")
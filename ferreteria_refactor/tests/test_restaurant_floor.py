@@ -0,0 +1,46 @@
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.models.restaurant import (
+    RestaurantTable, RestaurantOrder, RestaurantOrderItem, TableStatusDB, OrderItemStatusDB
+)
+from backend_api.services.floor_service import floor_state
+from backend_api.utils.time_utils import get_venezuela_now
+
+
+def test_floor_snapshot_follows_order_changes(db_session: Session):
+    floor_state.mark_stale(full=True)
+    dish = models.Product(name="Pasta", sku="PAS-F", price=Decimal("6"))
+    terrace = RestaurantTable(name="T1", zone="Terraza")
+    hall = RestaurantTable(name="S1", zone="Salón")
+    db_session.add_all([dish, terrace, hall])
+    db_session.commit()
+
+    order = RestaurantOrder(table_id=terrace.id, total_amount=Decimal("12"))
+    terrace.status = TableStatusDB.OCCUPIED
+    db_session.add(order)
+    db_session.flush()
+    db_session.add_all([
+        RestaurantOrderItem(order_id=order.id, product_id=dish.id, quantity=1, unit_price=6, subtotal=6,
+                            created_at=get_venezuela_now() - timedelta(minutes=10)),
+        RestaurantOrderItem(order_id=order.id, product_id=dish.id, quantity=1, unit_price=6, subtotal=6,
+                            status=OrderItemStatusDB.READY),
+    ])
+    db_session.commit()
+
+    tables = {t["name"]: t for t in floor_state.get(db_session)["tables"]}
+    assert tables["T1"]["status"] == "OCCUPIED"
+    assert tables["T1"]["open_order_id"] == order.id
+    assert (tables["T1"]["item_count"], tables["T1"]["running_total"]) == (2, 12.0)
+    assert tables["T1"]["oldest_pending_age_seconds"] >= 600
+    assert tables["S1"]["open_order_id"] is None and tables["S1"]["item_count"] == 0
+
+    # Sin cambios no se consulta la BD
+    assert floor_state.get(None)["tables"][1]["item_count"] == 2
+
+    # Un item nuevo solo recarga su mesa
+    db_session.add(RestaurantOrderItem(order_id=order.id, product_id=dish.id, quantity=2, unit_price=6, subtotal=12))
+    db_session.commit()
+    tables = {t["name"]: t for t in floor_state.get(db_session)["tables"]}
+    assert (tables["T1"]["item_count"], tables["T1"]["running_total"]) == (3, 24.0)
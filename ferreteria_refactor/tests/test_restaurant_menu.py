@@ -0,0 +1,39 @@
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.models.restaurant import RestaurantMenuSection, RestaurantMenuItem
+
+
+def test_menu_served_with_etag_until_it_changes(client: TestClient, db_session: Session, auth_headers):
+    burger = models.Product(name="Hamburguesa", sku="HAM-M", price=Decimal("8"))
+    soda = models.Product(name="Refresco", sku="REF-M", price=Decimal("1.5"))
+    mains = RestaurantMenuSection(name="Platos", sort_order=1)
+    drinks = RestaurantMenuSection(name="Bebidas", sort_order=2)
+    db_session.add_all([burger, soda, mains, drinks])
+    db_session.flush()
+    db_session.add_all([
+        RestaurantMenuItem(section_id=mains.id, product_id=burger.id, sort_order=1),
+        RestaurantMenuItem(section_id=drinks.id, product_id=soda.id, alias="Soda", price_override=Decimal("2")),
+    ])
+    db_session.commit()
+
+    response = client.get("/api/v1/restaurant/menu/full", headers=auth_headers)
+    assert response.status_code == 200
+    sections = response.json()["sections"]
+    assert [s["name"] for s in sections] == ["Platos", "Bebidas"]
+    assert sections[0]["items"][0]["price"] == 8.0
+    assert sections[1]["items"][0]["alias"] == "Soda"
+    assert sections[1]["items"][0]["price"] == 2.0
+    etag = response.headers["ETag"]
+
+    cached = client.get("/api/v1/restaurant/menu/full", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    # Cambio de precio del producto: nueva versión y nuevo ETag
+    burger.price = Decimal("9")
+    db_session.commit()
+    response = client.get("/api/v1/restaurant/menu/full", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["sections"][0]["items"][0]["price"] == 9.0
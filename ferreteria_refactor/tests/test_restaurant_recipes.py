@@ -0,0 +1,45 @@
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.models.restaurant import RestaurantRecipe, RestaurantOrderItem
+from backend_api.services.recipe_inventory_service import RecipeInventoryService
+
+
+def test_order_recipes_deducted_in_bulk(db_session: Session):
+    warehouse = models.Warehouse(name="Cocina", is_main=True)
+    bread = models.Product(name="Pan", sku="PAN-R", price=Decimal("0.5"), stock=Decimal("20"))
+    meat = models.Product(name="Carne", sku="CAR-R", price=Decimal("3"), stock=Decimal("5"))
+    burger = models.Product(name="Hamburguesa", sku="HAM-R", price=Decimal("8"))
+    soda = models.Product(name="Refresco", sku="REF-R", price=Decimal("1"))
+    db_session.add_all([warehouse, bread, meat, burger, soda])
+    db_session.flush()
+    db_session.add(models.ProductStock(product_id=bread.id, warehouse_id=warehouse.id, quantity=Decimal("20")))
+    db_session.add_all([
+        RestaurantRecipe(product_id=burger.id, ingredient_id=bread.id, quantity=Decimal("1")),
+        RestaurantRecipe(product_id=burger.id, ingredient_id=meat.id, quantity=Decimal("0.150")),
+    ])
+    db_session.commit()
+
+    # Dos líneas del mismo plato y una bebida sin receta
+    items = [
+        RestaurantOrderItem(product_id=burger.id, quantity=Decimal("2")),
+        RestaurantOrderItem(product_id=soda.id, quantity=Decimal("3")),
+        RestaurantOrderItem(product_id=burger.id, quantity=Decimal("1")),
+    ]
+    updated = RecipeInventoryService.deduct_for_items(db_session, items, warehouse.id, "Receta - Orden #1")
+    db_session.commit()
+
+    assert {p["id"]: p["stock"] for p in updated} == {bread.id: 17.0, meat.id: 4.55}
+    assert db_session.get(models.Product, bread.id).stock == Decimal("17")
+    assert db_session.get(models.Product, meat.id).stock == Decimal("4.55")
+
+    stocks = {
+        s.product_id: s.quantity
+        for s in db_session.query(models.ProductStock).filter_by(warehouse_id=warehouse.id)
+    }
+    assert stocks == {bread.id: Decimal("17"), meat.id: Decimal("-0.45")}  # Sin fila previa: se crea
+
+    kardex = db_session.query(models.Kardex).order_by(models.Kardex.product_id).all()
+    assert [(k.product_id, k.quantity, k.warehouse_id) for k in kardex] == [
+        (bread.id, Decimal("-3"), warehouse.id), (meat.id, Decimal("-0.45"), warehouse.id)
+    ]
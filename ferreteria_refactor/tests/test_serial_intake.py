@@ -0,0 +1,74 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend_api.models import models
+
+
+def serialized_phone(db_session):
+    main = models.Warehouse(name="Principal", is_main=True)
+    phone = models.Product(name="Teléfono X", sku="TEL-X", price=300, cost_price=200, stock=0, has_imei=True)
+    db_session.add_all([main, phone])
+    db_session.commit()
+    return main, phone
+
+
+def test_bulk_entry_stages_serials_and_updates_stock_once(client, db_session: Session, auth_headers):
+    main, phone = serialized_phone(db_session)
+    serials = [f"sn{i:06d}" for i in range(2000)] + ["490154203237518"]
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = client.post("/api/v1/inventory/bulk-entry", headers=auth_headers, json={
+            "product_id": phone.id, "warehouse_id": main.id, "imeis": serials, "cost": 180
+        })
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+    assert response.status_code == 200, response.text
+    assert response.json()["added_count"] == 2001 and response.json()["new_stock_level"] == 2001
+    assert len(statements) < 25  # No crece con el número de seriales
+
+    instances = db_session.query(models.ProductInstance).filter_by(product_id=phone.id)
+    assert instances.count() == 2001
+    first = instances.order_by(models.ProductInstance.id).first()
+    assert (first.serial_number, float(first.cost), first.status) == ("SN000000", 180, models.ProductInstanceStatus.AVAILABLE)
+    assert float(db_session.query(models.ProductStock).one().quantity) == 2001
+    move = db_session.query(models.Kardex).one()
+    assert (float(move.quantity), float(move.warehouse_balance)) == (2001, 2001)
+
+
+def test_bulk_entry_reports_every_problem_and_writes_nothing(client, db_session: Session, auth_headers):
+    main, phone = serialized_phone(db_session)
+    db_session.add(models.ProductInstance(product_id=phone.id, warehouse_id=main.id, serial_number="SN-OLD"))
+    db_session.commit()
+
+    response = client.post("/api/v1/inventory/bulk-entry", headers=auth_headers, json={
+        "product_id": phone.id, "warehouse_id": main.id,
+        "imeis": ["SN-1", "sn-old", "SN-2", "SN-2", "490154203237517", "A B"]
+    })
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert "490154203237517 (IMEI con dígito verificador inválido)" in detail and "A B (formato inválido)" in detail
+    assert "Repetidos en el lote: SN-2" in detail and "Ya registrados: SN-OLD" in detail
+    assert db_session.query(models.ProductInstance).count() == 1
+    assert db_session.query(models.Kardex).count() == 0
+
+
+def test_validate_many_serials_in_one_request(client, db_session: Session, auth_headers):
+    main, phone = serialized_phone(db_session)
+    db_session.add_all([
+        models.ProductInstance(product_id=phone.id, warehouse_id=main.id, serial_number="SN-A"),
+        models.ProductInstance(product_id=phone.id, warehouse_id=main.id, serial_number="SN-B",
+                               status=models.ProductInstanceStatus.SOLD),
+    ])
+    db_session.commit()
+
+    response = client.post("/api/v1/inventory/imei/validate", headers=auth_headers, json={
+        "product_id": phone.id, "serials": ["sn-a", "SN-B", "SN-Z", "SN-A"]
+    })
+    assert response.status_code == 200, response.text
+    assert [(r["serial"], r["valid"], r["status"]) for r in response.json()] == [
+        ("SN-A", True, "AVAILABLE"), ("SN-B", False, "SOLD"), ("SN-Z", False, None), ("SN-A", False, "AVAILABLE")
+    ]
+    assert client.get("/api/v1/inventory/validate-imei", headers=auth_headers,
+                      params={"product_id": phone.id, "imei": "SN-A"}).json()["valid"] is True
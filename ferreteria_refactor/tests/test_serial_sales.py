@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend_api.models import models
+
+
+def phones_in_stock(db_session, serials):
+    main = models.Warehouse(name="Principal", is_main=True)
+    phone = models.Product(name="Teléfono Y", sku="TEL-Y", price=300, cost_price=200, stock=len(serials),
+                           has_imei=True, warranty_duration=6, warranty_unit=models.WarrantyUnit.MONTHS)
+    db_session.add_all([main, phone])
+    db_session.flush()
+    db_session.add(models.ProductStock(product_id=phone.id, warehouse_id=main.id, quantity=len(serials)))
+    db_session.add_all(models.ProductInstance(product_id=phone.id, warehouse_id=main.id, serial_number=s) for s in serials)
+    db_session.commit()
+    return main, phone
+
+
+def sell(client, auth_headers, phone, lines):
+    items = [
+        {"product_id": phone.id, "quantity": len(serials), "unit_price": 300, "subtotal": 300 * len(serials),
+         "serial_numbers": serials}
+        for serials in lines
+    ]
+    total = sum(item["subtotal"] for item in items)
+    return client.post("/api/v1/products/sales/", headers=auth_headers, json={
+        "total_amount": total, "total_amount_bs": total * 40, "payments": [], "items": items
+    })
+
+
+def test_cart_serials_are_resolved_together_and_checked_for_warranty(client, db_session: Session, auth_headers):
+    main, phone = phones_in_stock(db_session, ["IMEI-1", "IMEI-2", "IMEI-3", "IMEI-4"])
+
+    # El mismo serial en dos líneas del carrito
+    response = sell(client, auth_headers, phone, [["IMEI-1"], ["imei-1"]])
+    assert response.status_code == 400 and "IMEI-1" in response.json()["detail"]
+    db_session.rollback()  # La sesión de la petición se descarta al cerrarse
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = sell(client, auth_headers, phone, [["IMEI-1", "IMEI-2"], ["IMEI-3"]])
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+    assert response.status_code == 200, response.text
+    # Una sola lectura de instancias para todo el carrito
+    assert len([s for s in statements if s.lstrip().startswith("SELECT") and "FROM product_instances" in s]) == 1
+    status = dict(db_session.query(models.ProductInstance.serial_number, models.ProductInstance.status))
+    assert status == {
+        "IMEI-1": models.ProductInstanceStatus.SOLD, "IMEI-2": models.ProductInstanceStatus.SOLD,
+        "IMEI-3": models.ProductInstanceStatus.SOLD, "IMEI-4": models.ProductInstanceStatus.AVAILABLE
+    }
+    assert db_session.query(models.SaleDetailInstance).count() == 3
+
+    response = client.post("/api/v1/rma/check", headers=auth_headers, json={"imeis": ["imei-2", "IMEI-4", "NOPE"]})
+    assert response.status_code == 200, response.text
+    checks = response.json()
+    assert [(c["imei"], c["warranty_status"]) for c in checks] == [
+        ("IMEI-2", "ACTIVE"), ("IMEI-4", "NOT_SOLD"), ("NOPE", "NOT_FOUND")
+    ]
+    expires = datetime.fromisoformat(checks[0]["warranty_expiration_date"])
+    assert abs(expires - (datetime.now() + timedelta(days=180))) < timedelta(minutes=5)
+    assert (checks[0]["product_name"], float(checks[0]["original_price"])) == ("Teléfono Y", 300)
+
+
+def test_rma_return_locks_the_instance_and_cannot_be_repeated(client, db_session: Session, auth_headers):
+    main, phone = phones_in_stock(db_session, ["IMEI-9"])
+    assert sell(client, auth_headers, phone, [["IMEI-9"]]).status_code == 200
+
+    payload = {"imei": "IMEI-9", "reason": "Pantalla", "condition": "GOOD", "action": "STORE_CREDIT"}
+    response = client.post("/api/v1/rma/process", headers=auth_headers, json=payload)
+    assert response.status_code == 200, response.text
+    assert response.json()["new_stock_status"] == "RESTOCKED"
+    assert client.get("/api/v1/rma/check/IMEI-9", headers=auth_headers).json()["warranty_status"] == "NOT_SOLD"
+
+    # Ya devuelto: no se vuelve a reponer stock
+    response = client.post("/api/v1/rma/process", headers=auth_headers, json=payload)
+    assert response.status_code == 400
+    assert float(db_session.query(models.ProductStock).one().quantity) == 1
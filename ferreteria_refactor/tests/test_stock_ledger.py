@@ -0,0 +1,129 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend_api.models import models
+from backend_api.services.stock_ledger_service import StockLedgerService
+
+
+def move(product, warehouse, quantity, when, kind=models.MovementType.ADJUSTMENT_IN):
+    return {
+        "product_id": product.id, "warehouse_id": warehouse.id if warehouse else None,
+        "movement_type": kind, "quantity": quantity, "balance_after": 0,
+        "description": "test", "date": when
+    }
+
+
+def as_of(db, when, **filters):
+    return {
+        (row.product_id, row.warehouse_id): float(row.quantity)
+        for row in db.execute(StockLedgerService.stock_as_of(db, when, **filters)) if row.quantity
+    }
+
+
+def test_running_balance_is_kept_per_warehouse(db_session: Session):
+    main, store = models.Warehouse(name="Principal", is_main=True), models.Warehouse(name="Tienda")
+    cement = models.Product(name="Cemento", sku="CEM-L", price=10, stock=0)
+    db_session.add_all([main, store, cement])
+    db_session.commit()
+
+    now = datetime.now()
+    StockLedgerService.append(db_session, [move(cement, main, 40, now), move(cement, store, 5, now)])
+    # ORM: dos movimientos del mismo almacén en un mismo flush
+    db_session.add_all([
+        models.Kardex(product_id=cement.id, warehouse_id=main.id, movement_type=models.MovementType.SALE,
+                      quantity=-3, balance_after=0),
+        models.Kardex(product_id=cement.id, warehouse_id=main.id, movement_type=models.MovementType.SALE,
+                      quantity=-2, balance_after=0),
+    ])
+    db_session.commit()
+    StockLedgerService.append(db_session, [move(cement, store, -1, now, models.MovementType.ADJUSTMENT_OUT)])
+    db_session.commit()
+
+    balances = [
+        (k.warehouse_id, float(k.warehouse_balance))
+        for k in db_session.query(models.Kardex).order_by(models.Kardex.id)
+    ]
+    assert balances == [(main.id, 40), (store.id, 5), (main.id, 37), (main.id, 35), (store.id, 4)]
+
+
+def test_month_end_snapshots_answer_stock_as_of(db_session: Session):
+    main = models.Warehouse(name="Principal", is_main=True)
+    nails = models.Product(name="Clavos", sku="CLA-L", price=1, stock=0)
+    db_session.add_all([main, nails])
+    db_session.commit()
+
+    StockLedgerService.append(db_session, [
+        move(nails, main, 100, datetime(2026, 7, 10)),
+        move(nails, main, -30, datetime(2026, 8, 5), models.MovementType.SALE),
+        move(nails, main, -20, datetime(2026, 9, 20), models.MovementType.SALE),
+        move(nails, None, 7, datetime(2026, 9, 21)),
+    ])
+    # Existencia actual que coincide con el libro
+    db_session.add(models.ProductStock(product_id=nails.id, warehouse_id=main.id, quantity=50))
+    nails.stock = 57
+    db_session.commit()
+
+    created = StockLedgerService.ensure_snapshots(db_session, today=date(2026, 10, 19))
+    db_session.commit()
+    assert created == [date(2026, 7, 31), date(2026, 8, 31), date(2026, 9, 30)]
+    opening = db_session.query(models.StockSnapshot).filter_by(is_opening=True).all()
+    assert [float(s.quantity) for s in opening] == [0, 0]  # El libro explica toda la existencia actual
+
+    assert StockLedgerService.snapshot_before(db_session, datetime(2026, 9, 15)) == date(2026, 8, 31)
+    assert as_of(db_session, datetime(2026, 9, 15)) == {(nails.id, main.id): 70}
+    assert as_of(db_session, datetime(2026, 10, 1)) == {(nails.id, main.id): 50, (nails.id, None): 7}
+    assert as_of(db_session, datetime(2026, 10, 1), warehouse_id=main.id) == {(nails.id, main.id): 50}
+
+    # Movimiento con fecha atrasada: se invalidan las fotos desde esa fecha
+    StockLedgerService.append(db_session, [move(nails, main, 4, datetime(2026, 8, 20))])
+    db_session.commit()
+    assert StockLedgerService.snapshot_before(db_session, datetime(2026, 10, 1)) == date(2026, 7, 31)
+    assert as_of(db_session, datetime(2026, 10, 1), warehouse_id=main.id) == {(nails.id, main.id): 54}
+
+
+def test_rebuild_opens_the_ledger_from_current_stock(db_session: Session):
+    main = models.Warehouse(name="Principal", is_main=True)
+    saw = models.Product(name="Sierra", sku="SIE-L", price=20, stock=12)
+    db_session.add_all([main, saw])
+    db_session.flush()
+    # 10 unidades cargadas desde la ficha del producto (sin movimiento) + una compra de 2
+    db_session.add(models.ProductStock(product_id=saw.id, warehouse_id=main.id, quantity=12))
+    db_session.add(models.Kardex(product_id=saw.id, warehouse_id=main.id, movement_type=models.MovementType.PURCHASE,
+                                 quantity=2, balance_after=12, date=datetime(2026, 9, 3)))
+    db_session.commit()
+
+    result = StockLedgerService.rebuild(db_session)
+    db_session.commit()
+    assert result["opening_date"] == date(2026, 9, 2)
+    assert float(db_session.query(models.Kardex).one().warehouse_balance) == 12
+    assert as_of(db_session, datetime(2026, 9, 3)) == {(saw.id, main.id): 10}
+
+    # Stock cambiado fuera del libro: la conciliación lo registra como ajuste
+    db_session.query(models.ProductStock).one().quantity = 15
+    saw.stock = 15
+    db_session.commit()
+    assert StockLedgerService.reconcile(db_session) == 1
+    db_session.commit()
+    last = db_session.query(models.Kardex).order_by(models.Kardex.id.desc()).first()
+    assert (last.movement_type, float(last.quantity), float(last.warehouse_balance)) == (
+        models.MovementType.ADJUSTMENT_IN, 3, 15
+    )
+
+
+def test_snapshot_rows_are_unique_per_bucket(db_session: Session):
+    main = models.Warehouse(name="Principal", is_main=True)
+    tape = models.Product(name="Cinta", sku="CIN-L", price=2, stock=0)
+    db_session.add_all([main, tape])
+    db_session.commit()
+    assert StockLedgerService.acquire_maintenance_lock(db_session)
+
+    for warehouse_id in (main.id, None):  # NULL también cuenta como un solo almacén
+        db_session.add(models.StockSnapshot(snapshot_date=date(2026, 9, 30), product_id=tape.id,
+                                            warehouse_id=warehouse_id, quantity=1))
+        db_session.commit()
+        db_session.add(models.StockSnapshot(snapshot_date=date(2026, 9, 30), product_id=tape.id,
+                                            warehouse_id=warehouse_id, quantity=1))
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+        db_session.rollback()
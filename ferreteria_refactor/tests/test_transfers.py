@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend_api.models import models
+
+
+def test_transfer_moves_all_lines_in_bulk(client, db_session: Session, auth_headers):
+    main = models.Warehouse(name="Principal", is_main=True)
+    store = models.Warehouse(name="Tienda Centro")
+    db_session.add_all([main, store])
+    products = [models.Product(name=f"Tornillo {i}", sku=f"TOR-{i}", price=1, stock=50) for i in range(30)]
+    db_session.add_all(products)
+    db_session.flush()
+    db_session.add_all(models.ProductStock(product_id=p.id, warehouse_id=main.id, quantity=50) for p in products)
+    # Solo el primero ya tiene fila en el destino
+    db_session.add(models.ProductStock(product_id=products[0].id, warehouse_id=store.id, quantity=5))
+    db_session.commit()
+
+    items = [{"product_id": p.id, "quantity": 10} for p in products]
+    items.append({"product_id": products[0].id, "quantity": 5})  # Línea repetida: se acumula
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = client.post("/api/v1/transfers", headers=auth_headers, json={
+            "source_warehouse_id": main.id, "target_warehouse_id": store.id, "items": items
+        })
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+    assert response.status_code == 200, response.text
+    # No crece con el número de líneas
+    assert len(statements) < 25
+
+    details = {d["product_id"]: float(d["quantity"]) for d in response.json()["details"]}
+    assert len(details) == 30 and details[products[0].id] == 15
+
+    stock = {
+        (s.product_id, s.warehouse_id): float(s.quantity)
+        for s in db_session.query(models.ProductStock)
+    }
+    assert stock[(products[0].id, main.id)] == 35 and stock[(products[0].id, store.id)] == 20
+    assert stock[(products[1].id, main.id)] == 40 and stock[(products[1].id, store.id)] == 10
+
+    moves = db_session.query(models.Kardex).filter_by(product_id=products[0].id).all()
+    assert sorted((m.movement_type.value, float(m.quantity), float(m.balance_after)) for m in moves) == [
+        ("TRANSFER_IN", 15, 20), ("TRANSFER_OUT", -15, 35)
+    ]
+
+
+def test_transfer_reports_every_shortage_and_writes_nothing(client, db_session: Session, auth_headers):
+    main = models.Warehouse(name="Principal", is_main=True)
+    store = models.Warehouse(name="Tienda Norte")
+    drill = models.Product(name="Taladro", sku="TAL-T", price=50)
+    saw = models.Product(name="Sierra", sku="SIE-T", price=20)
+    db_session.add_all([main, store, drill, saw])
+    db_session.flush()
+    db_session.add_all([
+        models.ProductStock(product_id=drill.id, warehouse_id=main.id, quantity=2),
+        models.ProductStock(product_id=saw.id, warehouse_id=main.id, quantity=1),
+    ])
+    db_session.commit()
+
+    response = client.post("/api/v1/transfers", headers=auth_headers, json={
+        "source_warehouse_id": main.id, "target_warehouse_id": store.id,
+        "items": [{"product_id": drill.id, "quantity": 3}, {"product_id": saw.id, "quantity": 2}]
+    })
+    assert response.status_code == 400
+    assert "'Taladro'" in response.json()["detail"] and "'Sierra'" in response.json()["detail"]
+    assert db_session.query(models.InventoryTransfer).count() == 0
+    assert db_session.query(models.Kardex).count() == 0